@@ -0,0 +1,215 @@
+"""
+Admission Control
+Bounds how many requests of each work class run at once, so a burst of
+CPU-bound OCR uploads cannot starve cheap ID lookups. Each class has its
+own slots and a bounded priority queue (verification ahead of
+registration). A request that would wait longer than its deadline is
+rejected at once instead of timing out later:
+
+    queue full                         -> 429 Too Many Requests
+    estimated wait exceeds deadline    -> 503 Service Unavailable
+    deadline passed while queued       -> 503 Service Unavailable
+
+both with Retry-After. The wait is estimated from the queue position and a
+moving average of how long the class holds a slot.
+
+Deadlines default per class (ADMIT_<CLASS>_DEADLINE_MS); a client can send
+a tighter one as X-Request-Deadline-Ms.
+"""
+
+import os
+import math
+import time
+import heapq
+import itertools
+import threading
+from typing import Dict, Optional
+
+ADMISSION = os.getenv("ADMISSION", "1") == "1"
+
+# Priorities within a class (lower runs first)
+VERIFY = 0
+REGISTER = 1
+
+_sequence = itertools.count()  # FIFO among waiters of equal priority
+
+
+def _class_config(name: str, slots: int, queue: int, deadline_ms: float, estimate_ms: float) -> Dict:
+    prefix = f"ADMIT_{name.upper()}_"
+    return {
+        "slots": int(os.getenv(prefix + "SLOTS", slots)),
+        "max_queue": int(os.getenv(prefix + "QUEUE", queue)),
+        "deadline": float(os.getenv(prefix + "DEADLINE_MS", deadline_ms)) / 1000.0,
+        "estimate": float(os.getenv(prefix + "ESTIMATE_MS", estimate_ms)) / 1000.0,
+    }
+
+
+# OCR gets one slot per core: more only splits the same CPU between requests
+DEFAULT_CLASSES = {
+    "ocr": _class_config("ocr", os.cpu_count() or 1, 16, 30000, 2000),
+    "lookup": _class_config("lookup", 32, 256, 2000, 20),
+    "chain": _class_config("chain", 4, 32, 10000, 500),
+    # Progress streams hold a thread while open; no queue, a client over the limit gets 429
+    "stream": _class_config("stream", 16, 0, 60000, 30000),
+}
+
+
+class Overloaded(Exception):
+    """A request was shed; carries the HTTP status and Retry-After seconds"""
+
+    def __init__(self, work_class: str, status: int, retry_after: float, reason: str):
+        super().__init__(f"{work_class} overloaded: {reason}")
+        self.work_class = work_class
+        self.status = status
+        self.retry_after = max(1, int(math.ceil(retry_after)))
+        self.reason = reason
+
+
+class WorkClass:
+    """
+    Slots and a priority queue for one kind of work.
+
+    Args:
+        name: class name (ocr, lookup, chain, stream)
+        slots: requests allowed to run at once
+        max_queue: requests allowed to wait; more are rejected with 429
+        deadline: default seconds a request may wait plus run
+        estimate: initial guess of seconds a request holds a slot
+    """
+
+    def __init__(self, name: str, slots: int, max_queue: int, deadline: float, estimate: float):
+        self.name = name
+        self.slots = max(1, slots)
+        self.max_queue = max_queue
+        self.deadline = deadline
+        self.service_time = estimate  # moving average of slot hold time
+        self.running = 0
+        self.waiting = []  # heap of (priority, seq, Event)
+        self.cond = threading.Condition()
+        self.stats = {"admitted": 0, "queued": 0, "rejected_full": 0, "rejected_deadline": 0,
+                      "expired_in_queue": 0}
+        self.max_wait = 0.0
+
+    def estimated_wait(self, priority: int) -> float:
+        """Seconds until a new request of this priority would get a slot (cond held)"""
+        if self.running < self.slots and not self.waiting:
+            return 0.0
+        ahead = sum(1 for p, _, _ in self.waiting if p <= priority)
+        return (ahead // self.slots + 1) * self.service_time
+
+    def acquire(self, priority: int, deadline: float) -> float:
+        """
+        Wait for a slot; returns seconds spent waiting
+
+        Args:
+            priority: VERIFY or REGISTER
+            deadline: time.monotonic() by which the request must finish
+
+        Raises:
+            Overloaded: queue full, or the wait would not fit the deadline
+        """
+        start = time.monotonic()
+        with self.cond:
+            if self.running < self.slots and not self.waiting:
+                self.running += 1
+                self.stats["admitted"] += 1
+                return 0.0
+            estimate = self.estimated_wait(priority)
+            if len(self.waiting) >= self.max_queue:
+                self.stats["rejected_full"] += 1
+                raise Overloaded(self.name, 429, estimate, "queue full")
+            # Leave room to run as well as to wait
+            if start + estimate + self.service_time > deadline:
+                self.stats["rejected_deadline"] += 1
+                raise Overloaded(self.name, 503, estimate, "estimated wait exceeds deadline")
+
+            entry = (priority, next(_sequence), threading.Event())
+            heapq.heappush(self.waiting, entry)
+            self.stats["queued"] += 1
+            while not entry[2].is_set():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.waiting.remove(entry)
+                    heapq.heapify(self.waiting)
+                    self.stats["expired_in_queue"] += 1
+                    raise Overloaded(self.name, 503, self.estimated_wait(priority), "deadline passed in queue")
+                self.cond.wait(remaining)
+            waited = time.monotonic() - start
+            self.max_wait = max(self.max_wait, waited)
+            return waited
+
+    def release(self, held: float) -> None:
+        """Free a slot (or hand it straight to the first waiter)"""
+        with self.cond:
+            self.service_time += 0.2 * (held - self.service_time)
+            if self.waiting:
+                # The slot passes to the waiter; running is unchanged
+                heapq.heappop(self.waiting)[2].set()
+                self.stats["admitted"] += 1
+                self.cond.notify_all()
+            else:
+                self.running -= 1
+
+    def snapshot(self) -> Dict:
+        with self.cond:
+            return {"slots": self.slots, "running": self.running, "waiting": len(self.waiting),
+                    "max_queue": self.max_queue, "deadline_ms": round(self.deadline * 1000),
+                    "service_ms": round(self.service_time * 1000, 1), "max_wait_ms": round(self.max_wait * 1000, 1),
+                    **self.stats}
+
+
+class Ticket:
+    """An admitted request; release() exactly once when it finishes"""
+
+    def __init__(self, work_class: WorkClass, waited: float):
+        self.work_class = work_class
+        self.waited = waited
+        self.started = time.monotonic()
+        self._released = False
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self.work_class.release(time.monotonic() - self.started)
+
+
+class AdmissionController:
+    """
+    Admission for all work classes.
+
+    Args:
+        classes: {name: {"slots", "max_queue", "deadline", "estimate"}}
+            (defaults from ADMIT_<CLASS>_* environment variables)
+    """
+
+    def __init__(self, classes: Optional[Dict[str, Dict]] = None, enabled: bool = ADMISSION):
+        self.enabled = enabled
+        self.classes = {name: WorkClass(name, **config) for name, config in (classes or DEFAULT_CLASSES).items()}
+
+    def admit(self, work_class: str, priority: int = VERIFY, deadline_ms: Optional[float] = None) -> Optional[Ticket]:
+        """
+        Admit one request of a class, waiting for a slot if needed
+
+        Args:
+            work_class: "ocr", "lookup", "chain" or "stream"
+            priority: VERIFY or REGISTER
+            deadline_ms: client deadline (capped at the class default)
+
+        Returns:
+            Ticket to release when the request ends (None when disabled)
+
+        Raises:
+            Overloaded: the request is shed
+        """
+        if not self.enabled:
+            return None
+        cls = self.classes[work_class]
+        budget = cls.deadline if deadline_ms is None else min(cls.deadline, max(0.0, deadline_ms / 1000.0))
+        waited = cls.acquire(priority, time.monotonic() + budget)
+        return Ticket(cls, waited)
+
+    def stats(self) -> Dict:
+        return {"enabled": self.enabled, "classes": {name: cls.snapshot() for name, cls in self.classes.items()}}
+
+
+admission = AdmissionController()
@@ -2,19 +2,36 @@ import os
 import time
 import json
 import hashlib
-import sqlite3
-import re
+import inspect
+import threading
 import requests
 from web3 import Web3
 from dotenv import load_dotenv
-from flask import Flask, request, jsonify, render_template, redirect, url_for, session
-from eth_hash.auto import keccak
+from flask import (Flask, Response, g, request, jsonify, render_template, stream_template, redirect, url_for, send_file,
+                   session, stream_with_context)
 
 # Import local OCR module
-from local_ocr import extract_document_details
+from local_ocr import FIELD_DEFAULTS, extract_document_details, tier_stats
 
 # Import hash validator for enhanced validation
 from hash_validator import HashValidator
+from chain_reader import ChainReader
+from merkle_anchor import MerkleAnchorer
+from tx_tracker import ConfirmationTracker
+from signer_pool import SignerPool, load_signer_keys
+from live_verify import LiveVerifier, LIVE_VERIFY_PORT
+from request_profiler import profiler
+from admission import admission, Overloaded, VERIFY, REGISTER
+from perceptual_hash import PerceptualIndex, compute_hashes, to_hex
+from registry_store import get_registry
+from registry_db import blob_to_hex, DOCUMENT_COLUMNS
+from fast_json import FastJSONProvider, stream_listing
+from idempotency import IdempotencyStore, IdempotencyError, SingleFlight, request_digest
+from progress import ProgressStore, valid_id
+from fingerprint import calculate_keccak_fingerprint
+
+# Precompiled text normalization / fuzzy matching shared with the OCR module
+from field_extraction import normalize_text, fuzzy_match_normalized
 
 load_dotenv()
 
@@ -22,24 +39,19 @@ load_dotenv()
 from provenance_agent import ProvenanceAgent
 
 app = Flask(__name__)
+# jsonify() through orjson when it is installed
+app.json = FastJSONProvider(app)
 app.secret_key = os.getenv("FLASK_SECRET_KEY", "super-secret-key-for-mvp")
-UPLOAD_FOLDER = 'uploads'
+UPLOAD_FOLDER = os.getenv("UPLOAD_FOLDER", 'uploads')
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
 print("✓ Using LOCAL OCR (PaddleOCR) - No external API dependencies!")
 
-# Old external API functions removed - now using local OCR
+# Verification scans try the fast low-resolution OCR tier first
+OCR_TIERED = os.getenv("OCR_TIERED", "1") == "1"
 
+# Old external API functions removed - now using local OCR
 
-def fuzzy_match(s1, s2):
-    """Simple fuzzy match: checks if strings are very similar after normalization."""
-    n1 = normalize_text(s1)
-    n2 = normalize_text(s2)
-    if not n1 or not n2: return False
-    # Check if one is a substring of another or they share 80% similar length/chars
-    if n1 in n2 or n2 in n1:
-        return True
-    return False
 
 # Blockchain Setup (Neo X Testnet)
 neoxt_url = os.getenv("WEB3_PROVIDER", "https://neoxt4seed1.ngd.network")
@@ -83,97 +95,53 @@ NFT_ABI = [
     }
 ]
 
-# DB Initialization
-def get_db_path():
-    base_dir = os.path.dirname(os.path.abspath(__file__))
-    return os.path.join(base_dir, 'document_verification.db')
-
-def get_db_connection():
-    conn = sqlite3.connect(get_db_path())
-    conn.row_factory = sqlite3.Row
-    return conn
-
-def init_db():
-    conn = get_db_connection()
-    # Create table if not exists with product-focused columns
-    conn.execute('''
-        CREATE TABLE IF NOT EXISTS documents (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            participant_name TEXT, -- This will be Product Name
-            hackathon_name TEXT,   -- This will be Brand/Batch
-            document_hash TEXT,    -- Unique Product Fingerprint
-            txn_hash TEXT,
-            token_id TEXT,
-            contract_address TEXT,
-            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-            issuer_address TEXT,
-            document_content TEXT  -- Full technical specs or label scan
-        )
-    ''')
-    
-    # Check for missing columns in existing table (Migration)
-    cursor = conn.execute('PRAGMA table_info(documents)')
-    columns = [row['name'] for row in cursor.fetchall()]
-    
-    if 'token_id' not in columns:
-        print("Migrating: Adding token_id column...")
-        conn.execute('ALTER TABLE documents ADD COLUMN token_id TEXT')
-    
-    if 'contract_address' not in columns:
-        print("Migrating: Adding contract_address column...")
-        conn.execute('ALTER TABLE documents ADD COLUMN contract_address TEXT')
-
-    if 'issuer_address' not in columns:
-        print("Migrating: Adding issuer_address column...")
-        conn.execute('ALTER TABLE documents ADD COLUMN issuer_address TEXT')
+# DB Initialization (schema and migrations live in registry_db)
+registry = get_registry()  # creates/migrates the main file and any shards
 
-    if 'document_content' not in columns:
-        print("Migrating: Adding document_content column...")
-        conn.execute('ALTER TABLE documents ADD COLUMN document_content TEXT')
-        
-    conn.commit()
-    conn.close()
+# Anchoring of registrations without an NFT mint:
+#   tx     - one zero-value data transaction per fingerprint
+#   merkle - fingerprints are batched into a Merkle tree and only the root is anchored
+ANCHOR_MODE = os.getenv("ANCHOR_MODE", "tx")
 
-init_db()
 
+# Perceptual hash index of registered label photos (pHash Hamming distance)
+# MATCH: radius probed first; CANDIDATE: wider radius probed when nothing is that close.
+# A hit is only a candidate: labels printed from one template differ only in their
+# serial, so OCR has to read the candidate's fingerprint or serial before it is accepted
+PHASH_MATCH_DISTANCE = int(os.getenv("PHASH_MATCH_DISTANCE", 6))
+PHASH_CANDIDATE_DISTANCE = int(os.getenv("PHASH_CANDIDATE_DISTANCE", 14))
+# Labels registered by other server processes are picked up at most this often
+PHASH_REFRESH_SECONDS = float(os.getenv("PHASH_REFRESH_SECONDS", 2))
+_perceptual_index = None
+_perceptual_floors = None  # highest document id loaded, per shard
+_perceptual_checked = 0.0
+_perceptual_lock = threading.Lock()
 
-def normalize_text(text):
-    """Normalize text for consistent hashing."""
-    if not text:
-        return ""
-    # Convert to string, lowercase, strip whitespace, and replace multiple spaces with single space
-    text = str(text).strip().lower()
-    text = re.sub(r'\s+', ' ', text)
-    # Remove non-alphanumeric characters for even more robustness (optional, but good for OCR)
-    text = re.sub(r'[^a-z0-9 ]', '', text)
-    return text
+def _load_perceptual_rows(index, floors):
+    """Add rows above each shard's floor to the index; returns the new floors."""
+    def rows_after(conn, shard):
+        conn.row_factory = None
+        return conn.execute('SELECT id, phash, dhash FROM documents WHERE phash IS NOT NULL AND id > ? ORDER BY id',
+                            (floors[shard],)).fetchall()
+    results = registry.fan_out(rows_after)
+    for rows in results:
+        index.load_rows(row for row in rows if row[0] not in index)
+    return [rows[-1][0] if rows else floor for rows, floor in zip(results, floors)]
 
-def calculate_keccak_fingerprint(data):
-    """
-    Calculate Keccak-256 hash of the canonicalized product content.
-    Matches the on-chain hashing logic.
-    """
-    content = data.get("document_content", "")
-    if not content:
-        # Fallback for manual entry
-        details = data.get("product_details", {})
-        parts = [
-            f"BRAND={details.get('brand', 'Unknown')}",
-            f"MODEL={data.get('product_name', 'Unknown')}",
-            f"SN={details.get('serial_no', 'Unknown')}",
-            f"MFG={details.get('mfg_date', 'Unknown')}"
-        ]
-        content = "|".join(parts)
-    
-    # Canonicalize
-    canonical = str(content).strip().upper()
-    return compute_keccak_hash(canonical)
+def get_perceptual_index():
+    """Load the perceptual index from the registry on first use, then add newer rows now and then"""
+    global _perceptual_index, _perceptual_floors, _perceptual_checked
+    with _perceptual_lock:
+        if _perceptual_index is None:
+            index = PerceptualIndex()
+            _perceptual_floors = _load_perceptual_rows(index, [0] * registry.count)
+            _perceptual_index = index
+            print(f"✓ Perceptual index loaded ({len(index)} labels)")
+        elif time.monotonic() - _perceptual_checked > PHASH_REFRESH_SECONDS:
+            _perceptual_floors = _load_perceptual_rows(_perceptual_index, _perceptual_floors)
+        _perceptual_checked = time.monotonic()
+        return _perceptual_index
 
-def calculate_legacy_hash(data):
-    """Calculate SHA-256 hash using the old JSON method (Legacy Logic)."""
-    normalized_data = {k: normalize_text(v) for k, v in data.items()}
-    data_string = json.dumps(normalized_data, sort_keys=True)
-    return hashlib.sha256(data_string.encode()).hexdigest()
 
 def verify_on_chain(txn_hash, expected_hash):
     """
@@ -181,6 +149,22 @@ def verify_on_chain(txn_hash, expected_hash):
     Handles both legacy data anchors and contract function calls.
     """
     try:
+        # 0. Merkle-batched registrations verify locally against the batch root
+        if anchorer is not None:
+            included, proof = anchorer.verify(expected_hash)
+            if included and proof["txn_hash"] == txn_hash:
+                return True, "Identity Confirmed on Neo X (Merkle proof)"
+
+        # Transactions this app sent: the tracker has the receipt status and the calldata
+        tracked = tracker.lookup(txn_hash) if tracker is not None else None
+        if tracked is not None and tracked['status'] == 'failed':
+            return False, "Transaction failed on-chain."
+        if tracked is not None and tracked['status'] == 'confirmed':
+            sent_data = str(json.loads(tracked['fields']).get('data') or '').lower().replace('0x', '')
+            if str(expected_hash).lower().replace('0x', '') in sent_data:
+                return True, "Identity Confirmed on Neo X (Verified)"
+            return False, "Hash not found in this transaction data."
+
         # 1. Fetch transaction and receipt
         receipt = web3.eth.get_transaction_receipt(txn_hash)
         if not receipt:
@@ -212,17 +196,197 @@ def verify_on_chain(txn_hash, expected_hash):
         print(f"Blockchain Verification Error: {str(e)}")
         return False, f"Protocol Error: {str(e)}"
 
-def compute_keccak_hash(text):
+# Submissions are spread over every configured account (SIGNER_KEYS / SIGNER_KEYS_FILE,
+# else PRIVATE_KEY); mints go only to accounts holding BRAND_ROLE
+signers = SignerPool(web3, load_signer_keys(PRIVATE_KEY), neoxt_url, contract_address=NFT_CONTRACT_ADDRESS)
+
+def send_transaction(txn, needs_role=False):
     """
-    Computes a Keccak256 hash (EVM native) of the canonical text.
-    Returns the hash as a hex string (with 0x prefix).
+    Sign and broadcast a transaction from the least-loaded signer and hand it to the
+    confirmation tracker; returns (txn hash, signer address).
     """
-    if not text:
-        return "0x" + "0" * 64
-    
-    # keccak from eth_hash expects bytes
-    hash_bytes = keccak(text.encode('utf-8'))
-    return "0x" + hash_bytes.hex()
+    txn_hash, signer, fields, raw = signers.send(txn, needs_role=needs_role)
+    if tracker is not None:
+        tracker.track(txn_hash, fields, raw)
+    return txn_hash, signer
+
+# Receipts of submitted transactions are checked in one batch per block and recorded
+# on the registry rows; stuck transactions are rebroadcast, then replaced (signed by
+# the account that sent them)
+tracker = ConfirmationTracker(neoxt_url, signers.sign) if os.getenv("TX_TRACKER", "1") == "1" else None
+
+def send_data_anchor(data):
+    """Anchor data (a fingerprint or Merkle root) as calldata of a zero-value transaction; returns (txn hash, signer)."""
+    txn = {
+        'to': "0x0000000000000000000000000000000000000000",
+        'value': 0,
+        'gas': 500000,
+        'gasPrice': web3.to_wei('50', 'gwei'),
+        'chainId': CHAIN_ID,
+        'data': data
+    }
+    return send_transaction(txn)
+
+# Roots are checked on-chain once per batch; proofs are then verified locally
+anchorer = MerkleAnchorer(lambda root: send_data_anchor(root)[0], confirm_anchor=lambda txn, root: verify_on_chain(txn, root)[0],
+                          on_anchored=tracker.apply if tracker is not None else None) \
+    if ANCHOR_MODE == "merkle" else None
+
+# One agent for the process: its report and transfer-history caches outlive requests
+provenance = ProvenanceAgent(web3_provider=neoxt_url)
+
+# Bulk contract reads (Multicall3-aggregated when the chain has it; checked once)
+chain_reader = ChainReader(neoxt_url, NFT_CONTRACT_ADDRESS)
+
+def conditional_json(payload):
+    """JSON response with an ETag; 304 without a body when If-None-Match already names it."""
+    etag = hashlib.sha1(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+    if etag in request.if_none_match:
+        response = app.response_class(status=304)
+    else:
+        response = jsonify(payload)
+    response.set_etag(etag)
+    # Browsers revalidate with If-None-Match instead of reusing a stale copy
+    response.cache_control.no_cache = True
+    return response
+
+def label_fields(details):
+    """Brand, serial number and manufacturing date of OCR details, as registered."""
+    return {
+        "brand": details.get("brand", "Verified Brand"),
+        "serial_no": details.get("serial_no", "N/A"),
+        "mfg_date": details.get("mfg_date", "N/A")
+    }
+
+def label_fingerprint(title, product_details):
+    """Fingerprint a label is registered under: its title and fields, not the raw OCR text."""
+    return calculate_keccak_fingerprint({"product_name": title, "product_details": product_details})
+
+def scan_fingerprint(details):
+    """Fingerprint of OCR details, computed as at registration so a re-scan finds its label."""
+    return label_fingerprint(details.get("document_title", "Untitled Document"), label_fields(details))
+
+# Camera streams (WebSocket on LIVE_VERIFY_PORT): sharpest frames only, verdict on the first confident match
+live_verifier = LiveVerifier(registry, get_perceptual_index, scan_fingerprint,
+                             candidate_distance=PHASH_CANDIDATE_DISTANCE)
+
+# On-demand profiling: requests carrying X-Profile-Token (or picked at PROFILE_SAMPLE_RATE)
+# are sampled into a flamegraph-ready file named after the request id
+@app.before_request
+def start_profile():
+    if profiler.enabled:
+        g.profile = profiler.begin(f"{request.method} {request.path}",
+                                   token=request.headers.get('X-Profile-Token'),
+                                   request_id=request.headers.get('X-Request-ID'),
+                                   mode=request.headers.get('X-Profile-Mode'))
+
+@app.after_request
+def finish_profile(response):
+    profile = g.pop('profile', None)
+    if profile is not None:
+        response.headers['X-Request-ID'] = profile.request_id
+        response.headers['X-Profile'] = profile.name
+        if inspect.isgenerator(response.response):
+            # Generated bodies (NDJSON) are produced after this hook: stop once they are sent
+            response.call_on_close(lambda: profiler.end(profile, response.status_code))
+        else:
+            profiler.end(profile, response.status_code)
+    return response
+
+# Stage events of registrations and verifications carrying X-Progress-Id (registration
+# falls back to its Idempotency-Key), streamed as server-sent events from /api/progress/<id>.
+# Opened before admission, so a shed request still ends its stream
+progress = ProgressStore(registry.db_path)
+PROGRESS_ENDPOINTS = ('upload_and_issue', 'verify_document')
+
+def request_progress_id():
+    """The progress id of a request that reports its stages, else None."""
+    if request.endpoint not in PROGRESS_ENDPOINTS:
+        return None
+    value = request.headers.get('X-Progress-Id') or request.headers.get('Idempotency-Key')
+    return value if valid_id(value) else None
+
+def report_progress(stage, **data):
+    """Publish a stage event to the request's progress stream, if it has one."""
+    channel = g.get('progress')
+    if channel is None:
+        return
+    try:
+        progress.publish(channel, stage, data)
+    except Exception as e:
+        print(f"⚠ Progress event '{stage}' not published: {e}")
+
+@app.before_request
+def open_progress():
+    channel = request_progress_id()
+    # Only the first request under an id reports to it (not its retries)
+    if channel is not None and progress.publish(channel, 'received', {"endpoint": request.endpoint,
+                                                                      "bytes": request.content_length}, first=True):
+        g.progress = channel
+
+@app.after_request
+def finish_progress(response):
+    if g.get('progress') is not None:
+        # The response itself, for clients whose connection dropped meanwhile
+        report_progress('done', status=response.status_code,
+                        body=None if response.is_streamed else response.get_json(silent=True))
+        g.pop('progress')
+    return response
+
+# Admission control: each endpoint runs in a work class with its own slots and queue,
+# so OCR bursts cannot starve ID lookups; verification queues ahead of registration
+WORK_CLASSES = {
+    'upload_and_issue': ('ocr', REGISTER),
+    'get_product_history': ('lookup', VERIFY),
+    'api_validate_hash': ('lookup', VERIFY),
+    'api_validate_hash_get': ('lookup', VERIFY),
+    'api_validate_batch': ('lookup', VERIFY),
+    'api_anchor_proof': ('lookup', VERIFY),
+    'api_get_transaction': ('lookup', VERIFY),
+    'api_check_hash_simple': ('lookup', VERIFY),
+    'initiate_transfer': ('chain', VERIFY),
+    'progress_stream': ('stream', VERIFY),
+}
+
+def work_class():
+    """(work class, priority) of the current request, or None when it is not admission-controlled."""
+    if request.endpoint == 'verify_document':
+        # Image scans run OCR; ID-only verifications are lookups
+        image = request.files.get('image')
+        return ('ocr', VERIFY) if image is not None and image.filename else ('lookup', VERIFY)
+    return WORK_CLASSES.get(request.endpoint)
+
+@app.before_request
+def admit_request():
+    admitted = work_class() if admission.enabled else None
+    if admitted is not None:
+        deadline = request.headers.get('X-Request-Deadline-Ms')
+        g.ticket = admission.admit(*admitted, deadline_ms=float(deadline) if deadline and deadline.isdigit() else None)
+
+@app.teardown_request
+def release_admission(exc=None):
+    ticket = g.pop('ticket', None)
+    if ticket is not None:
+        ticket.release()
+
+@app.errorhandler(Overloaded)
+def shed_request(e):
+    # Read and discard the upload the client already sent: gunicorn closes a kept-alive connection
+    # that has more than 64 KiB of body left unread, and the client's next request on it fails
+    if request.content_length:
+        while request.stream.read(65536):
+            pass
+    response = jsonify({"error": "Server busy, retry later", "work_class": e.work_class, "reason": e.reason,
+                        "retry_after": e.retry_after})
+    response.status_code = e.status
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response
+
+def profile_admin():
+    """Admin endpoints take the profiling token (header or ?token=); None when authorized."""
+    if not profiler.authorized(request.headers.get('X-Profile-Token') or request.args.get('token')):
+        return jsonify({"error": "Forbidden"}), 403
+    return None
 
 @app.route('/')
 def home():
@@ -234,18 +398,48 @@ def upload_page():
 
 @app.route('/verify')
 def verify_page():
-    return render_template('verify.html')
+    return render_template('verify.html', live_port=LIVE_VERIFY_PORT)
+
+# Registrations are idempotent: an Idempotency-Key header replays the stored
+# response of the first request carrying it (any process), concurrent uploads
+# of one fingerprint in a process share one registration, and a fingerprint
+# that is already registered is answered from the registry without a chain call
+idempotency = IdempotencyStore(registry.db_path)
+registrations = SingleFlight()
+
+@app.errorhandler(IdempotencyError)
+def idempotency_conflict(e):
+    response = jsonify({"error": str(e), "reason": e.reason})
+    response.status_code = e.status
+    if e.retry_after:
+        response.headers['Retry-After'] = str(e.retry_after)
+    return response
 
 @app.route('/upload_and_issue', methods=['POST'])
 def upload_and_issue():
     """OCR and Issue to Blockchain."""
     if 'image' not in request.files:
         return jsonify({"error": "No file uploaded"}), 400
-    
+
     file = request.files['image']
     if file.filename == '':
         return jsonify({"error": "Empty filename"}), 400
 
+    key = request.headers.get('Idempotency-Key')
+    if key is None:
+        body, status = issue_document(file)
+        return jsonify(body), status
+
+    digest = request_digest(file.stream, {name: request.form.get(name, "") for name in ('manual_title', 'manual_content')})
+    body, status, replayed = idempotency.run(key, digest, lambda: issue_document(file))
+    response = jsonify(body)
+    response.status_code = status
+    if replayed:
+        response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+def issue_document(file):
+    """Save, OCR and register an upload; returns (JSON body, status)."""
     filename = f"{int(time.time())}_{file.filename}"
     filepath = os.path.join(UPLOAD_FOLDER, filename)
     file.save(filepath)
@@ -253,106 +447,135 @@ def upload_and_issue():
     try:
         # Use LOCAL OCR (PaddleOCR) - No external API calls!
         print(f"🔍 Processing document with LOCAL OCR: {filepath}")
-        
+
         # Extract details using local OCR
-        details = extract_document_details(filepath)
+        with profiler.stage("ocr"):
+            details = extract_document_details(filepath)
         doc_content = details.get("document_content", "")
         doc_title = details.get("document_title", "Untitled Document")
-        
+
         # Allow manual override if OCR fails
         if not doc_content:
             print("⚠ OCR extraction failed or empty, checking for manual input...")
             doc_content = request.form.get('manual_content', "No content extracted.")
             doc_title = request.form.get('manual_title', "Manual Entry")
-        
+
         print(f"✓ Document Scanned. Content length: {len(doc_content)}")
 
+        product_details = label_fields(details)
+        report_progress('ocr', product_name=doc_title, product_details=product_details,
+                        content_length=len(doc_content), extracted=bool(details.get("document_content")))
         # Calculate Digital Fingerprint (Keccak256)
-        doc_hash = calculate_keccak_fingerprint({
-            "product_name": doc_title,
-            "product_details": {
-                "brand": details.get("brand", "Verified Brand"),
-                "serial_no": details.get("serial_no", "N/A"),
-                "mfg_date": details.get("mfg_date", "N/A")
-            }
-        })
+        doc_hash = label_fingerprint(doc_title, product_details)
+        report_progress('fingerprint', hash=doc_hash, token_id=str(int(doc_hash, 16)))
+
+        # Concurrent uploads of the same fingerprint wait for the first one's registration
+        body, shared = registrations.do(doc_hash, lambda: register_fingerprint(
+            doc_hash, doc_title, doc_content, product_details, details.get("brand", "Genuine Brand"), filepath))
+        return (dict(body, duplicate=True) if shared else body), 200
 
-        # 3. Blockchain Minting
-        token_id = int(doc_hash, 16)
+    except Exception as e:
+        import traceback
+        print(f"Error in {request.endpoint}:")
+        print(traceback.format_exc())
+        return {"error": str(e)}, 500
+
+def register_fingerprint(doc_hash, doc_title, doc_content, product_details, brand, filepath):
+    """Register a fingerprint on chain and in the registry, or return its existing registration."""
+    token_id = int(doc_hash, 16)
+    response = {
+        "status": "success",
+        "product_name": doc_title,
+        "hash": doc_hash,
+        "token_id": str(token_id),
+        "product_details": product_details,
+        "explorer_url": EXPLORER_URL,
+    }
+
+    existing = registry.find_registration(doc_hash)
+    if existing is not None:
+        print(f"✓ Fingerprint already registered (document {existing['id']}); no transaction sent")
+        report_progress('match', duplicate=True, document_id=existing['id'], txn_status=existing['txn_status'])
+        return dict(response, product_name=existing['participant_name'], txn_hash=blob_to_hex(existing['txn_hash']),
+                    anchor=None, duplicate=True, document_id=existing['id'], txn_status=existing['txn_status'])
+
+    # 3. Claim the fingerprint in the Local DB (with the photo's perceptual hashes)
+    # before any transaction: of concurrent registrations in other processes only
+    # one gets past the unique fingerprint index
+    with profiler.stage("phash"):
+        perceptual = compute_hashes(filepath)
+    # Written to the fingerprint's shard. Hashes are stored as 32-byte BLOBs; token_id
+    # derives from the fingerprint (SQLite INTEGER only holds 8 bytes, so it is never stored)
+    with profiler.stage("db"):
+        doc_id, created = registry.register_document(participant_name=doc_title, hackathon_name=brand,
+                                                     document_hash=doc_hash, contract_address=NFT_CONTRACT_ADDRESS,
+                                                     issuer_address=FROM_ADDRESS, document_content=doc_content,
+                                                     phash=to_hex(perceptual[0]) if perceptual else None,
+                                                     dhash=to_hex(perceptual[1]) if perceptual else None)
+    if not created:
+        return register_fingerprint(doc_hash, doc_title, doc_content, product_details, brand, filepath)
+    report_progress('match', duplicate=False, document_id=doc_id)
+
+    try:
+        # 4. Blockchain Minting
         txn_hex = None
-        
+        issuer = FROM_ADDRESS
+
         if NFT_CONTRACT_ADDRESS != "0x0000000000000000000000000000000000000000":
             try:
                 # Setup ABI for VeriChainProduct
                 # (We will load this from the compiled artifacts soon)
                 contract = web3.eth.contract(address=NFT_CONTRACT_ADDRESS, abi=NFT_ABI)
-                nonce = web3.eth.get_transaction_count(FROM_ADDRESS)
-                
+
                 # Convert hex hash to bytes32 for Solidity
                 bytes_hash = web3.to_bytes(hexstr=doc_hash)
-                
+
                 txn = contract.functions.mintWithFingerprint(bytes_hash, FROM_ADDRESS).build_transaction({
                     'chainId': CHAIN_ID,
                     'gas': 1000000,
                     'gasPrice': web3.to_wei('50', 'gwei'),
-                    'nonce': nonce,
+                    'nonce': 0,  # assigned by the signer pool
                 })
-                
-                signed_txn = web3.eth.account.sign_transaction(txn, PRIVATE_KEY)
-                txn_send_hash = web3.eth.send_raw_transaction(signed_txn.raw_transaction)
-                txn_hex = web3.to_hex(txn_send_hash)
-                
+
+                with profiler.stage("rpc"):
+                    txn_hex, issuer = send_transaction(txn, needs_role=True)
+
                 print(f"Minting NFT for TokenID {token_id}...")
                 print(f"TX: {txn_hex}")
             except Exception as e:
                 print(f"Contract Minting Error: {str(e)}")
                 # Fail gracefully for now
-        
+
+        anchor = None
         if not txn_hex:
-            # Fallback legacy anchor if NFT mint fails
-            print("Performing legacy data anchor on Neo X...")
-            nonce = web3.eth.get_transaction_count(FROM_ADDRESS)
-            txn = {
-                'to': "0x0000000000000000000000000000000000000000",
-                'value': 0,
-                'gas': 500000,
-                'gasPrice': web3.to_wei('50', 'gwei'),
-                'nonce': nonce,
-                'chainId': CHAIN_ID,
-                'data': doc_hash
-            }
-            signed_txn = web3.eth.account.sign_transaction(txn, PRIVATE_KEY)
-            txn_send_hash = web3.eth.send_raw_transaction(signed_txn.raw_transaction)
-            txn_hex = web3.to_hex(txn_send_hash)
-
-        # 4. Store in Local DB
-        conn = get_db_connection()
-        # Convert token_id to string to avoid "Python int too large to convert to SQLite INTEGER"
-        # SQLite INTEGER handles up to 8 bytes, but Keccak hashes are 32 bytes (256-bit).
-        conn.execute('INSERT INTO documents (participant_name, hackathon_name, document_hash, txn_hash, token_id, contract_address, issuer_address, document_content) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
-                    (doc_title, details.get("brand", "Genuine Brand"), doc_hash, txn_hex, str(token_id), NFT_CONTRACT_ADDRESS, FROM_ADDRESS, doc_content))
-        conn.commit()
-        conn.close()
-
-        return jsonify({
-            "status": "success",
-            "product_name": doc_title,
-            "hash": doc_hash,
-            "txn_hash": txn_hex,
-            "token_id": str(token_id),
-            "product_details": {
-                "brand": details.get("brand", "Verified Brand"),
-                "serial_no": details.get("serial_no", "N/A"),
-                "mfg_date": details.get("mfg_date", "N/A")
-            },
-            "explorer_url": EXPLORER_URL
-        })
+            if anchorer is not None:
+                # Queued for the next Merkle batch; txn_hash is set when the root is anchored
+                anchor = {"mode": "merkle", "status": "pending"}
+            else:
+                # Fallback legacy anchor if NFT mint fails
+                print("Performing legacy data anchor on Neo X...")
+                with profiler.stage("rpc"):
+                    txn_hex, issuer = send_data_anchor(doc_hash)
 
-    except Exception as e:
-        import traceback
-        print(f"Error in {request.endpoint}:")
-        print(traceback.format_exc())
-        return jsonify({"error": str(e)}), 500
+        if txn_hex or issuer != FROM_ADDRESS:
+            with profiler.stage("db"):
+                registry.update_documents([doc_id], txn_hash=txn_hex, txn_status='pending' if txn_hex else None,
+                                          issuer_address=issuer)
+        report_progress('transaction', txn_hash=txn_hex, anchor=anchor, issuer=issuer)
+    except Exception:
+        # Nothing was anchored: release the fingerprint for a retry
+        registry.update_documents([doc_id], txn_status='failed')
+        raise
+
+    if perceptual:
+        get_perceptual_index().add(perceptual[0], perceptual[1], doc_id)
+    if anchor is not None:
+        anchorer.enqueue(doc_id, doc_hash)
+    elif txn_hex and tracker is not None:
+        # The receipt may have been recorded before the row had its txn_hash
+        tracker.apply(txn_hex)
+
+    return dict(response, txn_hash=txn_hex, anchor=anchor, duplicate=False, document_id=doc_id)
 
 @app.route('/verify_document', methods=['POST'])
 def verify_document():
@@ -374,30 +597,19 @@ def verify_document():
     image_present = 'image' in request.files and request.files['image'].filename != ''
     
     try:
-        conn = get_db_connection()
-        records = conn.execute('SELECT * FROM documents').fetchall()
-        conn.close()
-        
         record = None
         details = {}
+        match_info = None
 
         # --- PHASE 1: IDENTIFICATION ---
         
         if manual_hash:
             print(f"🔍 System Search: ID [{manual_hash[:10]}...]")
-            for r in records:
-                # Check Document Fingerprint, Blockchain Txn, AND Token ID
-                db_hash = str(r['document_hash'] or "").lower()
-                db_txn = str(r['txn_hash'] or "").lower()
-                db_token = str(r['token_id'] or "").lower()
-                
-                # Loose matching: check with and without 0x
-                if (db_hash in [id_with_0x, clean_no_0x] or 
-                    db_txn in [id_with_0x, clean_no_0x] or 
-                    db_token in [id_with_0x, clean_no_0x]):
-                    record = r
-                    print(f"✓ Identity Found: {r['participant_name']}")
-                    break
+            # Document Fingerprint, Blockchain Txn, AND Token ID (indexed, with or without 0x)
+            with profiler.stage("db"):
+                record = registry.find_document(clean_manual)
+            if record:
+                print(f"✓ Identity Found: {record['participant_name']}")
         
         elif image_present:
             file = request.files['image']
@@ -405,37 +617,81 @@ def verify_document():
             file.save(filepath)
             
             print(f"🔍 Analyzing File: {filepath}")
-            details = extract_document_details(filepath)
-            doc_content = details.get("document_content", "")
+
+            # Perceptual lookup first: a re-photographed registered label
+            # gives a candidate record, which OCR then has to confirm
+            # (labels printed from one template differ only in the serial)
+            candidate = None
+            with profiler.stage("phash"):
+                perceptual = compute_hashes(filepath)
+            if perceptual:
+                index = get_perceptual_index()
+                # Tight radius first (a few bucket probes), wider only when nothing is close
+                hits = (index.query(*perceptual, radius=PHASH_MATCH_DISTANCE)
+                        or index.query(*perceptual, radius=PHASH_CANDIDATE_DISTANCE))
+                if hits:
+                    p_dist, d_dist, doc_id = hits[0]
+                    with profiler.stage("db"):
+                        candidate = registry.find_by_id(doc_id)
+                    match_info = {"method": "perceptual", "phash_distance": p_dist, "dhash_distance": d_dist}
+
+            def confirms_candidate(d):
+                """OCR details naming the perceptual candidate: its fingerprint, or its serial number"""
+                if candidate is None:
+                    return False
+                if scan_fingerprint(d) == candidate['document_hash']:
+                    return True
+                serial = d.get("serial_no")
+                return (bool(serial) and serial != FIELD_DEFAULTS["serial_no"]
+                        and normalize_text(candidate['participant_name']) == normalize_text(f"Product {serial}"))
+
+            def registered(d):
+                return confirms_candidate(d) or registry.find_by_fingerprint(scan_fingerprint(d)) is not None
+
+            # Fast OCR tier first; escalate when it names neither the candidate nor a registered fingerprint
+            with profiler.stage("ocr"):
+                details = extract_document_details(filepath, tiered=OCR_TIERED, accept=registered)
             doc_title = details.get("document_title", "Untitled Document")
-            
+            report_progress('ocr', product_name=doc_title, product_details=label_fields(details),
+                            content_length=len(details.get("document_content", "")))
+        
             # Use the same fingerprinting logic as registration
-            scanned_hash = calculate_keccak_fingerprint({
-                "product_name": doc_title,
-                "document_content": doc_content,
-                "product_details": {
-                    "brand": details.get("brand", "Verified Brand"),
-                    "serial_no": details.get("serial_no", "N/A"),
-                    "mfg_date": details.get("mfg_date", "N/A")
-                }
-            })
+            scanned_hash = scan_fingerprint(details)
             print(f"✓ Scanned Fingerprint: {scanned_hash[:10]}...")
-            
-            # Direct Match
-            for r in records:
-                if r['document_hash'] == scanned_hash:
-                    record = r
-                    break
-            
-            # Intelligent Alignment
+            report_progress('fingerprint', hash=scanned_hash)
+
+            # Perceptual candidate confirmed by OCR
+            if confirms_candidate(details):
+                record = candidate
+                match_info["method"] = "perceptual+ocr"
+                print(f"✓ Perceptual match confirmed by OCR (pHash {match_info['phash_distance']}, "
+                      f"dHash {match_info['dhash_distance']}): {record['participant_name']}")
+
+            # Direct Match (indexed)
+            if not record:
+                with profiler.stage("db"):
+                    record = registry.find_by_fingerprint(scanned_hash)
+                if record:
+                    match_info = {"method": "fingerprint"}
+
+            # Intelligent Alignment: names only, the matching row is then fetched by id
             if not record:
-                for r in records:
-                    if fuzzy_match(r['participant_name'], doc_title):
-                        record = r
+                title_norm = normalize_text(doc_title)
+                with profiler.stage("db"):
+                    names = registry.query('SELECT id, participant_name FROM documents ORDER BY id', raw=True)
+                for doc_id, name in names:
+                    if fuzzy_match_normalized(normalize_text(name), title_norm):
+                        record = registry.find_by_id(doc_id)
+                        match_info = {"method": "fuzzy_title"}
                         break
         else:
             return jsonify({"error": "Provide ID or Image"}), 400
 
+        report_progress('match', found=record is not None,
+                        method=(match_info or {}).get("method", "id") if record is not None else None,
+                        product_name=record['participant_name'] if record is not None else None,
+                        document_id=record['id'] if record is not None else None)
+
         if not record:
             # --- PHASE 1.5: BLOCKCHAIN FALLBACK ---
             # If not in DB, check if the ID itself is a valid Transaction on Neo X
@@ -445,9 +701,10 @@ def verify_document():
                 # Try as TokenID first
                 try:
                     token_id = int(id_with_0x, 16) if "x" in clean_manual else int(clean_no_0x)
-                    contract = web3.eth.contract(address=NFT_CONTRACT_ADDRESS, abi=NFT_ABI)
-                    owner = contract.functions.ownerOf(token_id).call()
+                    # Through the shared reader (Multicall3 / JSON-RPC batch), like the batch fallback
+                    owner = chain_reader.owners_of([token_id]).get(token_id)
                     if owner:
+                        owner = Web3.to_checksum_address(owner)
                         print(f"✓ Found Token {token_id} owned by {owner}")
                         return jsonify({
                             "status": "verified",
@@ -502,13 +759,15 @@ def verify_document():
             })
 
         # --- PHASE 2: Intelligence Agent Analysis ---
-        agent = ProvenanceAgent()
-        report = agent.analyze_product(record['document_hash'])
-        
-        return jsonify({
+        with profiler.stage("rpc"):
+            report = provenance.analyze_product(record['document_hash'])
+
+        # Cached reports are unchanged until the product's chain history changes
+        return conditional_json({
             "status": "verified" if report['authenticity_status'] == "Authentic" else "failed",
             "message": f"Provenance Intelligence Check Complete",
-            "report": report
+            "report": report,
+            "match": match_info
         })
 
     except Exception as e:
@@ -518,29 +777,17 @@ def get_product_history(token_id):
     """Fetch transfer history for a specific product NFT."""
     try:
         token_id_int = int(token_id)
-        contract = web3.eth.contract(address=NFT_CONTRACT_ADDRESS, abi=NFT_ABI)
-        
-        # Get Transfer events
+
+        # Transfer events, synced incrementally from the last block seen for this token
         try:
-            events = contract.events.Transfer().get_logs(
-                fromBlock=0,
-                argument_filters={'tokenId': token_id_int}
-            )
+            events = provenance.transfer_history(NFT_CONTRACT_ADDRESS, token_id_int)
         except:
             events = []
-            
-        history = []
-        for event in events:
-            block = web3.eth.get_block(event.blockNumber)
-            history.append({
-                "from": event.args['from'],
-                "to": event.args['to'],
-                "block": event.blockNumber,
-                "timestamp": time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(block.timestamp)),
-                "txn_hash": event.transactionHash.hex()
-            })
-            
-        return jsonify({"success": True, "history": history})
+
+        history = [dict(event, timestamp=time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(event['timestamp'])))
+                   for event in events]
+
+        return conditional_json({"success": True, "history": history})
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
@@ -563,10 +810,11 @@ def initiate_transfer():
 
 @app.route('/history')
 def history():
-    conn = get_db_connection()
-    docs = conn.execute('SELECT * FROM documents ORDER BY timestamp DESC').fetchall()
-    conn.close()
-    return render_template('history.html', documents=docs, explorer_url=EXPLORER_URL)
+    # Only the columns the page shows, rendered as the rows are read
+    docs = registry.iter_ordered('SELECT participant_name, hackathon_name, document_hash, txn_hash, timestamp '
+                                 'FROM documents ORDER BY timestamp DESC',
+                                 key=lambda r: r.timestamp or '', reverse=True)
+    return stream_template('history.html', documents=docs, explorer_url=EXPLORER_URL)
 
 # ============================================================
 # NEW: Enhanced Hash Validation & Database Query Endpoints
@@ -594,6 +842,138 @@ def api_validate_hash_get(hash_value):
     except Exception as e:
         return jsonify({"valid": False, "error": str(e)}), 500
 
+# Bulk validation limits (ids per request, ids per streamed chunk)
+MAX_BATCH_IDS = int(os.getenv("MAX_BATCH_IDS", 100000))
+BATCH_STREAM_CHUNK = 1000
+
+@app.route('/api/validate_batch', methods=['POST'])
+def api_validate_batch():
+    """
+    Bulk validation for shipments.
+    Body: {"hashes": [...], "chain_fallback": false}
+    Streams one NDJSON line per input id, in input order.
+    """
+    data = request.get_json(silent=True) or {}
+    hashes = data.get('hashes')
+    if not isinstance(hashes, list) or not hashes:
+        return jsonify({"error": "Provide a non-empty 'hashes' list"}), 400
+    if len(hashes) > MAX_BATCH_IDS:
+        return jsonify({"error": f"Too many ids (max {MAX_BATCH_IDS} per request)"}), 413
+
+    chain_fallback = bool(data.get('chain_fallback')) and NFT_CONTRACT_ADDRESS != "0x0000000000000000000000000000000000000000"
+    validator = HashValidator()
+
+    def resolve_on_chain(chunk):
+        # One batched ownerOf round for every id the registry did not know
+        missing = {}
+        for pos, (document_hash, (is_valid, details)) in enumerate(chunk):
+            normalized = HashValidator.normalize_hash(document_hash)
+            if not is_valid and len(normalized) == 64 and all(c in '0123456789abcdef' for c in normalized):
+                missing[pos] = int(normalized, 16)
+        if not missing:
+            return
+        try:
+            owners = chain_reader.owners_of(missing.values())
+        except Exception as e:
+            print(f"Batch chain fallback failed: {e}")
+            return
+        for pos, token_id in missing.items():
+            owner = owners.get(token_id)
+            if owner:
+                chunk[pos][1][1].update({
+                    'status': 'ON_CHAIN',
+                    'message': 'Token exists on-chain but is not registered in the local index.',
+                    'token_id': str(token_id),
+                    'owner': owner
+                })
+
+    def generate():
+        chunk = []
+        try:
+            for item in zip(hashes, validator.iter_validate_many(hashes)):
+                chunk.append(item)
+                if len(chunk) >= BATCH_STREAM_CHUNK:
+                    if chain_fallback:
+                        resolve_on_chain(chunk)
+                    yield "".join(json.dumps({"hash": h, "valid": v, "details": d}) + "\n" for h, (v, d) in chunk)
+                    chunk = []
+            if chunk:
+                if chain_fallback:
+                    resolve_on_chain(chunk)
+                yield "".join(json.dumps({"hash": h, "valid": v, "details": d}) + "\n" for h, (v, d) in chunk)
+        except Exception as e:
+            yield json.dumps({"error": str(e)}) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+@app.route('/api/progress/<progress_id>', methods=['GET'])
+def progress_stream(progress_id):
+    """Stage events of a registration or verification (X-Progress-Id) as server-sent events."""
+    if not valid_id(progress_id):
+        return jsonify({"error": "Progress id must be 8-128 letters, digits, '-' or '_'"}), 400
+    # EventSource resends the last event id it saw when it reconnects
+    last = request.headers.get('Last-Event-ID') or request.args.get('last_event_id', '')
+    after = int(last) if last.isdigit() else 0
+    if last.isdigit() and progress.finished(progress_id, after):
+        return '', 204  # stops EventSource from reconnecting
+    response = Response(stream_with_context(progress.stream(progress_id, after)),
+                        mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # no proxy buffering
+    # The stream slot is held until the response is closed, not just until the view returns
+    ticket = g.pop('ticket', None)
+    if ticket is not None:
+        response.call_on_close(ticket.release)
+    return response
+
+@app.route('/api/anchor/proof/<fingerprint>', methods=['GET'])
+def api_anchor_proof(fingerprint):
+    """Merkle inclusion proof of a batched registration, verifiable against the anchored root"""
+    if anchorer is None:
+        return jsonify({"error": "Merkle anchoring is not enabled (ANCHOR_MODE=merkle)"}), 404
+    try:
+        included, proof = anchorer.verify(fingerprint)
+        if proof.get("status") == "not_queued":
+            return jsonify({"found": False}), 404
+        return jsonify({"found": True, "verified": included, **proof})
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/ocr/tier_stats', methods=['GET'])
+def api_ocr_tier_stats():
+    """Hit rates and time per OCR tier for verification scans"""
+    return jsonify(tier_stats.snapshot())
+
+@app.route('/api/signers', methods=['GET'])
+def api_signers():
+    """Per-signer submissions, errors, in-flight transactions and throughput"""
+    return jsonify({"max_in_flight": signers.max_in_flight, "signers": signers.stats()})
+
+@app.route('/api/admission', methods=['GET'])
+def api_admission():
+    """Slots, queue depth, service time and shed requests per work class"""
+    return jsonify(admission.stats())
+
+@app.route('/api/admin/profiles', methods=['GET'])
+def api_admin_profiles():
+    """Recent request profiles (newest first) and the profiler's caps"""
+    denied = profile_admin()
+    if denied:
+        return denied
+    return jsonify({"profiler": profiler.stats(), "profiles": profiler.list()})
+
+@app.route('/api/admin/profiles/<name>', methods=['GET'])
+def api_admin_profile_download(name):
+    """Download one profile (.folded: flamegraph.pl / speedscope; .prof: pstats)"""
+    denied = profile_admin()
+    if denied:
+        return denied
+    path = profiler.path(name)
+    if path is None:
+        return jsonify({"error": "Profile not found"}), 404
+    return send_file(path, as_attachment=True, download_name=name,
+                     mimetype='text/plain' if name.endswith('.folded') else 'application/octet-stream')
+
 @app.route('/api/statistics', methods=['GET'])
 def api_statistics():
     """Get database statistics"""
@@ -603,33 +983,37 @@ def api_statistics():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+# Listings are streamed from the registry and serialized in chunks; long ones end with
+# {"count": n, "complete": true}, or "complete": false and "error" when the query failed midway
 @app.route('/api/all_hashes', methods=['GET'])
 def api_all_hashes():
     """Get all document hashes in the database"""
     try:
         validator = HashValidator()
-        hashes = validator.get_all_hashes()
-        return jsonify({"count": len(hashes), "hashes": hashes})
+        return stream_listing("hashes", validator.iter_all_hashes())
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
-    """Search documents by participant name"""
+def search_listing(column, text):
+    """Streamed search results; ?fields=a,b limits the columns fetched and returned."""
+    fields = [f.strip() for f in request.args.get('fields', '').split(',') if f.strip()]
     try:
         validator = HashValidator()
-        results = validator.search_by_name(name)
-        return jsonify({"count": len(results), "results": results})
+        return stream_listing("results", validator.iter_search(column, text, fields or DOCUMENT_COLUMNS))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/search/name/<name>', methods=['GET'])
+def api_search_by_name(name):
+    """Search documents by participant name"""
+    return search_listing('participant_name', name)
+
 @app.route('/api/search/event/<event>', methods=['GET'])
 def api_search_by_event(event):
     """Search documents by event name"""
-    try:
-        validator = HashValidator()
-        results = validator.search_by_event(event)
-        return jsonify({"count": len(results), "results": results})
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
+    return search_listing('hackathon_name', event)
 
 @app.route('/api/transaction/<txn_hash>', methods=['GET'])
 def api_get_transaction(txn_hash):
@@ -664,4 +1048,7 @@ def api_check_hash_simple():
 
 
 if __name__ == '__main__':
+    # The debug reloader runs this file twice; only the serving child starts the WebSocket server
+    if LIVE_VERIFY_PORT and os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        live_verifier.serve_in_background(port=LIVE_VERIFY_PORT)
     app.run(debug=True, port=5001)
\ No newline at end of file
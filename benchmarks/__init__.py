@@ -0,0 +1,8 @@
+"""
+VeriChain Benchmarks
+Reproducible performance benchmarks for OCR, fingerprinting, the registry
+and provenance, with baseline comparison.
+
+Run the suite with:
+    python -m benchmarks.run --baseline benchmarks/baseline.json
+"""
@@ -0,0 +1,77 @@
+"""
+Binary Storage Benchmark
+Builds a pre-v2 registry (hex TEXT hashes, stored token ids), measures
+file and index size plus exact-match lookup latency, runs the online
+migration to 32-byte BLOBs, VACUUMs and measures again.
+
+Usage: python benchmarks/bench_binary_storage.py [registry_rows]
+"""
+
+import os
+import sys
+import time
+import random
+import tempfile
+
+os.environ.setdefault("BINARY_MIGRATION", "off")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.suite import measure, summarize
+from benchmarks.synthetic import generate_registry
+from hash_validator import HashValidator
+from registry_db import get_db_connection, migrate_to_binary
+
+
+def storage(db_path: str) -> dict:
+    """File size and per-object bytes (tables and indexes) in MiB"""
+    conn = get_db_connection(db_path)
+    try:
+        objects = dict(conn.execute(
+            "SELECT name, SUM(pgsize) FROM dbstat WHERE name IN ('documents', 'idx_documents_hash', 'idx_documents_txn') "
+            "GROUP BY name"
+        ).fetchall())
+    except Exception:
+        objects = {}  # SQLite built without DBSTAT
+    conn.close()
+    result = {name: round(size / 2 ** 20, 1) for name, size in objects.items()}
+    result["file"] = round(os.path.getsize(db_path) / 2 ** 20, 1)
+    return result
+
+
+def lookups(db_path: str, fingerprints: list) -> dict:
+    validator = HashValidator(db_path)
+    rng = random.Random(3)
+    probes = [rng.choice(fingerprints) for _ in range(2000)]
+    single = iter(probes * 10)
+    return {
+        "validate_hash": summarize(measure(lambda: validator.validate_hash(next(single)), 2000)),
+        "validate_many_2000": summarize(measure(lambda: validator.validate_many(probes), 10)),
+    }
+
+
+def report(label: str, db_path: str, fingerprints: list) -> None:
+    sizes = storage(db_path)
+    timings = lookups(db_path, fingerprints)
+    print(f"{label}: " + ", ".join(f"{name} {size} MiB" for name, size in sizes.items()))
+    for name, stats in timings.items():
+        print(f"  {name:<20} median {stats['median_ms']} ms  p95 {stats['p95_ms']} ms")
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "registry.db")
+        fingerprints = generate_registry(db_path, rows, legacy=True)
+        report(f"Text (v1, {rows} rows)", db_path, fingerprints)
+
+        start = time.perf_counter()
+        converted = migrate_to_binary(db_path)
+        print(f"Online migration: {converted} rows in {time.perf_counter() - start:.1f}s")
+        conn = get_db_connection(db_path)
+        conn.execute('VACUUM')
+        conn.close()
+        report("BLOB (v2, vacuumed)", db_path, fingerprints)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Field Extraction Microbenchmark
+Compares the precompiled single-pass extractor and translate-table
+normalize_text against the previous per-field re.search / re.sub code.
+
+Usage: python benchmarks/bench_field_extraction.py
+"""
+
+import os
+import re
+import sys
+import time
+import random
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from field_extraction import get_extractor, normalize_text, fuzzy_match, fuzzy_match_normalized
+
+
+def legacy_extract(full_text):
+    details = {}
+    brand_match = re.search(r"(?:Brand|Manufacturer|BY)[\s:]+([A-Z0-9\s]{3,20})", full_text, re.IGNORECASE)
+    if brand_match:
+        details["brand"] = brand_match.group(1).strip()
+    serial_match = re.search(r"(?:S/N|Serial|ID|Code|UID)[\s:]+([A-Z0-9-]+)", full_text, re.IGNORECASE)
+    if serial_match:
+        details["serial_no"] = serial_match.group(1).strip()
+    date_match = re.search(r"(?:MFD|MFG|Batch Date)[\s:]+([\d\/-]{6,10})", full_text, re.IGNORECASE)
+    if date_match:
+        details["mfg_date"] = date_match.group(1).strip()
+    return details
+
+
+def legacy_normalize(text):
+    if not text:
+        return ""
+    text = str(text).strip().lower()
+    text = re.sub(r'\s+', ' ', text)
+    text = re.sub(r'[^a-z0-9 ]', '', text)
+    return text
+
+
+def legacy_fuzzy(s1, s2):
+    n1 = legacy_normalize(s1)
+    n2 = legacy_normalize(s2)
+    if not n1 or not n2:
+        return False
+    return n1 in n2 or n2 in n1
+
+
+def ocr_text(rng, lines):
+    words = ["NET WT", "500g", "Ingredients", "water", "sugar", "Store in a cool place",
+             "Made in India", "Lot 44", "Keep away", "Warranty void if removed", "Ltd."]
+    body = [" ".join(rng.choice(words) for _ in range(6)) for _ in range(lines)]
+    body.insert(lines // 3, "Brand: ACME INDUSTRIES")
+    body.insert(lines // 2, "S/N: AX-44-91827")
+    body.insert(lines - 10, "MFG: 12/03/2024")
+    return "\n".join(body)
+
+
+def timeit(fn, *args, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    rng = random.Random(3)
+    extractor = get_extractor()
+
+    for lines in (100, 2000, 20000):
+        text = ocr_text(rng, lines)
+        assert legacy_extract(text) == {k: v.value for k, v in extractor.extract(text).items()}
+        old = timeit(lambda: [legacy_extract(text) for _ in range(20)])
+        new = timeit(lambda: [extractor.extract(text) for _ in range(20)])
+        print(f"extract     {len(text) / 1024:8.0f} KiB  legacy {old / 20 * 1e3:8.3f} ms  engine {new / 20 * 1e3:8.3f} ms  x{old / new:5.1f}")
+
+    names = [f"Product AX-{rng.randint(0, 10**6)} {rng.choice(['Serum', 'Watch', 'Bag'])}" for _ in range(100000)]
+    old = timeit(lambda: [legacy_normalize(n) for n in names], repeat=3)
+    new = timeit(lambda: [normalize_text(n) for n in names], repeat=3)
+    print(f"normalize   100k names      legacy {old * 1e3:8.1f} ms  fast   {new * 1e3:8.1f} ms  x{old / new:5.1f}")
+
+    title = "Product AX-99 Watch"
+    old = timeit(lambda: [legacy_fuzzy(n, title) for n in names], repeat=3)
+    new = timeit(lambda: [fuzzy_match(n, title) for n in names], repeat=3)
+    title_norm = normalize_text(title)
+    hoisted = timeit(lambda: [fuzzy_match_normalized(normalize_text(n), title_norm) for n in names], repeat=3)
+    print(f"fuzzy loop  100k registry   legacy {old * 1e3:8.1f} ms  fast   {new * 1e3:8.1f} ms  hoisted {hoisted * 1e3:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+Listing Serialization Benchmark
+Builds a synthetic registry of N rows (100k by default) and serves the
+hash listing (/api/all_hashes), a search matching every row
+(/api/search/name/<name>) and the /history page, the way they were served
+before (every row read into a dict, one json/render pass) and now
+(DocumentRecords streamed from the cursor, serialized JSON_STREAM_CHUNK at
+a time, with orjson and with the json fallback):
+
+    total       time until the last byte of the body
+    first       time to the first chunk of the body
+    size        body size
+    peak        peak Python allocation while serving (a separate pass, under
+                tracemalloc, so it does not inflate the times)
+
+Usage: python benchmarks/bench_listings.py [rows]
+"""
+
+import os
+import sys
+import json
+import time
+import tempfile
+import tracemalloc
+import statistics
+
+os.environ.setdefault("BINARY_MIGRATION", "off")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask, jsonify, render_template, stream_template
+
+import fast_json
+from benchmarks.synthetic import generate_registry
+from fast_json import FastJSONProvider, stream_listing
+from hash_validator import HashValidator
+from registry_db import blob_to_hex
+from registry_store import RegistryStore
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HISTORY = ('SELECT participant_name, hackathon_name, document_hash, txn_hash, timestamp '
+           'FROM documents ORDER BY timestamp DESC')
+
+
+def timestamp_of(row):
+    return row['timestamp'] or ''
+
+
+def make_app(store: RegistryStore, fast: bool) -> Flask:
+    app = Flask("bench", template_folder=os.path.join(ROOT, "templates"))
+    if fast:
+        app.json = FastJSONProvider(app)
+    validator = HashValidator(store.db_path)
+    validator.registry = store
+
+    @app.route('/before/all_hashes')
+    def before_all_hashes():
+        records = store.query_ordered('SELECT document_hash, participant_name, hackathon_name, timestamp '
+                                      'FROM documents ORDER BY timestamp DESC',
+                                      raw=True, key=lambda r: r[3] or '', reverse=True)
+        hashes = [{'document_hash': blob_to_hex(h), 'participant_name': name, 'hackathon_name': brand,
+                   'timestamp': ts} for h, name, brand, ts in records]
+        return jsonify({"count": len(hashes), "hashes": hashes})
+
+    @app.route('/before/search')
+    def before_search():
+        records = store.query_ordered('SELECT * FROM documents WHERE participant_name LIKE ? ORDER BY timestamp DESC',
+                                      ('%%',), key=timestamp_of, reverse=True)
+        results = [dict(r) for r in records]
+        return jsonify({"count": len(results), "results": results})
+
+    @app.route('/before/history')
+    def before_history():
+        docs = store.query_ordered('SELECT * FROM documents ORDER BY timestamp DESC', key=timestamp_of, reverse=True)
+        return render_template('history.html', documents=docs, explorer_url="https://explorer")
+
+    @app.route('/after/all_hashes')
+    def after_all_hashes():
+        return stream_listing("hashes", validator.iter_all_hashes())
+
+    @app.route('/after/search')
+    def after_search():
+        return stream_listing("results", validator.iter_search('participant_name', ''))
+
+    @app.route('/after/search_fields')
+    def after_search_fields():
+        return stream_listing("results", validator.iter_search('participant_name', '',
+                                                               ('document_hash', 'participant_name')))
+
+    @app.route('/after/history')
+    def after_history():
+        docs = store.iter_ordered(HISTORY, key=lambda r: r.timestamp or '', reverse=True)
+        return stream_template('history.html', documents=docs, explorer_url="https://explorer")
+
+    return app
+
+
+def serve(client, path: str):
+    """(total seconds, seconds to first chunk, body bytes)"""
+    start = time.perf_counter()
+    response = client.get(path, buffered=False)
+    first, size = None, 0
+    for chunk in response.response:
+        if first is None:
+            first = time.perf_counter() - start
+        size += len(chunk)
+    response.close()
+    return time.perf_counter() - start, first, size
+
+
+def peak_memory(client, path: str) -> float:
+    tracemalloc.start()
+    serve(client, path)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / 2 ** 20
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    runs = 3
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "registry.db")
+        generate_registry(db_path, rows)
+        store = RegistryStore(db_path, 1)
+        clients = {"json": make_app(store, fast=False).test_client(),
+                   "orjson": make_app(store, fast=True).test_client()}
+
+        # The streamed bodies must parse to the same rows as before
+        for listing, key in (("all_hashes", "hashes"), ("search", "results")):
+            before = json.loads(clients["json"].get(f"/before/{listing}").data)
+            after = json.loads(clients["orjson"].get(f"/after/{listing}").data)
+            assert before[key] == after[key] and before["count"] == after["count"] == rows, listing
+
+        cases = [
+            ("all_hashes", "dicts + json (before)", "json", "/before/all_hashes", True),
+            ("all_hashes", "streamed, json", "json", "/after/all_hashes", False),
+            ("all_hashes", "streamed, orjson", "orjson", "/after/all_hashes", True),
+            ("search", "dicts + json (before)", "json", "/before/search", True),
+            ("search", "streamed, json", "json", "/after/search", False),
+            ("search", "streamed, orjson", "orjson", "/after/search", True),
+            ("search", "streamed, orjson, 2 fields", "orjson", "/after/search_fields", True),
+            ("history", "rows + render (before)", "json", "/before/history", True),
+            ("history", "5 columns, streamed", "json", "/after/history", True),
+        ]
+        print(f"{rows} rows, median of {runs} runs")
+        print(f"  {'':<11}{'':<28}{'total':>9}{'first':>9}{'size':>10}{'peak':>10}")
+        saved = fast_json.orjson
+        for listing, label, client_name, path, use_orjson in cases:
+            fast_json.orjson = saved if use_orjson else None
+            client = clients[client_name]
+            serve(client, path)  # warm
+            results = [serve(client, path) for _ in range(runs)]
+            total = statistics.median(r[0] for r in results)
+            first = statistics.median(r[1] for r in results)
+            size = results[0][2]
+            peak = peak_memory(client, path)
+            print(f"  {listing:<11}{label:<28}{total:8.2f}s{first * 1000:7.0f}ms"
+                  f"{size / 2 ** 20:7.1f}MiB{peak:7.1f}MiB")
+        fast_json.orjson = saved
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""
+Live Verification Benchmark
+Replays a recorded camera sequence (a directory of JPEG frames, or a
+synthetic one: a label photographed with shake, motion blur and noise that
+settles after a second) at 30 fps into the live verification WebSocket
+and reports frame-to-verdict latency, session time, frames received /
+processed / skipped, and CPU per session.
+
+OCR is a stand-in that burns --ocr-ms of CPU per frame and reads the label
+only on frames within --readable of the sequence's sharpest frame (by
+full-resolution Laplacian variance), so the numbers reflect frame selection
+and matching rather than a model.
+
+Scenarios:
+    photo    the label's registration photo hash is in the perceptual index
+    ocr      no photo hash: the verdict needs the OCR fingerprint
+    partial  no photo hash, and every frame's OCR misses one label line, so
+             only fields voted across frames can identify the label
+
+Usage: python benchmarks/bench_live_verify.py [--frames DIR] [--ocr-ms 300] [--fps 30]
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import threading
+
+os.environ.setdefault("BINARY_MIGRATION", "off")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cv2
+import numpy as np
+
+from fingerprint import calculate_keccak_fingerprint
+from live_verify import LiveVerifier, decode_frame, sharpness
+from local_ocr import LocalOCR
+from perceptual_hash import PerceptualIndex, compute_hashes, to_hex
+from registry_store import get_registry
+
+LABEL_LINES = ["Brand: NOVA LABS", "Wireless Charger", "S/N: NL-448210-5521", "Batch Date: 2025-06-02"]
+
+
+def render_label() -> np.ndarray:
+    label = np.full((720, 1280), 235, dtype=np.uint8)
+    cv2.rectangle(label, (80, 60), (1200, 660), 30, 6)
+    for i, line in enumerate(LABEL_LINES):
+        cv2.putText(label, line, (140, 190 + i * 120), cv2.FONT_HERSHEY_SIMPLEX, 2.0, 20, 5)
+    return label
+
+
+def synthetic_sequence(count: int = 90, seed: int = 5):
+    """Hand-held approach: strong shake and blur for ~1 s, then the camera settles"""
+    rng = random.Random(seed)
+    label = render_label()
+    frames = []
+    for i in range(count):
+        settle = min(1.0, i / 30.0)
+        angle = rng.uniform(-6, 6) * (1 - settle) + rng.uniform(-1, 1)
+        shift = (rng.uniform(-40, 40) * (1 - settle), rng.uniform(-30, 30) * (1 - settle))
+        matrix = cv2.getRotationMatrix2D((640, 360), angle, 1.0)
+        matrix[:, 2] += shift
+        frame = cv2.warpAffine(label, matrix, (1280, 720), borderValue=120)
+        blur = max(1, int(round(25 * (1 - settle) + rng.uniform(0, 6))))
+        if blur > 1:
+            kernel = np.zeros((blur, blur), np.float32)
+            kernel[blur // 2, :] = 1.0 / blur
+            frame = cv2.filter2D(frame, -1, kernel)
+        noise = np.random.default_rng(seed + i).normal(0, 6, frame.shape)
+        frame = np.clip(frame + noise, 0, 255).astype(np.uint8)
+        frames.append(cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, 85])[1].tobytes())
+    return frames
+
+
+def load_frames(directory: str):
+    names = sorted(n for n in os.listdir(directory) if n.lower().endswith((".jpg", ".jpeg", ".png")))
+    frames = []
+    for name in names:
+        with open(os.path.join(directory, name), "rb") as f:
+            frames.append(f.read())
+    return frames
+
+
+def stand_in_ocr(ocr_ms: float, readable: float, partial: bool = False):
+    rng = random.Random(11)
+
+    def ocr(gray):
+        end = time.thread_time() + ocr_ms / 1000.0
+        while time.thread_time() < end:
+            pass
+        if sharpness(gray) < readable:
+            return []
+        lines = list(LABEL_LINES)
+        if partial:
+            lines.pop(rng.randrange(len(lines)))
+        return [(line, 0.95) for line in lines]
+    return ocr
+
+
+def run(frames, verifier: LiveVerifier, fps: float) -> dict:
+    from websockets.sync.client import connect
+    server = threading.Thread(target=verifier.serve, kwargs={"host": "127.0.0.1", "port": 0}, daemon=True)
+    server.start()
+    while verifier.port is None:
+        time.sleep(0.01)
+
+    verdict = None
+    with connect(f"ws://127.0.0.1:{verifier.port}/", max_size=None) as ws:
+        stop = threading.Event()
+
+        def sender():
+            for frame in frames:
+                if stop.is_set():
+                    return
+                try:
+                    ws.send(frame)
+                except Exception:
+                    return
+                time.sleep(1.0 / fps)
+            try:
+                ws.send(json.dumps({"type": "end"}))
+            except Exception:
+                pass
+
+        start = time.perf_counter()
+        thread = threading.Thread(target=sender, daemon=True)
+        thread.start()
+        try:
+            for message in ws:
+                msg = json.loads(message)
+                if msg["type"] == "verdict":
+                    verdict = msg
+                    break
+        finally:
+            stop.set()
+        elapsed = time.perf_counter() - start
+    verifier.shutdown()
+    server.join(timeout=5)
+    verdict["client_ms"] = round(elapsed * 1000, 1)
+    return verdict
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--frames", help="Directory of recorded frames (default: synthetic sequence)")
+    parser.add_argument("--ocr-ms", type=float, default=300.0)
+    parser.add_argument("--fps", type=float, default=30.0)
+    parser.add_argument("--readable", type=float, default=0.7,
+                        help="Fraction of the sharpest frame's sharpness the stand-in OCR can read")
+    args = parser.parse_args()
+
+    frames = load_frames(args.frames) if args.frames else synthetic_sequence()
+    scores = [sharpness(decode_frame(f, reduced=True)) for f in frames]
+    full = [sharpness(decode_frame(f)) for f in frames]
+    readable = args.readable * max(full)
+    print(f"{len(frames)} frames at {args.fps:.0f} fps, stand-in OCR {args.ocr_ms:.0f} ms CPU/frame; "
+          f"reduced-decode sharpness {min(scores):.0f}..{max(scores):.0f}; "
+          f"{sum(s >= readable for s in full)} frames readable (first at {next(i for i, s in enumerate(full) if s >= readable)})")
+
+    label = render_label()
+    details = LocalOCR.parse_details("\n".join(LABEL_LINES))
+    fingerprint = calculate_keccak_fingerprint({"document_content": details["document_content"]})
+    with tempfile.TemporaryDirectory() as tmp:
+        registry = get_registry(os.path.join(tmp, "registry.db"))
+        p, d = compute_hashes(label)
+        doc_id = registry.insert_document(participant_name=details["document_title"], hackathon_name=details["brand"],
+                                          document_hash=fingerprint, phash=to_hex(p), dhash=to_hex(d))
+        with_photo = PerceptualIndex()
+        with_photo.add(p, d, doc_id)
+        scenarios = [("photo", with_photo, False), ("ocr", PerceptualIndex(), False),
+                     ("partial", PerceptualIndex(), True)]
+        for name, index, partial in scenarios:
+            verifier = LiveVerifier(registry, lambda index=index: index,
+                                    lambda det: calculate_keccak_fingerprint({"document_content": det["document_content"]}),
+                                    ocr=stand_in_ocr(args.ocr_ms, readable, partial))
+            v = run(frames, verifier, args.fps)
+            counts = v["frames"]
+            print(f"  {name:<8} {v['status']:<9} via {v.get('match', {}).get('method', '-'):<15} "
+                  f"frame->verdict {v.get('frame_to_verdict_ms', '-'):>6} ms  session {v['session_ms']:>7} ms  "
+                  f"cpu {v['cpu_ms']:>7} ms  received {counts.get('received', 0)} "
+                  f"processed {counts.get('processed', 0)} blurry {counts.get('too_blurry', 0)} "
+                  f"skipped {counts.get('dropped_busy', 0)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Multicall Benchmark
+Resolves ownerOf for N token ids (half minted, half not, so half revert)
+three ways and reports wall time, HTTP requests and JSON-RPC calls:
+
+    per-call    one web3 eth_call per token, as verify_document's fallback does
+                (timed on the first 200 tokens and scaled)
+    rpc-batch   one eth_call per token, sent in JSON-RPC batches
+    multicall   Multicall3 aggregate3 calls, MULTICALL_BATCH reads each
+
+plus products_of (ownerOf + tokenToFp + tokenMetaHash per token) over multicall.
+
+Simulated node (default): tokens are minted in a SimulatedNode with the given
+round-trip latency.
+    python benchmarks/bench_multicall.py --tokens 100,1000,10000 --latency-ms 50
+
+Real node, e.g. a local Hardhat chain with VeriChainProduct and Multicall3
+deployed (scripts/deploy.cjs, scripts/deploy_multicall.cjs) and some products
+minted; token ids come from the contract's ProductMinted logs:
+    python benchmarks/bench_multicall.py --rpc http://127.0.0.1:8545 \\
+        --contract 0x... --multicall 0x...
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from web3 import Web3
+
+from chain_reader import ChainReader, MULTICALL_ADDRESS, PRODUCT_MINTED_TOPIC
+
+CONTRACT_ADDRESS = "0xaC8eCD06c9FB699E5C39f2b8EA316BA817f1fD09"
+OWNER_OF_ABI = [{"inputs": [{"name": "tokenId", "type": "uint256"}], "name": "ownerOf",
+                 "outputs": [{"name": "", "type": "address"}], "stateMutability": "view", "type": "function"}]
+PER_CALL_SAMPLE = 200
+
+
+def counted(reader: ChainReader) -> ChainReader:
+    """Count the HTTP requests a reader sends"""
+    reader.http_requests = 0
+    post = reader.session.post
+
+    def counting_post(*args, **kwargs):
+        reader.http_requests += 1
+        return post(*args, **kwargs)
+    reader.session.post = counting_post
+    return reader
+
+
+def per_call(rpc_url: str, contract_address: str, token_ids, node=None):
+    contract = Web3(Web3.HTTPProvider(rpc_url)).eth.contract(address=Web3.to_checksum_address(contract_address),
+                                                             abi=OWNER_OF_ABI)
+    sample = token_ids[:PER_CALL_SAMPLE]
+    calls = node.calls if node else None
+    start = time.perf_counter()
+    for token_id in sample:
+        try:
+            contract.functions.ownerOf(token_id).call()
+        except Exception:
+            pass  # ownerOf reverts for tokens that do not exist
+    scale = len(token_ids) / len(sample)
+    # web3 sends each request on its own (eth_chainId checks included)
+    sent = round((node.calls - calls) * scale) if node else None
+    return (time.perf_counter() - start) * scale, sent
+
+
+def run(rpc_url: str, contract_address: str, multicall_address: str, token_ids, node=None):
+    rows = []
+    elapsed, sent = per_call(rpc_url, contract_address, token_ids, node)
+    rows.append(("per-call", elapsed, sent, sent, None))
+    for name, address in (("rpc-batch", ""), ("multicall", multicall_address)):
+        reader = counted(ChainReader(rpc_url, contract_address, multicall_address=address))
+        reader.has_multicall()
+        reader.http_requests = 0
+        calls = node.calls if node else None
+        start = time.perf_counter()
+        owners = reader.owners_of(token_ids)
+        elapsed = time.perf_counter() - start
+        rows.append((name, elapsed, reader.http_requests, node.calls - calls if node else None,
+                     sum(1 for owner in owners.values() if owner)))
+    reader = counted(ChainReader(rpc_url, contract_address, multicall_address=multicall_address))
+    reader.has_multicall()
+    reader.http_requests = 0
+    calls = node.calls if node else None
+    start = time.perf_counter()
+    products = reader.products_of(token_ids)
+    rows.append(("products", time.perf_counter() - start, reader.http_requests,
+                 node.calls - calls if node else None, sum(1 for p in products.values() if p)))
+    for name, elapsed, http, rpc, found in rows:
+        print(f"  {name:<10} {elapsed * 1000:9.0f} ms{'*' if name == 'per-call' else ' '}  "
+              f"{http if http is not None else '-':>6} HTTP  {rpc if rpc is not None else '-':>6} RPC calls  "
+              f"{found if found is not None else '-':>6} found")
+
+
+def simulated(args):
+    from benchmarks.sim_node import SimulatedNode
+    from benchmarks.fake_node import FakeNodeServer
+    node = SimulatedNode(CONTRACT_ADDRESS, latency=args.latency_ms / 1000.0, block_interval=0)
+    rng = random.Random(5)
+    largest = max(args.tokens)
+    minted = [rng.getrandbits(256) for _ in range(largest // 2)]
+    for token_id in minted:
+        node.add_mint(token_id, node.random_address())
+    absent = [rng.getrandbits(256) for _ in range(largest - len(minted))]
+    with FakeNodeServer(node) as server:
+        for count in args.tokens:
+            token_ids = minted[:count // 2] + absent[:count - count // 2]
+            rng.shuffle(token_ids)
+            print(f"{count} tokens ({count // 2} minted), {args.latency_ms:g} ms per request:")
+            run(server.url, CONTRACT_ADDRESS, MULTICALL_ADDRESS, token_ids, node)
+
+
+def live(args):
+    reader = ChainReader(args.rpc, args.contract)
+    head = reader.block_number()
+    minted = [int(log["topics"][1], 16)
+              for _, logs in reader.iter_logs([PRODUCT_MINTED_TOPIC], 0, head) for log in logs]
+    if not minted:
+        raise SystemExit("⚠ No ProductMinted events; mint some products first")
+    rng = random.Random(5)
+    for count in args.tokens:
+        token_ids = [rng.choice(minted) for _ in range(count // 2)] + \
+                    [rng.getrandbits(256) for _ in range(count - count // 2)]
+        print(f"{count} tokens ({len(minted)} minted on chain) at {args.rpc}:")
+        run(args.rpc, args.contract, args.multicall, token_ids)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Multicall read benchmark")
+    parser.add_argument("--tokens", default="100,1000,10000", type=lambda v: [int(x) for x in v.split(",")])
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="Simulated node round trip")
+    parser.add_argument("--rpc", help="Benchmark a real node instead (e.g. npx hardhat node)")
+    parser.add_argument("--contract", default=os.getenv("NFT_CONTRACT_ADDRESS"))
+    parser.add_argument("--multicall", default=MULTICALL_ADDRESS)
+    args = parser.parse_args()
+    (live if args.rpc else simulated)(args)
+    print("* per-call: timed on the first 200 tokens and scaled")
+
+
+if __name__ == "__main__":
+    main()
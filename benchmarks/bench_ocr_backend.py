@@ -0,0 +1,214 @@
+"""
+OCR Backend Benchmark
+Runs LocalOCR on each inference backend (OCR_BACKEND) in its own process
+and reports:
+
+    load        engine construction plus the first inference (sessions,
+                weights, graph optimization)
+    latency     median / p95 of recognize() on preprocessed images (the
+                preprocessing is the same for every backend and timed once)
+    throughput  images per second over the whole corpus pass
+    memory      RSS added by the backend (imports, weights, arenas) and peak RSS
+    accuracy    character error rate against the known text of rendered
+                labels (extract_text without preprocessing), label fields (brand, serial, date) parse_details gets
+                right, and on the sample images under uploads/, character
+                error rate against the reference backend's text (Paddle
+                when it loads, otherwise ONNX fp32)
+
+The ONNX backends need exported models in OCR_ONNX_MODEL_DIR (python
+onnx_ocr.py export ..., then python onnx_ocr.py quantize uploads/* for the
+int8 set). Backends that fail to load are reported and skipped.
+
+Usage: python benchmarks/bench_ocr_backend.py [--backends paddle,onnx,onnx-int8]
+           [--threads 1,4] [--repeat 3] [--models DIR]
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import resource
+import contextlib
+import tempfile
+import subprocess
+import statistics
+from typing import Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cv2
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FONTS = [cv2.FONT_HERSHEY_SIMPLEX, cv2.FONT_HERSHEY_DUPLEX, cv2.FONT_HERSHEY_COMPLEX, cv2.FONT_HERSHEY_TRIPLEX]
+BRANDS = ["ACME INDUSTRIES", "NORTHWIND", "CONTOSO", "FABRIKAM", "GLOBEX CORP", "INITECH"]
+
+
+def rendered_labels(directory: str, count: int = 8, seed: int = 11) -> List[Dict]:
+    """Synthetic product labels with known text: slight rotation, blur and noise"""
+    rng = random.Random(seed)
+    labels = []
+    for i in range(count):
+        fields = {"brand": rng.choice(BRANDS),
+                  "serial_no": f"{rng.choice('ABCDEFGHJKLMNPRSTUVWXYZ')}{rng.choice('ABCDEFGHJKLMNPRSTUVWXYZ')}-"
+                               f"{rng.randint(10, 99)}-{rng.randint(10000, 99999)}",
+                  "mfg_date": f"{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/{rng.randint(2019, 2025)}"}
+        lines = [f"Brand: {fields['brand']}", "Product Label", f"S/N: {fields['serial_no']}",
+                 f"MFG: {fields['mfg_date']}", "Made in India"]
+        label = np.full((600, 900, 3), rng.randint(215, 250), dtype=np.uint8)
+        font, scale = rng.choice(FONTS), rng.uniform(1.1, 1.5)
+        for row, line in enumerate(lines):
+            cv2.putText(label, line, (50, 100 + row * 100), font, scale, (rng.randint(0, 60),) * 3, 2, cv2.LINE_AA)
+        matrix = cv2.getRotationMatrix2D((450, 300), rng.uniform(-3, 3), 1.0)
+        label = cv2.warpAffine(label, matrix, (900, 600), borderMode=cv2.BORDER_REPLICATE)
+        label = cv2.GaussianBlur(label, (3, 3), 0)
+        noise = np.random.default_rng(seed + i).normal(0, 6, label.shape)
+        label = np.clip(label + noise, 0, 255).astype(np.uint8)
+        path = os.path.join(directory, f"label_{i}.png")
+        cv2.imwrite(path, label)
+        labels.append({"path": path, "text": "\n".join(lines), "fields": fields})
+    return labels
+
+
+def edit_distance(a: str, b: str) -> int:
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        previous = current
+    return previous[-1]
+
+
+def cer(text: str, reference: str) -> float:
+    """Character error rate of text against reference, whitespace collapsed"""
+    text, reference = " ".join(text.split()), " ".join(reference.split())
+    if not reference:
+        return 0.0 if not text else 1.0
+    return edit_distance(text, reference) / len(reference)
+
+
+def rss_mb() -> float:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+
+
+def child(backend: str, images: List[str], labels: List[Dict], repeat: int) -> Dict:
+    """Measure one backend in this process (run via --child)"""
+    from local_ocr import LocalOCR
+    # Preprocessing is backend independent (and does not use the engine):
+    # do it up front, time it once
+    start = time.perf_counter()
+    preprocessed = [LocalOCR.preprocess_image(None, path) for path in images]
+    preprocess_ms = (time.perf_counter() - start) * 1000 / len(images)
+
+    base_rss = rss_mb()
+    start = time.perf_counter()
+    log = io.StringIO()
+    with contextlib.redirect_stdout(log):
+        engine = LocalOCR(backend=backend)
+    if engine.ocr is None:
+        return {"backend": backend, "error": log.getvalue().strip().splitlines()[-1]}
+    engine.recognize(preprocessed[0])
+    load = time.perf_counter() - start
+
+    texts, timings = {}, []
+    pass_start = time.perf_counter()
+    for _ in range(repeat):
+        for path, img in zip(images, preprocessed):
+            start = time.perf_counter()
+            lines = engine.recognize(img)
+            timings.append(time.perf_counter() - start)
+            texts[path] = "\n".join(text for text, _ in lines)
+    throughput = len(timings) / (time.perf_counter() - pass_start)
+
+    label_errors, fields_right, fields_total = [], 0, 0
+    for label in labels:
+        # Unpreprocessed: the adaptive threshold turns the rendered noise into
+        # speckle for every backend alike
+        text = engine.extract_text(label["path"], preprocess=False)
+        label_errors.append(cer(text, label["text"]))
+        details = LocalOCR.parse_details(text)
+        for name, value in label["fields"].items():
+            fields_total += 1
+            # The brand pattern runs on across the line break: compare its first line
+            fields_right += details.get(name, "").split("\n")[0].strip() == value
+    ordered = sorted(timings)
+    return {
+        "backend": backend,
+        "load_s": load,
+        "preprocess_ms": preprocess_ms,
+        "median_ms": statistics.median(ordered) * 1000,
+        "p95_ms": ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))] * 1000,
+        "images_per_s": throughput,
+        "rss_added_mb": rss_mb() - base_rss,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "label_cer": statistics.mean(label_errors),
+        "fields": f"{fields_right}/{fields_total}",
+        "texts": texts,
+    }
+
+
+def run_backend(backend: str, threads: int, args, workdir: str) -> Dict:
+    env = dict(os.environ, OCR_CPU_THREADS=str(threads), OMP_NUM_THREADS=str(threads),
+               OCR_ONNX_INTRA_OP_THREADS=str(threads), PYTHONUNBUFFERED="1")
+    if args.models:
+        env["OCR_ONNX_MODEL_DIR"] = args.models
+    out = os.path.join(workdir, f"{backend}-{threads}.json")
+    proc = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", backend, "--out", out,
+                           "--repeat", str(args.repeat), "--workdir", workdir],
+                          cwd=BASE_DIR, env=env, capture_output=True, text=True)
+    if proc.returncode != 0 or not os.path.exists(out):
+        return {"backend": backend, "error": ((proc.stderr or proc.stdout).strip().splitlines() or ["?"])[-1]}
+    with open(out) as f:
+        return json.load(f)
+
+
+def main():
+    from benchmarks.suite import BenchContext
+    parser = argparse.ArgumentParser(description="OCR inference backend benchmark")
+    parser.add_argument("--backends", default="paddle,onnx,onnx-int8", type=lambda v: v.split(","))
+    parser.add_argument("--threads", default=str(os.cpu_count()), type=lambda v: [int(x) for x in v.split(",")])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--models", help="ONNX model directory (default OCR_ONNX_MODEL_DIR)")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--out", help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    images = BenchContext(tempfile.gettempdir()).corpus()
+    if args.child:
+        result = child(args.child, images, rendered_labels(args.workdir), args.repeat)
+        with open(args.out, "w") as f:
+            json.dump(result, f)
+        return
+
+    with tempfile.TemporaryDirectory() as workdir:
+        rendered_labels(workdir)
+        print(f"{len(images)} sample images x {args.repeat}, 8 rendered labels, {os.cpu_count()} CPUs")
+        for threads in args.threads:
+            results = [run_backend(backend, threads, args, workdir) for backend in args.backends]
+            loaded = [r for r in results if "error" not in r]
+            reference = next((r for r in loaded if r["backend"] == "paddle"),
+                             next((r for r in loaded if r["backend"] == "onnx"), None))
+            print(f"\n{threads} inference thread(s), text agreement against "
+                  f"{reference['backend'] if reference else '-'}:")
+            print(f"  {'backend':<10} {'load':>7} {'median':>9} {'p95':>9} {'img/s':>6} {'RSS+':>7} "
+                  f"{'peak':>7} {'label CER':>9} {'fields':>7} {'sample CER':>10}")
+            for r in results:
+                if "error" in r:
+                    print(f"  {r['backend']:<10} unavailable: {r['error'][:100]}")
+                    continue
+                agreement = statistics.mean(cer(r["texts"][p], reference["texts"][p]) for p in reference["texts"])
+                print(f"  {r['backend']:<10} {r['load_s']:>6.2f}s {r['median_ms']:>7.0f}ms {r['p95_ms']:>7.0f}ms "
+                      f"{r['images_per_s']:>6.2f} {r['rss_added_mb']:>5.0f}MB {r['peak_rss_mb']:>5.0f}MB "
+                      f"{r['label_cer']:>9.3f} {r['fields']:>7} {agreement:>10.3f}")
+            if loaded:
+                print(f"  preprocessing (every backend): {loaded[0]['preprocess_ms']:.0f} ms per image")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Page Streaming Benchmark
+Builds a synthetic multi-page invoice (A4 pages, as TIFF and PDF) whose
+label fields sit on one page, then measures peak memory (max RSS, each run
+in a fresh process) and time for:
+
+    eager     every page rasterized into memory first, then OCR on all pages
+    stream    PageStreamer reading every page (no required fields)
+    early     PageStreamer stopping once brand, serial and date are found
+
+OCR is a stand-in engine that loads the page image the way the real
+engines do and returns the page's text (the page number is encoded in two
+flat corner blocks, which survive the PDF's JPEG compression), so only
+ingestion is measured.
+
+Usage: python benchmarks/bench_page_stream.py [pages] [dpi] [field_page]
+"""
+
+import os
+import sys
+import json
+import time
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from ocr_engines import EngineEnsemble
+
+A4_INCHES = (8.27, 11.69)
+FIELDS = "Brand: VERITAS\nS/N: VI-204913-7731\nBatch Date: 2025-03-14"
+
+
+def page_text(index: int, field_page: int) -> str:
+    lines = [f"Shipment invoice page {index + 1}", f"Line items {index * 20 + 1}-{index * 20 + 20}"]
+    if index == field_page:
+        lines.append(FIELDS)
+    return "\n".join(lines)
+
+
+class PageNumberEngine:
+    """Reads the page like an OCR engine would, returns the page's known text"""
+    name = "synthetic"
+
+    def __init__(self, field_page: int):
+        self.field_page = field_page
+
+    def recognize(self, image_path):
+        img = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE) if isinstance(image_path, str) else image_path
+        high, low = (int(np.median(img[:32, x:x + 32])) // 16 for x in (0, 32))
+        index = high * 16 + low
+        return page_text(index, self.field_page), 0.99
+
+
+def render_page(index: int, dpi: int) -> Image.Image:
+    width, height = int(A4_INCHES[0] * dpi), int(A4_INCHES[1] * dpi)
+    page = np.full((height, width), 255, dtype=np.uint8)
+    for row in range(60):
+        cv2.putText(page, f"Item {index * 60 + row:05d}  qty 1  unit 12.50", (dpi // 2, dpi // 2 + row * dpi // 6),
+                    cv2.FONT_HERSHEY_SIMPLEX, dpi / 300, 0, 2)
+    page[:32, :32], page[:32, 32:64] = (index // 16) * 16 + 8, (index % 16) * 16 + 8
+    return Image.fromarray(page)
+
+
+def build_documents(directory: str, pages: int, dpi: int):
+    tiff_path, pdf_path = os.path.join(directory, "invoice.tif"), os.path.join(directory, "invoice.pdf")
+    frames = (render_page(i, dpi) for i in range(pages))
+    first = next(frames)
+    first.save(tiff_path, save_all=True, append_images=frames, compression="tiff_lzw")
+    frames = (render_page(i, dpi).convert("RGB") for i in range(pages))
+    first = next(frames)
+    # Lossless page images at the same resolution, so pdfium renders them back unchanged
+    first.save(pdf_path, save_all=True, append_images=frames, resolution=dpi)
+    return tiff_path, pdf_path
+
+
+def peak_rss_mb() -> float:
+    """High-water RSS of this process (VmHWM; unlike ru_maxrss it is not inherited from the parent)"""
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def measure(mode: str, path: str, dpi: int, field_page: int) -> dict:
+    from document_pages import PageStreamer, iter_pages
+    ensemble = EngineEnsemble([PageNumberEngine(field_page)], mode="sequential")
+    start = time.perf_counter()
+    if mode == "eager":
+        images = [image for _, image in iter_pages(path, dpi)]
+        texts = [ensemble.run(image)[0].text for image in images]
+        pages_read = len(texts)
+    else:
+        streamer = PageStreamer(ensemble, required=[] if mode == "stream" else None, dpi=dpi)
+        details = streamer.extract(path)
+        pages_read = json.loads(details["metadata"])["pages_read"]
+    elapsed = time.perf_counter() - start
+    return {"seconds": round(elapsed, 2), "pages_read": pages_read,
+            "max_rss_mb": round(peak_rss_mb(), 1)}
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "--child":
+        print(json.dumps(measure(sys.argv[2], sys.argv[3], int(sys.argv[4]), int(sys.argv[5]))))
+        return
+    pages = min(int(sys.argv[1]) if len(sys.argv) > 1 else 40, 256)
+    dpi = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    field_page = int(sys.argv[3]) if len(sys.argv) > 3 else 2
+    with tempfile.TemporaryDirectory() as tmp:
+        documents = build_documents(tmp, pages, dpi)
+        page_mb = A4_INCHES[0] * A4_INCHES[1] * dpi * dpi / 2 ** 20
+        print(f"{pages} pages at {dpi} dpi ({page_mb:.1f} MB per rasterized page), fields on page {field_page + 1}")
+        for path in documents:
+            print(f"  {os.path.basename(path)} ({os.path.getsize(path) / 2 ** 20:.1f} MB on disk)")
+            for mode in ("eager", "stream", "early"):
+                out = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", mode, path, str(dpi),
+                                      str(field_page)], capture_output=True, text=True, check=True).stdout
+                result = json.loads(out.strip().splitlines()[-1])
+                print(f"    {mode:<7} {result['seconds']:6.2f}s  {result['pages_read']:>3} pages  "
+                      f"peak RSS {result['max_rss_mb']:7.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Perceptual Hash Benchmark
+Accuracy and latency of pHash/dHash matching on the sample images in
+uploads/, using synthetic re-photographs (rescale, JPEG, rotation,
+brightness, crop) as queries.
+
+Usage: python benchmarks/bench_phash.py [uploads_dir]
+"""
+
+import os
+import sys
+import time
+import random
+import hashlib
+
+import cv2
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from perceptual_hash import PerceptualIndex, compute_hashes
+
+
+def variants(img, rng):
+    """Cheap stand-ins for re-photographing the same label"""
+    h, w = img.shape[:2]
+    out = {}
+    out["rescale_0.5"] = cv2.resize(img, (w // 2, h // 2), interpolation=cv2.INTER_AREA)
+    ok, enc = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, 40])
+    out["jpeg_q40"] = cv2.imdecode(enc, cv2.IMREAD_COLOR)
+    m = cv2.getRotationMatrix2D((w / 2, h / 2), rng.uniform(-3, 3), 1.0)
+    out["rotate_3deg"] = cv2.warpAffine(img, m, (w, h), borderMode=cv2.BORDER_REPLICATE)
+    out["brightness"] = cv2.convertScaleAbs(img, alpha=1.15, beta=20)
+    dy, dx = int(h * 0.04), int(w * 0.04)
+    out["crop_4pct"] = img[dy:h - dy, dx:w - dx]
+    noise = np.clip(img.astype(np.int16) + np.random.default_rng(1).normal(0, 8, img.shape), 0, 255)
+    out["noise"] = noise.astype(np.uint8)
+    return out
+
+
+def main():
+    uploads = sys.argv[1] if len(sys.argv) > 1 else os.path.join(BASE_DIR, "uploads")
+    rng = random.Random(5)
+
+    # Byte-identical uploads are the same label: group them
+    groups = {}
+    images = {}
+    for name in sorted(os.listdir(uploads)):
+        path = os.path.join(uploads, name)
+        img = cv2.imread(path, cv2.IMREAD_COLOR)
+        if img is None:
+            continue
+        digest = hashlib.md5(open(path, "rb").read()).hexdigest()
+        groups.setdefault(digest, []).append(name)
+        images.setdefault(digest, img)
+
+    index = PerceptualIndex()
+    hash_times = []
+    label_hashes = {}
+    for label, img in images.items():
+        start = time.perf_counter()
+        p, d = compute_hashes(img)
+        hash_times.append(time.perf_counter() - start)
+        index.add(p, d, label)
+        label_hashes[label] = (p, d)
+    print(f"Distinct labels: {len(images)} (from {sum(len(v) for v in groups.values())} files)")
+
+    results = {}
+    query_times = []
+    for label, img in images.items():
+        for kind, variant in variants(img, rng).items():
+            start = time.perf_counter()
+            p, d = compute_hashes(variant)
+            hash_times.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            index.query(p, d, radius=14)
+            query_times.append(time.perf_counter() - start)
+            # Accuracy is measured against every label, not just those within the radius
+            ranked = sorted((bin(p ^ lp).count("1"), bin(d ^ ld).count("1"), other) for other, (lp, ld) in label_hashes.items())
+            best = ranked[0]
+            second = next(h for h in ranked if h[2] != label) if len(ranked) > 1 else None
+            results.setdefault(kind, []).append((best[2] == label, best[0], best[1], second[0] if second else None))
+
+    print(f"{'variant':<12} {'top1':>6} {'pHash d (max)':>14} {'dHash d (max)':>14} {'nearest other pHash d (min)':>28}")
+    for kind, rows in results.items():
+        top1 = sum(r[0] for r in rows) / len(rows)
+        other = [r[3] for r in rows if r[3] is not None]
+        print(f"{kind:<12} {top1:6.0%} {max(r[1] for r in rows):14d} {max(r[2] for r in rows):14d} {min(other) if other else '-':>28}")
+
+    # Pairwise distance between distinct labels (false-positive margin)
+    hashes = [compute_hashes(img) for img in images.values()]
+    pair = [bin(a[0] ^ b[0]).count("1") for i, a in enumerate(hashes) for b in hashes[i + 1:]]
+    if pair:
+        print(f"Distinct-label pHash distance: min {min(pair)}, median {sorted(pair)[len(pair) // 2]}")
+
+    # Query latency at registry scale
+    big = PerceptualIndex()
+    r = random.Random(9)
+    for i in range(100000):
+        big.add(r.getrandbits(64), r.getrandbits(64), i)
+    p, d = hashes[0]
+    big.add(p, d, "probe")
+    timings = {}
+    for radius in (6, 14):
+        start = time.perf_counter()
+        for _ in range(50):
+            big.query(p, d, radius=radius)
+        timings[radius] = (time.perf_counter() - start) / 50
+
+    print(f"Hash compute: median {sorted(hash_times)[len(hash_times) // 2] * 1e3:.2f} ms per image")
+    print(f"Index query ({len(index)} labels, radius 14): median {sorted(query_times)[len(query_times) // 2] * 1e6:.1f} us")
+    for radius, seconds in timings.items():
+        print(f"Index query (100k labels, radius {radius}): {seconds * 1e3:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
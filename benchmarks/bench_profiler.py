@@ -0,0 +1,108 @@
+"""
+Request Profiler Benchmark
+Runs a verification-shaped request (perceptual hash of a label photo, OCR
+text parsing, a fingerprint lookup in a synthetic registry, a 20 ms chain
+call) repeatedly and reports its latency when:
+
+    off         profiling disabled
+    marks       profiling enabled, request not selected (stage marks only)
+    sample      sampled every 10 ms (the default)
+    sample-2ms  sampled every 2 ms
+    cprofile    cProfile on the request thread
+
+plus the size of the stored profile per request.
+
+Usage: python benchmarks/bench_profiler.py [requests] [rows]
+"""
+
+import io
+import os
+import sys
+import time
+import random
+import tempfile
+import contextlib
+import statistics
+
+os.environ.setdefault("BINARY_MIGRATION", "off")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cv2
+import numpy as np
+
+from benchmarks.synthetic import generate_registry
+from fingerprint import calculate_keccak_fingerprint
+from local_ocr import LocalOCR
+from perceptual_hash import compute_hashes
+from registry_store import get_registry
+from request_profiler import RequestProfiler
+
+LABEL = "\n".join(["Brand: NOVA LABS", "Wireless Charger 15W", "S/N: NL-448210-5521", "Batch Date: 2025-06-02",
+                   "Made in EU", "Input 5V 3A / 9V 2A", "Model WC-15"] * 6)
+
+
+def make_request(registry, fingerprints, image):
+    rng = random.Random(3)
+
+    def handle(profiler: RequestProfiler):
+        with profiler.stage("phash"):
+            compute_hashes(image)
+        with profiler.stage("ocr"):
+            details = LocalOCR.parse_details(LABEL)
+            calculate_keccak_fingerprint({"document_content": details["document_content"]})
+        with profiler.stage("db"):
+            registry.find_by_fingerprint(rng.choice(fingerprints))
+        with profiler.stage("rpc"):
+            time.sleep(0.02)
+    return handle
+
+
+def run(handle, profiler: RequestProfiler, requests: int, select: bool):
+    times = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        profile = profiler.begin("bench", token="bench" if select else None)
+        handle(profiler)
+        if profile is not None:
+            profiler.end(profile, 200)
+        times.append((time.perf_counter() - start) * 1000)
+    return times
+
+
+def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 60
+    rows = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+    image = cv2.GaussianBlur(np.random.default_rng(1).integers(0, 255, (1200, 1600), dtype=np.uint8), (9, 9), 0)
+    with tempfile.TemporaryDirectory() as tmp:
+        fingerprints = generate_registry(os.path.join(tmp, "registry.db"), rows)
+        registry = get_registry(os.path.join(tmp, "registry.db"))
+        handle = make_request(registry, fingerprints, image)
+        configs = [
+            ("off", dict(token=""), False),
+            ("marks", dict(token="bench"), False),
+            ("sample", dict(token="bench", interval_ms=10), True),
+            ("sample-2ms", dict(token="bench", interval_ms=2), True),
+            ("cprofile", dict(token="bench", mode="cprofile"), True),
+        ]
+        print(f"{requests} requests per mode, registry of {rows} rows")
+        baseline = None
+        for name, kwargs, select in configs:
+            profiler = RequestProfiler(directory=os.path.join(tmp, "profiles", name), max_files=requests,
+                                       max_per_minute=requests + 5, **kwargs)
+            with contextlib.redirect_stdout(io.StringIO()):
+                run(handle, profiler, 5, select)  # warm-up
+            with contextlib.redirect_stdout(io.StringIO()):
+                times = run(handle, profiler, requests, select)
+                profiler.flush()
+            median = statistics.median(times)
+            baseline = baseline or median
+            stored = profiler.list()
+            size = statistics.mean(p["bytes"] for p in stored) / 1024 if stored else 0
+            samples = statistics.mean(p["samples"] for p in stored) if stored else 0
+            print(f"  {name:<11} median {median:6.1f} ms  p90 {sorted(times)[int(len(times) * 0.9)]:6.1f} ms  "
+                  f"overhead {100 * (median / baseline - 1):+5.1f}%  "
+                  f"profile {size:5.1f} KB, {samples:4.1f} samples")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Reconciliation Benchmark
+Runs reconcile.RegistryReconciler over a synthetic registry against the
+fake node, with a known mix of failed, anchored, missing, duplicate and
+unregistered entries, and checks the report counts.
+
+Usage: python benchmarks/bench_reconcile.py [registry_rows] [shards]
+"""
+
+import os
+import sys
+import time
+import random
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_node import FakeNode, FakeNodeServer, MINT_SELECTOR, ZERO_ADDRESS
+from benchmarks.synthetic import generate_registry
+from registry_db import get_db_connection, hash_to_blob
+from reconcile import RegistryReconciler
+from registry_store import RegistryStore
+
+CONTRACT = "0xaC8eCD06c9FB699E5C39f2b8EA316BA817f1fD09"
+
+
+def build_chain(db_path: str, fingerprints: list, seed: int = 5) -> tuple:
+    """Mint most fingerprints; return (node, expected issue counts)"""
+    rng = random.Random(seed)
+    node = FakeNode(CONTRACT, seed=seed, start_block=1)
+    owner = node.random_address()
+    expected = {"failed_tx": 0, "legacy_anchor": 0, "missing_mint": 0, "unregistered_mint": 0, "duplicate_row": 0}
+    updates = []
+    for i, fingerprint in enumerate(fingerprints):
+        block = 1 + i // 20
+        roll = rng.random()
+        if roll < 0.01:
+            tx = node.add_transaction(block, owner, CONTRACT, MINT_SELECTOR + fingerprint[2:], status=0)
+            expected["failed_tx"] += 1
+        elif roll < 0.02:
+            tx = node.add_transaction(block, owner, ZERO_ADDRESS, fingerprint)
+            expected["legacy_anchor"] += 1
+        elif roll < 0.03:
+            tx = "0x" + format(rng.getrandbits(256), "064x")
+            expected["missing_mint"] += 1
+        else:
+            tx = node.add_mint(int(fingerprint, 16), owner, block=block)
+        updates.append((hash_to_blob(tx), i + 1))
+
+    # Mints that never made it into the registry
+    for _ in range(len(fingerprints) // 1000):
+        node.add_mint(rng.getrandbits(256), owner)
+        expected["unregistered_mint"] += 1
+
+    conn = get_db_connection(db_path)
+    conn.executemany('UPDATE documents SET txn_hash = ? WHERE id = ?', updates)
+    # Re-registrations of already registered products, as in registries from
+    # before the unique fingerprint index
+    conn.execute('DROP INDEX IF EXISTS idx_documents_fingerprint')
+    duplicates = conn.execute(
+        'INSERT INTO documents (participant_name, hackathon_name, document_hash, txn_hash, token_id, contract_address) '
+        'SELECT participant_name, hackathon_name, document_hash, txn_hash, token_id, contract_address '
+        'FROM documents WHERE id % 500 = 0'
+    ).rowcount
+    conn.commit()
+    conn.close()
+    expected["duplicate_row"] = duplicates
+    return node, expected
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    shards = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "registry.db")
+        start = time.perf_counter()
+        fingerprints = generate_registry(db_path, rows, contract_address=CONTRACT)
+        node, expected = build_chain(db_path, fingerprints)
+        if shards > 1:
+            RegistryStore(db_path, 1).rebalance(shards, prune=True)
+        print(f"Setup: {rows} rows, {len(node.logs)} logs, head {node.latest} in {time.perf_counter() - start:.1f}s")
+
+        with FakeNodeServer(node) as server:
+            reconciler = RegistryReconciler(db_path, server.url, CONTRACT, chunk_size=10000, block_step=2000,
+                                            start_block=1, shards=shards)
+            summary = reconciler.run()
+            print(f"Reconcile: {summary['rows_checked']} rows, {summary['chain_mints']} mints, "
+                  f"sync {summary['sync_seconds']}s, total {summary['total_seconds']}s "
+                  f"({summary['rows_checked'] / summary['total_seconds']:.0f} rows/s), node calls {node.calls}")
+
+            # Duplicate rows of unminted fingerprints also carry their chain issue
+            for issue, count in sorted(expected.items()):
+                found = summary["issues"].get(issue, 0)
+                mark = "✓" if found >= count else "⚠"
+                print(f"  {mark} {issue:<20} expected >= {count:<7} found {found}")
+
+            start = time.perf_counter()
+            again = RegistryReconciler(db_path, server.url, CONTRACT, start_block=1, shards=shards).run(fresh=True)
+            print(f"Incremental re-run (no new blocks): {again['total_seconds']}s, sync {again['sync_seconds']}s")
+        print(f"Peak RSS: {_peak_rss_mb():.0f} MiB")
+
+
+def _peak_rss_mb() -> float:
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+Server Entry Point Benchmark
+Starts the app against a simulated node and a synthetic registry, waits
+until it answers, sends image verifications, and reports per server:
+
+    debug       python app.py (Flask debug server with reloader)
+    preload     gunicorn -c gunicorn.conf.py wsgi:app (models loaded once in the master)
+    no-preload  the same with WEB_PRELOAD=0 (each worker imports the app itself)
+
+    ready       seconds from launch until the first response
+    first       latency of the first image /verify_document after ready
+    second      latency of the next one
+    RSS/PSS/USS per serving process (PSS splits shared pages between the
+                processes mapping them; USS is what the process alone holds)
+    total PSS   memory the whole process tree really costs
+
+Linux only (reads /proc/<pid>/smaps_rollup).
+
+Usage: python benchmarks/bench_server.py [workers] [rows]
+"""
+
+import os
+import sys
+import time
+import socket
+import signal
+import tempfile
+import subprocess
+from typing import Dict, List
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_node import FakeNodeServer
+from benchmarks.sim_node import SimulatedNode
+from benchmarks.suite import BenchContext
+from benchmarks.synthetic import generate_registry
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CONTRACT_ADDRESS = "0xaC8eCD06c9FB699E5C39f2b8EA316BA817f1fD09"
+DEBUG_PORT = 5001  # app.py does not take a port
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def children(pid: int) -> List[int]:
+    found = []
+    for task in os.listdir(f"/proc/{pid}/task"):
+        with open(f"/proc/{pid}/task/{task}/children") as f:
+            found += [int(c) for c in f.read().split()]
+    return found
+
+
+def tree(pid: int) -> List[int]:
+    pids = [pid]
+    for child in children(pid):
+        pids += tree(child)
+    return pids
+
+
+def memory(pid: int) -> Dict[str, float]:
+    """RSS, PSS and USS of a process in MB"""
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1]) / 1024
+    return {"rss": fields["Rss"], "pss": fields["Pss"],
+            "uss": fields["Private_Clean"] + fields["Private_Dirty"]}
+
+
+def verify_image(url: str, image: str) -> float:
+    start = time.perf_counter()
+    with open(image, "rb") as f:
+        response = requests.post(f"{url}/verify_document", files={"image": (os.path.basename(image), f)},
+                                 headers={"Accept": "application/json"}, timeout=300)
+    elapsed = (time.perf_counter() - start) * 1000
+    if response.status_code >= 500:
+        raise RuntimeError(f"verify_document returned {response.status_code}")
+    return elapsed
+
+
+def run_server(name: str, command: List[str], port: int, env: Dict, workdir: str, images: List[str]) -> Dict:
+    log = open(os.path.join(workdir, f"{name}.log"), "w")
+    start = time.perf_counter()
+    proc = subprocess.Popen(command, cwd=BASE_DIR, env=env, stdout=log, stderr=subprocess.STDOUT,
+                            start_new_session=True)
+    url = f"http://127.0.0.1:{port}"
+    try:
+        while True:
+            if proc.poll() is not None:
+                log.flush()
+                with open(log.name) as f:
+                    raise RuntimeError(f"{name} exited with {proc.returncode}:\n{f.read()[-2000:]}")
+            try:
+                requests.get(f"{url}/api/admission", timeout=5)
+                break
+            except (requests.ConnectionError, requests.Timeout):
+                time.sleep(0.1)
+        ready = time.perf_counter() - start
+        # gunicorn answers as soon as one worker is up: let the rest finish warming up
+        time.sleep(3)
+        first = verify_image(url, images[0])
+        second = verify_image(url, images[1 % len(images)])
+        pids = tree(proc.pid)
+        usage = {pid: memory(pid) for pid in pids}
+        # The serving processes: gunicorn workers, or the reloader's child
+        serving = pids[1:] if len(pids) > 1 else pids
+        return {
+            "ready": ready, "first": first, "second": second, "processes": len(pids),
+            "rss": sum(usage[p]["rss"] for p in serving) / len(serving),
+            "pss": sum(usage[p]["pss"] for p in serving) / len(serving),
+            "uss": sum(usage[p]["uss"] for p in serving) / len(serving),
+            "total_pss": sum(u["pss"] for u in usage.values()),
+        }
+    finally:
+        if proc.poll() is None:
+            os.killpg(proc.pid, signal.SIGTERM)
+        try:
+            proc.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            os.killpg(proc.pid, signal.SIGKILL)
+            proc.wait()
+        log.close()
+
+
+def main():
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else 2
+    rows = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+    images = BenchContext(tempfile.gettempdir()).corpus()[:2]
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "registry.db")
+        generate_registry(db_path, rows, contract_address=CONTRACT_ADDRESS)
+        node = SimulatedNode(CONTRACT_ADDRESS, chain_id=80002)
+        with FakeNodeServer(node) as node_server:
+            env = dict(os.environ, DB_PATH=db_path, UPLOAD_FOLDER=os.path.join(tmp, "uploads"),
+                       WEB3_PROVIDER=node_server.url, NFT_CONTRACT_ADDRESS=CONTRACT_ADDRESS, CHAIN_ID="80002",
+                       BINARY_MIGRATION="off", PYTHONUNBUFFERED="1")
+            port = free_port()
+            gunicorn = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "wsgi:app"]
+            configs = [
+                ("debug", [sys.executable, "app.py"], DEBUG_PORT, {}),
+                ("preload", gunicorn, port, {"BIND": f"127.0.0.1:{port}", "WEB_WORKERS": str(workers)}),
+                ("no-preload", gunicorn, port, {"BIND": f"127.0.0.1:{port}", "WEB_WORKERS": str(workers),
+                                                "WEB_PRELOAD": "0"}),
+            ]
+            print(f"{workers} gunicorn workers, registry of {rows} rows, {os.cpu_count()} CPUs")
+            print(f"  {'server':<11} {'procs':>5} {'ready':>7} {'first':>9} {'second':>9} "
+                  f"{'RSS/proc':>9} {'PSS/proc':>9} {'USS/proc':>9} {'total PSS':>10}")
+            for name, command, server_port, extra in configs:
+                result = run_server(name, command, server_port, dict(env, **extra), tmp, images)
+                print(f"  {name:<11} {result['processes']:>5} {result['ready']:>6.1f}s "
+                      f"{result['first']:>7.0f}ms {result['second']:>7.0f}ms "
+                      f"{result['rss']:>7.0f}MB {result['pss']:>7.0f}MB {result['uss']:>7.0f}MB "
+                      f"{result['total_pss']:>8.0f}MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Sharding Benchmark
+Builds a synthetic registry, rebalances it into 1, 4 and 8 shards and
+measures concurrent registration throughput (one committed insert per
+registration, as the upload route does), fingerprint lookups, fan-out
+history and statistics, and how long rebalancing takes.
+
+Usage: python benchmarks/bench_sharding.py [registry_rows] [writer_threads]
+"""
+
+import os
+import sys
+import time
+import random
+import tempfile
+import threading
+
+os.environ.setdefault("BINARY_MIGRATION", "off")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.suite import measure, summarize
+from benchmarks.synthetic import generate_registry
+from fingerprint import calculate_keccak_fingerprint
+from hash_validator import HashValidator
+from registry_store import RegistryStore
+
+
+def registrations(store: RegistryStore, threads: int, per_thread: int) -> dict:
+    """Concurrent committed inserts of new fingerprints"""
+    errors = []
+
+    def writer(t):
+        for i in range(per_thread):
+            fingerprint = calculate_keccak_fingerprint({"product_name": f"bench-{threads}-{t}-{i}-{time.time_ns()}"})
+            try:
+                store.insert_document(participant_name=f"Load {t}-{i}", hackathon_name="Bench",
+                                      document_hash=fingerprint, txn_hash=fingerprint)
+            except Exception as e:
+                errors.append(str(e))
+
+    workers = [threading.Thread(target=writer, args=(t,)) for t in range(threads)]
+    start = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - start
+    return {"per_sec": round(threads * per_thread / elapsed, 1), "errors": len(errors)}
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    rng = random.Random(13)
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "registry.db")
+        fingerprints = generate_registry(db_path, rows)
+        probes = [rng.choice(fingerprints) for _ in range(2000)]
+        print(f"Registry: {rows} rows, {threads} writer threads")
+
+        current = RegistryStore(db_path, 1)
+        for count in (1, 4, 8):
+            if count != current.count:
+                start = time.perf_counter()
+                summary = current.rebalance(count, prune=True)
+                print(f"Rebalance {current.count} -> {count}: {summary['total_copied']} rows "
+                      f"in {time.perf_counter() - start:.1f}s")
+                current = RegistryStore(db_path, count)
+
+            validator = HashValidator(db_path, count)
+            single = iter(probes * 10)
+            lookup = summarize(measure(lambda: validator.validate_hash(next(single)), 2000))
+            history = summarize(measure(lambda: validator.registry.query_ordered(
+                'SELECT * FROM documents ORDER BY timestamp DESC LIMIT 50', key=lambda r: r['timestamp'],
+                reverse=True, limit=50), 50))
+            stats = summarize(measure(validator.get_statistics, 5, warmup=1))
+            writes = registrations(validator.registry, threads, 200)
+            print(f"  {count} shard(s): register {writes['per_sec']:>8}/s ({writes['errors']} errors)  "
+                  f"lookup {lookup['median_ms']} ms  history {history['median_ms']} ms  "
+                  f"statistics {stats['median_ms']} ms")
+
+
+if __name__ == "__main__":
+    main()
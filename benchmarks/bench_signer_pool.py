@@ -0,0 +1,82 @@
+"""
+Signer Pool Benchmark
+Submits mints from concurrent threads through a SignerPool of 1, 4 and 8
+accounts against the simulated node (one block per interval) and reports
+submission throughput, per-signer counts and mined/reverted totals. One
+extra account without BRAND_ROLE is in every pool and must never mint.
+
+Usage: python benchmarks/bench_signer_pool.py [transactions] [block_seconds] [max_in_flight]
+"""
+
+import os
+import sys
+import time
+import threading
+
+os.environ.setdefault("BINARY_MIGRATION", "off")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from eth_account import Account
+from web3 import Web3
+
+from benchmarks.fake_node import FakeNodeServer, MINT_SELECTOR
+from benchmarks.sim_node import SimulatedNode
+from signer_pool import SignerPool
+
+CONTRACT = "0xaC8eCD06c9FB699E5C39f2b8EA316BA817f1fD09"
+THREADS = 16
+
+
+def run(count: int, signers: int, block_interval: float, max_in_flight: int) -> None:
+    minters = [Account.create(f"bench-signer-{signers}-{i}") for i in range(signers)]
+    outsider = Account.create(f"bench-signer-{signers}-outsider")
+    node = SimulatedNode(CONTRACT, latency=0.005, block_interval=block_interval, chain_id=80002,
+                         brand_role=[a.address for a in minters])
+    with FakeNodeServer(node) as server:
+        web3 = Web3(Web3.HTTPProvider(server.url))
+        pool = SignerPool(web3, [a.key.hex() for a in minters + [outsider]], server.url, CONTRACT,
+                          max_in_flight=max_in_flight, wait=120)
+        counter = iter(range(count))
+        lock = threading.Lock()
+        errors = []
+
+        def submitter():
+            while True:
+                with lock:
+                    n = next(counter, None)
+                if n is None:
+                    return
+                fields = {"to": CONTRACT, "value": 0, "gas": 1000000, "gasPrice": 50 * 10 ** 9, "chainId": 80002,
+                          "data": MINT_SELECTOR + format(n + 1, "064x") + minters[0].address[2:].lower().rjust(64, "0")}
+                try:
+                    pool.send(fields, needs_role=True)
+                except Exception as e:
+                    errors.append(str(e))
+
+        workers = [threading.Thread(target=submitter) for _ in range(THREADS)]
+        start = time.perf_counter()
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+        elapsed = time.perf_counter() - start
+        while any(node.mempool.values()):
+            web3.eth.block_number  # lets the node mine what is left
+            time.sleep(block_interval / 4)
+        per_signer = sorted(s["submitted"] for s in pool.stats())
+        print(f"  {signers} signer(s): {count / elapsed:7.1f} tx/s submitted ({elapsed:.1f}s)  "
+              f"per signer {per_signer}  mined {node.stats['mined']}  reverted {node.stats['reverted']}  "
+              f"rejected {node.stats['rejected']}  errors {len(errors)}")
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+    block_interval = float(sys.argv[2]) if len(sys.argv) > 2 else 1.0
+    max_in_flight = int(sys.argv[3]) if len(sys.argv) > 3 else 16
+    print(f"{count} mints, {THREADS} threads, {block_interval}s blocks, {max_in_flight} in flight per signer")
+    for signers in (1, 4, 8):
+        run(count, signers, block_interval, max_in_flight)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""
+Offline Snapshot Benchmark
+Writes a snapshot of N random fingerprints (10M by default) and reports:
+
+    size        file size (32-byte and 16-byte records)
+    open        time to open and map the file
+    lookup      single-fingerprint latency, interpolation vs binary search,
+                hits and misses, with the page cache cold and warm
+    resident    how much of the mapping is in memory after the lookups
+    batch       vectorized lookups (contains_keys) per second
+    verify      full checksum pass
+
+and, on a synthetic SQLite registry of R rows, export and delta export time
+next to a registry point lookup.
+
+Usage: python benchmarks/bench_snapshot.py [fingerprints] [registry rows]
+"""
+
+import os
+import sys
+import time
+import random
+import tempfile
+import statistics
+
+os.environ.setdefault("BINARY_MIGRATION", "off")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from benchmarks.synthetic import generate_registry
+from offline_snapshot import Snapshot, export, write_snapshot
+from registry_store import RegistryStore
+
+LOOKUPS = 20000
+
+
+def random_keys(count: int, record_size: int, seed: int) -> np.ndarray:
+    raw = np.random.default_rng(seed).integers(0, 256, count * record_size, dtype=np.uint8).tobytes()
+    return np.frombuffer(raw, dtype=f"S{record_size}")
+
+
+def evict(path: str) -> None:
+    """Drop the file's pages from the page cache (dirty pages are written back first)"""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+    finally:
+        os.close(fd)
+
+
+def mapped_rss(path: str) -> float:
+    """MB of a mapped file resident in this process"""
+    total, inside = 0, False
+    with open("/proc/self/smaps") as f:
+        for line in f:
+            first = line.split(maxsplit=1)[0]
+            if "-" in first and not first.endswith(":"):
+                inside = line.rstrip().endswith(path)
+            elif inside and first == "Rss:":
+                total += int(line.split()[1])
+    return total / 1024
+
+
+def time_lookups(snapshot: Snapshot, keys, interpolate: bool):
+    times = []
+    for key in keys:
+        start = time.perf_counter()
+        snapshot.contains_key(key, interpolate)
+        times.append((time.perf_counter() - start) * 1e6)
+    return times
+
+
+def summary(times) -> str:
+    ordered = sorted(times)
+    return f"median {statistics.median(ordered):6.1f} µs  p99 {ordered[int(len(ordered) * 0.99)]:7.1f} µs"
+
+
+def bench_snapshot(directory: str, count: int, record_size: int) -> None:
+    path = os.path.join(directory, f"snapshot-{record_size}.vcs")
+    start = time.perf_counter()
+    keys = np.unique(random_keys(count, record_size, seed=1))
+    write_snapshot(path, keys)
+    built = time.perf_counter() - start
+    print(f"\n{record_size}-byte records: {os.path.getsize(path) / 2 ** 20:.1f} MiB "
+          f"for {len(keys)} fingerprints (built in {built:.1f}s)")
+
+    rng = random.Random(2)
+    hits = [bytes(keys[rng.randrange(len(keys))]).ljust(record_size, b"\0") for _ in range(LOOKUPS)]
+    misses = [bytes(k).ljust(record_size, b"\0") for k in random_keys(LOOKUPS, record_size, seed=3)]
+    del keys
+
+    evict(path)
+    start = time.perf_counter()
+    snapshot = Snapshot(path)
+    print(f"  open             {(time.perf_counter() - start) * 1e6:8.0f} µs")
+    print(f"  cold hit         {summary(time_lookups(snapshot, hits[:2000], True))}  "
+          f"(page cache dropped, interpolation)")
+    print(f"  resident         {mapped_rss(path):8.1f} MiB of the mapping after 2000 cold lookups")
+    for interpolate, name in ((True, "interpolation"), (False, "binary")):
+        time_lookups(snapshot, hits + misses, interpolate)  # warm
+        print(f"  {name:<13} hit  {summary(time_lookups(snapshot, hits, interpolate))}")
+        print(f"  {name:<13} miss {summary(time_lookups(snapshot, misses, interpolate))}")
+
+    batch = np.array(hits + misses, dtype=f"S{record_size}")
+    start = time.perf_counter()
+    found = snapshot.contains_keys(batch)
+    elapsed = time.perf_counter() - start
+    assert found[:LOOKUPS].all() and not found[LOOKUPS:].any()
+    print(f"  batch            {len(batch) / elapsed / 1e6:8.2f} M lookups/s ({len(batch)} keys)")
+    start = time.perf_counter()
+    assert snapshot.verify()
+    print(f"  verify           {time.perf_counter() - start:8.2f} s")
+    snapshot.close()
+
+
+def bench_export(directory: str, rows: int) -> None:
+    db_path = os.path.join(directory, "registry.db")
+    fingerprints = generate_registry(db_path, rows)
+    store = RegistryStore(db_path, 1)
+    path = os.path.join(directory, "registry.vcs")
+    start = time.perf_counter()
+    export(path, store)
+    full = time.perf_counter() - start
+    generate_registry(db_path, rows // 100, seed=8)
+    start = time.perf_counter()
+    delta = export(os.path.join(directory, "delta.vcs"), store, [path])
+    delta_time = time.perf_counter() - start
+    rng = random.Random(4)
+    sample = [rng.choice(fingerprints) for _ in range(2000)]
+    times = []
+    for fingerprint in sample:
+        t = time.perf_counter()
+        store.find_by_fingerprint(fingerprint)
+        times.append((time.perf_counter() - t) * 1e6)
+    with Snapshot(path) as snapshot:
+        lookups = []
+        for fingerprint in sample:
+            t = time.perf_counter()
+            assert fingerprint in snapshot
+            lookups.append((time.perf_counter() - t) * 1e6)
+    print(f"\nRegistry of {rows} rows: full export {full:.2f}s, delta of {delta['records']} new rows "
+          f"{delta_time:.2f}s")
+    print(f"  SQLite lookup    {summary(times)}")
+    print(f"  snapshot lookup  {summary(lookups)}  (hex fingerprint, including parsing)")
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000_000
+    rows = int(sys.argv[2]) if len(sys.argv) > 2 else 200_000
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{count} fingerprints, {LOOKUPS} lookups per measurement")
+        for record_size in (32, 16):
+            bench_snapshot(tmp, count, record_size)
+        bench_export(tmp, rows)
+
+
+if __name__ == "__main__":
+    main()
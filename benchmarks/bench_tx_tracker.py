@@ -0,0 +1,95 @@
+"""
+Confirmation Tracker Benchmark
+Submits signed transactions to the simulated node, then compares one
+batched tracker round (all receipts in one JSON-RPC batch, results written
+to the registry) with a receipt request per transaction. Also drops
+transactions from the node's mempool to exercise rebroadcast and
+replacement.
+
+Usage: python benchmarks/bench_tx_tracker.py [transactions] [latency_ms]
+"""
+
+import os
+import sys
+import time
+import tempfile
+
+os.environ.setdefault("BINARY_MIGRATION", "off")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from eth_account import Account
+from web3 import Web3
+
+from benchmarks.fake_node import FakeNodeServer
+from benchmarks.sim_node import SimulatedNode
+from registry_store import get_registry
+from tx_tracker import ConfirmationTracker
+
+CONTRACT = "0xaC8eCD06c9FB699E5C39f2b8EA316BA817f1fD09"
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    latency = float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 0.02
+    account = Account.create("bench-tx-tracker")
+    node = SimulatedNode(CONTRACT, latency=latency, block_interval=0, chain_id=80002)
+
+    def sign(fields):
+        return Web3.to_hex(account.sign_transaction(fields).raw_transaction)
+
+    with tempfile.TemporaryDirectory() as tmp, FakeNodeServer(node) as server:
+        db_path = os.path.join(tmp, "registry.db")
+        registry = get_registry(db_path)
+        tracker = ConfirmationTracker(server.url, sign, db_path=db_path, stuck_after=0)
+        tracker.start = lambda: None  # rounds are driven by hand below
+        web3 = Web3(Web3.HTTPProvider(server.url))
+
+        hashes = []
+        for nonce in range(count):
+            fields = {"to": "0x" + "00" * 20, "value": 0, "gas": 50000, "gasPrice": 50 * 10 ** 9,
+                      "nonce": nonce, "chainId": 80002, "data": "0x" + format(nonce, "064x")}
+            raw = sign(fields)
+            txn_hash = web3.to_hex(web3.eth.send_raw_transaction(raw))
+            tracker.track(txn_hash, fields, raw)
+            registry.insert_document(participant_name=f"Product {nonce}", document_hash="0x" + format(nonce + 1, "064x"),
+                                     txn_hash=txn_hash, txn_status="pending")
+            hashes.append(txn_hash)
+        web3.eth.block_number  # mines the pending block
+
+        start = time.perf_counter()
+        for txn_hash in hashes:
+            web3.eth.get_transaction_receipt(txn_hash)
+        per_tx = time.perf_counter() - start
+
+        calls = node.calls
+        start = time.perf_counter()
+        summary = tracker.poll_once(force=True)
+        batched = time.perf_counter() - start
+        confirmed = len(registry.query("SELECT id FROM documents WHERE txn_status = 'confirmed'"))
+        print(f"{count} transactions, {latency * 1000:.0f} ms node latency")
+        print(f"  per-tx receipts      {per_tx:7.2f}s  ({count} requests)")
+        print(f"  tracker round        {batched:7.2f}s  ({node.calls - calls} calls in batched requests, "
+              f"{summary['confirmed']} confirmed, {confirmed} registry rows updated)")
+
+        # Stuck transaction: the node loses it, the tracker rebroadcasts, then replaces it
+        fields = {"to": "0x" + "00" * 20, "value": 0, "gas": 50000, "gasPrice": 50 * 10 ** 9,
+                  "nonce": count, "chainId": 80002, "data": "0x" + "ab" * 32}
+        raw = sign(fields)
+        stuck = web3.to_hex(web3.eth.send_raw_transaction(raw))
+        tracker.track(stuck, fields, raw)
+        registry.insert_document(participant_name="Stuck", document_hash="0x" + "cd" * 32, txn_hash=stuck)
+        node.block_interval = 3600  # no more blocks until the test advances the chain
+        for _ in range(2):
+            with node.lock:
+                node.mempool.clear()
+                node.latest += 1
+            print(f"  stuck round          {tracker.poll_once()}")
+        with node.lock:
+            node._mine_block(node.latest + 1)
+        print(f"  after mining         {tracker.poll_once()}")
+        row = registry.query("SELECT txn_hash, txn_status FROM documents WHERE participant_name = 'Stuck'")[0]
+        print(f"  stuck registration now {row['txn_hash'][:12]}... ({row['txn_status']}), tracker {tracker.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Bulk Validation Benchmark
+Measures HashValidator.validate_many throughput against per-id validate_hash
+
+Usage: python benchmarks/bench_validate_batch.py [registry_rows]
+"""
+
+import os
+import sys
+import time
+import random
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from hash_validator import HashValidator
+from benchmarks.synthetic import generate_registry
+
+
+def request_ids(hashes: list, count: int, rng: random.Random) -> list:
+    """Half known fingerprints (mixed case/prefix), half unknown"""
+    ids = []
+    for i in range(count):
+        if i % 2:
+            h = rng.choice(hashes)
+            ids.append(h.upper().replace('0X', '') if i % 4 == 1 else h)
+        else:
+            ids.append('%064x' % rng.getrandbits(256))
+    return ids
+
+
+def main():
+    registry_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    rng = random.Random(11)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        hashes = generate_registry(db_path, registry_rows)
+        validator = HashValidator(db_path)
+        print(f"Registry rows: {registry_rows}")
+
+        ids = request_ids(hashes, 1000, rng)
+        start = time.perf_counter()
+        for h in ids:
+            validator.validate_hash(h)
+        elapsed = time.perf_counter() - start
+        print(f"validate_hash loop   n=1000    {elapsed:8.3f}s  {len(ids) / elapsed:10.0f} ids/s")
+
+        for count in (1000, 10000, 100000):
+            ids = request_ids(hashes, count, rng)
+            start = time.perf_counter()
+            results = validator.validate_many(ids)
+            elapsed = time.perf_counter() - start
+            hits = sum(1 for ok, _ in results if ok)
+            print(f"validate_many        n={count:<7} {elapsed:8.3f}s  {count / elapsed:10.0f} ids/s  (hits={hits})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,367 @@
+"""
+Fake JSON-RPC Node
+Deterministic, in-process stand-in for the Neo X RPC used by the app,
+the provenance agent and the benchmarks. Serves single and batch requests
+over HTTP on 127.0.0.1.
+"""
+
+import json
+import bisect
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+from eth_abi import decode as abi_decode, encode as abi_encode
+from eth_hash.auto import keccak
+
+TRANSFER_TOPIC = "0x" + keccak(b"Transfer(address,address,uint256)").hex()
+PRODUCT_MINTED_TOPIC = "0x" + keccak(b"ProductMinted(uint256,bytes32,address)").hex()
+OWNER_OF_SELECTOR = "0x6352211e"
+FP_TO_TOKEN_SELECTOR = "0x" + keccak(b"fpToToken(bytes32)")[:4].hex()
+TOKEN_TO_FP_SELECTOR = "0x" + keccak(b"tokenToFp(uint256)")[:4].hex()
+TOKEN_META_HASH_SELECTOR = "0x" + keccak(b"tokenMetaHash(uint256)")[:4].hex()
+NONEXISTENT_TOKEN_ERROR = keccak(b"ERC721NonexistentToken(uint256)")[:4]
+MULTICALL3_ADDRESS = "0xcA11bde05977b3631167028862bE2a173976CA11"
+AGGREGATE3_SELECTOR = "0x82ad56cb"
+# Gas of one aggregated read, and the eth_call gas cap (geth's default RPCGasCap)
+READ_GAS = 6000
+CALL_GAS_CAP = 50_000_000
+# mintWithFingerprint(bytes32,address)
+MINT_SELECTOR = "0x" + keccak(b"mintWithFingerprint(bytes32,address)")[:4].hex()
+ZERO_ADDRESS = "0x" + "00" * 20
+
+
+class RPCError(Exception):
+    def __init__(self, code: int, message: str, data: bytes = b""):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+        self.data = data
+
+
+def _hex(value: int) -> str:
+    return hex(value)
+
+
+def _word(value: int) -> str:
+    return "0x" + format(value, "064x")
+
+
+def _address_topic(address: str) -> str:
+    return "0x" + "0" * 24 + address.lower()[2:]
+
+
+def _block_number(tag, latest: int) -> int:
+    if tag in (None, "latest", "pending", "safe", "finalized"):
+        return latest
+    if tag == "earliest":
+        return 0
+    return int(tag, 16) if isinstance(tag, str) else int(tag)
+
+
+class FakeNode:
+    """
+    Chain state plus one rpc_<method> handler per supported JSON-RPC call.
+    Everything is derived from the seed, so two nodes built with the same
+    arguments answer identically.
+    """
+
+    def __init__(self, contract_address: str, chain_id: int = 12227332, seed: int = 1,
+                 start_block: int = 1000, block_time: int = 12, genesis_timestamp: int = 1767225600,
+                 multicall_address: Optional[str] = MULTICALL3_ADDRESS):
+        self.contract_address = contract_address
+        self.multicall_address = multicall_address
+        self.chain_id = chain_id
+        self.rng = random.Random(seed)
+        self.block_time = block_time
+        self.genesis_timestamp = genesis_timestamp
+        self.latest = start_block
+        self.lock = threading.RLock()
+        # Compact state (tuples), materialized into JSON-RPC dicts on request,
+        # so a node can hold a million mints
+        self.logs: List[tuple] = []                      # (block, tx_hash, topics, data)
+        self.block_logs: Dict[int, List[int]] = {}       # block -> indices into logs
+        self.log_blocks: List[int] = []                  # sorted keys of block_logs
+        self.tx_logs: Dict[str, List[int]] = {}
+        self.transactions: Dict[str, tuple] = {}         # (block, from, to, data, status, nonce, gas, gas_price)
+        self.block_transactions: Dict[int, List[str]] = {}
+        self.owners: Dict[int, str] = {}
+        self.meta_hashes: Dict[int, int] = {}
+        self.calls = 0
+
+    # --- State builders ---
+
+    def random_address(self) -> str:
+        return "0x" + format(self.rng.getrandbits(160), "040x")
+
+    def _tx_hash(self) -> str:
+        return "0x" + format(self.rng.getrandbits(256), "064x")
+
+    def _add_log(self, block: int, tx_hash: str, topics: List[str], data: str = "0x") -> None:
+        index = len(self.logs)
+        self.logs.append((block, tx_hash, tuple(topics), data))
+        self.tx_logs.setdefault(tx_hash, []).append(index)
+        if block not in self.block_logs:
+            self.block_logs[block] = []
+            if self.log_blocks and block < self.log_blocks[-1]:
+                bisect.insort(self.log_blocks, block)
+            else:
+                self.log_blocks.append(block)
+        self.block_logs[block].append(index)
+
+    def add_mint(self, token_id: int, owner: str, block: Optional[int] = None, transfers: int = 0) -> str:
+        """Record a mintWithFingerprint (ProductMinted + Transfer) and optional later transfers"""
+        with self.lock:
+            block = self.latest if block is None else block
+            tx_hash = self._tx_hash()
+            self._add_log(block, tx_hash, [TRANSFER_TOPIC, _address_topic(ZERO_ADDRESS), _address_topic(owner), _word(token_id)])
+            self._add_log(block, tx_hash, [PRODUCT_MINTED_TOPIC, _word(token_id), _word(token_id), _address_topic(owner)])
+            self._add_receipt(tx_hash, block, owner, self.contract_address, MINT_SELECTOR + format(token_id, "064x") + _address_topic(owner)[2:])
+            self.owners[token_id] = owner
+            for i in range(transfers):
+                new_owner = self.random_address()
+                block += 1 + i
+                transfer_hash = self._tx_hash()
+                self._add_log(block, transfer_hash, [TRANSFER_TOPIC, _address_topic(self.owners[token_id]),
+                                                     _address_topic(new_owner), _word(token_id)])
+                self._add_receipt(transfer_hash, block, self.owners[token_id], self.contract_address, "0x")
+                self.owners[token_id] = new_owner
+            self.latest = max(self.latest, block)
+            return tx_hash
+
+    def add_transaction(self, block: int, sender: str, to: Optional[str], data: str, status: int = 1) -> str:
+        """Record a plain transaction (e.g. a legacy data anchor or a failed mint)"""
+        with self.lock:
+            tx_hash = self._tx_hash()
+            self._add_receipt(tx_hash, block, sender, to, data, status)
+            self.latest = max(self.latest, block)
+            return tx_hash
+
+    def _add_receipt(self, tx_hash: str, block: int, sender: str, to: Optional[str], data: str, status: int = 1,
+                     nonce: int = 0, gas: int = 500000, gas_price: int = 50 * 10 ** 9) -> None:
+        self.transactions[tx_hash] = (block, sender, to, data, status, nonce, gas, gas_price)
+        self.block_transactions.setdefault(block, []).append(tx_hash)
+
+    def log(self, index: int) -> Dict:
+        block, tx_hash, topics, data = self.logs[index]
+        return {
+            "address": self.contract_address,
+            "topics": list(topics),
+            "data": data,
+            "blockNumber": _hex(block),
+            "blockHash": self.block_hash(block),
+            "transactionHash": tx_hash,
+            "transactionIndex": "0x0",
+            "logIndex": _hex(index),
+            "removed": False,
+        }
+
+    def transaction(self, tx_hash: str) -> Optional[Dict]:
+        record = self.transactions.get(tx_hash)
+        if record is None:
+            return None
+        block, sender, to, data, _status, nonce, gas, gas_price = record
+        return {
+            "hash": tx_hash, "blockNumber": _hex(block), "blockHash": self.block_hash(block),
+            "from": sender, "to": to, "input": data, "value": "0x0", "nonce": _hex(nonce),
+            "gas": _hex(gas), "gasPrice": _hex(gas_price), "transactionIndex": "0x0",
+            "chainId": _hex(self.chain_id), "type": "0x0", "v": "0x1b", "r": _word(1), "s": _word(1),
+        }
+
+    def receipt(self, tx_hash: str) -> Optional[Dict]:
+        record = self.transactions.get(tx_hash)
+        if record is None:
+            return None
+        block, sender, to, _data, status, _nonce, _gas, gas_price = record
+        return {
+            "transactionHash": tx_hash, "blockNumber": _hex(block), "blockHash": self.block_hash(block),
+            "from": sender, "to": to, "status": _hex(status), "gasUsed": _hex(21000),
+            "cumulativeGasUsed": _hex(21000), "effectiveGasPrice": _hex(gas_price),
+            "logs": [self.log(i) for i in self.tx_logs.get(tx_hash, [])] if status else [],
+            "logsBloom": "0x" + "00" * 256, "transactionIndex": "0x0", "type": "0x0", "contractAddress": None,
+        }
+
+    def block_hash(self, number: int) -> str:
+        return "0x" + keccak(number.to_bytes(32, "big")).hex()
+
+    def block(self, number: int) -> Dict:
+        return {
+            "number": _hex(number),
+            "hash": self.block_hash(number),
+            "parentHash": self.block_hash(max(number - 1, 0)),
+            "timestamp": _hex(self.genesis_timestamp + number * self.block_time),
+            "transactions": list(self.block_transactions.get(number, [])),
+            "gasLimit": _hex(30_000_000), "gasUsed": "0x0", "baseFeePerGas": _hex(10 ** 9),
+            "miner": ZERO_ADDRESS, "difficulty": "0x0", "totalDifficulty": "0x0", "extraData": "0x",
+            "nonce": "0x0000000000000000", "mixHash": _word(0), "sha3Uncles": _word(0),
+            "logsBloom": "0x" + "00" * 256, "transactionsRoot": _word(0), "stateRoot": _word(0),
+            "receiptsRoot": _word(0), "size": "0x200", "uncles": [],
+        }
+
+    # --- Dispatch ---
+
+    def handle(self, request: Dict) -> Dict:
+        response = {"jsonrpc": "2.0", "id": request.get("id")}
+        handler = getattr(self, "rpc_" + str(request.get("method")), None)
+        try:
+            if handler is None:
+                raise RPCError(-32601, f"Method not found: {request.get('method')}")
+            with self.lock:
+                self.calls += 1
+                response["result"] = handler(*(request.get("params") or []))
+        except RPCError as e:
+            response["error"] = {"code": e.code, "message": e.message}
+            if e.data:
+                response["error"]["data"] = "0x" + e.data.hex()
+        return response
+
+    def handle_payload(self, body):
+        """Answer a single request or a batch (list of requests)"""
+        if isinstance(body, list):
+            return [self.handle(item) for item in body]
+        return self.handle(body)
+
+    # --- JSON-RPC methods ---
+
+    def rpc_eth_chainId(self):
+        return _hex(self.chain_id)
+
+    def rpc_net_version(self):
+        return str(self.chain_id)
+
+    def rpc_eth_blockNumber(self):
+        return _hex(self.latest)
+
+    def rpc_eth_gasPrice(self):
+        return _hex(50 * 10 ** 9)
+
+    def rpc_eth_getBlockByNumber(self, tag, full=False):
+        number = _block_number(tag, self.latest)
+        return self.block(number) if number <= self.latest else None
+
+    def rpc_eth_getTransactionByHash(self, tx_hash):
+        return self.transaction(tx_hash.lower())
+
+    def rpc_eth_getTransactionReceipt(self, tx_hash):
+        return self.receipt(tx_hash.lower())
+
+    def rpc_eth_getLogs(self, criteria):
+        start = _block_number(criteria.get("fromBlock", "latest"), self.latest)
+        end = _block_number(criteria.get("toBlock", "latest"), self.latest)
+        address = criteria.get("address")
+        addresses = {a.lower() for a in ([address] if isinstance(address, str) else address or [])}
+        if addresses and self.contract_address.lower() not in addresses:
+            return []
+        topics = [
+            None if wanted is None else {o.lower() for o in (wanted if isinstance(wanted, list) else [wanted])}
+            for wanted in criteria.get("topics") or []
+        ]
+
+        matched = []
+        first = bisect.bisect_left(self.log_blocks, start)
+        last = bisect.bisect_right(self.log_blocks, end)
+        for block in self.log_blocks[first:last]:
+            for index in self.block_logs[block]:
+                log_topics = self.logs[index][2]
+                if all(wanted is None or (i < len(log_topics) and log_topics[i] in wanted)
+                       for i, wanted in enumerate(topics)):
+                    matched.append(self.log(index))
+        return matched
+
+    def rpc_eth_getCode(self, address, tag="latest"):
+        deployed = {self.contract_address.lower()} | ({self.multicall_address.lower()} if self.multicall_address else set())
+        return "0x6080604052" if address.lower() in deployed else "0x"
+
+    def rpc_eth_call(self, call, tag="latest"):
+        data = (call.get("data") or call.get("input") or "0x").lower()
+        to = call.get("to", "").lower()
+        if self.multicall_address and to == self.multicall_address.lower() and data.startswith(AGGREGATE3_SELECTOR):
+            return self.aggregate3(data, int(call["gas"], 16) if call.get("gas") else CALL_GAS_CAP)
+        return self.contract_call(to, data)
+
+    def aggregate3(self, data: str, gas: int) -> str:
+        """Multicall3.aggregate3, decoded and encoded with eth_abi"""
+        calls, = abi_decode(["(address,bool,bytes)[]"], bytes.fromhex(data[10:]))
+        if len(calls) * READ_GAS > min(gas, CALL_GAS_CAP):
+            raise RPCError(-32000, "out of gas")
+        results = []
+        for target, allow_failure, calldata in calls:
+            try:
+                results.append((True, bytes.fromhex(self.contract_call(target.lower(), "0x" + calldata.hex())[2:])))
+            except RPCError as e:
+                if not allow_failure:
+                    raise RPCError(3, "execution reverted: Multicall3: call failed")
+                results.append((False, e.data))
+        return "0x" + abi_encode(["(bool,bytes)[]"], [results]).hex()
+
+    def contract_call(self, to: str, data: str) -> str:
+        """Read-only calls to the VeriChainProduct contract"""
+        if to != self.contract_address.lower() or len(data) < 74:
+            raise RPCError(3, "execution reverted")
+        selector, argument = data[:10], int(data[10:74], 16)
+        if selector == OWNER_OF_SELECTOR:
+            owner = self.owners.get(argument)
+            if owner is None:
+                raise RPCError(3, "execution reverted: ERC721NonexistentToken",
+                               NONEXISTENT_TOKEN_ERROR + argument.to_bytes(32, "big"))
+            return _address_topic(owner)
+        # tokenId is uint256(fpHash), so both mappings hold the same number for minted tokens
+        if selector in (FP_TO_TOKEN_SELECTOR, TOKEN_TO_FP_SELECTOR):
+            return _word(argument if argument in self.owners else 0)
+        if selector == TOKEN_META_HASH_SELECTOR:
+            return _word(self.meta_hashes.get(argument, 0))
+        raise RPCError(3, "execution reverted")
+
+
+class _Handler(BaseHTTPRequestHandler):
+    node: FakeNode = None
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"null")
+        payload = self.node.handle_payload(body)
+        data = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeNodeServer:
+    """
+    Serve a FakeNode on 127.0.0.1 in a background thread.
+
+    Usage:
+        with FakeNodeServer(node) as server:
+            Web3(Web3.HTTPProvider(server.url))
+    """
+
+    def __init__(self, node: FakeNode, port: int = 0):
+        handler = type("Handler", (_Handler,), {"node": node})
+        self.node = node
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), handler)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeNodeServer":
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
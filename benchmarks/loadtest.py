@@ -0,0 +1,417 @@
+"""
+End-to-End Load Test
+Drives the Flask app with a mix of registration, ID verification, image
+verification and history calls against a simulated Neo X node, and
+reports p50/p95/p99 latency and throughput per endpoint.
+
+In-process (default): seeds a temporary registry, starts a SimulatedNode
+and the app on 127.0.0.1, then generates traffic.
+    python -m benchmarks.loadtest --duration 30 --concurrency 8 \\
+        --mix register=1,verify_id=5,verify_image=2,history=2 \\
+        --latency-ms 80 --error-rate 0.01 --block-time 2 --output load.json
+
+The app is served by werkzeug with a thread per request by default. With
+--server gunicorn it runs under gunicorn.conf.py (gthread workers with a
+fixed thread count, as in production), which is what admission control
+and thread starvation should be measured on.
+
+Against a running app (start benchmarks.sim_node and point WEB3_PROVIDER at it):
+    python -m benchmarks.loadtest --target http://127.0.0.1:5000 --duration 60
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import socket
+import shutil
+import argparse
+import subprocess
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+DEFAULT_MIX = "register=1,verify_id=5,verify_image=2,history=2"
+CONTRACT_ADDRESS = "0xaC8eCD06c9FB699E5C39f2b8EA316BA817f1fD09"
+SHED_STATUSES = (429, 503)
+
+
+def parse_mix(value: str) -> Dict[str, float]:
+    mix = {}
+    for part in value.split(","):
+        name, weight = part.split("=")
+        if name not in OPERATIONS:
+            raise ValueError(f"Unknown operation: {name} (expected one of {', '.join(OPERATIONS)})")
+        mix[name] = float(weight)
+    return mix
+
+
+def percentile(ordered: List[float], q: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+class Workload:
+    """Shared pools of known ids and label images the traffic draws from"""
+
+    def __init__(self, fingerprints: List[str], tokens: List[int], images: List[str], seed: int):
+        self.lock = threading.Lock()
+        self.fingerprints = list(fingerprints)
+        self.tokens = list(tokens)
+        self.images = [(os.path.basename(p), open(p, "rb").read()) for p in images]
+        self.seed = seed
+        self.counter = 0
+
+    def next_id(self) -> int:
+        with self.lock:
+            self.counter += 1
+            return self.counter
+
+    def registered(self, body: Dict) -> None:
+        with self.lock:
+            if body.get("hash"):
+                self.fingerprints.append(body["hash"])
+            if body.get("token_id"):
+                self.tokens.append(int(body["token_id"]))
+
+
+# --- Operations: (session, base_url, workload, rng) -> (http status, ok) ---
+
+def op_register(session, base_url: str, workload: Workload, rng: random.Random) -> Tuple[int, bool]:
+    name, data = rng.choice(workload.images)
+    n = workload.next_id()
+    response = session.post(f"{base_url}/upload_and_issue",
+                            files={"image": (f"load{n}_{name}", data)},
+                            data={"manual_title": f"Load Product {n}", "manual_content": f"LOAD-{n}"})
+    ok = response.status_code == 200
+    if ok:
+        workload.registered(response.json())
+    return response.status_code, ok
+
+
+def op_verify_id(session, base_url: str, workload: Workload, rng: random.Random) -> Tuple[int, bool]:
+    fingerprint = rng.choice(workload.fingerprints)
+    response = session.post(f"{base_url}/verify_document", data={"manual_hash": fingerprint})
+    return response.status_code, response.status_code == 200 and response.json().get("status") == "verified"
+
+
+def op_verify_image(session, base_url: str, workload: Workload, rng: random.Random) -> Tuple[int, bool]:
+    name, data = rng.choice(workload.images)
+    response = session.post(f"{base_url}/verify_document", files={"image": (name, data)})
+    # A scan that finds nothing is a valid answer; only server errors count as failures
+    return response.status_code, response.status_code == 200
+
+
+def op_check_hash(session, base_url: str, workload: Workload, rng: random.Random) -> Tuple[int, bool]:
+    fingerprint = rng.choice(workload.fingerprints)
+    response = session.get(f"{base_url}/api/check_hash", params={"hash": fingerprint})
+    return response.status_code, response.status_code == 200 and response.json().get("authentic", False)
+
+
+def op_history(session, base_url: str, workload: Workload, rng: random.Random) -> Tuple[int, bool]:
+    token_id = rng.choice(workload.tokens)
+    response = session.get(f"{base_url}/api/history/{token_id}")
+    return response.status_code, response.status_code == 200 and response.json().get("success", False)
+
+
+OPERATIONS = {
+    "register": op_register,
+    "verify_id": op_verify_id,
+    "verify_image": op_verify_image,
+    "history": op_history,
+    "check_hash": op_check_hash,
+}
+
+
+class TrafficGenerator:
+    """Closed-loop workers issuing a weighted mix of operations until the deadline"""
+
+    def __init__(self, base_url: str, workload: Workload, mix: Dict[str, float],
+                 concurrency: int = 8, duration: float = 30.0, seed: int = 7):
+        self.base_url = base_url.rstrip("/")
+        self.workload = workload
+        self.mix = mix
+        self.concurrency = concurrency
+        self.duration = duration
+        self.seed = seed
+        self.samples: Dict[str, List[Tuple[float, int, bool]]] = {name: [] for name in mix}
+        self.lock = threading.Lock()
+
+    def _worker(self, index: int, deadline: float) -> None:
+        rng = random.Random(self.seed * 1000 + index)
+        names, weights = list(self.mix), list(self.mix.values())
+        session = requests.Session()
+        while time.monotonic() < deadline:
+            name = rng.choices(names, weights)[0]
+            start = time.perf_counter()
+            try:
+                status, ok = OPERATIONS[name](session, self.base_url, self.workload, rng)
+            except Exception:
+                status, ok = 0, False
+            elapsed = time.perf_counter() - start
+            with self.lock:
+                self.samples[name].append((elapsed, status, ok))
+
+    def run(self) -> Dict:
+        deadline = time.monotonic() + self.duration
+        started = time.perf_counter()
+        threads = [threading.Thread(target=self._worker, args=(i, deadline), daemon=True)
+                   for i in range(self.concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return self.report(time.perf_counter() - started)
+
+    def report(self, wall: float) -> Dict:
+        endpoints = {}
+        everything = []
+        for name, samples in self.samples.items():
+            # Requests shed by admission control (429/503) are reported apart from errors,
+            # and their (fast) rejections are left out of the latency percentiles
+            shed = sum(1 for s in samples if s[1] in SHED_STATUSES)
+            ordered = sorted(s[0] for s in samples if s[1] not in SHED_STATUSES)
+            everything.extend(ordered)
+            errors = sum(1 for s in samples if not s[2]) - shed
+            statuses: Dict[str, int] = {}
+            for _, status, _ in samples:
+                statuses[str(status)] = statuses.get(str(status), 0) + 1
+            endpoints[name] = {
+                "requests": len(samples),
+                "errors": errors,
+                "error_rate": round(errors / len(samples), 4) if samples else 0.0,
+                "shed": shed,
+                "throughput_rps": round(len(samples) / wall, 2),
+                "p50_ms": round(percentile(ordered, 0.50) * 1000, 1),
+                "p95_ms": round(percentile(ordered, 0.95) * 1000, 1),
+                "p99_ms": round(percentile(ordered, 0.99) * 1000, 1),
+                "max_ms": round(ordered[-1] * 1000, 1) if ordered else 0.0,
+                "status_codes": statuses,
+            }
+        everything.sort()
+        return {
+            "duration_s": round(wall, 2),
+            "concurrency": self.concurrency,
+            "mix": self.mix,
+            "total": {
+                "requests": len(everything),
+                "throughput_rps": round(len(everything) / wall, 2),
+                "p50_ms": round(percentile(everything, 0.50) * 1000, 1),
+                "p95_ms": round(percentile(everything, 0.95) * 1000, 1),
+                "p99_ms": round(percentile(everything, 0.99) * 1000, 1),
+            },
+            "endpoints": endpoints,
+        }
+
+
+def print_report(report: Dict) -> None:
+    print(f"\nLoad test: {report['duration_s']}s, concurrency {report['concurrency']}")
+    print(f"  {'endpoint':<14}{'reqs':>7}{'err%':>7}{'shed':>6}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, row in report["endpoints"].items():
+        print(f"  {name:<14}{row['requests']:>7}{row['error_rate'] * 100:>6.1f}%{row['shed']:>6}{row['throughput_rps']:>9.2f}"
+              f"{row['p50_ms']:>10.1f}{row['p95_ms']:>10.1f}{row['p99_ms']:>10.1f}")
+    total = report["total"]
+    print(f"  {'total':<14}{total['requests']:>7}{'':>13}{total['throughput_rps']:>9.2f}"
+          f"{total['p50_ms']:>10.1f}{total['p95_ms']:>10.1f}{total['p99_ms']:>10.1f}")
+    if report.get("node"):
+        print(f"  node: {report['node']}")
+
+
+def synthetic_ocr(latency: float, cpu: bool = False):
+    """
+    Stand-in for extract_document_details that returns a fresh synthetic
+    label per call after `latency` seconds, so the chain and registry
+    paths can be loaded without OCR models. With cpu, the latency is spent
+    computing (like real OCR) instead of sleeping.
+    """
+    from benchmarks.synthetic import synthetic_details
+    rng = random.Random(99)
+    counter = [10 ** 6]
+    lock = threading.Lock()
+
+    def extract(image_path, tiered=False, accept=None, profile="default"):
+        if latency and cpu:
+            end = time.thread_time() + latency
+            while time.thread_time() < end:
+                pass
+        elif latency:
+            time.sleep(latency)
+        with lock:
+            counter[0] += 1
+            details = synthetic_details(counter[0], rng)
+        return {
+            "document_title": details["product_name"],
+            "document_content": details["document_content"],
+            "metadata": json.dumps({"ocr_engine": "synthetic"}),
+            **details["product_details"],
+        }
+    return extract
+
+
+@contextmanager
+def serve_werkzeug(args, workdir: str):
+    """The app in this process, one thread per request"""
+    from werkzeug.serving import make_server
+    import app as verichain
+    if args.ocr == "synthetic":
+        verichain.extract_document_details = synthetic_ocr(args.ocr_ms / 1000.0, cpu=args.ocr_cpu)
+    http = make_server("127.0.0.1", 0, verichain.app, threaded=True)
+    threading.Thread(target=http.serve_forever, daemon=True).start()
+    try:
+        yield f"http://127.0.0.1:{http.server_port}"
+    finally:
+        http.shutdown()
+
+
+def gunicorn_app():
+    """
+    WSGI app for --server gunicorn (benchmarks.loadtest:gunicorn_app()):
+    wsgi:app, with the synthetic OCR when LOADTEST_OCR=synthetic
+    """
+    import wsgi
+    if os.getenv("LOADTEST_OCR") == "synthetic":
+        wsgi.verichain.extract_document_details = synthetic_ocr(float(os.getenv("LOADTEST_OCR_MS", 0)) / 1000.0,
+                                                                cpu=os.getenv("LOADTEST_OCR_CPU") == "1")
+    return wsgi.app
+
+
+@contextmanager
+def serve_gunicorn(args, workdir: str):
+    """The app under gunicorn.conf.py in a child process (the environment is already set)"""
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    env = dict(os.environ, BIND=f"127.0.0.1:{port}", LOADTEST_OCR=args.ocr, LOADTEST_OCR_MS=str(args.ocr_ms),
+               LOADTEST_OCR_CPU="1" if args.ocr_cpu else "0")
+    log = open(os.path.join(workdir, "gunicorn.log"), "w")
+    server = subprocess.Popen([sys.executable, "-m", "gunicorn", "-c", os.path.join(ROOT, "gunicorn.conf.py"),
+                               "benchmarks.loadtest:gunicorn_app()"], cwd=ROOT, env=env, stdout=log,
+                              stderr=subprocess.STDOUT)
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + 180
+        while True:
+            if server.poll() is not None:
+                raise SystemExit(f"⚠ gunicorn exited ({server.returncode}), see {log.name}")
+            try:
+                requests.get(f"{base_url}/api/admission", timeout=2)
+                break
+            except requests.RequestException:
+                if time.monotonic() > deadline:
+                    raise SystemExit("⚠ gunicorn did not start within 180 s")
+                time.sleep(0.5)
+        yield base_url
+    finally:
+        server.terminate()
+        server.wait(timeout=60)
+        log.close()
+
+
+def run_in_process(args, mix: Dict[str, float]) -> Dict:
+    """Seed a registry, start the simulated node and the app, then run the traffic"""
+    from benchmarks.sim_node import SimulatedNode
+    from benchmarks.fake_node import FakeNodeServer
+    from benchmarks.synthetic import generate_registry
+    from benchmarks.suite import BenchContext
+
+    workdir = tempfile.mkdtemp(prefix="verichain-load-")
+    try:
+        db_path = os.path.join(workdir, "registry.db")
+        fingerprints = generate_registry(db_path, args.seed_rows, seed=args.seed, contract_address=CONTRACT_ADDRESS)
+
+        chain_id = int(os.getenv("CHAIN_ID", 80002))
+        node = SimulatedNode(CONTRACT_ADDRESS, chain_id=chain_id, seed=args.seed,
+                             latency=args.latency_ms / 1000.0, jitter=args.jitter_ms / 1000.0,
+                             error_rate=args.error_rate, block_interval=args.block_time)
+        minted = fingerprints[:args.minted]
+        for i, fingerprint in enumerate(minted):
+            node.add_mint(int(fingerprint, 16), node.random_address(), transfers=i % 3)
+            node.fingerprints.add(fingerprint[2:])
+
+        with FakeNodeServer(node) as node_server:
+            # The app reads its configuration at import time
+            os.environ.update({
+                "DB_PATH": db_path,
+                "UPLOAD_FOLDER": os.path.join(workdir, "uploads"),
+                "WEB3_PROVIDER": node_server.url,
+                "NFT_CONTRACT_ADDRESS": CONTRACT_ADDRESS,
+                "CHAIN_ID": str(chain_id),
+            })
+            workload = Workload(fingerprints, [int(f, 16) for f in minted],
+                                BenchContext(workdir).corpus(), args.seed)
+            serve = serve_gunicorn if args.server == "gunicorn" else serve_werkzeug
+            with serve(args, workdir) as base_url:
+                print(f"✓ App on {base_url} ({args.server}), node on {node_server.url}, "
+                      f"{args.seed_rows} registry rows ({len(minted)} minted)")
+                report = TrafficGenerator(base_url, workload, mix, args.concurrency, args.duration, args.seed).run()
+                admission_stats = requests.get(f"{base_url}/api/admission", timeout=10).json()
+            with node.lock:
+                report["node"] = dict(node.stats, blocks=node.latest)
+            report["admission"] = admission_stats
+            report["config"] = {
+                "server": args.server, "seed_rows": args.seed_rows, "minted": len(minted), "ocr": args.ocr,
+                "ocr_ms": args.ocr_ms, "ocr_cpu": args.ocr_cpu, "admission": admission_stats.get("enabled"),
+                "latency_ms": args.latency_ms, "jitter_ms": args.jitter_ms,
+                "error_rate": args.error_rate, "block_time_s": args.block_time,
+            }
+            return report
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def run_against_target(args, mix: Dict[str, float]) -> Dict:
+    """Generate traffic against an app that is already running"""
+    from benchmarks.suite import BenchContext
+    hashes = requests.get(f"{args.target}/api/all_hashes", timeout=60).json().get("hashes", [])
+    fingerprints = [h["document_hash"] for h in hashes if h.get("document_hash")]
+    if not fingerprints:
+        raise SystemExit("⚠ Target registry is empty; register some products first")
+    workload = Workload(fingerprints, [int(f, 16) for f in fingerprints],
+                        BenchContext(tempfile.gettempdir()).corpus(), args.seed)
+    report = TrafficGenerator(args.target, workload, mix, args.concurrency, args.duration, args.seed).run()
+    report["config"] = {"target": args.target}
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="VeriChain end-to-end load test")
+    parser.add_argument("--target", help="Base URL of a running app (default: start one in-process)")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds of traffic")
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent clients")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Operation weights (default {DEFAULT_MIX})")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--seed-rows", type=int, default=2000, help="Registry rows seeded before the run")
+    parser.add_argument("--minted", type=int, default=500, help="Seeded rows that also exist on the node")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="Mean node latency per request")
+    parser.add_argument("--jitter-ms", type=float, default=15.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of node requests that fail")
+    parser.add_argument("--block-time", type=float, default=2.0, help="Seconds between blocks")
+    parser.add_argument("--ocr", choices=("real", "synthetic"), default="real",
+                        help="synthetic replaces OCR with a fixed-latency stand-in to load the chain/registry paths")
+    parser.add_argument("--ocr-ms", type=float, default=0.0, help="Latency of the synthetic OCR")
+    parser.add_argument("--ocr-cpu", action="store_true", help="The synthetic OCR burns CPU instead of sleeping")
+    parser.add_argument("--server", choices=("werkzeug", "gunicorn"), default="werkzeug",
+                        help="gunicorn serves the app under gunicorn.conf.py (fixed threads per worker)")
+    parser.add_argument("--output", help="Write the report JSON here")
+    args = parser.parse_args(argv)
+
+    mix = parse_mix(args.mix)
+    report = run_against_target(args, mix) if args.target else run_in_process(args, mix)
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"✓ Report written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
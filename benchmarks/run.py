@@ -0,0 +1,132 @@
+"""
+Benchmark Runner
+Runs the suite, writes JSON results and compares them against a baseline.
+
+Usage:
+    python -m benchmarks.run                                   # run everything
+    python -m benchmarks.run --only registry,provenance --rows 100000
+    python -m benchmarks.run --baseline benchmarks/baseline.json --threshold 0.25 \\
+        --threshold registry.search_by_name=0.5
+    python -m benchmarks.run --baseline benchmarks/baseline.json --update-baseline
+
+Exit status is 1 when any metric regressed past its threshold.
+"""
+
+import os
+import sys
+import json
+import shutil
+import argparse
+import platform
+import tempfile
+from datetime import datetime, timezone
+from typing import Dict, List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.suite import BENCHMARKS, BenchContext, run_suite
+
+
+def compare(results: Dict, baseline: Dict, default_threshold: float,
+            thresholds: Dict[str, float]) -> List[Tuple[str, float, float, float, bool]]:
+    """
+    Compare median_ms per metric against the baseline
+
+    Returns:
+        (metric, baseline_ms, current_ms, relative_change, regressed) for
+        every metric present in both runs
+    """
+    rows = []
+    base_results = baseline.get("results", {})
+    for metric, current in results.items():
+        base = base_results.get(metric)
+        if not base or not base.get("median_ms"):
+            continue
+        change = current["median_ms"] / base["median_ms"] - 1.0
+        limit = thresholds.get(metric, default_threshold)
+        rows.append((metric, base["median_ms"], current["median_ms"], change, change > limit))
+    return rows
+
+
+def parse_thresholds(values: List[str]) -> Tuple[float, Dict[str, float]]:
+    default, per_metric = 0.25, {}
+    for value in values or []:
+        if "=" in value:
+            metric, limit = value.split("=", 1)
+            per_metric[metric.strip()] = float(limit)
+        else:
+            default = float(value)
+    return default, per_metric
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="VeriChain benchmark suite")
+    parser.add_argument("--only", help=f"Comma-separated benchmarks ({', '.join(BENCHMARKS)})")
+    parser.add_argument("--rows", type=int, default=50000, help="Synthetic registry size")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--quick", action="store_true", help="Fewer iterations (smoke run)")
+    parser.add_argument("--output", help="Write results JSON here")
+    parser.add_argument("--baseline", help="Baseline JSON to compare against")
+    parser.add_argument("--threshold", action="append",
+                        help="Allowed slowdown as a fraction (0.25 = 25%%); NAME=VALUE overrides one metric")
+    parser.add_argument("--update-baseline", action="store_true", help="Write the results to --baseline")
+    args = parser.parse_args(argv)
+
+    only = [name.strip() for name in args.only.split(",")] if args.only else None
+    unknown = [name for name in only or [] if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"Unknown benchmark(s): {', '.join(unknown)}")
+
+    workdir = tempfile.mkdtemp(prefix="verichain-bench-")
+    try:
+        ctx = BenchContext(workdir, rows=args.rows, seed=args.seed, quick=args.quick)
+        run = run_suite(ctx, only)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "rows": args.rows,
+            "seed": args.seed,
+            "quick": args.quick,
+        },
+        **run,
+    }
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"✓ Results written to {args.output}")
+
+    if args.baseline and args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"✓ Baseline updated: {args.baseline}")
+        return 0
+
+    if args.baseline:
+        if not os.path.exists(args.baseline):
+            print(f"⚠ Baseline not found: {args.baseline}")
+            return 0
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        default, per_metric = parse_thresholds(args.threshold)
+        rows = compare(report["results"], baseline, default, per_metric)
+        print(f"\nComparison with {args.baseline} (default threshold {default:.0%})")
+        for metric, base_ms, cur_ms, change, regressed in rows:
+            mark = "⚠ REGRESSION" if regressed else "✓"
+            print(f"  {metric:<40} {base_ms:>10.3f} → {cur_ms:>10.3f} ms  {change:+7.1%}  {mark}")
+        regressions = [row for row in rows if row[4]]
+        if regressions:
+            print(f"\n⚠ {len(regressions)} metric(s) regressed")
+            return 1
+        print("\n✓ No regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
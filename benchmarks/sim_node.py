@@ -0,0 +1,242 @@
+"""
+Simulated Neo X Node
+A FakeNode that behaves like a live chain under load: it accepts signed
+transactions, mines them on a wall-clock block interval, enforces
+per-account nonces and adds configurable latency and error rate.
+
+Run standalone (point the app's WEB3_PROVIDER at it):
+    python -m benchmarks.sim_node --port 8545 --latency-ms 80 --error-rate 0.01 --block-time 2
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+from typing import Dict, List, NamedTuple, Optional
+
+import rlp
+from eth_account import Account
+from eth_hash.auto import keccak
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_node import (
+    FakeNode, FakeNodeServer, RPCError, MINT_SELECTOR, PRODUCT_MINTED_TOPIC, TRANSFER_TOPIC, ZERO_ADDRESS,
+    _address_topic, _hex, _word,
+)
+
+HAS_ROLE_SELECTOR = "0x" + keccak(b"hasRole(bytes32,address)")[:4].hex()
+
+
+class RawTransaction(NamedTuple):
+    """The fields of a signed transaction the node acts on"""
+    hash: str
+    sender: str
+    nonce: int
+    to: Optional[str]
+    data: str
+    gas: int
+    gas_price: int
+
+
+def _int(field: bytes) -> int:
+    return int.from_bytes(field, "big")
+
+
+def decode_raw_transaction(raw: str) -> RawTransaction:
+    """Decode a legacy, EIP-2930 or EIP-1559 signed transaction"""
+    payload = bytes.fromhex(raw[2:] if raw.startswith("0x") else raw)
+    if payload[0] >= 0xc0:
+        nonce, gas_price, gas, to, _value, data = rlp.decode(payload)[:6]
+    elif payload[0] == 1:
+        _chain, nonce, gas_price, gas, to, _value, data = rlp.decode(payload[1:])[:7]
+    elif payload[0] == 2:
+        _chain, nonce, _tip, gas_price, gas, to, _value, data = rlp.decode(payload[1:])[:8]
+    else:
+        raise RPCError(-32000, f"transaction type not supported: {payload[0]}")
+    return RawTransaction(
+        hash="0x" + keccak(payload).hex(),
+        sender=Account.recover_transaction(payload).lower(),
+        nonce=_int(nonce),
+        to=("0x" + to.hex()) if to else None,
+        data="0x" + data.hex(),
+        gas=_int(gas),
+        gas_price=_int(gas_price),
+    )
+
+
+class SimulatedNode(FakeNode):
+    """
+    Live-chain behaviour on top of FakeNode.
+
+    Args:
+        latency: mean added delay per HTTP request, in seconds
+        jitter: standard deviation of that delay, in seconds
+        error_rate: fraction of HTTP requests answered with a JSON-RPC error
+        block_interval: seconds between blocks; pending transactions are
+            mined (in nonce order per sender) when their block is due
+        block_capacity: maximum transactions per block
+        brand_role: addresses holding BRAND_ROLE; when set, mints from any
+            other sender revert (None: anyone may mint)
+    """
+
+    def __init__(self, contract_address: str, latency: float = 0.0, jitter: float = 0.0,
+                 error_rate: float = 0.0, block_interval: float = 2.0, block_capacity: int = 500,
+                 brand_role: Optional[List[str]] = None, **kwargs):
+        super().__init__(contract_address, **kwargs)
+        self.brand_role = {a.lower() for a in brand_role} if brand_role is not None else None
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.block_interval = block_interval
+        self.block_capacity = block_capacity
+        self.fault_rng = random.Random(kwargs.get("seed", 1) + 1)
+        self.mined_nonces: Dict[str, int] = {}
+        self.mempool: Dict[str, Dict[int, RawTransaction]] = {}
+        self.fingerprints = set()
+        self.stats = {"sent": 0, "mined": 0, "reverted": 0, "rejected": 0, "injected_errors": 0}
+        # The block clock starts with the first request, after any seeding
+        self._clock_start: Optional[float] = None
+        self._clock_block = self.latest
+
+    # --- Transport ---
+
+    def handle_payload(self, body):
+        """Add latency, then fail the whole request with probability error_rate"""
+        delay = self.fault_rng.gauss(self.latency, self.jitter) if self.jitter else self.latency
+        if delay > 0:
+            time.sleep(delay)
+        if self.error_rate and self.fault_rng.random() < self.error_rate:
+            with self.lock:
+                self.stats["injected_errors"] += 1
+            items = body if isinstance(body, list) else [body]
+            errors = [{"jsonrpc": "2.0", "id": item.get("id"),
+                       "error": {"code": -32603, "message": "simulated node error"}} for item in items]
+            return errors if isinstance(body, list) else errors[0]
+        with self.lock:
+            self._advance()
+        return super().handle_payload(body)
+
+    # --- Mining ---
+
+    def _advance(self) -> None:
+        """Mine every block that is due on the wall clock"""
+        if self._clock_start is None:
+            self._clock_start, self._clock_block = time.monotonic(), self.latest
+        if self.block_interval <= 0:
+            due = self.latest + (1 if any(self.mempool.values()) else 0)
+        else:
+            due = self._clock_block + int((time.monotonic() - self._clock_start) / self.block_interval)
+        while self.latest < due:
+            self._mine_block(self.latest + 1)
+
+    def _mine_block(self, number: int) -> None:
+        self.latest = number
+        included = 0
+        for sender in list(self.mempool):
+            queue = self.mempool[sender]
+            nonce = self.mined_nonces.get(sender, 0)
+            while nonce in queue and included < self.block_capacity:
+                self._execute(queue.pop(nonce), number)
+                nonce += 1
+                included += 1
+            self.mined_nonces[sender] = nonce
+            if not queue:
+                del self.mempool[sender]
+
+    def _execute(self, tx: RawTransaction, block: int) -> None:
+        status = 1
+        data = tx.data.lower()
+        if tx.to and tx.to.lower() == self.contract_address.lower() and data.startswith(MINT_SELECTOR):
+            fingerprint = data[10:74]
+            owner = "0x" + data[98:138]
+            token_id = int(fingerprint, 16)
+            if self.brand_role is not None and tx.sender not in self.brand_role:
+                status = 0  # AccessControlUnauthorizedAccount
+            elif fingerprint in self.fingerprints:
+                status = 0  # "Fingerprint already minted"
+            else:
+                self.fingerprints.add(fingerprint)
+                self._add_log(block, tx.hash, [TRANSFER_TOPIC, _address_topic(ZERO_ADDRESS), _address_topic(owner), _word(token_id)])
+                self._add_log(block, tx.hash, [PRODUCT_MINTED_TOPIC, _word(token_id), _word(token_id), _address_topic(owner)])
+                self.owners[token_id] = owner
+        self._add_receipt(tx.hash, block, tx.sender, tx.to, tx.data, status=status,
+                          nonce=tx.nonce, gas=tx.gas, gas_price=tx.gas_price)
+        self.stats["mined"] += 1
+        if not status:
+            self.stats["reverted"] += 1
+
+    # --- JSON-RPC methods ---
+
+    def rpc_eth_getTransactionCount(self, address, tag="latest"):
+        sender = address.lower()
+        nonce = self.mined_nonces.get(sender, 0)
+        if tag == "pending":
+            queue = self.mempool.get(sender, {})
+            while nonce in queue:
+                nonce += 1
+        return _hex(nonce)
+
+    def rpc_eth_sendRawTransaction(self, raw):
+        tx = decode_raw_transaction(raw)
+        self.stats["sent"] += 1
+        queue = self.mempool.setdefault(tx.sender, {})
+        if tx.nonce < self.mined_nonces.get(tx.sender, 0):
+            self.stats["rejected"] += 1
+            raise RPCError(-32000, "nonce too low")
+        pending = queue.get(tx.nonce)
+        if pending is not None and pending.hash != tx.hash:
+            # Same rule as geth: a replacement must bump the gas price by 10%
+            if tx.gas_price * 10 < pending.gas_price * 11:
+                self.stats["rejected"] += 1
+                raise RPCError(-32000, "replacement transaction underpriced")
+        queue[tx.nonce] = tx
+        return tx.hash
+
+    def rpc_eth_estimateGas(self, call, tag="latest"):
+        return _hex(150000)
+
+    def rpc_eth_call(self, call, tag="latest"):
+        data = (call.get("data") or call.get("input") or "0x").lower()
+        if call.get("to", "").lower() == self.contract_address.lower() and data.startswith(HAS_ROLE_SELECTOR):
+            account = "0x" + data[98:138]
+            return _word(1 if self.brand_role is None or account in self.brand_role else 0)
+        return super().rpc_eth_call(call, tag)
+
+    def rpc_eth_getTransactionByHash(self, tx_hash):
+        tx_hash = tx_hash.lower()
+        for queue in self.mempool.values():
+            for tx in queue.values():
+                if tx.hash == tx_hash:
+                    return {"hash": tx.hash, "from": tx.sender, "to": tx.to, "input": tx.data,
+                            "nonce": _hex(tx.nonce), "gas": _hex(tx.gas), "gasPrice": _hex(tx.gas_price),
+                            "value": "0x0", "blockNumber": None, "blockHash": None, "transactionIndex": None}
+        return super().rpc_eth_getTransactionByHash(tx_hash)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Simulated Neo X JSON-RPC node")
+    parser.add_argument("--port", type=int, default=8545)
+    parser.add_argument("--contract", default=os.getenv("NFT_CONTRACT_ADDRESS", "0xaC8eCD06c9FB699E5C39f2b8EA316BA817f1fD09"))
+    parser.add_argument("--chain-id", type=int, default=int(os.getenv("CHAIN_ID", 80002)))
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--jitter-ms", type=float, default=15.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--block-time", type=float, default=2.0, help="Seconds between blocks")
+    args = parser.parse_args(argv)
+
+    node = SimulatedNode(args.contract, chain_id=args.chain_id, latency=args.latency_ms / 1000.0,
+                         jitter=args.jitter_ms / 1000.0, error_rate=args.error_rate,
+                         block_interval=args.block_time)
+    server = FakeNodeServer(node, port=args.port).start()
+    print(f"✓ Simulated node on {server.url} (chain {args.chain_id}, contract {args.contract})")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
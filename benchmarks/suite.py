@@ -0,0 +1,263 @@
+"""
+Benchmark Suite
+Each benchmark is a function registered with @benchmark(name). It receives a
+BenchContext and returns {metric_name: timings}, where timings is the list
+of per-operation durations in seconds.
+"""
+
+import os
+import time
+import random
+import statistics
+from typing import Callable, Dict, List, Optional
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+BENCHMARKS: Dict[str, Callable] = {}
+
+
+class SkipBenchmark(Exception):
+    """Raised when a benchmark cannot run here (e.g. missing OCR models)"""
+
+
+def benchmark(name: str):
+    def register(fn):
+        BENCHMARKS[name] = fn
+        return fn
+    return register
+
+
+class BenchContext:
+    """Shared settings and scratch space for one suite run"""
+
+    def __init__(self, workdir: str, rows: int = 50000, seed: int = 7, quick: bool = False):
+        self.workdir = workdir
+        self.rows = rows
+        self.seed = seed
+        self.quick = quick
+        self._registry = None
+
+    def registry(self):
+        """Synthetic registry shared by the DB benchmarks: (db_path, fingerprints)"""
+        if self._registry is None:
+            from benchmarks.synthetic import generate_registry
+            db_path = os.path.join(self.workdir, "registry.db")
+            self._registry = (db_path, generate_registry(db_path, self.rows, seed=self.seed))
+        return self._registry
+
+    def corpus(self) -> List[str]:
+        """Fixed image corpus: distinct sample images under uploads/"""
+        import hashlib
+        uploads = os.path.join(BASE_DIR, "uploads")
+        seen, paths = set(), []
+        for name in sorted(os.listdir(uploads)):
+            path = os.path.join(uploads, name)
+            with open(path, "rb") as f:
+                digest = hashlib.md5(f.read()).hexdigest()
+            if digest not in seen:
+                seen.add(digest)
+                paths.append(path)
+        return paths
+
+
+def measure(fn: Callable, iterations: int, warmup: int = 3) -> List[float]:
+    """Per-call wall-clock durations of fn() after warmup calls"""
+    for _ in range(warmup):
+        fn()
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def summarize(timings: List[float], ops_per_call: int = 1) -> Dict:
+    ordered = sorted(timings)
+    p95 = ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))]
+    median = statistics.median(ordered)
+    return {
+        "median_ms": round(median * 1000, 4),
+        "p95_ms": round(p95 * 1000, 4),
+        "iterations": len(ordered),
+        "ops_per_sec": round(ops_per_call / median, 1) if median else None,
+    }
+
+
+# --- Fingerprinting and text ---
+
+@benchmark("fingerprint")
+def bench_fingerprint(ctx: BenchContext) -> Dict:
+    from fingerprint import calculate_keccak_fingerprint, calculate_legacy_hash
+    from benchmarks.synthetic import synthetic_details
+    rng = random.Random(ctx.seed)
+    details = [synthetic_details(i, rng) for i in range(1000)]
+    manual = [{k: v for k, v in d.items() if k != "document_content"} for d in details]
+    n = 5 if ctx.quick else 20
+    return {
+        "fingerprint.keccak_content_x1000": (measure(lambda: [calculate_keccak_fingerprint(d) for d in details], n), 1000),
+        "fingerprint.keccak_fields_x1000": (measure(lambda: [calculate_keccak_fingerprint(d) for d in manual], n), 1000),
+        "fingerprint.legacy_sha256_x1000": (measure(lambda: [calculate_legacy_hash(d["product_details"]) for d in details], n), 1000),
+    }
+
+
+@benchmark("text")
+def bench_text(ctx: BenchContext) -> Dict:
+    from field_extraction import get_extractor, normalize_text
+    from benchmarks.synthetic import BRANDS
+    rng = random.Random(ctx.seed)
+    filler = ["NET WT 500g", "Store in a cool place", "Made in India", "Warranty void if removed"]
+    lines = [rng.choice(filler) for _ in range(5000)]
+    lines[1500:1500] = ["Brand: ACME"]
+    lines[2500:2500] = ["S/N: AX-44-91827"]
+    lines[4900:4900] = ["MFG: 12/03/2024"]
+    text = "\n".join(lines)
+    names = [f"Product {rng.choice(BRANDS)}-{i} Watch" for i in range(10000)]
+    extractor = get_extractor()
+    n = 10 if ctx.quick else 30
+    return {
+        "text.extract_fields_100k_chars": (measure(lambda: extractor.extract(text), n), 1),
+        "text.normalize_x10000": (measure(lambda: [normalize_text(x) for x in names], n), 10000),
+    }
+
+
+# --- Registry ---
+
+@benchmark("registry")
+def bench_registry(ctx: BenchContext) -> Dict:
+    from hash_validator import HashValidator
+    db_path, fingerprints = ctx.registry()
+    validator = HashValidator(db_path)
+    rng = random.Random(ctx.seed)
+    hits = [rng.choice(fingerprints) for _ in range(200)]
+    misses = ["0x" + format(rng.getrandbits(256), "064x") for _ in range(200)]
+    bulk = [rng.choice(fingerprints) if i % 2 else "0x" + format(rng.getrandbits(256), "064x") for i in range(10000)]
+    hit_iter, miss_iter = iter(hits * 10), iter(misses * 10)
+    n = 50 if ctx.quick else 200
+    return {
+        "registry.validate_hash_hit": (measure(lambda: validator.validate_hash(next(hit_iter)), n), 1),
+        "registry.validate_hash_miss": (measure(lambda: validator.validate_hash(next(miss_iter)), n), 1),
+        "registry.validate_many_10k": (measure(lambda: validator.validate_many(bulk), 3 if ctx.quick else 10), 10000),
+        "registry.search_by_name": (measure(lambda: validator.search_by_name("AX-5"), 3 if ctx.quick else 10), 1),
+        "registry.statistics": (measure(validator.get_statistics, 3 if ctx.quick else 10), 1),
+        "registry.all_hashes": (measure(validator.get_all_hashes, 3 if ctx.quick else 5), 1),
+    }
+
+
+# --- Perceptual hashing ---
+
+@benchmark("perceptual")
+def bench_perceptual(ctx: BenchContext) -> Dict:
+    import cv2
+    from perceptual_hash import PerceptualIndex, compute_hashes
+    images = [cv2.imread(path) for path in ctx.corpus()]
+    images = [img for img in images if img is not None]
+    index = PerceptualIndex()
+    rng = random.Random(ctx.seed)
+    for i in range(ctx.rows):
+        index.add(rng.getrandbits(64), rng.getrandbits(64), i)
+    probe = compute_hashes(images[0])
+    n = 20 if ctx.quick else 100
+    return {
+        "perceptual.compute_hashes": (measure(lambda: [compute_hashes(img) for img in images], 5 if ctx.quick else 20), len(images)),
+        "perceptual.query_radius6": (measure(lambda: index.query(*probe, radius=6), n), 1),
+        "perceptual.query_radius14": (measure(lambda: index.query(*probe, radius=14), n // 2), 1),
+    }
+
+
+# --- Merkle anchoring ---
+
+@benchmark("merkle")
+def bench_merkle(ctx: BenchContext) -> Dict:
+    from merkle_anchor import build_levels, leaf_hash, proof_for, verify_proof
+    rng = random.Random(ctx.seed)
+    fingerprints = ["0x" + format(rng.getrandbits(256), "064x") for _ in range(1024)]
+    levels = build_levels([leaf_hash(f) for f in fingerprints])
+    root = levels[-1][0]
+    proofs = [proof_for(levels, i) for i in range(len(fingerprints))]
+    n = 5 if ctx.quick else 20
+    return {
+        "merkle.build_1024": (measure(lambda: build_levels([leaf_hash(f) for f in fingerprints]), n), 1),
+        "merkle.verify_proof_x1024": (measure(lambda: [verify_proof(f, p, root) for f, p in zip(fingerprints, proofs)], n), 1024),
+    }
+
+
+# --- OCR ---
+
+@benchmark("ocr")
+def bench_ocr(ctx: BenchContext) -> Dict:
+    try:
+        import paddleocr  # noqa: F401
+    except ImportError:
+        raise SkipBenchmark("paddleocr is not installed")
+    from local_ocr import get_local_ocr
+    corpus = ctx.corpus()
+    full = get_local_ocr()
+    fast = get_local_ocr(fast=True)
+    n = 1 if ctx.quick else 3
+    return {
+        "ocr.full_pipeline": (measure(lambda: [full.extract_text(p) for p in corpus], n), len(corpus)),
+        "ocr.fast_tier": (measure(lambda: [fast.recognize(fast.load_fast_image(p)) for p in corpus], n), len(corpus)),
+    }
+
+
+# --- Provenance ---
+
+@benchmark("provenance")
+def bench_provenance(ctx: BenchContext) -> Dict:
+    from benchmarks.fake_node import FakeNode, FakeNodeServer
+    from provenance_agent import ProvenanceAgent
+    from registry_db import get_db_connection, init_db, insert_document
+
+    contract = "0xaC8eCD06c9FB699E5C39f2b8EA316BA817f1fD09"
+    db_path = os.path.join(ctx.workdir, "provenance.db")
+    init_db(db_path)
+    node = FakeNode(contract, seed=ctx.seed)
+    rng = random.Random(ctx.seed)
+
+    fingerprints = []
+    conn = get_db_connection(db_path)
+    for i in range(200):
+        token_id = rng.getrandbits(256)
+        fingerprint = "0x" + format(token_id, "064x")
+        owner = node.random_address()
+        tx_hash = node.add_mint(token_id, owner, block=1000 + i * 3, transfers=i % 4)
+        insert_document(conn, participant_name=f"Product {i}", hackathon_name="ACME", document_hash=fingerprint,
+                        txn_hash=tx_hash, contract_address=contract, issuer_address=owner)
+        fingerprints.append(fingerprint)
+    conn.commit()
+    conn.close()
+
+    with FakeNodeServer(node) as server:
+        agent = ProvenanceAgent(db_path=db_path, web3_provider=server.url)
+        report = agent.analyze_product(fingerprints[3])
+        if len(report["ownership_timeline"]) != 4:
+            raise RuntimeError(f"Unexpected provenance timeline: {report['ownership_timeline']}")
+        probes = iter(fingerprints * 10)
+        missing = "0x" + "ee" * 32
+        n = 20 if ctx.quick else 100
+        return {
+            "provenance.analyze_product": (measure(lambda: agent.analyze_product(next(probes)), n), 1),
+            # Repeat scan of one product: served from the report cache
+            "provenance.analyze_product_cached": (measure(lambda: agent.analyze_product(fingerprints[3]), n), 1),
+            "provenance.not_found": (measure(lambda: agent.analyze_product(missing), n), 1),
+        }
+
+
+def run_suite(ctx: BenchContext, only: Optional[List[str]] = None) -> Dict:
+    """Run the selected benchmarks; returns {"results": ..., "skipped": ...}"""
+    results, skipped = {}, {}
+    for name, fn in BENCHMARKS.items():
+        if only and name not in only:
+            continue
+        print(f"▶ {name}")
+        try:
+            metrics = fn(ctx)
+        except SkipBenchmark as e:
+            print(f"  skipped: {e}")
+            skipped[name] = str(e)
+            continue
+        for metric, (timings, ops) in metrics.items():
+            results[metric] = summarize(timings, ops)
+            print(f"  {metric:<40} median {results[metric]['median_ms']:>10.3f} ms   p95 {results[metric]['p95_ms']:>10.3f} ms")
+    return {"results": results, "skipped": skipped}
@@ -0,0 +1,85 @@
+"""
+Synthetic Registry Generator
+Builds a documents registry of N deterministic rows with the app's schema
+"""
+
+import random
+from typing import List, Optional
+
+from registry_db import get_db_connection, hash_to_blob, init_db
+from fingerprint import calculate_keccak_fingerprint
+
+BRANDS = ["ACME", "NOVA LABS", "ORION", "VERITAS", "HELIX", "ZENITH", "AURUM", "KESTREL"]
+PRODUCTS = ["Serum", "Watch", "Handbag", "Sneaker", "Headphones", "Perfume", "Charger", "Wallet"]
+
+
+def synthetic_details(i: int, rng: random.Random) -> dict:
+    """OCR-like details for one product label"""
+    brand = rng.choice(BRANDS)
+    serial = f"{brand[:2]}-{rng.randint(10 ** 5, 10 ** 6 - 1)}-{i}"
+    return {
+        "product_name": f"Product {serial}",
+        "product_details": {
+            "brand": brand,
+            "serial_no": serial,
+            "mfg_date": f"{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/20{rng.randint(20, 26)}",
+        },
+        "document_content": f"{brand} {rng.choice(PRODUCTS)} S/N: {serial} Batch Date: 2025",
+    }
+
+
+def generate_registry(db_path: str, rows: int, seed: int = 7, contract_address: Optional[str] = None,
+                      batch_size: int = 10000, legacy: bool = False) -> List[str]:
+    """
+    Create (or extend) a registry at db_path with `rows` synthetic products
+
+    Args:
+        legacy: store hashes and token ids as text, as registries written
+            before schema v2 do (left at user_version 0, i.e. unmigrated)
+
+    Returns:
+        The inserted fingerprints, in insertion order
+    """
+    rng = random.Random(seed)
+    contract_address = contract_address or "0x" + "ab" * 20
+    issuer = "0x8883bFFa42A7f5B509D0929c6fFa041e46E18e2f"
+
+    init_db(db_path)
+    conn = get_db_connection(db_path)
+    fingerprints = []
+    batch = []
+    for i in range(rows):
+        details = synthetic_details(i, rng)
+        fingerprint = calculate_keccak_fingerprint({
+            "product_name": details["product_name"],
+            "product_details": details["product_details"],
+        })
+        fingerprints.append(fingerprint)
+        txn_hash = "0x" + format(rng.getrandbits(256), "064x")
+        if legacy:
+            stored = (fingerprint, txn_hash, str(int(fingerprint, 16)))
+        else:
+            stored = (hash_to_blob(fingerprint), hash_to_blob(txn_hash), None)
+        batch.append((
+            details["product_name"], details["product_details"]["brand"], *stored,
+            contract_address, issuer, details["document_content"],
+            format(rng.getrandbits(64), "016x"), format(rng.getrandbits(64), "016x"),
+        ))
+        if len(batch) >= batch_size:
+            _insert(conn, batch)
+            batch = []
+    if batch:
+        _insert(conn, batch)
+    if legacy:
+        conn.execute('PRAGMA user_version = 0')
+    conn.close()
+    return fingerprints
+
+
+def _insert(conn, batch):
+    conn.executemany(
+        'INSERT INTO documents (participant_name, hackathon_name, document_hash, txn_hash, token_id, '
+        'contract_address, issuer_address, document_content, phash, dhash) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+        batch
+    )
+    conn.commit()
@@ -0,0 +1,302 @@
+"""
+Chain Reader Module
+Batched read-only access to the VeriChain contract over raw JSON-RPC
+
+Contract reads (ownerOf, fpToToken, tokenToFp, tokenMetaHash) are packed
+into Multicall3 aggregate3 calls when the chain has the contract: each
+eth_call carries up to MULTICALL_BATCH reads, and MULTICALL_PER_REQUEST of
+them share one HTTP request. Every read may revert on its own (ownerOf of
+a token that does not exist) without failing the rest. An aggregate the
+node rejects (gas cap, response size) is split in half and retried. With no
+Multicall3 deployed, each read is its own eth_call in a JSON-RPC batch.
+"""
+
+import os
+import weakref
+import requests
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from eth_hash.auto import keccak
+
+# ownerOf(uint256)
+OWNER_OF_SELECTOR = "0x6352211e"
+FP_TO_TOKEN_SELECTOR = "0x" + keccak(b"fpToToken(bytes32)")[:4].hex()
+TOKEN_TO_FP_SELECTOR = "0x" + keccak(b"tokenToFp(uint256)")[:4].hex()
+TOKEN_META_HASH_SELECTOR = "0x" + keccak(b"tokenMetaHash(uint256)")[:4].hex()
+
+# Multicall3 is deployed at this address on most EVM chains; "" disables it
+MULTICALL_ADDRESS = os.getenv("MULTICALL_ADDRESS", "0xcA11bde05977b3631167028862bE2a173976CA11")
+# Reads per aggregate3 call (a read costs ~5-8k gas, well under eth_call gas caps)
+# and aggregate3 calls per HTTP request (~220 KB of request body each)
+MULTICALL_BATCH = int(os.getenv("MULTICALL_BATCH", 1000))
+MULTICALL_PER_REQUEST = int(os.getenv("MULTICALL_PER_REQUEST", 4))
+# aggregate3((address target, bool allowFailure, bytes callData)[])
+AGGREGATE3_SELECTOR = "0x82ad56cb"
+
+# ProductMinted(uint256 indexed tokenId, bytes32 indexed fpHash, address indexed to)
+PRODUCT_MINTED_TOPIC = "0x" + keccak(b"ProductMinted(uint256,bytes32,address)").hex()
+
+ZERO_ADDRESS = "0x0000000000000000000000000000000000000000"
+
+def _word(value: int) -> str:
+    return format(value, "064x")
+
+
+def encode_aggregate3(target: str, calldata: List[str]) -> str:
+    """
+    aggregate3 call data for reads of one contract, every one allowed to fail
+
+    Args:
+        target: contract address
+        calldata: '0x' hex call data per read, each a selector plus one word
+    """
+    count = len(calldata)
+    head = [AGGREGATE3_SELECTOR, _word(0x20), _word(count)]
+    # Offsets of the (target, allowFailure, callData) tuples from the start of the offsets
+    tail = []
+    offset = 32 * count
+    target_word = target.lower()[2:].rjust(64, "0")
+    for data in calldata:
+        data = data[2:]
+        size = len(data) // 2
+        head.append(_word(offset))
+        padded = data.ljust((size + 31) // 32 * 64, "0")
+        tail.append(target_word + _word(1) + _word(0x60) + _word(size) + padded)
+        offset += 128 + len(padded) // 2
+    return "".join(head) + "".join(tail)
+
+
+def decode_aggregate3(result: str) -> List[Tuple[bool, bytes]]:
+    """(success, returnData) per call from an aggregate3 result"""
+    raw = bytes.fromhex(result[2:] if result.startswith("0x") else result)
+    array = int.from_bytes(raw[0:32], "big") + 32
+    count = int.from_bytes(raw[array - 32:array], "big")
+    decoded = []
+    for i in range(count):
+        start = array + int.from_bytes(raw[array + 32 * i:array + 32 * i + 32], "big")
+        success = raw[start + 31] == 1
+        data = start + int.from_bytes(raw[start + 32:start + 64], "big")
+        size = int.from_bytes(raw[data:data + 32], "big")
+        decoded.append((success, raw[data + 32:data + 32 + size]))
+    return decoded
+
+
+# Readers whose keep-alive connections must not be shared with a forked server worker
+_readers = weakref.WeakSet()
+
+
+def _after_fork() -> None:
+    for reader in list(_readers):
+        reader.session = requests.Session()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork)
+
+
+class ChainReader:
+    """
+    Packs many read calls into JSON-RPC batch requests so a bulk check costs
+    one HTTP round-trip per batch instead of one per id
+    """
+
+    def __init__(self, rpc_url: str, contract_address: str, batch_size: int = 200, timeout: int = 30,
+                 multicall_address: Optional[str] = MULTICALL_ADDRESS, multicall_batch: int = MULTICALL_BATCH):
+        self.rpc_url = rpc_url
+        self.contract_address = contract_address
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.multicall_address = multicall_address or None
+        self.multicall_batch = multicall_batch
+        self._multicall_checked = False
+        self.session = requests.Session()
+        _readers.add(self)
+
+    def rpc_batch(self, calls: List[Tuple[str, list]]) -> List[Tuple[Optional[object], Optional[str]]]:
+        """
+        Send a list of (method, params) as JSON-RPC batches
+
+        Returns:
+            List of (result, error_message) aligned with the input calls
+        """
+        results = []
+        for start in range(0, len(calls), self.batch_size):
+            chunk = calls[start:start + self.batch_size]
+            payload = [
+                {"jsonrpc": "2.0", "id": i, "method": method, "params": params}
+                for i, (method, params) in enumerate(chunk)
+            ]
+            response = self.session.post(self.rpc_url, json=payload, timeout=self.timeout)
+            response.raise_for_status()
+            body = response.json()
+            if isinstance(body, dict):
+                # Node rejected the whole batch
+                error = body.get("error", {}).get("message", "batch rejected")
+                results.extend((None, error) for _ in chunk)
+                continue
+
+            by_id = {item.get("id"): item for item in body}
+            for i in range(len(chunk)):
+                item = by_id.get(i, {})
+                if "error" in item:
+                    results.append((None, item["error"].get("message", "call failed")))
+                else:
+                    results.append((item.get("result"), None))
+        return results
+
+    def has_multicall(self) -> bool:
+        """Whether reads go through Multicall3 (checked against the chain once)"""
+        if self.multicall_address and not self._multicall_checked:
+            # Marked checked only once the node answered: a failed check raises and runs again next time
+            (code, error), = self.rpc_batch([("eth_getCode", [self.multicall_address, "latest"])])
+            self._multicall_checked = True
+            if error or not code or code == "0x":
+                print(f"⚠ No Multicall3 at {self.multicall_address}; contract reads use JSON-RPC batches")
+                self.multicall_address = None
+        return self.multicall_address is not None
+
+    def call_many(self, calldata: List[str]) -> List[Optional[bytes]]:
+        """
+        Run many read-only calls against the contract
+
+        Args:
+            calldata: '0x' hex call data per call
+
+        Returns:
+            Return data per call, or None when it reverted or the request failed
+        """
+        if not self.has_multicall():
+            results = self.rpc_batch([("eth_call", [{"to": self.contract_address, "data": data}, "latest"])
+                                      for data in calldata])
+            return [bytes.fromhex(result[2:]) if not error and isinstance(result, str) else None
+                    for result, error in results]
+
+        returned: List[Optional[bytes]] = [None] * len(calldata)
+        pending = [(start, min(start + self.multicall_batch, len(calldata)))
+                   for start in range(0, len(calldata), self.multicall_batch)]
+        while pending:
+            group, pending = pending[:MULTICALL_PER_REQUEST], pending[MULTICALL_PER_REQUEST:]
+            calls = [("eth_call", [{"to": self.multicall_address,
+                                    "data": encode_aggregate3(self.contract_address, calldata[start:end])}, "latest"])
+                     for start, end in group]
+            retry = []
+            for (start, end), (result, error) in zip(group, self.rpc_batch(calls)):
+                decoded = decode_aggregate3(result) if not error and isinstance(result, str) else None
+                if decoded is not None and len(decoded) == end - start:
+                    returned[start:end] = [data if success else None for success, data in decoded]
+                elif end - start > 1:
+                    # Over the node's gas cap or response limit: retry in halves
+                    middle = (start + end) // 2
+                    retry += [(start, middle), (middle, end)]
+            pending = retry + pending
+        return returned
+
+    def _read_words(self, selectors: Tuple[str, ...], args: List[int]) -> List[Optional[int]]:
+        """
+        One-word results of every selector(arg), per argument then per selector
+        (None: reverted or failed)
+        """
+        calldata = [selector + _word(arg) for arg in args for selector in selectors]
+        return [int.from_bytes(data[:32], "big") if data is not None and len(data) >= 32 else None
+                for data in self.call_many(calldata)]
+
+    def owners_of(self, token_ids: Iterable[int]) -> Dict[int, Optional[str]]:
+        """
+        Resolve ownerOf for many token ids
+
+        Returns:
+            Mapping token_id -> owner address, or None when the token does not
+            exist (ownerOf reverts) or the call failed
+        """
+        token_ids = list(dict.fromkeys(token_ids))
+        return {token_id: "0x" + format(owner, "040x") if owner else None
+                for token_id, owner in zip(token_ids, self._read_words((OWNER_OF_SELECTOR,), token_ids))}
+
+    def tokens_of(self, fingerprints: Iterable[str]) -> Dict[str, Optional[int]]:
+        """
+        Resolve fpToToken for many fingerprints (hex, with or without 0x)
+
+        Returns:
+            Mapping fingerprint -> token id, or None when it was never minted
+        """
+        fingerprints = list(dict.fromkeys(fingerprints))
+        words = [int(fp[2:] if fp[:2] in ("0x", "0X") else fp, 16) for fp in fingerprints]
+        return {fp: token or None for fp, token in zip(fingerprints, self._read_words((FP_TO_TOKEN_SELECTOR,), words))}
+
+    def products_of(self, token_ids: Iterable[int]) -> Dict[int, Optional[Dict]]:
+        """
+        Owner, fingerprint (tokenToFp) and metadata hash (tokenMetaHash) of many
+        tokens, all three reads packed into the same aggregate calls
+
+        Returns:
+            Mapping token_id -> {"owner", "fingerprint", "meta_hash"}, or None
+            when the token does not exist or the reads failed; meta_hash is
+            None until the owner sets it
+        """
+        token_ids = list(dict.fromkeys(token_ids))
+        words = self._read_words((OWNER_OF_SELECTOR, TOKEN_TO_FP_SELECTOR, TOKEN_META_HASH_SELECTOR), token_ids)
+        products = {}
+        for i, token_id in enumerate(token_ids):
+            owner, fingerprint, meta_hash = words[3 * i:3 * i + 3]
+            if not owner or fingerprint is None:
+                products[token_id] = None
+                continue
+            products[token_id] = {
+                "owner": "0x" + format(owner, "040x"),
+                "fingerprint": "0x" + _word(fingerprint),
+                "meta_hash": "0x" + _word(meta_hash) if meta_hash else None,
+            }
+        return products
+
+    def block_number(self) -> int:
+        (result, error), = self.rpc_batch([("eth_blockNumber", [])])
+        if error:
+            raise RuntimeError(f"eth_blockNumber failed: {error}")
+        return int(result, 16)
+
+    def iter_logs(self, topics: list, from_block: int, to_block: int, step: int = 5000,
+                  ranges_per_batch: int = 20) -> Iterator[Tuple[int, List[Dict]]]:
+        """
+        Fetch contract logs over [from_block, to_block] in block-range batches
+
+        Ranges of `step` blocks are sent `ranges_per_batch` at a time in one
+        JSON-RPC batch. A range the node rejects (e.g. too many results) is
+        split in half and retried.
+
+        Yields:
+            (last block covered, logs) in block order; every block up to the
+            yielded number has been fetched
+        """
+        pending = [(start, min(start + step - 1, to_block)) for start in range(from_block, to_block + 1, step)]
+        while pending:
+            group, pending = pending[:ranges_per_batch], pending[ranges_per_batch:]
+            calls = [
+                ("eth_getLogs", [{"address": self.contract_address, "topics": topics,
+                                  "fromBlock": hex(start), "toBlock": hex(end)}])
+                for start, end in group
+            ]
+            logs, covered = [], None
+            for i, ((start, end), (result, error)) in enumerate(zip(group, self.rpc_batch(calls))):
+                if error:
+                    if start == end:
+                        raise RuntimeError(f"eth_getLogs failed for block {start}: {error}")
+                    middle = (start + end) // 2
+                    # Retry the split range, then everything after it, in order
+                    pending = [(start, middle), (middle + 1, end)] + group[i + 1:] + pending
+                    break
+                logs.extend(result or [])
+                covered = end
+            if covered is not None:
+                yield covered, logs
+
+    def receipts(self, tx_hashes: Iterable[str]) -> Dict[str, Optional[Dict]]:
+        """
+        Fetch many transaction receipts in batched requests
+
+        Returns:
+            Mapping tx hash -> receipt dict, or None when the node has no
+            receipt (unknown or pending) or the call failed
+        """
+        tx_hashes = list(dict.fromkeys(tx_hashes))
+        results = self.rpc_batch([("eth_getTransactionReceipt", [h]) for h in tx_hashes])
+        return {h: (result if not error else None) for h, (result, error) in zip(tx_hashes, results)}
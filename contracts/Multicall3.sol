@@ -0,0 +1,29 @@
+// SPDX-License-Identifier: MIT
+pragma solidity ^0.8.20;
+
+// Multicall3's aggregate3 (github.com/mds1/multicall) for chains that do not have it at
+// 0xcA11bde05977b3631167028862bE2a173976CA11, e.g. `npx hardhat node`.
+// Point MULTICALL_ADDRESS at the deployed contract.
+contract Multicall3 {
+    struct Call3 {
+        address target;
+        bool allowFailure;
+        bytes callData;
+    }
+
+    struct Result {
+        bool success;
+        bytes returnData;
+    }
+
+    function aggregate3(Call3[] calldata calls) public payable returns (Result[] memory returnData) {
+        uint256 length = calls.length;
+        returnData = new Result[](length);
+        for (uint256 i = 0; i < length; i++) {
+            Call3 calldata calli = calls[i];
+            (bool success, bytes memory result) = calli.target.call(calli.callData);
+            require(success || calli.allowFailure, "Multicall3: call failed");
+            returnData[i] = Result(success, result);
+        }
+    }
+}
@@ -0,0 +1,213 @@
+"""
+Multi-page Document Ingestion
+Streams PDF and multi-page TIFF documents (invoices, shipment papers)
+through OCR one page at a time. Pages are rasterized lazily by a
+generator and written to a temporary image for the OCR engines, so only
+the pages currently being recognized are held in memory, however long
+the document is. Recognition stops once the combined text has every
+required field.
+
+PDF rendering uses pypdfium2 when it is installed; TIFF needs only Pillow.
+"""
+
+import os
+import json
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from local_ocr import FIELD_DEFAULTS, LocalOCR
+
+PDF_DPI = int(os.getenv("PDF_RENDER_DPI", 200))
+PAGE_WORKERS = int(os.getenv("OCR_PAGE_WORKERS", 1))
+MAX_PAGES = int(os.getenv("OCR_MAX_PAGES", 200))
+# Fields whose presence ends a document early (empty: always read every page)
+REQUIRED_FIELDS = [f.strip() for f in os.getenv("OCR_PAGE_REQUIRED_FIELDS", "brand,serial_no,mfg_date").split(",")
+                   if f.strip()]
+
+PDF_EXTENSIONS = (".pdf",)
+TIFF_EXTENSIONS = (".tif", ".tiff")
+
+
+def is_multipage(path: str) -> bool:
+    """True for documents that go through page streaming (PDF or TIFF)"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension in PDF_EXTENSIONS + TIFF_EXTENSIONS:
+        return True
+    try:
+        with open(path, "rb") as f:
+            magic = f.read(4)
+    except OSError:
+        return False
+    return magic == b"%PDF" or magic in (b"II*\x00", b"MM\x00*")
+
+
+def _is_pdf(path: str) -> bool:
+    with open(path, "rb") as f:
+        return f.read(4) == b"%PDF"
+
+
+def iter_pages(path: str, dpi: int = PDF_DPI, max_pages: int = MAX_PAGES) -> Iterator[Tuple[int, np.ndarray]]:
+    """
+    Yield (page_index, grayscale page) one page at a time
+
+    Args:
+        path: PDF or TIFF file
+        dpi: PDF render resolution
+        max_pages: pages after this are ignored
+    """
+    if _is_pdf(path):
+        try:
+            import pypdfium2 as pdfium
+        except ImportError:
+            raise RuntimeError("PDF ingestion needs pypdfium2 (pip install pypdfium2)")
+        pdf = pdfium.PdfDocument(path)
+        try:
+            for index in range(min(len(pdf), max_pages)):
+                page = pdf[index]
+                try:
+                    bitmap = page.render(scale=dpi / 72.0, grayscale=True)
+                    pixels = bitmap.to_numpy()
+                    # Copy out of the PDFium buffer so the bitmap can be freed now
+                    image = np.array(pixels[:, :, 0] if pixels.ndim == 3 else pixels)
+                    del pixels
+                    bitmap.close()
+                finally:
+                    page.close()
+                yield index, image
+        finally:
+            pdf.close()
+        return
+
+    with Image.open(path) as tiff:
+        # Pillow decodes a frame only when it is selected
+        for index in range(min(getattr(tiff, "n_frames", 1), max_pages)):
+            tiff.seek(index)
+            yield index, np.asarray(tiff.convert("L"))
+
+
+def page_count(path: str) -> Optional[int]:
+    """Number of pages, without rasterizing any (None if unreadable)"""
+    try:
+        if _is_pdf(path):
+            import pypdfium2 as pdfium
+            pdf = pdfium.PdfDocument(path)
+            try:
+                return len(pdf)
+            finally:
+                pdf.close()
+        with Image.open(path) as tiff:
+            return getattr(tiff, "n_frames", 1)
+    except Exception:
+        return None
+
+
+def has_required_fields(details: Dict, required: List[str]) -> bool:
+    """True once parse_details found every required field"""
+    return all(details.get(name) not in (None, "", FIELD_DEFAULTS.get(name)) for name in required)
+
+
+def _recognize_page(ensemble, index: int, page_path: str) -> Tuple[int, str, Dict]:
+    try:
+        result, trace = ensemble.run(page_path)
+    finally:
+        os.remove(page_path)
+    return index, result.text, {"page": index + 1, "engine": result.engine,
+                                "confidence": round(result.confidence, 4), "chars": len(result.text)}
+
+
+class PageStreamer:
+    """
+    OCR for multi-page documents, page by page.
+
+    Args:
+        ensemble: OCR engine ensemble (the shared Paddle + Tesseract one by default)
+        workers: pages recognized concurrently; peak memory is about
+            workers + 1 rasterized pages
+        required: fields whose presence stops reading further pages
+        dpi: PDF render resolution
+    """
+
+    def __init__(self, ensemble=None, workers: int = PAGE_WORKERS, required: Optional[List[str]] = None,
+                 dpi: int = PDF_DPI, max_pages: int = MAX_PAGES):
+        if ensemble is None:
+            from ocr_engines import get_default_ensemble
+            ensemble = get_default_ensemble()
+        self.ensemble = ensemble
+        self.workers = max(1, workers)
+        self.required = REQUIRED_FIELDS if required is None else required
+        self.dpi = dpi
+        self.max_pages = max_pages
+
+    def extract(self, path: str, profile: str = "default") -> Dict[str, str]:
+        """
+        Recognize pages in order until the required fields are found
+
+        Returns:
+            Details dict as LocalOCR.parse_details builds it, with the page
+            texts combined into document_content and per-page OCR metadata
+        """
+        texts: Dict[int, str] = {}
+        trace: List[Dict] = []
+        total = page_count(path)
+        pages = iter_pages(path, self.dpi, self.max_pages)
+        tmp_dir = tempfile.mkdtemp(prefix="ocr-pages-")
+        executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="ocr-page")
+        in_flight = {}
+        next_index = 0  # next page, in document order, still to be added to the text
+        try:
+            exhausted = False
+            while True:
+                # Rasterize only as many pages as there are free workers
+                while not exhausted and len(in_flight) < self.workers:
+                    page = next(pages, None)
+                    if page is None:
+                        exhausted = True
+                        break
+                    index, image = page
+                    # Uncompressed: a few ms to write and read back, and every engine accepts it
+                    page_path = os.path.join(tmp_dir, f"page-{index:04d}.bmp")
+                    cv2.imwrite(page_path, image)
+                    del image, page
+                    in_flight[index] = executor.submit(_recognize_page, self.ensemble, index, page_path)
+                if next_index not in in_flight:
+                    break
+
+                _, text, page_trace = in_flight.pop(next_index).result()
+                texts[next_index] = text
+                trace.append(page_trace)
+                next_index += 1
+                if self.required and text.strip():
+                    if has_required_fields(LocalOCR.parse_details(self._combined(texts), profile), self.required):
+                        break
+        finally:
+            for future in in_flight.values():
+                future.cancel()
+            executor.shutdown(wait=True)
+            pages.close()
+            for name in os.listdir(tmp_dir):
+                os.remove(os.path.join(tmp_dir, name))
+            os.rmdir(tmp_dir)
+
+        full_text = self._combined(texts)
+        stopped_early = total is not None and len(texts) < min(total, self.max_pages)
+        metadata = {"ocr_mode": "pages", "pages_read": len(texts), "page_count": total,
+                    "stopped_early": stopped_early, "ocr_pages": trace}
+        print(f"✓ Read {len(texts)} of {total} page(s){' (required fields found)' if stopped_early else ''}")
+        if not full_text.strip():
+            print("⚠ No text extracted from document")
+            return {"document_content": "", "metadata": json.dumps(metadata)}
+        return LocalOCR.parse_details(full_text, profile, extra_metadata=metadata)
+
+    @staticmethod
+    def _combined(texts: Dict[int, str]) -> str:
+        return "\n".join(texts[i] for i in sorted(texts) if texts[i].strip())
+
+
+def extract_multipage_details(path: str, profile: str = "default") -> Dict[str, str]:
+    """Details of a PDF/TIFF document with the default streamer"""
+    return PageStreamer().extract(path, profile)
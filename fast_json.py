@@ -0,0 +1,111 @@
+"""
+Fast JSON Responses
+Responses are serialized with orjson when it is installed (optional; the
+standard json module otherwise):
+
+    FastJSONProvider   Flask JSON provider, so every jsonify() uses it
+    stream_listing     listings (all hashes, searches) from a streamed query
+                       (RegistryStore.iter_ordered). Up to JSON_STREAM_CHUNK
+                       records are sent as one buffered response, count first:
+
+                           {"count": 12, "complete": true, "hashes": [...]}
+
+                       Longer listings are sent as one JSON document built
+                       JSON_STREAM_CHUNK records at a time, so a response never
+                       holds every row or its whole text. The count and
+                       "complete" come last, once the rows have been sent:
+
+                           {"hashes": [{...}, {...}, ...], "count": 100000, "complete": true}
+
+                       The status is already sent by then, so a query failing
+                       midway still ends a 200 response, with "complete": false
+                       and "error". Clients must check "complete".
+
+Values orjson does not take (integers beyond 64 bits, e.g. token ids) fall
+back to json for that response.
+"""
+
+import os
+import json
+import itertools
+from typing import Callable, Iterable, Optional
+
+from flask import Response, stream_with_context
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+JSON_STREAM_CHUNK = int(os.getenv("JSON_STREAM_CHUNK", 1000))
+
+
+def dumps(obj, default: Optional[Callable] = None, sort_keys: bool = False) -> bytes:
+    """Compact JSON as bytes"""
+    if orjson is not None:
+        # Dates and dataclasses go through default, as with json
+        option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        try:
+            return orjson.dumps(obj, default=default, option=option)
+        except TypeError:
+            pass
+    return json.dumps(obj, default=default, sort_keys=sort_keys, separators=(',', ':')).encode()
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask's JSON provider with compact output through dumps() (indented debug output stays with json)"""
+
+    def dumps(self, obj, **kwargs) -> str:
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return dumps(obj, default=self.default, sort_keys=self.sort_keys).decode()
+
+    def response(self, *args, **kwargs) -> Response:
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps(obj, default=self.default, sort_keys=self.sort_keys) + b"\n",
+                                        mimetype=self.mimetype)
+
+
+def stream_listing(key: str, records: Iterable, chunk_size: int = JSON_STREAM_CHUNK) -> Response:
+    """
+    {"count": n, "complete": true, "<key>": [...]} response of DocumentRecords
+
+    The first chunk is fetched before responding, so a query that cannot run
+    or fails within it still raises here (and gets an error status from the
+    caller). A listing that fits in it is sent buffered; longer ones stream.
+    """
+    records = iter(records)
+    head = list(itertools.islice(records, chunk_size + 1))
+    fields = head[0]._fields if head else ()
+    if len(head) <= chunk_size:
+        return Response(dumps({"count": len(head), "complete": True,
+                               key: [dict(zip(fields, r)) for r in head]}) + b"\n", mimetype='application/json')
+
+    def generate():
+        yield b'{' + dumps(key) + b':['
+        count = 0
+        chunk = head
+        tail = {}
+        try:
+            for record in records:
+                chunk.append(record)
+                if len(chunk) >= chunk_size:
+                    yield (b',' if count else b'') + dumps([dict(zip(fields, r)) for r in chunk])[1:-1]
+                    count += len(chunk)
+                    chunk = []
+            if chunk:
+                yield (b',' if count else b'') + dumps([dict(zip(fields, r)) for r in chunk])[1:-1]
+                count += len(chunk)
+        except Exception as e:
+            print(f"⚠ Listing '{key}' stopped after {count} records: {e}")
+            tail["error"] = str(e)
+        tail["count"] = count
+        tail["complete"] = "error" not in tail
+        yield b'],' + dumps(tail)[1:] + b'\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/json')
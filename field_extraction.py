@@ -0,0 +1,199 @@
+"""
+Field Extraction Module
+Declarative, precompiled extraction of label fields from OCR text
+"""
+
+import re
+from typing import Dict, Iterator, List, NamedTuple, Tuple
+
+
+class FieldRule(NamedTuple):
+    """A keyword/value pattern for one label field"""
+    field: str
+    keywords: Tuple[str, ...]  # literal keywords introducing the field (case-insensitive)
+    value: str                 # regex for the value that follows the keywords
+    confidence: float          # confidence attached to a match of this rule
+
+
+class FieldMatch(NamedTuple):
+    """A field value found in the text, with its span"""
+    value: str
+    start: int
+    end: int
+    confidence: float
+    rule: int
+
+
+# Rules per label type. Within a profile, the first occurrence in the text
+# wins for each field, the same as one re.search per field.
+LABEL_PROFILES: Dict[str, List[FieldRule]] = {
+    "default": [
+        FieldRule("brand", ("Brand", "Manufacturer"), r"[A-Z0-9\s]{3,20}", 0.9),
+        FieldRule("brand", ("BY",), r"[A-Z0-9\s]{3,20}", 0.6),
+        FieldRule("serial_no", ("S/N", "Serial"), r"[A-Z0-9-]+", 0.95),
+        FieldRule("serial_no", ("ID", "Code", "UID"), r"[A-Z0-9-]+", 0.75),
+        FieldRule("mfg_date", ("MFD", "MFG", "Batch Date"), r"[\d\/-]{6,10}", 0.9),
+    ],
+    "invoice": [
+        FieldRule("brand", ("Seller", "Supplier", "Vendor"), r"[A-Z0-9 .&-]{3,30}", 0.85),
+        FieldRule("serial_no", ("Invoice No", "Invoice Number", "Invoice #", "Shipment ID"), r"[A-Z0-9-]+", 0.95),
+        FieldRule("mfg_date", ("Invoice Date", "Date"), r"[\d\/-]{6,10}", 0.8),
+    ],
+}
+
+
+class FieldExtractor:
+    """
+    Compiles a profile's rules once and extracts every field in one
+    left-to-right pass over the text.
+
+    Keyword occurrences are located with str.find on a lowercased copy
+    (a C-speed scan per keyword, merged in position order); at each
+    occurrence only the still-missing fields are tried with an anchored,
+    precompiled match. Keywords of fields already found are dropped and
+    the scan stops once every field is found.
+    """
+
+    def __init__(self, rules: List[FieldRule], flags: int = re.IGNORECASE):
+        self.rules = list(rules)
+        self.fields = list(dict.fromkeys(rule.field for rule in self.rules))
+        # keyword (lowercased) -> fields it can introduce
+        self.keywords: Dict[str, List[str]] = {}
+        for rule in self.rules:
+            for keyword in rule.keywords:
+                fields = self.keywords.setdefault(keyword.lower(), [])
+                if rule.field not in fields:
+                    fields.append(rule.field)
+        # field -> (anchored pattern over that field's rules, group index -> rule index)
+        self.field_patterns = {}
+        for field in self.fields:
+            indices = [i for i, rule in enumerate(self.rules) if rule.field == field]
+            pattern = re.compile("|".join(
+                "(?:{})[\\s:]+(?P<r{}>{})".format(
+                    "|".join(re.escape(k) for k in self.rules[i].keywords), i, self.rules[i].value)
+                for i in indices
+            ), flags)
+            # The value group closes last in its alternative, so it is lastindex
+            groups = {pattern.groupindex[f"r{i}"]: i for i in indices}
+            self.field_patterns[field] = (pattern, groups)
+        # Fallback scan for text whose lowercase form changes length
+        self.keyword_pattern = re.compile("|".join(re.escape(k) for k in self.keywords), flags)
+
+    def _candidates(self, text: str, pending: List[str]) -> Iterator[int]:
+        """Yield keyword positions in increasing order"""
+        lowered = text.lower()
+        if len(lowered) != len(text):
+            search = self.keyword_pattern.search
+            hit = search(text)
+            while hit is not None:
+                yield hit.start()
+                hit = search(text, hit.start() + 1)
+            return
+
+        find = lowered.find
+        next_pos = {}
+        for keyword in self.keywords:
+            pos = find(keyword)
+            if pos >= 0:
+                next_pos[keyword] = pos
+        while next_pos:
+            pos = min(next_pos.values())
+            yield pos
+            for keyword in [k for k, p in next_pos.items() if p == pos]:
+                if not any(f in pending for f in self.keywords[keyword]):
+                    del next_pos[keyword]
+                    continue
+                nxt = find(keyword, pos + 1)
+                if nxt < 0:
+                    del next_pos[keyword]
+                else:
+                    next_pos[keyword] = nxt
+
+    def extract(self, text: str) -> Dict[str, FieldMatch]:
+        """
+        Extract all fields from text
+
+        Returns:
+            Mapping field name -> FieldMatch for every field found
+        """
+        found: Dict[str, FieldMatch] = {}
+        if not text:
+            return found
+
+        pending = list(self.fields)
+        for pos in self._candidates(text, pending):
+            for field in list(pending):
+                pattern, groups = self.field_patterns[field]
+                match = pattern.match(text, pos)
+                if match is None:
+                    continue
+                i = groups[match.lastindex]
+                group = f"r{i}"
+                raw = match.group(group)
+                value = raw.strip()
+                start = match.start(group) + (len(raw) - len(raw.lstrip()))
+                found[field] = FieldMatch(value, start, start + len(value), self.rules[i].confidence, i)
+                pending.remove(field)
+            if not pending:
+                break
+        return found
+
+
+_EXTRACTORS: Dict[str, FieldExtractor] = {}
+
+
+def get_extractor(profile: str = "default") -> FieldExtractor:
+    """Return the compiled extractor for a label profile (compiled once)"""
+    extractor = _EXTRACTORS.get(profile)
+    if extractor is None:
+        rules = LABEL_PROFILES.get(profile)
+        if rules is None:
+            raise KeyError(f"Unknown label profile: {profile}")
+        extractor = _EXTRACTORS[profile] = FieldExtractor(rules)
+    return extractor
+
+
+def register_profile(profile: str, rules: List[FieldRule]) -> FieldExtractor:
+    """Add or replace a label profile and compile it"""
+    LABEL_PROFILES[profile] = list(rules)
+    _EXTRACTORS.pop(profile, None)
+    return get_extractor(profile)
+
+
+# --- Text normalization ---
+
+# Every ASCII byte that is not [a-z0-9 ] (applied after lowercasing)
+_ASCII_DELETE = bytes(
+    c for c in range(128)
+    if not (48 <= c <= 57 or 97 <= c <= 122 or c == 32)
+)
+_NON_ALNUM_RE = re.compile(r'[^a-z0-9 ]')
+
+
+def collapse_whitespace(text: str) -> str:
+    """Equivalent of re.sub(r'\\s+', ' ', text).strip()"""
+    return ' '.join(text.split())
+
+
+def normalize_text(text) -> str:
+    """Normalize text for consistent hashing."""
+    if not text:
+        return ""
+    # Lowercase, trim and collapse whitespace runs to a single space
+    text = ' '.join(str(text).lower().split())
+    # Drop everything but [a-z0-9 ]; ASCII input goes through a byte delete table
+    if text.isascii():
+        return text.encode('ascii').translate(None, _ASCII_DELETE).decode('ascii')
+    return _NON_ALNUM_RE.sub('', text)
+
+
+def fuzzy_match_normalized(n1: str, n2: str) -> bool:
+    """fuzzy_match for strings already passed through normalize_text"""
+    if not n1 or not n2:
+        return False
+    return n1 in n2 or n2 in n1
+
+
+def fuzzy_match(s1, s2) -> bool:
+    """Simple fuzzy match: checks if strings are very similar after normalization."""
+    return fuzzy_match_normalized(normalize_text(s1), normalize_text(s2))
@@ -0,0 +1,49 @@
+"""
+Fingerprint Module
+Canonicalization and hashing of product content (Keccak-256, legacy SHA-256)
+"""
+
+import json
+import hashlib
+from eth_hash.auto import keccak
+
+from field_extraction import normalize_text
+
+def calculate_keccak_fingerprint(data):
+    """
+    Calculate Keccak-256 hash of the canonicalized product content.
+    Matches the on-chain hashing logic.
+    """
+    content = data.get("document_content", "")
+    if not content:
+        # Fallback for manual entry
+        details = data.get("product_details", {})
+        parts = [
+            f"BRAND={details.get('brand', 'Unknown')}",
+            f"MODEL={data.get('product_name', 'Unknown')}",
+            f"SN={details.get('serial_no', 'Unknown')}",
+            f"MFG={details.get('mfg_date', 'Unknown')}"
+        ]
+        content = "|".join(parts)
+    
+    # Canonicalize
+    canonical = str(content).strip().upper()
+    return compute_keccak_hash(canonical)
+
+def calculate_legacy_hash(data):
+    """Calculate SHA-256 hash using the old JSON method (Legacy Logic)."""
+    normalized_data = {k: normalize_text(v) for k, v in data.items()}
+    data_string = json.dumps(normalized_data, sort_keys=True)
+    return hashlib.sha256(data_string.encode()).hexdigest()
+
+def compute_keccak_hash(text):
+    """
+    Computes a Keccak256 hash (EVM native) of the canonical text.
+    Returns the hash as a hex string (with 0x prefix).
+    """
+    if not text:
+        return "0x" + "0" * 64
+    
+    # keccak from eth_hash expects bytes
+    hash_bytes = keccak(text.encode('utf-8'))
+    return "0x" + hash_bytes.hex()
@@ -0,0 +1,59 @@
+"""
+gunicorn configuration for VeriChain
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Workers and threads default from the CPU count: OCR is CPU-bound, so one
+process per core, each with a few threads for requests that mostly wait on
+the database or the chain. The OCR runtime and admission control are told
+their share of the cores so the workers do not oversubscribe them.
+"""
+
+import os
+
+cpus = os.cpu_count() or 1
+
+bind = os.getenv("BIND", "0.0.0.0:5001")
+workers = int(os.getenv("WEB_WORKERS", cpus))
+threads = int(os.getenv("WEB_THREADS", 4))
+worker_class = "gthread"
+timeout = int(os.getenv("WEB_TIMEOUT", 120))
+# Import the app (and load the OCR models) once in the master; workers share it copy-on-write
+preload_app = os.getenv("WEB_PRELOAD", "1") != "0"
+
+# Set before the app is imported: both are read at import time
+_share = max(1, cpus // workers)
+os.environ.setdefault("OCR_CPU_THREADS", str(_share))
+os.environ.setdefault("OMP_NUM_THREADS", str(_share))
+os.environ.setdefault("ADMIT_OCR_SLOTS", str(_share))
+
+# Admitted and queued requests both hold one of the worker's threads, so the OCR class
+# (slots + queue) and the chain class may each hold at most threads - WEB_RESERVED_THREADS
+# of them. The reserved threads stay free for lookups, pages and progress streams; OCR
+# requests beyond that are shed with 429 instead of waiting in a thread.
+_reserved = min(threads - 1, int(os.getenv("WEB_RESERVED_THREADS", max(1, threads // 2))))
+_heavy = max(1, threads - _reserved)
+_ocr_slots = min(int(os.environ["ADMIT_OCR_SLOTS"]), _heavy)
+os.environ["ADMIT_OCR_SLOTS"] = str(_ocr_slots)
+os.environ.setdefault("ADMIT_OCR_QUEUE", str(_heavy - _ocr_slots))
+os.environ.setdefault("ADMIT_CHAIN_SLOTS", str(_heavy))
+os.environ.setdefault("ADMIT_CHAIN_QUEUE", "0")
+# An open progress stream holds a thread for up to PROGRESS_STREAM_SECONDS: streams may use
+# the reserved threads but one, which is left to lookups and pages
+os.environ.setdefault("ADMIT_STREAM_SLOTS", str(max(1, _reserved - 1)))
+os.environ.setdefault("ADMIT_STREAM_QUEUE", "0")
+
+
+def pre_fork(server, worker):
+    # Stable worker numbers 0..workers-1, reused when a worker is replaced
+    taken = {w.index for w in server.WORKERS.values() if hasattr(w, "index")}
+    worker.index = min(i for i in range(len(taken) + 1) if i not in taken)
+
+
+def post_fork(server, worker):
+    import wsgi
+    wsgi.after_fork(worker.index, server.num_workers)
+
+
+def post_worker_init(worker):
+    import wsgi
+    wsgi.warm_up()
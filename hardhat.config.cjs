@@ -6,6 +6,10 @@ require("dotenv").config();
 module.exports = {
     solidity: "0.8.20",
     networks: {
+        // `npx hardhat node`: signer-pool runs against its funded dev accounts
+        localhost: {
+            url: "http://127.0.0.1:8545"
+        },
         neox_testnet: {
             url: "https://neoxt4seed1.ngd.network",
             accounts: process.env.PRIVATE_KEY ? [process.env.PRIVATE_KEY] : [],
@@ -4,27 +4,75 @@ Provides comprehensive hash validation against database and blockchain
 """
 
 import sqlite3
-from typing import Dict, Optional, Tuple
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import registry_db
+from registry_db import blob_to_hex, hash_params, is_migrated, token_id_for, DOCUMENT_COLUMNS
+from registry_store import get_registry, shard_of
+
+# Columns of the hash listing (/api/all_hashes)
+LISTING_COLUMNS = ('document_hash', 'participant_name', 'hackathon_name', 'timestamp')
+SEARCH_COLUMNS = ('participant_name', 'hackathon_name')
+
+
+def _newest_first(row):
+    return row['timestamp'] or ''
+
+def _record_newest_first(record):
+    return record.timestamp or ''
 
 class HashValidator:
     """
     Validates document hashes against the database and blockchain
     """
     
-    def __init__(self, db_path=None):
-        if db_path is None:
-            import os
-            base_dir = os.path.dirname(os.path.abspath(__file__))
-            self.db_path = os.path.join(base_dir, 'document_verification.db')
-        else:
-            self.db_path = db_path
+    def __init__(self, db_path=None, shards=None):
+        # Documents may be spread over shard files; the store routes and fans out
+        self.registry = get_registry(db_path, shards)
+        self.db_path = self.registry.db_path
     
     def get_db_connection(self):
-        """Get database connection"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        return conn
+        """Get a connection to the main registry database (hashes are returned as '0x' hex)"""
+        return registry_db.get_db_connection(self.db_path)
     
+    @staticmethod
+    def normalize_hash(document_hash) -> str:
+        """Normalize a hash for lookup: strip whitespace and '0x', lowercase"""
+        document_hash = str(document_hash or '').strip().lower()
+        if document_hash.startswith('0x'):
+            document_hash = document_hash[2:]
+        return document_hash
+
+    @staticmethod
+    def _record_details(record) -> Dict:
+        """Build the AUTHENTIC details dict for a matched document row (converted or raw)"""
+        stored = record['document_hash']
+        document_hash = blob_to_hex(stored)
+        token_id = record['token_id']
+        if token_id is None:
+            token_id = str(int.from_bytes(stored, 'big')) if isinstance(stored, bytes) else token_id_for(stored)
+        return {
+            'id': record['id'],
+            'participant_name': record['participant_name'],
+            'hackathon_name': record['hackathon_name'],
+            'document_hash': document_hash,
+            'txn_hash': blob_to_hex(record['txn_hash']),
+            'token_id': token_id,
+            'contract_address': record['contract_address'],
+            'issuer_address': record['issuer_address'],
+            'timestamp': record['timestamp'],
+            'status': 'AUTHENTIC',
+            'message': 'This document hash exists in our database and is authentic.'
+        }
+
+    @staticmethod
+    def _not_found_details(document_hash: str) -> Dict:
+        return {
+            'status': 'NOT_FOUND',
+            'message': 'This hash was never issued by our system. Document may be fraudulent.',
+            'document_hash': document_hash
+        }
+
     def validate_hash(self, document_hash: str) -> Tuple[bool, Dict]:
         """
         Validate a document hash against the database
@@ -37,40 +85,16 @@ class HashValidator:
         """
         try:
             # Normalize hash: Remove '0x' if present and lowercase
-            document_hash = document_hash.strip().lower()
-            if document_hash.startswith('0x'):
-                document_hash = document_hash[2:]
+            document_hash = self.normalize_hash(document_hash)
 
-            conn = self.get_db_connection()
-            
-            # Search for exact hash match
-            record = conn.execute(
-                'SELECT * FROM documents WHERE document_hash = ?',
-                (document_hash,)
-            ).fetchone()
-            
-            conn.close()
+            # Search for exact hash match on the fingerprint's shard
+            # (32-byte BLOB, or hex TEXT in unmigrated rows)
+            record = self.registry.find_by_fingerprint(document_hash)
             
             if record:
-                return True, {
-                    'id': record['id'],
-                    'participant_name': record['participant_name'],
-                    'hackathon_name': record['hackathon_name'],
-                    'document_hash': record['document_hash'],
-                    'txn_hash': record['txn_hash'],
-                    'token_id': record['token_id'],
-                    'contract_address': record['contract_address'],
-                    'issuer_address': record['issuer_address'],
-                    'timestamp': record['timestamp'],
-                    'status': 'AUTHENTIC',
-                    'message': 'This document hash exists in our database and is authentic.'
-                }
+                return True, self._record_details(record)
             else:
-                return False, {
-                    'status': 'NOT_FOUND',
-                    'message': 'This hash was never issued by our system. Document may be fraudulent.',
-                    'document_hash': document_hash
-                }
+                return False, self._not_found_details(document_hash)
         
         except Exception as e:
             return False, {
@@ -78,7 +102,128 @@ class HashValidator:
                 'message': f'Validation error: {str(e)}',
                 'document_hash': document_hash
             }
+
+    def iter_validate_many(self, document_hashes: Iterable[str],
+                           chunk_size: int = 5000) -> Iterator[Tuple[bool, Dict]]:
+        """
+        Validate many document hashes over a single connection per shard
+        
+        Ids are normalized, loaded chunk by chunk into a temp table and
+        resolved with one indexed join per chunk (per shard, in parallel),
+        so the cost is a handful of statements instead of one connection
+        and query per id.
+        
+        Args:
+            document_hashes: Hashes to validate (any case, with or without '0x')
+            chunk_size: Number of ids resolved per join
+        
+        Yields:
+            (is_valid, details_dict) per input hash, in input order
+        """
+        if self.registry.count > 1:
+            chunk = []
+            for document_hash in document_hashes:
+                chunk.append(self.normalize_hash(document_hash))
+                if len(chunk) >= chunk_size:
+                    yield from self._resolve_sharded(chunk)
+                    chunk = []
+            if chunk:
+                yield from self._resolve_sharded(chunk)
+            return
+
+        conn = self.registry.connect(0)
+        try:
+            chunk = []
+            for document_hash in document_hashes:
+                chunk.append(self.normalize_hash(document_hash))
+                if len(chunk) >= chunk_size:
+                    yield from self._resolve_chunk(conn, chunk)
+                    chunk = []
+            if chunk:
+                yield from self._resolve_chunk(conn, chunk)
+        finally:
+            conn.close()
+
+    def _resolve_sharded(self, chunk: List[str]) -> List[Tuple[bool, Dict]]:
+        """Split a chunk by shard, resolve the parts in parallel and restore input order"""
+        parts: Dict[int, List[int]] = {}
+        for pos, document_hash in enumerate(chunk):
+            parts.setdefault(shard_of(document_hash, self.registry.count), []).append(pos)
+        shards = list(parts)
+        resolved = self.registry.fan_out(
+            lambda conn, shard: self._resolve_chunk(conn, [chunk[pos] for pos in parts[shard]]), shards
+        )
+        results = [None] * len(chunk)
+        for shard, shard_results in zip(shards, resolved):
+            for pos, result in zip(parts[shard], shard_results):
+                results[pos] = result
+        return results
+
+    @staticmethod
+    def _blob_keys(chunk: List[str]) -> Optional[List[bytes]]:
+        """32-byte keys for a chunk of normalized hashes, or None if any is not 64 hex chars"""
+        try:
+            keys = [bytes.fromhex(h) for h in chunk]
+        except ValueError:
+            return None
+        return keys if all(len(key) == 32 for key in keys) else None
+
+    def _resolve_chunk(self, conn, chunk: List[str]) -> List[Tuple[bool, Dict]]:
+        conn.execute('CREATE TEMP TABLE IF NOT EXISTS batch_ids (pos INTEGER PRIMARY KEY, k1, k2, k3)')
+        conn.execute('DELETE FROM batch_ids')
+        # Once the registry is fully BLOB, a chunk of well-formed ids needs one
+        # index probe each; otherwise every stored spelling is tried
+        blobs = self._blob_keys(chunk) if is_migrated(conn) else None
+        if blobs is not None:
+            conn.executemany('INSERT INTO batch_ids (pos, k1) VALUES (?, ?)', enumerate(blobs))
+            match = 'd.document_hash = b.k1'
+        else:
+            conn.executemany('INSERT INTO batch_ids (pos, k1, k2, k3) VALUES (?, ?, ?, ?)',
+                             ((pos, *hash_params(h)) for pos, h in enumerate(chunk)))
+            match = 'd.document_hash IN (b.k1, b.k2, b.k3)'
+        # Raw rows: _record_details converts only the rows it returns
+        cursor = conn.cursor()
+        cursor.row_factory = sqlite3.Row
+        rows = cursor.execute(
+            f'SELECT b.pos AS batch_pos, d.* FROM batch_ids b JOIN documents d ON {match} '
+            'ORDER BY b.pos, d.id'
+        ).fetchall()
+
+        found = {}
+        for row in rows:
+            # Keep the earliest registration when a fingerprint was issued twice
+            found.setdefault(row['batch_pos'], row)
+
+        return [
+            (True, self._record_details(found[pos])) if pos in found
+            else (False, self._not_found_details(document_hash))
+            for pos, document_hash in enumerate(chunk)
+        ]
+
+    def validate_many(self, document_hashes: Iterable[str]) -> List[Tuple[bool, Dict]]:
+        """
+        Validate a list of document hashes in bulk
+        
+        Args:
+            document_hashes: Hashes to validate
+        
+        Returns:
+            List of (is_valid, details_dict), aligned with the input
+        """
+        return list(self.iter_validate_many(document_hashes))
     
+    def iter_all_hashes(self) -> Iterator:
+        """
+        Stream every document's hash, name, brand and timestamp, newest first
+        
+        Returns:
+            Iterator of DocumentRecords (LISTING_COLUMNS), read from the shards as consumed
+        """
+        return self.registry.iter_ordered(
+            f"SELECT {', '.join(LISTING_COLUMNS)} FROM documents ORDER BY timestamp DESC",
+            key=_record_newest_first, reverse=True
+        )
+
     def get_all_hashes(self) -> list:
         """
         Get all document hashes from the database
@@ -87,13 +232,7 @@ class HashValidator:
             List of all document hashes
         """
         try:
-            conn = self.get_db_connection()
-            records = conn.execute(
-                'SELECT document_hash, participant_name, hackathon_name, timestamp FROM documents ORDER BY timestamp DESC'
-            ).fetchall()
-            conn.close()
-            
-            return [dict(r) for r in records]
+            return [record._asdict() for record in self.iter_all_hashes()]
         
         except Exception as e:
             print(f"Error fetching hashes: {e}")
@@ -110,12 +249,7 @@ class HashValidator:
             Document details or None
         """
         try:
-            conn = self.get_db_connection()
-            record = conn.execute(
-                'SELECT * FROM documents WHERE txn_hash = ?',
-                (txn_hash,)
-            ).fetchone()
-            conn.close()
+            record = self.registry.find_by_txn(txn_hash)
             
             if record:
                 return dict(record)
@@ -133,23 +267,30 @@ class HashValidator:
             Dictionary with statistics
         """
         try:
-            conn = self.get_db_connection()
-            
-            total_docs = conn.execute('SELECT COUNT(*) as count FROM documents').fetchone()['count']
-            
-            unique_participants = conn.execute(
-                'SELECT COUNT(DISTINCT participant_name) as count FROM documents'
-            ).fetchone()['count']
-            
-            unique_events = conn.execute(
-                'SELECT COUNT(DISTINCT hackathon_name) as count FROM documents'
-            ).fetchone()['count']
-            
-            recent_docs = conn.execute(
-                'SELECT * FROM documents ORDER BY timestamp DESC LIMIT 5'
-            ).fetchall()
-            
-            conn.close()
+            def shard_statistics(conn, shard):
+                if self.registry.count == 1:
+                    # Distinct counts straight from SQLite when there is nothing to union
+                    return (
+                        conn.execute('SELECT COUNT(*) FROM documents').fetchone()[0],
+                        conn.execute('SELECT COUNT(DISTINCT participant_name) FROM documents').fetchone()[0],
+                        conn.execute('SELECT COUNT(DISTINCT hackathon_name) FROM documents').fetchone()[0],
+                        conn.execute('SELECT * FROM documents ORDER BY timestamp DESC LIMIT 5').fetchall(),
+                    )
+                return (
+                    conn.execute('SELECT COUNT(*) FROM documents').fetchone()[0],
+                    {r[0] for r in conn.execute('SELECT DISTINCT participant_name FROM documents')},
+                    {r[0] for r in conn.execute('SELECT DISTINCT hackathon_name FROM documents')},
+                    conn.execute('SELECT * FROM documents ORDER BY timestamp DESC LIMIT 5').fetchall(),
+                )
+
+            shards = self.registry.fan_out(shard_statistics)
+            if self.registry.count == 1:
+                total_docs, unique_participants, unique_events, recent_docs = shards[0]
+            else:
+                total_docs = sum(s[0] for s in shards)
+                unique_participants = len(set().union(*(s[1] for s in shards)) - {None})
+                unique_events = len(set().union(*(s[2] for s in shards)) - {None})
+                recent_docs = sorted((r for s in shards for r in s[3]), key=_newest_first, reverse=True)[:5]
             
             return {
                 'total_documents': total_docs,
@@ -167,6 +308,32 @@ class HashValidator:
                 'recent_documents': []
             }
     
+    def iter_search(self, column: str, text: str, columns: Sequence[str] = DOCUMENT_COLUMNS) -> Iterator:
+        """
+        Stream documents whose name or brand contains text, newest first
+        
+        Args:
+            column: 'participant_name' or 'hackathon_name'
+            text: Substring to search for
+            columns: Columns to fetch (timestamp is always included: results are ordered by it)
+        
+        Returns:
+            Iterator of DocumentRecords, read from the shards as consumed
+        
+        Raises:
+            ValueError: unknown search or result column
+        """
+        if column not in SEARCH_COLUMNS:
+            raise ValueError(f"Cannot search by {column}")
+        unknown = [c for c in columns if c not in DOCUMENT_COLUMNS]
+        if unknown:
+            raise ValueError(f"Unknown column(s): {', '.join(unknown)}")
+        columns = list(dict.fromkeys(columns)) + ([] if 'timestamp' in columns else ['timestamp'])
+        return self.registry.iter_ordered(
+            f"SELECT {', '.join(columns)} FROM documents WHERE {column} LIKE ? ORDER BY timestamp DESC",
+            (f'%{text}%',), key=_record_newest_first, reverse=True
+        )
+
     def search_by_name(self, name: str) -> list:
         """
         Search documents by participant name
@@ -178,14 +345,7 @@ class HashValidator:
             List of matching documents
         """
         try:
-            conn = self.get_db_connection()
-            records = conn.execute(
-                'SELECT * FROM documents WHERE participant_name LIKE ? ORDER BY timestamp DESC',
-                (f'%{name}%',)
-            ).fetchall()
-            conn.close()
-            
-            return [dict(r) for r in records]
+            return [record._asdict() for record in self.iter_search('participant_name', name)]
         
         except Exception as e:
             print(f"Error searching by name: {e}")
@@ -202,14 +362,7 @@ class HashValidator:
             List of matching documents
         """
         try:
-            conn = self.get_db_connection()
-            records = conn.execute(
-                'SELECT * FROM documents WHERE hackathon_name LIKE ? ORDER BY timestamp DESC',
-                (f'%{event}%',)
-            ).fetchall()
-            conn.close()
-            
-            return [dict(r) for r in records]
+            return [record._asdict() for record in self.iter_search('hackathon_name', event)]
         
         except Exception as e:
             print(f"Error searching by event: {e}")
@@ -0,0 +1,237 @@
+"""
+Idempotent Registration
+Registration retries and repeated uploads must not redo OCR, mint twice or
+insert a second row for one fingerprint. Three layers:
+
+    Idempotency-Key     a client-chosen key per logical request; the first
+                        response is stored (main registry file) and replayed
+                        to retries without running anything again. The same
+                        key with a different upload is rejected (422); a key
+                        still being processed by another server process
+                        answers 409 with Retry-After.
+    SingleFlight        concurrent calls with the same key (an idempotency
+                        key, or a fingerprint once OCR has computed it) in
+                        one process collapse into one execution whose
+                        result every caller gets.
+    fingerprint index   across processes, the registry's unique index on live
+                        fingerprints lets only one writer claim a fingerprint
+                        before any chain call (RegistryStore.register_document).
+
+Stored responses expire after IDEMPOTENCY_TTL_SECONDS. A key left in flight
+by a process that died is taken over after IDEMPOTENCY_LEASE_SECONDS.
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+from typing import Callable, Dict, Optional, Tuple
+
+from registry_db import get_db_connection, get_db_path
+
+IDEMPOTENCY_TTL = float(os.getenv("IDEMPOTENCY_TTL_SECONDS", 24 * 3600))
+IDEMPOTENCY_LEASE = float(os.getenv("IDEMPOTENCY_LEASE_SECONDS", 300))
+MAX_KEY_LENGTH = 255
+
+
+class IdempotencyError(Exception):
+    """A keyed request that cannot run now; carries the HTTP status and Retry-After seconds"""
+
+    def __init__(self, key: str, status: int, reason: str, retry_after: Optional[float] = None):
+        super().__init__(f"Idempotency-Key {key!r}: {reason}")
+        self.key = key
+        self.status = status
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls with the same key into one execution: the
+    first caller runs fn, the others wait and share its result or exception
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict = {}
+
+    def do(self, key, fn: Callable) -> Tuple[object, bool]:
+        """
+        Returns:
+            (fn's result, shared) where shared is True for callers that waited
+            on another caller's execution
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = {"done": threading.Event(), "result": None, "error": None}
+        if not leader:
+            call["done"].wait()
+            if call["error"] is not None:
+                raise call["error"]
+            return call["result"], True
+        try:
+            call["result"] = fn()
+            return call["result"], False
+        except BaseException as e:
+            call["error"] = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call["done"].set()
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+
+def request_digest(stream, fields: Dict[str, str]) -> str:
+    """SHA-256 of an uploaded file and the form fields, to tell a retry from a different request under one key"""
+    digest = hashlib.sha256()
+    position = stream.tell()
+    for chunk in iter(lambda: stream.read(1 << 16), b""):
+        digest.update(chunk)
+    stream.seek(position)
+    digest.update(json.dumps(fields, sort_keys=True).encode())
+    return digest.hexdigest()
+
+
+class IdempotencyStore:
+    """
+    Stored responses of keyed requests, shared by every server process
+
+    Args:
+        db_path: registry database holding the idempotency_keys table
+        ttl: seconds a stored response is replayed
+        lease: seconds before an unfinished key is considered abandoned
+    """
+
+    def __init__(self, db_path=None, ttl: float = IDEMPOTENCY_TTL, lease: float = IDEMPOTENCY_LEASE):
+        self.db_path = db_path or get_db_path()
+        self.ttl = ttl
+        self.lease = lease
+        self._flights = SingleFlight()
+        self._last_purge = 0.0
+        self.ensure_tables()
+
+    def get_db_connection(self):
+        conn = get_db_connection(self.db_path)
+        conn.execute('PRAGMA busy_timeout = 10000')
+        return conn
+
+    def ensure_tables(self) -> None:
+        conn = self.get_db_connection()
+        conn.executescript('''
+            CREATE TABLE IF NOT EXISTS idempotency_keys (
+                key TEXT PRIMARY KEY,
+                request_hash TEXT,          -- request_digest of the first request
+                status_code INTEGER,        -- NULL while in flight
+                response TEXT,              -- JSON body to replay
+                created_at REAL,
+                completed_at REAL
+            );
+            CREATE INDEX IF NOT EXISTS idx_idempotency_keys_created ON idempotency_keys(created_at);
+        ''')
+        conn.commit()
+        conn.close()
+
+    def begin(self, key: str, request_hash: str) -> Optional[Tuple[int, Dict]]:
+        """
+        Claim a key for this request
+
+        Returns:
+            None when the caller now owns the key and has to run the request
+            (then complete() or release()), else the stored (status, body) to replay
+
+        Raises:
+            IdempotencyError: key reused for another request (422), or still
+                in flight in another process (409)
+        """
+        now = time.time()
+        conn = self.get_db_connection()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute('SELECT * FROM idempotency_keys WHERE key = ?', (key,)).fetchone()
+            expired = row is not None and (
+                row['created_at'] < now - self.ttl
+                or (row['status_code'] is None and row['created_at'] < now - self.lease)
+            )
+            if row is None or expired:
+                conn.execute('INSERT OR REPLACE INTO idempotency_keys (key, request_hash, created_at) VALUES (?, ?, ?)',
+                             (key, request_hash, now))
+                conn.commit()
+                return None
+            conn.rollback()
+        finally:
+            conn.close()
+
+        if row['request_hash'] != request_hash:
+            raise IdempotencyError(key, 422, "already used for a different request")
+        if row['status_code'] is None:
+            # Registrations take seconds: ask for a retry soon, not at the end of the lease
+            raise IdempotencyError(key, 409, "request still in progress",
+                                   retry_after=max(1, min(5, round(row['created_at'] + self.lease - now))))
+        return row['status_code'], json.loads(row['response'])
+
+    def complete(self, key: str, status_code: int, body: Dict) -> None:
+        """Store the response of a claimed key for replay"""
+        conn = self.get_db_connection()
+        conn.execute('UPDATE idempotency_keys SET status_code = ?, response = ?, completed_at = ? WHERE key = ?',
+                     (status_code, json.dumps(body, default=str), time.time(), key))
+        conn.commit()
+        conn.close()
+        self.purge()
+
+    def release(self, key: str) -> None:
+        """Forget a claimed key whose request failed, so a retry runs it again"""
+        conn = self.get_db_connection()
+        conn.execute('DELETE FROM idempotency_keys WHERE key = ? AND status_code IS NULL', (key,))
+        conn.commit()
+        conn.close()
+
+    def purge(self, force: bool = False) -> int:
+        """Drop expired responses (at most once a minute unless forced); returns rows removed"""
+        now = time.time()
+        if not force and now - self._last_purge < 60:
+            return 0
+        self._last_purge = now
+        conn = self.get_db_connection()
+        removed = conn.execute('DELETE FROM idempotency_keys WHERE created_at < ?', (now - self.ttl,)).rowcount
+        conn.commit()
+        conn.close()
+        return removed
+
+    def run(self, key: str, request_hash: str, fn: Callable[[], Tuple[Dict, int]]) -> Tuple[Dict, int, bool]:
+        """
+        Run fn() at most once per key: the first request runs it and stores
+        its (body, status); retries, including concurrent ones in this
+        process, get that response. 5xx responses and exceptions are not
+        stored, so the client's retry runs again.
+
+        Returns:
+            (body, status, replayed)
+        """
+        if not key or len(key) > MAX_KEY_LENGTH:
+            raise IdempotencyError(key[:32], 400, f"must be 1-{MAX_KEY_LENGTH} characters")
+
+        def first():
+            stored = self.begin(key, request_hash)
+            if stored is not None:
+                status, body = stored
+                return body, status, True
+            try:
+                body, status = fn()
+            except BaseException:
+                self.release(key)
+                raise
+            if status >= 500:
+                self.release(key)
+            else:
+                self.complete(key, status, body)
+            return body, status, False
+
+        (body, status, replayed), shared = self._flights.do((key, request_hash), first)
+        return body, status, replayed or shared
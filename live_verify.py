@@ -0,0 +1,304 @@
+"""
+Live Camera Verification
+WebSocket endpoint that takes a stream of camera frames (JPEG/PNG binary
+messages) and verifies the label as soon as one frame is good enough,
+instead of asking the user to retake a still photo.
+
+Frames arriving while a frame is being recognized are not queued: only
+the sharpest one (variance of the Laplacian on a reduced decode) is kept
+for when the worker is free, and frames below LIVE_MIN_SHARPNESS are
+skipped. A processed frame's perceptual hash picks a candidate record,
+accepted once OCR reads its fingerprint or serial (labels printed from one
+template look alike); otherwise the frame is matched by the fingerprint of
+its OCR text, and label fields read across frames are voted
+on, so a serial number read twice identifies the product even when no
+single frame reads the whole label. The first confident match is pushed
+as the verdict and the session ends.
+
+Messages to the client (JSON text):
+    {"type": "progress", ...}   after each processed frame
+    {"type": "verdict", "status": "verified" | "not_found", ...}
+"""
+
+import os
+import json
+import time
+import threading
+from collections import Counter
+from typing import Callable, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from local_ocr import FAST_MAX_SIDE, FIELD_DEFAULTS, LocalOCR, get_local_ocr
+from perceptual_hash import compute_hashes
+
+LIVE_VERIFY_PORT = int(os.getenv("LIVE_VERIFY_PORT", 5002))
+LIVE_MIN_SHARPNESS = float(os.getenv("LIVE_MIN_SHARPNESS", 40))
+LIVE_MAX_SECONDS = float(os.getenv("LIVE_MAX_SECONDS", 30))
+LIVE_FIELD_VOTES = int(os.getenv("LIVE_FIELD_VOTES", 2))
+LIVE_MAX_FRAME_BYTES = int(os.getenv("LIVE_MAX_FRAME_BYTES", 4 * 1024 * 1024))
+
+
+def decode_frame(data: bytes, reduced: bool = False) -> Optional[np.ndarray]:
+    """Grayscale frame from encoded bytes (a quarter-size decode when reduced)"""
+    flag = cv2.IMREAD_REDUCED_GRAYSCALE_4 if reduced else cv2.IMREAD_GRAYSCALE
+    return cv2.imdecode(np.frombuffer(data, dtype=np.uint8), flag)
+
+
+def sharpness(gray: np.ndarray) -> float:
+    """Variance of the Laplacian: low for motion-blurred or out-of-focus frames"""
+    return float(cv2.Laplacian(gray, cv2.CV_64F).var())
+
+
+def fast_ocr(gray: np.ndarray) -> List[Tuple[str, float]]:
+    """Fast-tier PaddleOCR on a frame downscaled like load_fast_image"""
+    height, width = gray.shape[:2]
+    scale = FAST_MAX_SIDE / float(max(height, width))
+    if scale < 1.0:
+        gray = cv2.resize(gray, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+    return get_local_ocr(fast=True).recognize(gray)
+
+
+class LiveVerifier:
+    """
+    Matching shared by all live sessions.
+
+    Args:
+        registry: RegistryStore
+        perceptual_index: callable returning the loaded PerceptualIndex
+        fingerprint: callable(details) -> fingerprint, as for still scans
+        ocr: callable(gray frame) -> [(text, confidence)] (fast tier by default)
+        candidate_distance: pHash distance at which a record is kept as a candidate
+            (confirmed by OCR reading its fingerprint or serial)
+    """
+
+    def __init__(self, registry, perceptual_index: Callable, fingerprint: Callable[[Dict], str],
+                 ocr: Optional[Callable] = None, candidate_distance: int = 14,
+                 min_sharpness: float = LIVE_MIN_SHARPNESS, max_seconds: float = LIVE_MAX_SECONDS,
+                 field_votes: int = LIVE_FIELD_VOTES):
+        self.registry = registry
+        self.perceptual_index = perceptual_index
+        self.fingerprint = fingerprint
+        self.ocr = ocr or fast_ocr
+        self.candidate_distance = candidate_distance
+        self.min_sharpness = min_sharpness
+        self.max_seconds = max_seconds
+        self.field_votes = field_votes
+        self._server = None
+        self.port = None  # bound port once serving
+
+    def record(self, doc_id):
+        return self.registry.find_by_id(doc_id)
+
+    def by_title(self, title: str) -> List:
+        return self.registry.query('SELECT * FROM documents WHERE participant_name = ?', (title,))
+
+    # --- WebSocket server ---
+
+    def handle(self, websocket) -> None:
+        """websockets handler: one LiveSession per connection"""
+        LiveSession(self, websocket).run()
+
+    def serve(self, host: str = "0.0.0.0", port: int = LIVE_VERIFY_PORT) -> None:
+        """Serve live sessions until shutdown() (blocks)"""
+        from websockets.sync.server import serve
+        with serve(self.handle, host, port, max_size=LIVE_MAX_FRAME_BYTES, compression=None) as server:
+            self._server = server
+            self.port = server.socket.getsockname()[1]
+            print(f"✓ Live verification on ws://{host}:{self.port}/")
+            server.serve_forever()
+
+    def serve_in_background(self, host: str = "0.0.0.0", port: int = LIVE_VERIFY_PORT) -> threading.Thread:
+        thread = threading.Thread(target=self.serve, args=(host, port), name="live-verify", daemon=True)
+        thread.start()
+        return thread
+
+    def shutdown(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+
+
+class LiveSession:
+    """One camera stream: a receiver (this connection's thread) and a matching worker"""
+
+    def __init__(self, verifier: LiveVerifier, websocket):
+        self.verifier = verifier
+        self.websocket = websocket
+        self.cond = threading.Condition()
+        self.pending: Optional[Tuple[bytes, float, float]] = None  # (frame, sharpness, received_at)
+        self.finished = False
+        self.ended = False  # client sent {"type": "end"} or disconnected
+        self.stats = Counter()
+        self.votes: Dict[str, Counter] = {name: Counter() for name in FIELD_DEFAULTS}
+        self.candidate = None  # (pHash distance, record, dHash distance) closest so far
+        self.started = None
+        self.receiver_cpu = 0.0  # thread CPU spent scoring frames
+        self.worker_cpu_start = 0.0
+        self._send_lock = threading.Lock()
+
+    def send(self, message: Dict) -> None:
+        with self._send_lock:
+            try:
+                self.websocket.send(json.dumps(message, default=str))
+            except Exception:
+                self.ended = True
+
+    def run(self) -> None:
+        worker = threading.Thread(target=self._work, name="live-verify-worker", daemon=True)
+        worker.start()
+        try:
+            for message in self.websocket:
+                if self.finished:
+                    break
+                if isinstance(message, str):
+                    if json.loads(message or "{}").get("type") == "end":
+                        break
+                    continue
+                self._receive(message)
+        except Exception as e:
+            print(f"⚠ Live verification stream: {e}")
+        finally:
+            with self.cond:
+                self.ended = True
+                self.cond.notify()
+            worker.join()
+
+    def _receive(self, frame: bytes) -> None:
+        """Score the frame cheaply; keep it only if it beats the one waiting"""
+        cpu, now = time.thread_time(), time.monotonic()
+        try:
+            self._score(frame, now)
+        finally:
+            self.receiver_cpu += time.thread_time() - cpu
+
+    def _score(self, frame: bytes, now: float) -> None:
+        if self.started is None:
+            self.started = now
+        self.stats["received"] += 1
+        small = decode_frame(frame, reduced=True)
+        score = sharpness(small) if small is not None else 0.0
+        if score < self.verifier.min_sharpness:
+            self.stats["too_blurry"] += 1
+            return
+        with self.cond:
+            if self.pending is not None:
+                self.stats["dropped_busy"] += 1
+                if self.pending[1] >= score:
+                    return
+            self.pending = (frame, score, now)
+            self.cond.notify()
+
+    def _work(self) -> None:
+        self.worker_cpu_start = time.thread_time()
+        while True:
+            with self.cond:
+                while self.pending is None and not self.ended and not self._timed_out():
+                    self.cond.wait(timeout=0.25)
+                if self.pending is None:
+                    break
+                frame, score, received_at = self.pending
+                self.pending = None
+            verdict = self._process(frame, score)
+            if verdict is not None:
+                verdict["frame_to_verdict_ms"] = round((time.monotonic() - received_at) * 1000, 1)
+                self._finish(verdict)
+                return
+            if self._timed_out():
+                break
+        self._finish({"status": "not_found", "message": "No registered label recognized in the stream"})
+
+    def _timed_out(self) -> bool:
+        return self.started is not None and time.monotonic() - self.started > self.verifier.max_seconds
+
+    def _finish(self, verdict: Dict) -> None:
+        """Push the verdict (called on the worker thread) and close the stream"""
+        self.finished = True
+        cpu = self.receiver_cpu + time.thread_time() - self.worker_cpu_start
+        verdict.update(type="verdict", frames=dict(self.stats), cpu_ms=round(cpu * 1000, 1),
+                       session_ms=round((time.monotonic() - (self.started or time.monotonic())) * 1000, 1))
+        self.send(verdict)
+        try:
+            self.websocket.close()
+        except Exception:
+            pass
+
+    # --- Matching ---
+
+    def _process(self, frame: bytes, score: float) -> Optional[Dict]:
+        verifier = self.verifier
+        gray = decode_frame(frame)
+        if gray is None:
+            self.stats["undecodable"] += 1
+            return None
+        self.stats["processed"] += 1
+
+        # 1. Perceptual hash: a re-photographed registered label gives a candidate.
+        # Labels printed from one template differ only in their serial, so OCR confirms it.
+        hashes = compute_hashes(gray)
+        if hashes:
+            hits = verifier.perceptual_index().query(*hashes, radius=verifier.candidate_distance)
+            if hits:
+                p_dist, d_dist, doc_id = hits[0]
+                if self.candidate is None or p_dist < self.candidate[0]:
+                    record = verifier.record(doc_id)
+                    if record is not None:
+                        self.candidate = (p_dist, record, d_dist)
+
+        # 2. OCR of this frame: the candidate's fingerprint or serial, any registered
+        # fingerprint, then fields voted across frames
+        lines = verifier.ocr(gray)
+        self.stats["ocr_runs"] += 1
+        details = LocalOCR.parse_details("\n".join(text for text, _ in lines)) if lines else {}
+        if details.get("document_content"):
+            fingerprint = verifier.fingerprint(details)
+            if self.candidate is not None:
+                p_dist, record, d_dist = self.candidate
+                serial = details.get("serial_no")
+                if record['document_hash'] == fingerprint or (
+                        serial and serial != FIELD_DEFAULTS["serial_no"]
+                        and record['participant_name'] == f"Product {serial}"):
+                    return self._verdict(record, {"method": "perceptual+ocr", "phash_distance": p_dist,
+                                                  "dhash_distance": d_dist})
+            record = verifier.registry.find_by_fingerprint(fingerprint)
+            if record is not None:
+                return self._verdict(record, {"method": "fingerprint"})
+        for name, default in FIELD_DEFAULTS.items():
+            value = details.get(name)
+            if value and value != default:
+                self.votes[name][value] += 1
+        record, method = self._voted_match()
+        if record is not None:
+            return self._verdict(record, {"method": method})
+
+        self.send({"type": "progress", "frames": dict(self.stats), "sharpness": round(score, 1),
+                   "fields": {name: votes.most_common(1)[0][0] for name, votes in self.votes.items() if votes}})
+        return None
+
+    def _voted_match(self):
+        """Record named by a serial number read in enough frames, if the rest of the label agrees"""
+        if not self.votes["serial_no"]:
+            return None, None
+        serial, count = self.votes["serial_no"].most_common(1)[0]
+        if count < self.verifier.field_votes:
+            return None, None
+        rows = self.verifier.by_title(f"Product {serial}")
+        if len(rows) != 1:
+            return None, None
+        record = rows[0]
+        if self.candidate is not None and self.candidate[1]['id'] == record['id']:
+            return record, "perceptual+ocr"
+        brand = self.votes["brand"].most_common(1)[0][0] if self.votes["brand"] else None
+        if brand and brand.strip().upper() == str(record['hackathon_name'] or "").strip().upper():
+            return record, "ocr_fields"
+        return None, None
+
+    def _verdict(self, record, match: Dict) -> Dict:
+        return {
+            "status": "verified",
+            "message": "Registered label recognized",
+            "document_hash": record['document_hash'],
+            "product_name": record['participant_name'],
+            "brand": record['hackathon_name'],
+            "match": match,
+        }
@@ -4,27 +4,65 @@ No external API dependencies - runs completely offline
 """
 
 import os
-import re
 import json
-from typing import Dict, Optional, Tuple
-from paddleocr import PaddleOCR
+import time
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
 import cv2
 import numpy as np
 from PIL import Image
 
+from field_extraction import collapse_whitespace, get_extractor
+
+# Fast tier: longest image side after downscaling, and the mean line
+# confidence below which the fast result is not trusted
+FAST_MAX_SIDE = int(os.getenv("OCR_FAST_MAX_SIDE", 960))
+FAST_MIN_CONFIDENCE = float(os.getenv("OCR_FAST_MIN_CONFIDENCE", 0.85))
+
+# PaddleOCR inference threads per engine (unset: PaddleOCR's default). The
+# production server sets it so workers x threads does not oversubscribe the CPU
+OCR_CPU_THREADS = int(os.getenv("OCR_CPU_THREADS", 0))
+
+# Inference backend: 'paddle' (PaddlePaddle inference), 'onnx' (exported
+# models on ONNX Runtime) or 'onnx-int8' (the quantized set, see onnx_ocr.py)
+OCR_BACKEND = os.getenv("OCR_BACKEND", "paddle")
+BACKENDS = ("paddle", "onnx", "onnx-int8")
+
+# Label field values parse_details reports when a field was not found
+FIELD_DEFAULTS = {"brand": "Genuine Brand", "serial_no": "Unknown", "mfg_date": "N/A"}
+
 class LocalOCR:
     """
     Local OCR engine using PaddleOCR for accurate text extraction
     """
     
-    def __init__(self):
-        """Initialize PaddleOCR with English language support"""
+    def __init__(self, use_angle_cls: bool = True, backend: str = OCR_BACKEND):
+        """
+        Initialize PaddleOCR with English language support
+
+        Args:
+            use_angle_cls: Angle classification (on for the full pipeline, off for the fast tier)
+            backend: 'paddle', 'onnx' or 'onnx-int8' (see BACKENDS)
+        """
+        self.backend = backend
+        # One predictor is not safe to call from several threads (request
+        # threads, the OCR engine pool and live sessions share these engines)
+        self._lock = threading.Lock()
         try:
-            # Initialize PaddleOCR with angle classification enabled
-            self.ocr = PaddleOCR(use_angle_cls=True, lang='en')
-            print("✓ PaddleOCR initialized successfully")
+            if backend not in BACKENDS:
+                raise ValueError(f"Unknown OCR backend: {backend}")
+            if backend == "paddle":
+                from paddleocr import PaddleOCR
+                options = {"cpu_threads": OCR_CPU_THREADS} if OCR_CPU_THREADS else {}
+                self.ocr = PaddleOCR(use_angle_cls=use_angle_cls, lang='en', **options)
+            else:
+                # Same models and result layout, run on ONNX Runtime
+                from onnx_ocr import OnnxPaddleOCR
+                precision = "int8" if backend == "onnx-int8" else "fp32"
+                self.ocr = OnnxPaddleOCR(use_angle_cls=use_angle_cls, precision=precision)
+            print(f"✓ PaddleOCR initialized successfully ({backend} backend)")
         except Exception as e:
-            print(f"⚠ PaddleOCR initialization error: {e}")
+            print(f"⚠ PaddleOCR initialization error ({backend} backend): {e}")
             self.ocr = None
     
     def preprocess_image(self, image_path: str) -> np.ndarray:
@@ -61,6 +99,43 @@ class LocalOCR:
             # Return original image if preprocessing fails
             return cv2.imread(image_path)
     
+    def load_fast_image(self, image_path: str, max_side: int = FAST_MAX_SIDE) -> np.ndarray:
+        """
+        Cheap input for the fast tier: grayscale, downscaled so the longest
+        side is at most max_side, no denoising or thresholding
+        """
+        img = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
+        if img is None:
+            return img
+        height, width = img.shape[:2]
+        scale = max_side / float(max(height, width))
+        if scale < 1.0:
+            img = cv2.resize(img, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+        return img
+
+    def recognize(self, img) -> List[Tuple[str, float]]:
+        """
+        Run PaddleOCR on an image (path or array); calls are serialized per engine
+        
+        Returns:
+            List of (text, confidence) per recognized line
+        """
+        if not self.ocr:
+            return []
+        
+        with self._lock:
+            result = self.ocr.ocr(img)
+        lines = []
+        if result and result[0]:
+            for line in result[0]:
+                if line and len(line) >= 2:
+                    # line[1] contains (text, confidence)
+                    if isinstance(line[1], (tuple, list)):
+                        lines.append((line[1][0], float(line[1][1]) if len(line[1]) > 1 else 0.0))
+                    else:
+                        lines.append((line[1], 0.0))
+        return lines
+
     def extract_text(self, image_path: str, preprocess: bool = True) -> str:
         """
         Extract text from image using PaddleOCR
@@ -83,19 +158,12 @@ class LocalOCR:
                 img = image_path
             
             # Perform OCR
-            result = self.ocr.ocr(img)
+            lines = self.recognize(img)
             
             # Extract text from results
-            if result and result[0]:
-                text_lines = []
-                for line in result[0]:
-                    if line and len(line) >= 2:
-                        # line[1] contains (text, confidence)
-                        text = line[1][0] if isinstance(line[1], tuple) else line[1]
-                        text_lines.append(text)
-                
-                full_text = "\n".join(text_lines)
-                print(f"✓ Extracted {len(text_lines)} lines of text")
+            if lines:
+                full_text = "\n".join(text for text, _ in lines)
+                print(f"✓ Extracted {len(lines)} lines of text")
                 return full_text
             
             return ""
@@ -104,7 +172,7 @@ class LocalOCR:
             print(f"OCR extraction error: {e}")
             return ""
     
-    def extract_document_details(self, image_path: str) -> Dict[str, str]:
+    def extract_document_details(self, image_path: str, profile: str = "default") -> Dict[str, str]:
         """
         Extract product label details (Brand, Serial No, Mfg Date)
         """
@@ -117,33 +185,47 @@ class LocalOCR:
         
         print(f"\n--- Extracted Content (Preview) ---\n{full_text[:500]}...\n-------------------\n")
         
+        return self.parse_details(full_text, profile)
+
+    @staticmethod
+    def parse_details(full_text: str, profile: str = "default", extra_metadata: Optional[Dict] = None) -> Dict[str, str]:
+        """
+        Build the details dict from OCR text in a single extraction pass.
+        Per-field positions and confidence are kept as JSON in 'metadata'.
+        """
         details = {
-            "document_content": re.sub(r'\s+', ' ', full_text).strip(),
+            "document_content": collapse_whitespace(full_text),
             "full_extracted_text": full_text,
             "product_name": "Authentic Item",
-            "brand": "Genuine Brand",
-            "serial_no": "Unknown",
-            "mfg_date": "N/A",
+            **FIELD_DEFAULTS,
             "document_title": "Product Label"
         }
 
-        # 1. Look for Brand (Usually capital letters at top or near 'Brand:')
-        brand_match = re.search(r"(?:Brand|Manufacturer|BY)[\s:]+([A-Z0-9\s]{3,20})", full_text, re.IGNORECASE)
-        if brand_match:
-            details["brand"] = brand_match.group(1).strip()
+        fields = get_extractor(profile).extract(full_text)
+
+        # 1. Brand (usually capital letters near 'Brand:' / 'BY')
+        if "brand" in fields:
+            details["brand"] = fields["brand"].value
 
-        # 2. Look for Serial/Product ID
-        serial_match = re.search(r"(?:S/N|Serial|ID|Code|UID)[\s:]+([A-Z0-9-]+)", full_text, re.IGNORECASE)
-        if serial_match:
-            details["serial_no"] = serial_match.group(1).strip()
+        # 2. Serial/Product ID
+        if "serial_no" in fields:
+            details["serial_no"] = fields["serial_no"].value
             details["product_name"] = f"Product {details['serial_no']}"
             details["document_title"] = details["product_name"]
 
-        # 3. Look for Manufacturing/Expiry Date
-        date_match = re.search(r"(?:MFD|MFG|Batch Date)[\s:]+([\d\/-]{6,10})", full_text, re.IGNORECASE)
-        if date_match:
-            details["mfg_date"] = date_match.group(1).strip()
+        # 3. Manufacturing/Batch Date
+        if "mfg_date" in fields:
+            details["mfg_date"] = fields["mfg_date"].value
 
+        metadata = {
+            "profile": profile,
+            "fields": {
+                name: {"value": m.value, "start": m.start, "end": m.end, "confidence": m.confidence}
+                for name, m in fields.items()
+            }
+        }
+        metadata.update(extra_metadata or {})
+        details["metadata"] = json.dumps(metadata)
         return details
 
     def _is_valid_name(self, candidate: str) -> bool:
@@ -180,22 +262,152 @@ class TesseractOCR:
             return ""
 
 
+# Long-lived engine instances (model loading is the expensive part)
+_engines: Dict[str, LocalOCR] = {}
+_engines_lock = threading.Lock()
+
+def get_local_ocr(fast: bool = False) -> LocalOCR:
+    """Return the shared full-pipeline or fast-tier PaddleOCR instance (OCR_BACKEND)"""
+    key = "fast" if fast else "full"
+    with _engines_lock:
+        if key not in _engines:
+            _engines[key] = LocalOCR(use_angle_cls=not fast)
+        return _engines[key]
+
+
+class TierStats:
+    """
+    Per-tier counters for tiered extraction: how often the fast tier is
+    accepted, why it escalates, and the time spent in each tier.
+    CPU time is process-wide, so it is approximate under concurrent load.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.tiers = {
+                tier: {"runs": 0, "accepted": 0, "wall_seconds": 0.0, "cpu_seconds": 0.0}
+                for tier in ("fast", "full")
+            }
+            self.escalations: Dict[str, int] = {}
+
+    def record(self, tier: str, accepted: bool, wall: float, cpu: float, reason: Optional[str] = None):
+        with self._lock:
+            stats = self.tiers[tier]
+            stats["runs"] += 1
+            stats["accepted"] += int(accepted)
+            stats["wall_seconds"] += wall
+            stats["cpu_seconds"] += cpu
+            if reason:
+                self.escalations[reason] = self.escalations.get(reason, 0) + 1
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            fast, full = self.tiers["fast"], self.tiers["full"]
+            report = {"tiers": {}, "escalations": dict(self.escalations)}
+            for tier, stats in self.tiers.items():
+                runs = stats["runs"]
+                report["tiers"][tier] = dict(
+                    stats,
+                    hit_rate=round(stats["accepted"] / runs, 4) if runs else None,
+                    avg_cpu_seconds=round(stats["cpu_seconds"] / runs, 4) if runs else None,
+                )
+            # CPU the fast hits would have cost on the full pipeline, minus what they did cost
+            if fast["accepted"] and full["runs"]:
+                avg_full = full["cpu_seconds"] / full["runs"]
+                avg_fast = fast["cpu_seconds"] / fast["runs"]
+                report["estimated_cpu_seconds_saved"] = round(fast["accepted"] * avg_full - fast["runs"] * avg_fast, 3)
+            return report
+
+
+tier_stats = TierStats()
+
+
+def _extract_fast(image_path: str, accept: Optional[Callable[[Dict], bool]]) -> Tuple[Optional[Dict], str]:
+    """
+    Fast tier: downscaled grayscale, no angle classification.
+    Returns (details, '') when accepted, else (None, escalation_reason).
+    """
+    engine = get_local_ocr(fast=True)
+    wall, cpu = time.perf_counter(), time.process_time()
+    details, reason = None, ""
+    try:
+        img = engine.load_fast_image(image_path)
+        lines = engine.recognize(img) if img is not None else []
+        confidence = sum(c for _, c in lines) / len(lines) if lines else 0.0
+        if not lines:
+            reason = "no_text"
+        elif confidence < FAST_MIN_CONFIDENCE:
+            reason = "low_confidence"
+        else:
+            details = LocalOCR.parse_details(
+                "\n".join(text for text, _ in lines),
+                extra_metadata={"ocr_tier": "fast", "ocr_confidence": round(confidence, 4)}
+            )
+            if accept is not None and not accept(details):
+                details, reason = None, "no_registry_match"
+    except Exception as e:
+        print(f"Fast OCR tier error: {e}")
+        details, reason = None, "error"
+
+    tier_stats.record("fast", details is not None, time.perf_counter() - wall,
+                      time.process_time() - cpu, reason or None)
+    return details, reason
+
+
 # Main OCR interface
-def extract_document_details(image_path: str) -> Dict[str, str]:
+def extract_document_details(image_path: str, tiered: bool = False,
+                             accept: Optional[Callable[[Dict], bool]] = None) -> Dict[str, str]:
     """
     Main function to extract details from document image
-    """
-    paddle_ocr = LocalOCR()
-    details = paddle_ocr.extract_document_details(image_path)
     
-    # If extraction is empty, try Tesseract
-    if not details.get("document_content"):
-        print("Trying Tesseract fallback...")
-        tesseract = TesseractOCR()
-        text = tesseract.extract_text(image_path)
-        if text:
-            details["document_content"] = re.sub(r'\s+', ' ', text).strip()
-            details["full_extracted_text"] = text
+    Args:
+        image_path: Path to the image file
+        tiered: Try the cheap fast tier first and escalate to the full
+            pipeline only when it fails its checks
+        accept: Optional check on the fast-tier details (e.g. the fingerprint
+            matches a registry entry); False escalates to the full pipeline
+
+    PDF and multi-page TIFF documents are streamed page by page instead
+    (see document_pages); the fast tier does not apply to them.
+    """
+    from document_pages import is_multipage, extract_multipage_details
+    if is_multipage(image_path):
+        return extract_multipage_details(image_path)
+
+    escalation = None
+    if tiered:
+        details, escalation = _extract_fast(image_path, accept)
+        if details is not None:
+            print("✓ Fast OCR tier accepted")
+            return details
+        print(f"Escalating to full OCR pipeline ({escalation})")
+
+    wall, cpu = time.perf_counter(), time.process_time()
+    # Paddle and Tesseract run under the ensemble's latency budget instead of back to back
+    from ocr_engines import get_default_ensemble
+    ensemble = get_default_ensemble()
+    result, trace = ensemble.run(image_path)
+    ocr_metadata = {"ocr_engine": result.engine, "ocr_mode": ensemble.mode, "ocr_engines": trace}
+    summary = ", ".join(f"{t['engine']}={t['status']}" for t in trace)
+    print(f"OCR engines: {summary} -> {result.engine}")
+
+    if result.text:
+        print(f"\n--- Extracted Content (Preview) ---\n{result.text[:500]}...\n-------------------\n")
+        details = LocalOCR.parse_details(result.text, extra_metadata=ocr_metadata)
+    else:
+        print("⚠ No text extracted from image")
+        details = {"document_content": "", "metadata": json.dumps(ocr_metadata)}
+
+    if tiered:
+        tier_stats.record("full", bool(details.get("document_content")),
+                          time.perf_counter() - wall, time.process_time() - cpu)
+        metadata = json.loads(details.get("metadata") or "{}")
+        metadata.update({"ocr_tier": "full", "escalation": escalation})
+        details["metadata"] = json.dumps(metadata)
     
     return details
 
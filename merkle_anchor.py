@@ -0,0 +1,280 @@
+"""
+Merkle Anchor Module
+Aggregates pending fingerprints into a Merkle tree, anchors only the root
+on Neo X in one transaction and keeps each leaf's inclusion proof, so
+registrations can be verified locally against a cached root.
+
+Hashing matches OpenZeppelin's MerkleProof (sorted pairs):
+    leaf = keccak256(fingerprint)
+    node = keccak256(min(a, b) ++ max(a, b))
+"""
+
+import os
+import json
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+from eth_hash.auto import keccak
+
+from registry_db import get_db_connection
+from registry_store import get_registry
+
+# Anchoring schedule: flush every interval, or early once a batch is full
+ANCHOR_INTERVAL = float(os.getenv("ANCHOR_INTERVAL_SECONDS", 60))
+ANCHOR_MAX_BATCH = int(os.getenv("ANCHOR_MAX_BATCH", 1024))
+
+
+def _bytes32(value) -> bytes:
+    if isinstance(value, bytes):
+        return value
+    text = str(value).strip().lower()
+    return bytes.fromhex(text[2:] if text.startswith("0x") else text)
+
+
+def leaf_hash(fingerprint) -> bytes:
+    return keccak(_bytes32(fingerprint))
+
+
+def _pair(a: bytes, b: bytes) -> bytes:
+    return keccak(a + b) if a <= b else keccak(b + a)
+
+
+def build_levels(leaves: List[bytes]) -> List[List[bytes]]:
+    """All tree levels, leaves first; an odd last node is carried up unchanged"""
+    if not leaves:
+        raise ValueError("Cannot build a Merkle tree without leaves")
+    levels = [list(leaves)]
+    while len(levels[-1]) > 1:
+        level = levels[-1]
+        levels.append([_pair(level[i], level[i + 1]) if i + 1 < len(level) else level[i]
+                       for i in range(0, len(level), 2)])
+    return levels
+
+
+def proof_for(levels: List[List[bytes]], index: int) -> List[bytes]:
+    """Sibling hashes from the leaf at index up to the root"""
+    proof = []
+    for level in levels[:-1]:
+        sibling = index ^ 1
+        if sibling < len(level):
+            proof.append(level[sibling])
+        index //= 2
+    return proof
+
+
+def verify_proof(fingerprint, proof: List, root) -> bool:
+    """Check a fingerprint's inclusion proof against a root (no RPC)"""
+    node = leaf_hash(fingerprint)
+    for sibling in proof:
+        node = _pair(node, _bytes32(sibling))
+    return node == _bytes32(root)
+
+
+class MerkleAnchorer:
+    """
+    Batches fingerprints into Merkle roots anchored by one transaction each.
+
+    Args:
+        send_anchor: callable(root_hex) -> txn hash that submits the anchor
+            transaction (the app passes its legacy data-anchor sender)
+        confirm_anchor: optional callable(txn_hash, root_hex) -> bool that
+            checks the root on-chain; called once per batch, then cached
+        db_path: registry database (defaults to the app's)
+        interval: seconds between scheduled flushes
+        max_batch: leaves per batch; a full batch flushes immediately
+        on_anchored: optional callable(txn_hash) run once the batch's registry
+            rows point at its transaction (the app copies a receipt the
+            confirmation tracker may already hold)
+    """
+
+    def __init__(self, send_anchor: Callable[[str], str], db_path=None,
+                 interval: float = ANCHOR_INTERVAL, max_batch: int = ANCHOR_MAX_BATCH,
+                 confirm_anchor: Optional[Callable[[str, str], bool]] = None,
+                 on_anchored: Optional[Callable[[str], None]] = None):
+        self.send_anchor = send_anchor
+        self.confirm_anchor = confirm_anchor
+        self.on_anchored = on_anchored
+        self.db_path = db_path
+        self.registry = get_registry(db_path)
+        self.interval = interval
+        self.max_batch = max_batch
+        self._roots: Dict[int, Tuple[str, str, bool]] = {}  # batch id -> (root, txn hash, confirmed)
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        # With several server processes only one runs the loop; the others just enqueue
+        self.autostart = True
+        self.ensure_tables()
+
+    def get_db_connection(self):
+        return get_db_connection(self.db_path)
+
+    def ensure_tables(self) -> None:
+        conn = self.get_db_connection()
+        conn.executescript('''
+            CREATE TABLE IF NOT EXISTS anchor_batches (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                root TEXT,
+                leaf_count INTEGER,
+                txn_hash TEXT,
+                status TEXT,           -- building / anchored / failed
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                anchored_at DATETIME,
+                confirmed_at DATETIME  -- root checked on-chain
+            );
+            CREATE TABLE IF NOT EXISTS anchor_leaves (
+                document_id INTEGER PRIMARY KEY,
+                fingerprint TEXT,
+                batch_id INTEGER,      -- NULL while pending
+                leaf_index INTEGER,
+                proof TEXT             -- JSON list of 0x sibling hashes
+            );
+            CREATE INDEX IF NOT EXISTS idx_anchor_leaves_fingerprint ON anchor_leaves(fingerprint);
+            CREATE INDEX IF NOT EXISTS idx_anchor_leaves_batch ON anchor_leaves(batch_id);
+        ''')
+        # Batches interrupted between building and sending go back to the queue
+        conn.execute("UPDATE anchor_leaves SET batch_id = NULL, leaf_index = NULL, proof = NULL "
+                     "WHERE batch_id IN (SELECT id FROM anchor_batches WHERE status = 'building')")
+        conn.execute("UPDATE anchor_batches SET status = 'failed' WHERE status = 'building'")
+        conn.commit()
+        conn.close()
+
+    # --- Queue ---
+
+    def enqueue(self, document_id: int, fingerprint: str) -> None:
+        """Queue a registered fingerprint for the next batch"""
+        conn = self.get_db_connection()
+        conn.execute('INSERT OR IGNORE INTO anchor_leaves (document_id, fingerprint) VALUES (?, ?)',
+                     (document_id, fingerprint.lower()))
+        pending = conn.execute('SELECT COUNT(*) FROM anchor_leaves WHERE batch_id IS NULL').fetchone()[0]
+        conn.commit()
+        conn.close()
+        if self.autostart:
+            self.start()
+        if pending >= self.max_batch:
+            self._wake.set()
+
+    def start(self) -> None:
+        """Start the background flush loop (idempotent)"""
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._loop, name="merkle-anchor", daemon=True)
+            self._thread.start()
+
+    def _loop(self) -> None:
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                while self.flush():
+                    pass
+            except Exception as e:
+                print(f"⚠ Merkle anchor flush failed: {e}")
+
+    def flush(self) -> Optional[Dict]:
+        """
+        Anchor up to max_batch pending fingerprints in one transaction
+
+        Returns:
+            Batch summary, or None when nothing was pending
+        """
+        with self._flush_lock:
+            conn = self.get_db_connection()
+            try:
+                rows = conn.execute('SELECT document_id, fingerprint FROM anchor_leaves WHERE batch_id IS NULL '
+                                    'ORDER BY document_id LIMIT ?', (self.max_batch,)).fetchall()
+                if not rows:
+                    return None
+
+                levels = build_levels([leaf_hash(row['fingerprint']) for row in rows])
+                root = "0x" + levels[-1][0].hex()
+                cursor = conn.execute("INSERT INTO anchor_batches (root, leaf_count, status) VALUES (?, ?, 'building')",
+                                      (root, len(rows)))
+                batch_id = cursor.lastrowid
+                conn.executemany(
+                    'UPDATE anchor_leaves SET batch_id = ?, leaf_index = ?, proof = ? WHERE document_id = ?',
+                    [(batch_id, i, json.dumps(["0x" + p.hex() for p in proof_for(levels, i)]), row['document_id'])
+                     for i, row in enumerate(rows)]
+                )
+                conn.commit()
+
+                try:
+                    txn_hash = self.send_anchor(root)
+                except Exception:
+                    conn.execute('UPDATE anchor_leaves SET batch_id = NULL, leaf_index = NULL, proof = NULL '
+                                 'WHERE batch_id = ?', (batch_id,))
+                    conn.execute("UPDATE anchor_batches SET status = 'failed' WHERE id = ?", (batch_id,))
+                    conn.commit()
+                    raise
+
+                # Registry rows (on any shard) point at the batch transaction as their genesis
+                # proof; done before the batch is marked anchored, so a crash in between re-queues
+                self.registry.update_documents([row['document_id'] for row in rows], txn_hash=txn_hash,
+                                               txn_status='pending')
+                conn.execute("UPDATE anchor_batches SET status = 'anchored', txn_hash = ?, anchored_at = CURRENT_TIMESTAMP "
+                             "WHERE id = ?", (txn_hash, batch_id))
+                conn.commit()
+                if self.on_anchored is not None:
+                    self.on_anchored(txn_hash)
+                self._roots[batch_id] = (root, txn_hash, False)
+                print(f"✓ Anchored {len(rows)} fingerprints in batch {batch_id} (root {root[:12]}..., tx {txn_hash[:12]}...)")
+                return {"batch_id": batch_id, "root": root, "leaf_count": len(rows), "txn_hash": txn_hash}
+            finally:
+                conn.close()
+
+    # --- Verification ---
+
+    def _root(self, conn, batch_id: int) -> Optional[Tuple[str, str, bool]]:
+        """Anchored root of a batch, confirming it on-chain the first time it is used"""
+        cached = self._roots.get(batch_id)
+        if cached is None:
+            row = conn.execute("SELECT root, txn_hash, confirmed_at FROM anchor_batches WHERE id = ? AND status = 'anchored'",
+                               (batch_id,)).fetchone()
+            if row is None:
+                return None
+            cached = self._roots[batch_id] = (row['root'], row['txn_hash'], row['confirmed_at'] is not None)
+        if not cached[2] and self.confirm_anchor is not None and self.confirm_anchor(cached[1], cached[0]):
+            conn.execute('UPDATE anchor_batches SET confirmed_at = CURRENT_TIMESTAMP WHERE id = ?', (batch_id,))
+            conn.commit()
+            cached = self._roots[batch_id] = (cached[0], cached[1], True)
+        return cached
+
+    def get_proof(self, fingerprint: str) -> Optional[Dict]:
+        """
+        Inclusion proof for a fingerprint
+
+        Returns:
+            {"status": "pending"} while queued, the proof with its root and
+            anchor transaction once anchored, or None if never queued
+        """
+        conn = self.get_db_connection()
+        try:
+            key = fingerprint.strip().lower()
+            key = key if key.startswith("0x") else "0x" + key
+            row = conn.execute('SELECT * FROM anchor_leaves WHERE fingerprint = ? ORDER BY batch_id IS NULL LIMIT 1',
+                               (key,)).fetchone()
+            if row is None:
+                return None
+            anchored = self._root(conn, row['batch_id']) if row['batch_id'] is not None else None
+            if anchored is None:
+                return {"status": "pending", "fingerprint": key}
+            return {
+                "status": "anchored",
+                "fingerprint": key,
+                "batch_id": row['batch_id'],
+                "leaf_index": row['leaf_index'],
+                "proof": json.loads(row['proof']),
+                "root": anchored[0],
+                "txn_hash": anchored[1],
+                "root_confirmed": anchored[2],
+            }
+        finally:
+            conn.close()
+
+    def verify(self, fingerprint: str) -> Tuple[bool, Dict]:
+        """Verify a fingerprint's inclusion locally against its batch root"""
+        proof = self.get_proof(fingerprint)
+        if proof is None or proof["status"] != "anchored":
+            return False, proof or {"status": "not_queued"}
+        if self.confirm_anchor is not None and not proof["root_confirmed"]:
+            return False, proof
+        return verify_proof(fingerprint, proof["proof"], proof["root"]), proof
@@ -0,0 +1,294 @@
+"""
+OCR Engine Orchestration
+Runs long-lived OCR engines concurrently under a latency budget and
+selects a result by priority or confidence
+"""
+
+import os
+import time
+import threading
+import statistics
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+
+from PIL import Image
+
+from local_ocr import LocalOCR, TesseractOCR, get_local_ocr
+
+# Orchestration defaults. Sequential runs Tesseract only when Paddle returns nothing,
+# so CPU-only hosts do not pay for both engines on every image.
+ENSEMBLE_MODE = os.getenv("OCR_ENSEMBLE_MODE", "sequential")
+ENGINE_BUDGET = float(os.getenv("OCR_ENGINE_BUDGET_MS", 30000)) / 1000.0
+# Hedge delay for secondary engines; unset: the primary's median latency over recent runs
+HEDGE_AFTER = float(os.environ["OCR_HEDGE_AFTER_MS"]) / 1000.0 if os.getenv("OCR_HEDGE_AFTER_MS") else None
+# Secondary engines started while the primary is still running (speculative work that
+# may be abandoned), across all requests of a process
+MAX_SPECULATIVE = int(os.getenv("OCR_MAX_SPECULATIVE", 1))
+MIN_CONFIDENCE = float(os.getenv("OCR_MIN_CONFIDENCE", 0.5))
+HEDGE_HISTORY = 32
+
+MODES = ("sequential", "hedged", "race", "best")
+
+
+class OCRResult(NamedTuple):
+    """Text produced by one engine for one image"""
+    engine: str
+    text: str
+    confidence: float
+    elapsed: float
+    error: Optional[str] = None
+
+
+class PaddleEngine:
+    """Full PaddleOCR pipeline (preprocessing + angle classification)"""
+    name = "paddle"
+
+    def __init__(self, ocr: Optional[LocalOCR] = None):
+        # LocalOCR.recognize serializes calls to its predictor; preprocessing runs outside it
+        self._ocr = ocr
+
+    @property
+    def ocr(self) -> LocalOCR:
+        if self._ocr is None:
+            self._ocr = get_local_ocr()
+        return self._ocr
+
+    def recognize(self, image_path: str) -> Tuple[str, float]:
+        img = self.ocr.preprocess_image(image_path)
+        lines = self.ocr.recognize(img)
+        if not lines:
+            return "", 0.0
+        return "\n".join(text for text, _ in lines), sum(c for _, c in lines) / len(lines)
+
+
+class TesseractEngine:
+    """Tesseract via pytesseract, confidence from per-word scores"""
+    name = "tesseract"
+
+    def __init__(self, tesseract: Optional[TesseractOCR] = None):
+        self._tesseract = tesseract
+
+    @property
+    def tesseract(self) -> TesseractOCR:
+        if self._tesseract is None:
+            self._tesseract = TesseractOCR()
+        return self._tesseract
+
+    def recognize(self, image_path: str) -> Tuple[str, float]:
+        pytesseract = self.tesseract.tesseract
+        if not pytesseract:
+            return "", 0.0
+
+        data = pytesseract.image_to_data(Image.open(image_path), output_type=pytesseract.Output.DICT)
+        lines: Dict[tuple, List[str]] = {}
+        scores = []
+        for i, word in enumerate(data["text"]):
+            conf = float(data["conf"][i])
+            if not word.strip() or conf < 0:
+                continue
+            key = (data["block_num"][i], data["par_num"][i], data["line_num"][i])
+            lines.setdefault(key, []).append(word)
+            scores.append(conf / 100.0)
+        text = "\n".join(" ".join(words) for words in lines.values())
+        return text, (sum(scores) / len(scores) if scores else 0.0)
+
+
+_executor = ThreadPoolExecutor(max_workers=int(os.getenv("OCR_ENGINE_WORKERS", 4)), thread_name_prefix="ocr-engine")
+
+
+def _run_engine(engine, image_path: str) -> OCRResult:
+    start = time.perf_counter()
+    try:
+        text, confidence = engine.recognize(image_path)
+        return OCRResult(engine.name, text or "", confidence, time.perf_counter() - start)
+    except Exception as e:
+        return OCRResult(engine.name, "", 0.0, time.perf_counter() - start, str(e))
+
+
+class EngineEnsemble:
+    """
+    Orchestrates several OCR engines for one image.
+
+    Modes:
+        sequential (default): run engines in priority order until one
+            returns text (the previous Paddle-then-Tesseract behaviour)
+        hedged: start secondaries once the primary has run for hedge_after
+            (by default its median latency, so about half of the images);
+            take the highest-priority engine that returns acceptable text,
+            falling back to lower priorities only when it fails or runs out
+            of budget. Worst case is the slowest engine, not the sum.
+        race: start every engine at once, first acceptable result wins
+        best: start every engine at once, wait for all within the budget,
+            pick the highest confidence
+
+    Secondaries started while the primary runs are speculative: at most
+    max_speculative run at once (beyond that they start only if the primary
+    fails), and engines not yet started when a request is decided or out of
+    budget are cancelled. Engines already running cannot be interrupted;
+    they finish in the background and are ignored.
+
+    Engines are any objects with a `name` and `recognize(image_path)`
+    returning (text, confidence), so stub engines can stand in for tests.
+    """
+
+    def __init__(self, engines: list, mode: str = ENSEMBLE_MODE, budget: float = ENGINE_BUDGET,
+                 hedge_after: Optional[float] = HEDGE_AFTER, min_confidence: float = MIN_CONFIDENCE,
+                 executor: Optional[ThreadPoolExecutor] = None, max_speculative: int = MAX_SPECULATIVE):
+        if mode not in MODES:
+            raise ValueError(f"Unknown ensemble mode: {mode}")
+        self.engines = list(engines)
+        self.mode = mode
+        self.budget = budget
+        self.hedge_after = hedge_after
+        self.min_confidence = min_confidence
+        self.executor = executor or _executor
+        self._speculative = threading.BoundedSemaphore(max_speculative) if max_speculative > 0 else None
+        self._primary_latency = deque(maxlen=HEDGE_HISTORY)  # seconds, successful primary runs
+
+    def _acceptable(self, result: OCRResult) -> bool:
+        return not result.error and bool(result.text.strip()) and result.confidence >= self.min_confidence
+
+    def run(self, image_path: str) -> Tuple[OCRResult, List[Dict]]:
+        """
+        Recognize an image with the configured strategy
+
+        Returns:
+            (chosen result, per-engine trace for this request)
+        """
+        if self.mode == "sequential":
+            results, started = self._run_sequential(image_path)
+        else:
+            results, started = self._run_concurrent(image_path)
+        primary = results.get(self.engines[0].name)
+        if primary is not None and not primary.error:
+            self._primary_latency.append(primary.elapsed)
+
+        chosen = self._select(results)
+        trace = []
+        for engine in self.engines:
+            result = results.get(engine.name)
+            if result is None:
+                status = "abandoned" if engine.name in started else "skipped"
+                trace.append({"engine": engine.name, "status": status, "chosen": False})
+                continue
+            trace.append({
+                "engine": engine.name,
+                "status": "error" if result.error else ("ok" if result.text.strip() else "empty"),
+                "elapsed_ms": round(result.elapsed * 1000, 1),
+                "confidence": round(result.confidence, 4),
+                "chosen": chosen is not None and chosen.engine == engine.name,
+            })
+        if chosen is None:
+            chosen = OCRResult("none", "", 0.0, 0.0, "no engine produced text")
+        return chosen, trace
+
+    def hedge_delay(self) -> Optional[float]:
+        """Seconds before secondaries start (hedged mode); None: only once the primary fails"""
+        if self.hedge_after is not None:
+            return self.hedge_after
+        if not self._primary_latency:
+            return None
+        return statistics.median(self._primary_latency)
+
+    def _run_sequential(self, image_path: str) -> Tuple[Dict[str, OCRResult], Set[str]]:
+        results = {}
+        for engine in self.engines:
+            result = _run_engine(engine, image_path)
+            results[engine.name] = result
+            if result.text.strip():
+                break
+        return results, set(results)
+
+    def _start_speculative(self) -> bool:
+        """Take a speculative slot (released when that engine run ends)"""
+        return self._speculative is not None and self._speculative.acquire(blocking=False)
+
+    def _run_concurrent(self, image_path: str) -> Tuple[Dict[str, OCRResult], Set[str]]:
+        deadline = time.monotonic() + self.budget
+        futures = {}
+        pending_starts = list(self.engines)
+
+        def start(engine, speculative: bool):
+            future = self.executor.submit(_run_engine, engine, image_path)
+            if speculative:
+                future.add_done_callback(lambda f: self._speculative.release())
+            futures[future] = engine
+
+        # Primary starts now; secondaries right away (race, best) or after the hedge delay
+        start(pending_starts.pop(0), speculative=False)
+        delay = self.hedge_delay() if self.mode == "hedged" else 0.0
+        hedge_at = None if delay is None else time.monotonic() + delay
+
+        results: Dict[str, OCRResult] = {}
+        try:
+            while True:
+                for future in [f for f in futures if f.done()]:
+                    results.setdefault(futures[future].name, future.result())
+                if self._decided(results):
+                    break
+
+                now = time.monotonic()
+                running = [f for f in futures if not f.done()]
+                if pending_starts and not running:
+                    # Nothing left running: the remaining engines are the fallback, not speculation
+                    while pending_starts:
+                        start(pending_starts.pop(0), speculative=False)
+                    continue
+                if pending_starts and hedge_at is not None and now >= hedge_at:
+                    while pending_starts and self._start_speculative():
+                        start(pending_starts.pop(0), speculative=True)
+                    if pending_starts:
+                        hedge_at = None  # no slot free: wait for the running engines instead
+                    continue
+
+                if not running or now >= deadline:
+                    break
+                wake = deadline if hedge_at is None or not pending_starts else min(deadline, hedge_at)
+                wait(running, timeout=max(0.0, wake - now), return_when=FIRST_COMPLETED)
+        finally:
+            # Engines still queued are dropped; running ones finish in the background and are ignored
+            for future in futures:
+                future.cancel()
+        started = {engine.name for future, engine in futures.items() if not future.cancelled()}
+        return results, started
+
+    def _decided(self, results: Dict[str, OCRResult]) -> bool:
+        if self.mode == "race":
+            return any(self._acceptable(r) for r in results.values())
+        if self.mode == "hedged":
+            # Decided once an engine is acceptable and every higher-priority engine has failed
+            for engine in self.engines:
+                result = results.get(engine.name)
+                if result is None:
+                    return False
+                if self._acceptable(result):
+                    return True
+            return True
+        return len(results) == len(self.engines)
+
+    def _select(self, results: Dict[str, OCRResult]) -> Optional[OCRResult]:
+        candidates = [results[e.name] for e in self.engines if e.name in results]
+        acceptable = [r for r in candidates if self._acceptable(r)]
+        if self.mode == "best":
+            pool = acceptable or [r for r in candidates if r.text.strip()]
+            return max(pool, key=lambda r: r.confidence) if pool else None
+        if self.mode == "race" and acceptable:
+            return min(acceptable, key=lambda r: r.elapsed)
+        # Priority order: first acceptable, else first with any text
+        for result in acceptable or [r for r in candidates if r.text.strip()]:
+            return result
+        return None
+
+
+_default_ensemble: Optional[EngineEnsemble] = None
+_default_lock = threading.Lock()
+
+
+def get_default_ensemble() -> EngineEnsemble:
+    """Shared Paddle + Tesseract ensemble built from the environment"""
+    global _default_ensemble
+    with _default_lock:
+        if _default_ensemble is None:
+            _default_ensemble = EngineEnsemble([PaddleEngine(), TesseractEngine()])
+        return _default_ensemble
@@ -0,0 +1,372 @@
+"""
+Offline Snapshot Module
+Fingerprint snapshots that field inspectors and kiosks verify against
+with no network: registered fingerprints, sorted and fixed-width, behind a
+128-byte header. Readers mmap the file and answer membership by
+interpolation search (fingerprints are keccak hashes, so uniformly spread),
+touching a few pages per lookup instead of loading the file.
+
+Header (little-endian):
+    magic "VCSNAP\\0\\0", version, kind (full / delta), record size,
+    record count, creation time, SHA-256 checksum (of the header with the
+    checksum zeroed, plus the records), checksum of the parent snapshot
+
+A delta holds the fingerprints missing from its base snapshots (a full one,
+then earlier deltas) and names the last of them as parent, so readers can
+check that a chain is complete and in order. Records may be truncated to a
+prefix (--bytes 16 halves the file; a forged label would still need a
+second preimage of 128 bits).
+
+Registrations whose transaction failed on-chain are left out.
+
+    python offline_snapshot.py export registry.vcs
+    python offline_snapshot.py export delta-1.vcs --base registry.vcs
+    python offline_snapshot.py export delta-2.vcs --base registry.vcs --base delta-1.vcs
+    python offline_snapshot.py verify registry.vcs delta-1.vcs delta-2.vcs
+    python offline_snapshot.py lookup registry.vcs delta-1.vcs -f 0x3f2a...
+    python offline_snapshot.py merge registry-2.vcs registry.vcs delta-1.vcs delta-2.vcs
+"""
+
+import os
+import sys
+import mmap
+import time
+import struct
+import hashlib
+import argparse
+from typing import Iterable, List, Optional
+
+import numpy as np
+
+from registry_db import fingerprint_for, hash_to_blob
+from registry_store import RegistryStore
+
+MAGIC = b"VCSNAP\0\0"
+FORMAT_VERSION = 1
+FULL = 0
+DELTA = 1
+KINDS = {FULL: "full", DELTA: "delta"}
+
+# magic, version, kind, record size, reserved, count, created, checksum, parent, reserved
+HEADER = struct.Struct("<8sHHHHQQ32s32s32s")
+HEADER_SIZE = HEADER.size  # 128, so records stay 16- and 32-byte aligned
+CHECKSUM_OFFSET = 32
+NO_PARENT = bytes(32)
+
+# Interpolation probes before falling back to bisection (bounds the worst case)
+INTERPOLATION_STEPS = 3
+
+
+class SnapshotError(Exception):
+    """A snapshot file is malformed, corrupt or out of chain order"""
+
+
+def snapshot_key(fingerprint, record_size: int = 32) -> Optional[bytes]:
+    """Record key of a fingerprint (hex with or without 0x, or decimal token id)"""
+    blob = hash_to_blob(fingerprint_for(fingerprint))
+    return blob[:record_size] if blob is not None else None
+
+
+def write_snapshot(path: str, records: np.ndarray, kind: int = FULL, parent: bytes = NO_PARENT) -> bytes:
+    """
+    Write sorted, distinct records as a snapshot file (atomically)
+
+    Args:
+        records: numpy array of dtype S<record size>, sorted and distinct
+        kind: FULL or DELTA
+        parent: checksum of the snapshot a delta applies to
+
+    Returns:
+        The snapshot checksum
+    """
+    record_size = records.dtype.itemsize
+    body = records.tobytes()
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, kind, record_size, 0, len(records), int(time.time()),
+                         NO_PARENT, parent, bytes(32))
+    checksum = hashlib.sha256(header)
+    checksum.update(body)
+    checksum = checksum.digest()
+    header = header[:CHECKSUM_OFFSET] + checksum + header[CHECKSUM_OFFSET + 32:]
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(header)
+        f.write(body)
+    os.replace(tmp, path)
+    return checksum
+
+
+class Snapshot:
+    """
+    Read-only, memory-mapped snapshot file
+
+    Args:
+        path: snapshot file
+        verify: check the checksum on open (reads the whole file once)
+    """
+
+    def __init__(self, path: str, verify: bool = False):
+        self.path = path
+        with open(path, "rb") as f:
+            header = f.read(HEADER_SIZE)
+            if len(header) < HEADER_SIZE or header[:8] != MAGIC:
+                raise SnapshotError(f"{path}: not a fingerprint snapshot")
+            (_, self.version, self.kind, self.record_size, _, self.count, self.created,
+             self.checksum, self.parent, _) = HEADER.unpack(header)
+            if self.version != FORMAT_VERSION:
+                raise SnapshotError(f"{path}: unsupported snapshot version {self.version}")
+            size = os.fstat(f.fileno()).st_size
+            if size != HEADER_SIZE + self.count * self.record_size:
+                raise SnapshotError(f"{path}: truncated ({size} bytes for {self.count} records)")
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if hasattr(self._mm, "madvise"):
+            # Lookups jump around the file; readahead would only pull in pages nobody asked for
+            self._mm.madvise(mmap.MADV_RANDOM)
+        self._first = self._record(0) if self.count else None
+        self._last = self._record(self.count - 1) if self.count else None
+        self._array = None
+        if verify and not self.verify():
+            raise SnapshotError(f"{path}: checksum mismatch")
+
+    def __len__(self):
+        return self.count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self) -> None:
+        self._array = None  # numpy views pin the mapping
+        self._mm.close()
+
+    def _record(self, index: int) -> bytes:
+        start = HEADER_SIZE + index * self.record_size
+        return self._mm[start:start + self.record_size]
+
+    def records(self) -> np.ndarray:
+        """All records as a numpy array over the mapping (nothing is copied)"""
+        if self._array is None:
+            self._array = np.frombuffer(self._mm, dtype=f"S{self.record_size}", count=self.count,
+                                        offset=HEADER_SIZE)
+        return self._array
+
+    def verify(self) -> bool:
+        """Recompute the checksum"""
+        header = bytearray(self._mm[:HEADER_SIZE])
+        header[CHECKSUM_OFFSET:CHECKSUM_OFFSET + 32] = NO_PARENT
+        digest = hashlib.sha256(header)
+        chunk = 1 << 24
+        for start in range(HEADER_SIZE, len(self._mm), chunk):
+            digest.update(self._mm[start:start + chunk])
+        return digest.digest() == self.checksum
+
+    def contains_key(self, key: bytes, interpolate: bool = True) -> bool:
+        """Membership of a record key (snapshot_key) by interpolation, then binary, search"""
+        if not self.count or key < self._first or key > self._last:
+            return False
+        lo, hi = 0, self.count - 1
+        lo_value = int.from_bytes(self._first[:8], "big")
+        hi_value = int.from_bytes(self._last[:8], "big")
+        target = int.from_bytes(key[:8], "big")
+        steps = INTERPOLATION_STEPS if interpolate else 0
+        while lo <= hi:
+            if steps and hi_value > lo_value:
+                steps -= 1
+                mid = lo + (target - lo_value) * (hi - lo) // (hi_value - lo_value)
+                mid = min(max(mid, lo), hi)
+            else:
+                mid = (lo + hi) // 2
+            record = self._record(mid)
+            if record == key:
+                return True
+            if record < key:
+                lo, lo_value = mid + 1, int.from_bytes(record[:8], "big")
+            else:
+                hi, hi_value = mid - 1, int.from_bytes(record[:8], "big")
+        return False
+
+    def __contains__(self, fingerprint) -> bool:
+        key = snapshot_key(fingerprint, self.record_size)
+        return key is not None and self.contains_key(key)
+
+    def contains_keys(self, keys: np.ndarray) -> np.ndarray:
+        """Vectorized membership of an array of record keys (dtype S<record size>)"""
+        records = self.records()
+        if not self.count or not len(keys):
+            return np.zeros(len(keys), dtype=bool)
+        # Searching in key order walks the file front to back instead of at random
+        order = np.argsort(keys)
+        ordered = keys[order]
+        positions = np.minimum(np.searchsorted(records, ordered), self.count - 1)
+        found = np.empty(len(keys), dtype=bool)
+        found[order] = records[positions] == ordered
+        return found
+
+    def describe(self) -> dict:
+        return {"path": self.path, "kind": KINDS.get(self.kind, self.kind), "records": self.count,
+                "record_bytes": self.record_size, "bytes": HEADER_SIZE + self.count * self.record_size,
+                "created": self.created, "checksum": self.checksum.hex(),
+                "parent": self.parent.hex() if self.parent != NO_PARENT else None}
+
+
+class SnapshotChain:
+    """
+    A full snapshot and the deltas applied on top of it, in order
+
+    Args:
+        paths: the full snapshot first, then each delta
+        verify: check every file's checksum on open
+
+    Raises:
+        SnapshotError: a file is invalid, or the chain is out of order
+    """
+
+    def __init__(self, paths: Iterable[str], verify: bool = False):
+        self.snapshots: List[Snapshot] = []
+        try:
+            for path in paths:
+                snapshot = Snapshot(path, verify=verify)
+                self.snapshots.append(snapshot)
+                previous = self.snapshots[-2] if len(self.snapshots) > 1 else None
+                if previous is None and snapshot.kind != FULL:
+                    raise SnapshotError(f"{path}: a chain starts with a full snapshot")
+                if previous is not None and (snapshot.kind != DELTA or snapshot.parent != previous.checksum):
+                    raise SnapshotError(f"{path}: not a delta of {previous.path}")
+                if snapshot.record_size != self.snapshots[0].record_size:
+                    raise SnapshotError(f"{path}: record size differs from {self.snapshots[0].path}")
+        except Exception:
+            self.close()
+            raise
+        if not self.snapshots:
+            raise SnapshotError("No snapshot files given")
+        self.record_size = self.snapshots[0].record_size
+
+    def __len__(self):
+        return sum(s.count for s in self.snapshots)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self) -> None:
+        for snapshot in self.snapshots:
+            snapshot.close()
+
+    def __contains__(self, fingerprint) -> bool:
+        key = snapshot_key(fingerprint, self.record_size)
+        # Deltas are small and hold the newest labels: check them first
+        return key is not None and any(s.contains_key(key) for s in reversed(self.snapshots))
+
+    def contains_keys(self, keys: np.ndarray) -> np.ndarray:
+        found = np.zeros(len(keys), dtype=bool)
+        for snapshot in self.snapshots:
+            found |= snapshot.contains_keys(keys)
+        return found
+
+    @property
+    def checksum(self) -> bytes:
+        return self.snapshots[-1].checksum
+
+
+def registry_keys(store: RegistryStore, record_size: int = 32) -> np.ndarray:
+    """Sorted, distinct record keys of every registered fingerprint"""
+    def shard_keys(conn, shard):
+        conn.row_factory = None
+        keys = bytearray()
+        for (value,) in conn.execute("SELECT document_hash FROM documents WHERE txn_status IS NOT 'failed'"):
+            blob = value if value.__class__ is bytes and len(value) == 32 else hash_to_blob(value)
+            if blob is not None:
+                keys += blob[:record_size]
+        return keys
+    keys = b"".join(store.fan_out(shard_keys))
+    return np.unique(np.frombuffer(keys, dtype=f"S{record_size}"))
+
+
+def export(path: str, store: RegistryStore, bases: Iterable[str] = (), record_size: int = 32) -> dict:
+    """
+    Export the registry as a full snapshot, or as a delta over base snapshots
+
+    Args:
+        path: output file
+        store: registry to export
+        bases: a full snapshot and earlier deltas; when given, only
+            fingerprints missing from all of them are written
+        record_size: bytes kept per fingerprint (full snapshots; deltas use the base's)
+
+    Returns:
+        describe() of the written snapshot
+    """
+    bases = list(bases)
+    if not bases:
+        write_snapshot(path, registry_keys(store, record_size))
+    else:
+        with SnapshotChain(bases) as chain:
+            keys = registry_keys(store, chain.record_size)
+            write_snapshot(path, keys[~chain.contains_keys(keys)], DELTA, chain.checksum)
+    with Snapshot(path) as snapshot:
+        return snapshot.describe()
+
+
+def merge(path: str, paths: Iterable[str]) -> dict:
+    """Fold a chain (full snapshot plus deltas) into one full snapshot"""
+    with SnapshotChain(paths, verify=True) as chain:
+        keys = np.unique(np.concatenate([s.records() for s in chain.snapshots]))
+    write_snapshot(path, keys)
+    with Snapshot(path) as snapshot:
+        return snapshot.describe()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Offline fingerprint snapshots")
+    sub = parser.add_subparsers(dest="command", required=True)
+    export_cmd = sub.add_parser("export", help="Write a full snapshot, or a delta with --base")
+    export_cmd.add_argument("output")
+    export_cmd.add_argument("--base", action="append", default=[],
+                            help="Full snapshot, then earlier deltas (repeat, in order)")
+    export_cmd.add_argument("--bytes", type=int, default=32, choices=range(8, 33), metavar="8-32",
+                            help="Bytes kept per fingerprint (default 32)")
+    export_cmd.add_argument("--db", default=None, help="Main registry database (default DB_PATH)")
+    export_cmd.add_argument("--shards", type=int, default=None, help="Registry shard count (default REGISTRY_SHARDS)")
+    merge_cmd = sub.add_parser("merge", help="Fold a snapshot and its deltas into one full snapshot")
+    merge_cmd.add_argument("output")
+    merge_cmd.add_argument("chain", nargs="+")
+    verify_cmd = sub.add_parser("verify", help="Check checksums and chain order")
+    verify_cmd.add_argument("chain", nargs="+")
+    lookup_cmd = sub.add_parser("lookup", help="Check fingerprints against a chain (exit 1 if any is missing)")
+    lookup_cmd.add_argument("chain", nargs="+")
+    lookup_cmd.add_argument("-f", "--fingerprint", action="append", required=True)
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == "export":
+            start = time.perf_counter()
+            info = export(args.output, RegistryStore(args.db, args.shards), args.base, args.bytes)
+            print(f"✓ Wrote {info['kind']} snapshot {args.output}: {info['records']} fingerprints, "
+                  f"{info['bytes'] / 2 ** 20:.1f} MiB in {time.perf_counter() - start:.1f}s")
+        elif args.command == "merge":
+            info = merge(args.output, args.chain)
+            print(f"✓ Wrote full snapshot {args.output}: {info['records']} fingerprints")
+        elif args.command == "verify":
+            with SnapshotChain(args.chain, verify=True) as chain:
+                for snapshot in chain.snapshots:
+                    info = snapshot.describe()
+                    print(f"  {info['kind']:<5} {info['records']:>10} fingerprints  {info['checksum'][:16]}  "
+                          f"{snapshot.path}")
+            print(f"✓ Chain valid: {len(chain)} fingerprints")
+        else:
+            with SnapshotChain(args.chain) as chain:
+                found = [fingerprint in chain for fingerprint in args.fingerprint]
+            for fingerprint, hit in zip(args.fingerprint, found):
+                print(f"  {'✓ registered' if hit else '⚠ not found '}  {fingerprint}")
+            return 0 if all(found) else 1
+    except SnapshotError as e:
+        print(f"⚠ {e}")
+        return 2
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,430 @@
+"""
+ONNX Runtime OCR Backend
+PaddleOCR's detection, angle classification and recognition models exported
+to ONNX (paddle2onnx) and run on ONNX Runtime's CPU provider, optionally
+with an int8-quantized model set. OnnxPaddleOCR.ocr() returns PaddleOCR's
+result layout so LocalOCR uses it as a drop-in engine (OCR_BACKEND=onnx).
+
+Model directory layout (OCR_ONNX_MODEL_DIR):
+    det.onnx  rec.onnx  cls.onnx          full precision
+    det.int8.onnx  rec.int8.onnx  ...     quantized set (python onnx_ocr.py quantize)
+    dict.txt                              recognition alphabet (optional when
+                                          rec.onnx carries it as metadata)
+
+Usage:
+    python onnx_ocr.py export <paddle det dir> <paddle rec dir> [<paddle cls dir>] [--dict en_dict.txt]
+    python onnx_ocr.py quantize [image ...]
+    python onnx_ocr.py <image_path>
+"""
+
+import os
+import sys
+import math
+import shutil
+import threading
+import subprocess
+import weakref
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+ONNX_MODEL_DIR = os.getenv("OCR_ONNX_MODEL_DIR", os.path.join(BASE_DIR, "models", "onnx"))
+# ONNX Runtime threads per session: intra-op splits one operator across cores,
+# inter-op runs independent graph branches (the OCR models are chains, so 1).
+# 0 falls back to OCR_CPU_THREADS, then to ONNX Runtime's default (one per core)
+ONNX_INTRA_OP_THREADS = int(os.getenv("OCR_ONNX_INTRA_OP_THREADS", 0))
+ONNX_INTER_OP_THREADS = int(os.getenv("OCR_ONNX_INTER_OP_THREADS", 1))
+# The CPU memory arena keeps the peak activation memory of every input size
+# seen; off, buffers go back to the allocator (about half the RSS, ~5% slower)
+ONNX_MEM_ARENA = os.getenv("OCR_ONNX_MEM_ARENA", "1") != "0"
+
+PRECISIONS = ("fp32", "int8")
+MODELS = ("det", "cls", "rec")
+DICT_FILE = "dict.txt"
+
+# PaddleOCR's defaults for the English pipeline
+DET_LIMIT_SIDE = 960
+DET_THRESH = 0.3
+DET_BOX_THRESH = 0.6
+DET_UNCLIP_RATIO = 1.5
+DET_MIN_SIZE = 3
+DET_MEAN = np.array([0.485, 0.456, 0.406], dtype=np.float32)
+DET_STD = np.array([0.229, 0.224, 0.225], dtype=np.float32)
+CLS_SHAPE = (48, 192)
+CLS_THRESH = 0.9
+REC_HEIGHT = 48
+REC_MIN_WIDTH = 320
+REC_BATCH = 6
+DROP_SCORE = 0.5
+QUANT_OPSET = 13
+
+
+def model_path(name: str, precision: str = "fp32", model_dir: str = ONNX_MODEL_DIR) -> str:
+    """Path of one model of a set, e.g. det.onnx or det.int8.onnx"""
+    suffix = ".onnx" if precision == "fp32" else f".{precision}.onnx"
+    return os.path.join(model_dir, name + suffix)
+
+
+def session_options(intra_op_threads: int = 0, inter_op_threads: int = ONNX_INTER_OP_THREADS):
+    import onnxruntime as ort
+    from local_ocr import OCR_CPU_THREADS
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    options.enable_cpu_mem_arena = ONNX_MEM_ARENA
+    threads = intra_op_threads or ONNX_INTRA_OP_THREADS or OCR_CPU_THREADS
+    if threads:
+        options.intra_op_num_threads = threads
+    options.inter_op_num_threads = inter_op_threads
+    return options
+
+
+def det_input(img: np.ndarray) -> np.ndarray:
+    """Detection input: longest side at most DET_LIMIT_SIDE, both sides multiples of 32, NCHW"""
+    height, width = img.shape[:2]
+    scale = min(1.0, DET_LIMIT_SIDE / max(height, width))
+    resized = cv2.resize(img, (max(32, int(round(width * scale / 32)) * 32),
+                               max(32, int(round(height * scale / 32)) * 32)))
+    batch = ((resized.astype(np.float32) / 255.0 - DET_MEAN) / DET_STD).transpose(2, 0, 1)[None]
+    return np.ascontiguousarray(batch)
+
+
+# Engines whose sessions a forked child has to rebuild (see _after_fork)
+_engines = weakref.WeakSet()
+# Sessions inherited from the parent: never freed, their destructor would
+# wait forever on thread pool threads that did not survive the fork
+_inherited: List = []
+
+
+def _after_fork():
+    # Set the parent's sessions aside and let the child build its own on first use
+    for engine in list(_engines):
+        _inherited.extend(engine._sessions.values())
+        engine._lock = threading.Lock()
+        engine._sessions = {}
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork)
+
+
+class OnnxPaddleOCR:
+    """
+    PaddleOCR pipeline (DB text detection, optional 0/180 degree angle
+    classification, CTC recognition) on ONNX Runtime
+
+    Sessions are created on first use in each process; __init__ only checks
+    the model files, so a preloading parent can construct the engine cheaply.
+    """
+
+    def __init__(self, use_angle_cls: bool = True, precision: str = "fp32", model_dir: str = ONNX_MODEL_DIR,
+                 intra_op_threads: int = 0, inter_op_threads: int = ONNX_INTER_OP_THREADS):
+        """
+        Args:
+            use_angle_cls: Run the angle classifier (skipped if cls model is missing)
+            precision: 'fp32' or 'int8' model set
+            model_dir: Directory holding the exported models
+            intra_op_threads: Threads per operator (0: OCR_ONNX_INTRA_OP_THREADS / OCR_CPU_THREADS)
+            inter_op_threads: Threads across independent operators
+        """
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unknown ONNX precision: {precision}")
+        self.precision = precision
+        self.paths = {name: model_path(name, precision, model_dir) for name in MODELS}
+        for name in ("det", "rec"):
+            if not os.path.exists(self.paths[name]):
+                raise FileNotFoundError(f"ONNX {name} model not found: {self.paths[name]}")
+        self.use_angle_cls = use_angle_cls and os.path.exists(self.paths["cls"])
+        self.intra_op_threads = intra_op_threads
+        self.inter_op_threads = inter_op_threads
+        self.characters = self._load_characters(model_dir)
+        self._lock = threading.Lock()
+        self._sessions: Dict = {}
+        _engines.add(self)
+
+    def _load_characters(self, model_dir: str) -> List[str]:
+        """CTC alphabet: blank, the dictionary, then space (PaddleOCR's use_space_char)"""
+        dict_path = os.path.join(model_dir, DICT_FILE)
+        if os.path.exists(dict_path):
+            with open(dict_path, encoding="utf-8") as f:
+                chars = [line.rstrip("\r\n") for line in f]
+        else:
+            # paddle2onnx exports of PP-OCRv4 rec models keep the alphabet as metadata
+            import onnx
+            model = onnx.load(self.paths["rec"], load_external_data=False)
+            meta = {prop.key: prop.value for prop in model.metadata_props}
+            if "character" not in meta:
+                raise FileNotFoundError(f"No {DICT_FILE} in {model_dir} and no alphabet in rec model")
+            chars = meta["character"].splitlines()
+        return ["blank"] + chars + [" "]
+
+    def session(self, name: str):
+        """The ONNX Runtime session for one model, created on first use"""
+        session = self._sessions.get(name)
+        if session is None:
+            import onnxruntime as ort
+            with self._lock:
+                session = self._sessions.get(name)
+                if session is None:
+                    session = ort.InferenceSession(self.paths[name],
+                                                   session_options(self.intra_op_threads, self.inter_op_threads),
+                                                   providers=["CPUExecutionProvider"])
+                    self._sessions[name] = session
+        return session
+
+    def _run(self, name: str, batch: np.ndarray) -> np.ndarray:
+        session = self.session(name)
+        return session.run(None, {session.get_inputs()[0].name: batch})[0]
+
+    # --- detection ---
+
+    def detect(self, img: np.ndarray) -> List[np.ndarray]:
+        """Text boxes (4x2 float32 corners, clockwise from top-left) in reading order"""
+        height, width = img.shape[:2]
+        batch = det_input(img)
+        resized_h, resized_w = batch.shape[2:]
+        prob = self._run("det", batch)[0, 0]
+
+        bitmap = (prob > DET_THRESH).astype(np.uint8)
+        contours, _ = cv2.findContours(bitmap, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
+        ratio = np.array([width / resized_w, height / resized_h], dtype=np.float32)
+        boxes = []
+        for contour in contours[:1000]:
+            (cx, cy), (w, h), angle = cv2.minAreaRect(contour)
+            if min(w, h) < DET_MIN_SIZE or self._box_score(prob, contour) < DET_BOX_THRESH:
+                continue
+            # Unclip: offset the rectangle outwards by area * ratio / perimeter
+            distance = w * h * DET_UNCLIP_RATIO / (2 * (w + h))
+            w, h = w + 2 * distance, h + 2 * distance
+            if min(w, h) < DET_MIN_SIZE + 2:
+                continue
+            box = self._order_points(cv2.boxPoints(((cx, cy), (w, h), angle))) * ratio
+            box[:, 0] = np.clip(box[:, 0], 0, width)
+            box[:, 1] = np.clip(box[:, 1], 0, height)
+            boxes.append(box)
+        return self._reading_order(boxes)
+
+    @staticmethod
+    def _box_score(prob: np.ndarray, contour: np.ndarray) -> float:
+        """Mean probability inside the contour's bounding box (PaddleOCR's 'fast' score)"""
+        x, y, w, h = cv2.boundingRect(contour)
+        mask = np.zeros((h, w), dtype=np.uint8)
+        cv2.fillPoly(mask, [contour.reshape(-1, 2) - (x, y)], 1)
+        return cv2.mean(prob[y:y + h, x:x + w], mask)[0]
+
+    @staticmethod
+    def _order_points(points: np.ndarray) -> np.ndarray:
+        by_x = points[np.argsort(points[:, 0])]
+        left, right = by_x[:2], by_x[2:]
+        top_left, bottom_left = left[np.argsort(left[:, 1])]
+        top_right, bottom_right = right[np.argsort(right[:, 1])]
+        return np.array([top_left, top_right, bottom_right, bottom_left], dtype=np.float32)
+
+    @staticmethod
+    def _reading_order(boxes: List[np.ndarray]) -> List[np.ndarray]:
+        """Top to bottom, left to right within a line (10px tolerance, like PaddleOCR)"""
+        boxes = sorted(boxes, key=lambda b: (b[0][1], b[0][0]))
+        for i in range(len(boxes) - 1):
+            for j in range(i, -1, -1):
+                if abs(boxes[j + 1][0][1] - boxes[j][0][1]) < 10 and boxes[j + 1][0][0] < boxes[j][0][0]:
+                    boxes[j], boxes[j + 1] = boxes[j + 1], boxes[j]
+                else:
+                    break
+        return boxes
+
+    @staticmethod
+    def crop(img: np.ndarray, box: np.ndarray) -> np.ndarray:
+        """Perspective-rectified crop of one box; tall crops are rotated upright"""
+        width = int(max(np.linalg.norm(box[0] - box[1]), np.linalg.norm(box[2] - box[3])))
+        height = int(max(np.linalg.norm(box[0] - box[3]), np.linalg.norm(box[1] - box[2])))
+        target = np.float32([[0, 0], [width, 0], [width, height], [0, height]])
+        matrix = cv2.getPerspectiveTransform(box.astype(np.float32), target)
+        crop = cv2.warpPerspective(img, matrix, (width, height), borderMode=cv2.BORDER_REPLICATE,
+                                   flags=cv2.INTER_CUBIC)
+        if crop.shape[0] >= crop.shape[1] * 1.5:
+            crop = np.rot90(crop)
+        return crop
+
+    # --- classification and recognition ---
+
+    @staticmethod
+    def _normalize(crop: np.ndarray, height: int, width: int, max_width: int) -> np.ndarray:
+        """Resize to height keeping the aspect ratio, scale to [-1, 1], pad right to max_width"""
+        h, w = crop.shape[:2]
+        resized_w = min(max_width, int(math.ceil(height * w / float(h))))
+        resized = cv2.resize(crop, (max(1, resized_w), height)).astype(np.float32)
+        padded = np.zeros((3, height, width), dtype=np.float32)
+        padded[:, :, :resized.shape[1]] = (resized / 255.0 - 0.5).transpose(2, 0, 1) / 0.5
+        return padded
+
+    def classify(self, crops: List[np.ndarray]) -> List[np.ndarray]:
+        """Rotate crops the angle classifier reads as upside down"""
+        height, width = CLS_SHAPE
+        for start in range(0, len(crops), REC_BATCH):
+            chunk = crops[start:start + REC_BATCH]
+            batch = np.stack([self._normalize(c, height, width, width) for c in chunk])
+            scores = self._run("cls", batch)
+            for i, score in enumerate(scores):
+                if score.argmax() == 1 and score[1] > CLS_THRESH:
+                    crops[start + i] = cv2.rotate(chunk[i], cv2.ROTATE_180)
+        return crops
+
+    def recognize(self, crops: List[np.ndarray]) -> List[Tuple[str, float]]:
+        """CTC greedy decode of each crop: (text, mean character probability)"""
+        results: List[Tuple[str, float]] = [("", 0.0)] * len(crops)
+        # Similar widths per batch keep the padding small
+        order = np.argsort([c.shape[1] / float(c.shape[0]) for c in crops])
+        for start in range(0, len(crops), REC_BATCH):
+            indices = order[start:start + REC_BATCH]
+            ratio = max(crops[i].shape[1] / float(crops[i].shape[0]) for i in indices)
+            width = max(REC_MIN_WIDTH, int(math.ceil(REC_HEIGHT * ratio)))
+            batch = np.stack([self._normalize(crops[i], REC_HEIGHT, width, width) for i in indices])
+            probs = self._run("rec", batch)
+            best, scores = probs.argmax(axis=2), probs.max(axis=2)
+            for row, i in enumerate(indices):
+                keep = best[row] != 0
+                keep[1:] &= best[row][1:] != best[row][:-1]
+                text = "".join(self.characters[c] for c in best[row][keep] if c < len(self.characters))
+                results[i] = (text, float(scores[row][keep].mean()) if keep.any() else 0.0)
+        return results
+
+    def ocr(self, img, cls: bool = True) -> List[List]:
+        """
+        Recognize an image (path, grayscale or BGR array)
+
+        Returns:
+            PaddleOCR's layout: [[[box, (text, confidence)], ...]] for the one
+            image, lines in reading order, low-confidence lines dropped
+        """
+        if isinstance(img, str):
+            img = cv2.imread(img)
+        if img is None:
+            return [None]
+        if img.ndim == 2:
+            img = cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)
+        boxes = self.detect(img)
+        if not boxes:
+            return [None]
+        crops = [self.crop(img, box) for box in boxes]
+        if cls and self.use_angle_cls:
+            crops = self.classify(crops)
+        lines = []
+        for box, (text, score) in zip(boxes, self.recognize(crops)):
+            if text and score >= DROP_SCORE:
+                lines.append([box.tolist(), (text, score)])
+        return [lines or None]
+
+
+# --- model preparation ---
+
+def quantize(images: List[str], model_dir: str = ONNX_MODEL_DIR) -> Dict[str, str]:
+    """
+    Write the int8 model set next to the fp32 one
+
+    det is quantized statically (QDQ, per-channel weights) with activation
+    ranges calibrated on the given images. rec and cls only get int8 MatMul
+    weights (dynamic quantization): quantizing the recognizer's convolutions
+    or attention, statically or dynamically, garbled most text lines of the
+    sample images for at best a 20% speedup.
+
+    Returns:
+        Model name -> written path
+    """
+    import onnx
+    import onnx.version_converter
+    from onnxruntime.quantization import (CalibrationDataReader, QuantFormat, QuantType,
+                                          quantize_dynamic, quantize_static)
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    class CalibrationImages(CalibrationDataReader):
+        def __init__(self, input_name: str):
+            self.input_name = input_name
+            self.images = iter(images)
+
+        def get_next(self):
+            for path in self.images:
+                img = cv2.imread(path)
+                if img is not None:
+                    return {self.input_name: det_input(img)}
+            return None
+
+    written = {}
+    for name in MODELS:
+        source = model_path(name, "fp32", model_dir)
+        if not os.path.exists(source):
+            continue
+        target = model_path(name, "int8", model_dir)
+        prepared = target + ".prep"
+        model = onnx.load(source)
+        try:
+            if name == "det" and model.opset_import[0].version < QUANT_OPSET:
+                # paddle2onnx writes opset 11; per-channel QDQ needs 13
+                model = onnx.version_converter.convert_version(model, QUANT_OPSET)
+                onnx.save(model, prepared)
+                source = prepared
+            quant_pre_process(source, prepared, skip_symbolic_shape=True)
+            if name == "det":
+                if not images:
+                    raise ValueError("det quantization needs calibration images")
+                quantize_static(prepared, target, CalibrationImages(model.graph.input[0].name),
+                                quant_format=QuantFormat.QDQ, per_channel=True,
+                                activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8)
+            else:
+                quantize_dynamic(prepared, target, weight_type=QuantType.QInt8, per_channel=True,
+                                 op_types_to_quantize=["MatMul"])
+        finally:
+            if os.path.exists(prepared):
+                os.remove(prepared)
+        written[name] = target
+        print(f"✓ Quantized {name}: {os.path.getsize(model_path(name, 'fp32', model_dir)) / 2 ** 20:.1f} MB -> "
+              f"{os.path.getsize(target) / 2 ** 20:.1f} MB")
+    return written
+
+
+def export(det_dir: str, rec_dir: str, cls_dir: Optional[str] = None, dict_path: Optional[str] = None,
+           model_dir: str = ONNX_MODEL_DIR) -> None:
+    """
+    Convert PaddleOCR inference models (the directories PaddleOCR downloads
+    into ~/.paddleocr) to ONNX with paddle2onnx
+    """
+    os.makedirs(model_dir, exist_ok=True)
+    for name, source in (("det", det_dir), ("rec", rec_dir), ("cls", cls_dir)):
+        if not source:
+            continue
+        subprocess.run(["paddle2onnx", "--model_dir", source,
+                        "--model_filename", "inference.pdmodel", "--params_filename", "inference.pdiparams",
+                        "--save_file", model_path(name, "fp32", model_dir),
+                        "--opset_version", "11", "--enable_onnx_checker", "True"], check=True)
+        print(f"✓ Exported {name} model from {source}")
+    if dict_path:
+        shutil.copyfile(dict_path, os.path.join(model_dir, DICT_FILE))
+
+
+def main(argv: List[str]) -> int:
+    if len(argv) > 1 and argv[1] == "quantize":
+        quantize(argv[2:])
+    elif len(argv) > 1 and argv[1] == "export":
+        args = argv[2:]
+        dict_path = None
+        if "--dict" in args:
+            i = args.index("--dict")
+            dict_path = args[i + 1]
+            args = args[:i] + args[i + 2:]
+        if len(args) < 2:
+            print("Usage: python onnx_ocr.py export <det dir> <rec dir> [<cls dir>] [--dict dict.txt]")
+            return 1
+        export(args[0], args[1], args[2] if len(args) > 2 else None, dict_path)
+    elif len(argv) > 1:
+        for line in OnnxPaddleOCR().ocr(argv[1])[0] or []:
+            print(f"{line[1][1]:.3f}  {line[1][0]}")
+    else:
+        print(__doc__)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
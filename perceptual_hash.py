@@ -0,0 +1,175 @@
+"""
+Perceptual Hash Module
+pHash/dHash fingerprints of label photos and a multi-index Hamming
+index, so a re-photographed label can be matched without OCR
+"""
+
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+
+def _load_gray(image) -> Optional[np.ndarray]:
+    if isinstance(image, str):
+        return cv2.imread(image, cv2.IMREAD_GRAYSCALE)
+    if image is not None and image.ndim == 3:
+        return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    return image
+
+
+def _bits_to_int(bits: np.ndarray) -> int:
+    return int.from_bytes(np.packbits(bits.astype(np.uint8).ravel()).tobytes(), "big")
+
+
+def dhash(gray: np.ndarray, size: int = 8) -> int:
+    """Difference hash: sign of horizontal gradients on a (size+1)x size thumbnail"""
+    small = cv2.resize(gray, (size + 1, size), interpolation=cv2.INTER_AREA).astype(np.int16)
+    return _bits_to_int(small[:, 1:] > small[:, :-1])
+
+
+def phash(gray: np.ndarray, size: int = 8, scale: int = 4) -> int:
+    """DCT hash: low-frequency 8x8 DCT coefficients above their median"""
+    small = cv2.resize(gray, (size * scale, size * scale), interpolation=cv2.INTER_AREA).astype(np.float32)
+    low = cv2.dct(small)[:size, :size]
+    # Median without the DC term, which only carries overall brightness
+    median = np.median(low.ravel()[1:])
+    return _bits_to_int(low > median)
+
+
+def compute_hashes(image) -> Optional[Tuple[int, int]]:
+    """
+    Compute (phash, dhash) for an image path or array
+
+    Returns:
+        Tuple of 64-bit ints, or None if the image cannot be read
+    """
+    gray = _load_gray(image)
+    if gray is None or gray.size == 0:
+        return None
+    return phash(gray), dhash(gray)
+
+
+def to_hex(value: int) -> str:
+    return format(value, "016x")
+
+
+def from_hex(value: Optional[str]) -> Optional[int]:
+    return int(value, 16) if value else None
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+def _masks(bits: int, max_weight: int) -> List[int]:
+    """All bits-wide XOR masks with at most max_weight bits set, lightest first"""
+    from itertools import combinations
+    masks = []
+    for weight in range(max_weight + 1):
+        for positions in combinations(range(bits), weight):
+            mask = 0
+            for p in positions:
+                mask |= 1 << p
+            masks.append(mask)
+    return masks
+
+
+class MultiIndexHash:
+    """
+    Multi-index hashing over 64-bit hashes (Norouzi et al.).
+    Each hash is split into 4 16-bit chunks with one table per chunk. Any
+    hash within Hamming radius r shares at least one chunk within r // 4 of
+    the query's chunk, so probing those few buckets finds every candidate
+    without scanning the registry.
+    """
+
+    CHUNKS = 4
+    CHUNK_BITS = 16
+
+    def __init__(self):
+        self.tables: List[Dict[int, List[int]]] = [{} for _ in range(self.CHUNKS)]
+        self.items: Dict[int, list] = {}
+        self.size = 0
+        self._mask_cache: Dict[int, List[int]] = {}
+
+    def _chunks(self, value: int) -> List[int]:
+        mask = (1 << self.CHUNK_BITS) - 1
+        return [(value >> (i * self.CHUNK_BITS)) & mask for i in range(self.CHUNKS)]
+
+    def add(self, value: int, item) -> None:
+        self.size += 1
+        if value in self.items:
+            self.items[value].append(item)
+            return
+        self.items[value] = [item]
+        for table, chunk in zip(self.tables, self._chunks(value)):
+            table.setdefault(chunk, []).append(value)
+
+    def search(self, value: int, radius: int) -> List[Tuple[int, object]]:
+        """Return (distance, item) for all entries within radius, closest first"""
+        per_chunk = radius // self.CHUNKS
+        masks = self._mask_cache.get(per_chunk)
+        if masks is None:
+            masks = self._mask_cache[per_chunk] = _masks(self.CHUNK_BITS, per_chunk)
+
+        seen = set()
+        found = []
+        for table, chunk in zip(self.tables, self._chunks(value)):
+            for mask in masks:
+                bucket = table.get(chunk ^ mask)
+                if not bucket:
+                    continue
+                for candidate in bucket:
+                    if candidate in seen:
+                        continue
+                    seen.add(candidate)
+                    d = (candidate ^ value).bit_count()
+                    if d <= radius:
+                        found.extend((d, item) for item in self.items[candidate])
+        found.sort(key=lambda x: x[0])
+        return found
+
+
+class PerceptualIndex:
+    """
+    In-memory index of registered label photos.
+    pHash drives the multi-index lookup; dHash breaks ties and guards
+    against pHash collisions between different labels.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._index = MultiIndexHash()
+        self._dhashes: Dict[object, int] = {}
+
+    def __len__(self):
+        return self._index.size
+
+    def __contains__(self, item) -> bool:
+        return item in self._dhashes
+
+    def add(self, phash_value: int, dhash_value: int, item) -> None:
+        with self._lock:
+            self._index.add(phash_value, item)
+            self._dhashes[item] = dhash_value
+
+    def load_rows(self, rows) -> None:
+        """Load (item, phash_hex, dhash_hex) rows, e.g. from the documents table"""
+        for item, phash_hex, dhash_hex in rows:
+            if phash_hex and dhash_hex:
+                self.add(from_hex(phash_hex), from_hex(dhash_hex), item)
+
+    def query(self, phash_value: int, dhash_value: int, radius: int) -> List[Tuple[int, int, object]]:
+        """
+        Candidates within radius (pHash distance)
+
+        Returns:
+            (phash_distance, dhash_distance, item), best match first
+        """
+        with self._lock:
+            hits = self._index.search(phash_value, radius)
+            ranked = [(d, hamming(dhash_value, self._dhashes[item]), item) for d, item in hits]
+        ranked.sort(key=lambda x: (x[0] + x[1], x[0]))
+        return ranked
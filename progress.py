@@ -0,0 +1,208 @@
+"""
+Progress Streams
+Registration and verification run OCR, hashing, registry work and chain
+calls inside one request, for seconds. A request carrying X-Progress-Id
+reports each stage as it completes to a server-sent event stream,
+GET /api/progress/<id>:
+
+    id: 3
+    event: ocr
+    data: {"product_name": "...", "brand": "...", ...}
+
+The last event is "done", with the request's status code and JSON body, so
+a client whose POST connection dropped gets the result from the stream
+instead of sending the request again. Events are kept in the main registry
+file: a reconnecting EventSource resumes after its Last-Event-ID on any
+worker. Streams close after PROGRESS_STREAM_SECONDS (EventSource then
+reconnects by itself) and events are dropped after PROGRESS_TTL_SECONDS.
+
+An id with no events for PROGRESS_IDLE_SECONDS gets a terminal "idle"
+event, and a client resuming after "done" or "idle" with nothing left to
+receive gets 204, which stops EventSource from reconnecting.
+
+The first request to open an id owns it: a retry under the same id (e.g.
+an Idempotency-Key replay, or a 409 while the first is in flight) adds no
+events, and nothing is published after "done".
+"""
+
+import os
+import re
+import json
+import time
+import threading
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from registry_db import get_db_connection, get_db_path
+
+PROGRESS_TTL = float(os.getenv("PROGRESS_TTL_SECONDS", 600))
+PROGRESS_STREAM_SECONDS = float(os.getenv("PROGRESS_STREAM_SECONDS", 55))
+# Longer than the slowest stage (an OCR request may queue for up to its 30 s deadline)
+PROGRESS_IDLE_SECONDS = float(os.getenv("PROGRESS_IDLE_SECONDS", 45))
+PROGRESS_HEARTBEAT = 15.0
+PROGRESS_POLL = 0.25
+RECONNECT_MS = 1000
+DONE = "done"
+IDLE = "idle"
+
+_ID = re.compile(r'^[A-Za-z0-9_-]{8,128}$')
+
+
+def valid_id(progress_id: Optional[str]) -> bool:
+    return bool(progress_id) and _ID.match(progress_id) is not None
+
+
+def format_event(seq: int, event: str, data: str) -> str:
+    return f"id: {seq}\nevent: {event}\ndata: {data}\n\n"
+
+
+class ProgressStore:
+    """
+    Stage events of in-flight requests, shared by every server process
+
+    Args:
+        db_path: registry database holding the progress_events table
+        ttl: seconds events are kept
+        stream_seconds: longest a single stream stays open
+        idle_seconds: a stream whose id has had no events for this long ends
+    """
+
+    def __init__(self, db_path=None, ttl: float = PROGRESS_TTL, stream_seconds: float = PROGRESS_STREAM_SECONDS,
+                 idle_seconds: float = PROGRESS_IDLE_SECONDS):
+        self.db_path = db_path or get_db_path()
+        self.ttl = ttl
+        self.stream_seconds = stream_seconds
+        self.idle_seconds = idle_seconds
+        # Wakes this process's streams on a publish; other processes' events are polled
+        self._published = threading.Condition()
+        self._last_purge = 0.0
+        self.ensure_tables()
+
+    def get_db_connection(self):
+        conn = get_db_connection(self.db_path)
+        conn.execute('PRAGMA busy_timeout = 10000')
+        return conn
+
+    def ensure_tables(self) -> None:
+        conn = self.get_db_connection()
+        conn.executescript('''
+            CREATE TABLE IF NOT EXISTS progress_events (
+                progress_id TEXT,
+                seq INTEGER,            -- SSE event id, from 1 per progress id
+                event TEXT,
+                data TEXT,              -- JSON
+                created_at REAL,
+                PRIMARY KEY (progress_id, seq)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS idx_progress_events_created ON progress_events(created_at);
+        ''')
+        conn.commit()
+        conn.close()
+
+    def publish(self, progress_id: str, event: str, data: Dict, first: bool = False) -> Optional[int]:
+        """
+        Append an event to a stream
+
+        Args:
+            first: only publish if the stream has no events yet (opening it)
+
+        Returns:
+            The event id, or None when nothing was published (stream already
+            finished, or already opened with first=True)
+        """
+        conn = self.get_db_connection()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            last = conn.execute('SELECT seq, event FROM progress_events WHERE progress_id = ? ORDER BY seq DESC LIMIT 1',
+                                (progress_id,)).fetchone()
+            if last is not None and (first or last['event'] == DONE):
+                conn.rollback()
+                return None
+            seq = (last['seq'] if last is not None else 0) + 1
+            conn.execute('INSERT INTO progress_events (progress_id, seq, event, data, created_at) VALUES (?, ?, ?, ?, ?)',
+                         (progress_id, seq, event, json.dumps(data, default=str), time.time()))
+            conn.commit()
+        finally:
+            conn.close()
+        with self._published:
+            self._published.notify_all()
+        if event == DONE:
+            self.purge()
+        return seq
+
+    def events(self, progress_id: str, after: int = 0) -> List[Tuple[int, str, str]]:
+        """Events after an event id: (id, event, JSON data)"""
+        conn = self.get_db_connection()
+        try:
+            return [(seq, event, data) for seq, event, data, _ in self._events(conn, progress_id, after)]
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _events(conn, progress_id: str, after: int) -> List[Tuple[int, str, str, float]]:
+        return [tuple(row) for row in conn.execute(
+            'SELECT seq, event, data, created_at FROM progress_events WHERE progress_id = ? AND seq > ? ORDER BY seq',
+            (progress_id, after))]
+
+    def finished(self, progress_id: str, after: int) -> bool:
+        """
+        Whether a client resuming after an event id has nothing left to
+        receive: no later events, and the id sent "done", has had no events
+        for idle_seconds, or has none at all (it was only ever sent "idle")
+        """
+        conn = self.get_db_connection()
+        try:
+            last = conn.execute('SELECT seq, event, created_at FROM progress_events WHERE progress_id = ? '
+                                'ORDER BY seq DESC LIMIT 1', (progress_id,)).fetchone()
+        finally:
+            conn.close()
+        if last is None:
+            return True
+        if last['seq'] > after:
+            return False
+        return last['event'] == DONE or time.time() - last['created_at'] >= self.idle_seconds
+
+    def stream(self, progress_id: str, after: int = 0) -> Iterator[str]:
+        """
+        Server-sent events of a progress id from after the given event id,
+        until "done", idle_seconds without events (a terminal "idle" event)
+        or stream_seconds (the id may not be opened yet: the client
+        subscribes before posting). One connection serves the whole stream.
+        """
+        yield f"retry: {RECONNECT_MS}\n\n"
+        conn = self.get_db_connection()
+        try:
+            start = last_write = time.monotonic()
+            active = time.time()
+            while True:
+                for seq, event, data, created_at in self._events(conn, progress_id, after):
+                    after = seq
+                    active = max(active, created_at)
+                    last_write = time.monotonic()
+                    yield format_event(seq, event, data)
+                    if event == DONE:
+                        return
+                if time.time() - active >= self.idle_seconds:
+                    yield format_event(after, IDLE, json.dumps({"idle_seconds": self.idle_seconds}))
+                    return
+                now = time.monotonic()
+                if now - start >= self.stream_seconds:
+                    return
+                if now - last_write >= PROGRESS_HEARTBEAT:
+                    last_write = now
+                    yield ": keep-alive\n\n"
+                with self._published:
+                    self._published.wait(PROGRESS_POLL)
+        finally:
+            conn.close()
+
+    def purge(self, force: bool = False) -> int:
+        """Drop expired events (at most once a minute unless forced); returns rows removed"""
+        now = time.time()
+        if not force and now - self._last_purge < 60:
+            return 0
+        self._last_purge = now
+        conn = self.get_db_connection()
+        removed = conn.execute('DELETE FROM progress_events WHERE created_at < ?', (now - self.ttl,)).rowcount
+        conn.commit()
+        conn.close()
+        return removed
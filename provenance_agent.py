@@ -1,21 +1,111 @@
 import sqlite3
 import os
+import json
 import re
+import time
+import threading
+from collections import OrderedDict
 from datetime import datetime
 from web3 import Web3
 
+import registry_db
+from registry_store import get_registry
+
+# Seconds a fetched chain head is trusted before asking the node again
+PROVENANCE_HEAD_TTL = float(os.getenv("PROVENANCE_HEAD_TTL", 5))
+# Tokens (transfer histories) and fingerprints (reports) kept in memory
+PROVENANCE_CACHE_SIZE = int(os.getenv("PROVENANCE_CACHE_SIZE", 10000))
+
+
+class TransferCache:
+    """
+    Transfer events per (contract, token id), synced incrementally: an entry
+    remembers the last block it covers and later calls only fetch the logs
+    after it, so an unchanged token costs at most one eth_blockNumber per
+    head_ttl. Least recently used entries are evicted.
+
+    Args:
+        web3: Web3 instance
+        abi: contract ABI containing the Transfer event
+        head_ttl: seconds to reuse the last chain head
+        max_entries: tokens kept
+    """
+
+    def __init__(self, web3, abi, head_ttl: float = PROVENANCE_HEAD_TTL, max_entries: int = PROVENANCE_CACHE_SIZE):
+        self.web3 = web3
+        self.abi = abi
+        self.head_ttl = head_ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # (contract, token id) -> (last block covered, events)
+        self._head = (0.0, None)       # (fetched at, block number)
+        self._lock = threading.Lock()
+
+    def head(self) -> int:
+        fetched_at, number = self._head
+        if number is None or time.monotonic() - fetched_at > self.head_ttl:
+            number = self.web3.eth.block_number
+            self._head = (time.monotonic(), number)
+        return number
+
+    def transfers(self, contract_address, token_id: int):
+        """
+        All Transfer events of a token, oldest first
+
+        Returns:
+            (events, last block covered); events are dicts with from, to,
+            block, timestamp (unix seconds) and txn_hash. When the node is
+            unreachable a token synced before returns its cached events.
+        """
+        key = (contract_address.lower(), token_id)
+        with self._lock:
+            cursor, events = self._entries.get(key, (-1, []))
+        try:
+            head = self.head()
+            if head > cursor:
+                contract = self.web3.eth.contract(address=contract_address, abi=self.abi)
+                logs = contract.events.Transfer().get_logs(
+                    from_block=cursor + 1, to_block=head, argument_filters={'tokenId': token_id}
+                )
+                blocks = {}
+                for log in logs:
+                    if log.blockNumber not in blocks:
+                        blocks[log.blockNumber] = self.web3.eth.get_block(log.blockNumber).timestamp
+                events = events + [{
+                    "from": log.args['from'],
+                    "to": log.args['to'],
+                    "block": log.blockNumber,
+                    "timestamp": blocks[log.blockNumber],
+                    "txn_hash": log.transactionHash.hex(),
+                } for log in logs]
+                cursor = head
+        except Exception as e:
+            if cursor < 0:
+                raise
+            print(f"⚠ Transfer sync failed, serving history up to block {cursor}: {e}")
+            return events, cursor
+        with self._lock:
+            current = self._entries.get(key)
+            # A concurrent call may have synced further; keep the longer history
+            if current is None or current[0] < cursor:
+                self._entries[key] = (cursor, events)
+            else:
+                cursor, events = current
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return events, cursor
+
+
 class ProvenanceAgent:
     """
     Advanced Authenticity Verification and Provenance Intelligence Agent.
     Operates on VeriChain protocol to provide luxury-grade authenticity assurance.
     """
-    def __init__(self, db_path=None, web3_provider="https://neoxt4seed1.ngd.network"):
-        if db_path is None:
-            base_dir = os.path.dirname(os.path.abspath(__file__))
-            self.db_path = os.path.join(base_dir, 'document_verification.db')
-        else:
-            self.db_path = db_path
+    def __init__(self, db_path=None, web3_provider=None):
+        self.registry = get_registry(db_path)
+        self.db_path = self.registry.db_path
         
+        web3_provider = web3_provider or os.getenv("WEB3_PROVIDER", "https://neoxt4seed1.ngd.network")
         self.web3 = Web3(Web3.HTTPProvider(web3_provider))
         self.nft_abi = [
             {
@@ -29,25 +119,72 @@ class ProvenanceAgent:
                 "type": "event"
             }
         ]
-        
+        self.transfers = TransferCache(self.web3, self.nft_abi)
+        # fingerprint -> (inputs the report was built from, report)
+        self._reports = OrderedDict()
+        self._reports_lock = threading.Lock()
+
     def _get_conn(self):
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        return conn
+        return registry_db.get_db_connection(self.db_path)
+
+    def _anchor_leaf(self, document_id):
+        """Merkle anchor entry of a registration, if it was batched"""
+        conn = self._get_conn()
+        try:
+            return conn.execute('SELECT batch_id, leaf_index, proof FROM anchor_leaves WHERE document_id = ?',
+                                (document_id,)).fetchone()
+        except sqlite3.OperationalError:
+            # Merkle anchoring never enabled on this registry
+            return None
+        finally:
+            conn.close()
 
     def analyze_product(self, product_id):
         """
         Main intelligence function to identify, reconstruct, and validate product history.
+
+        Reports are cached per fingerprint and rebuilt only when the registry
+        row, its Merkle anchor or the token's transfer events change, so
+        repeat scans of a product return the same report (and ETag).
         """
         # 1. Database Lookup
-        conn = self._get_conn()
-        record = conn.execute('SELECT * FROM documents WHERE document_hash = ? OR txn_hash = ? OR token_id = ?', 
-                             (product_id, product_id, product_id)).fetchone()
-        conn.close()
+        record = self.registry.find_document(product_id)
 
         if not record:
             return self._generate_not_found_report(product_id)
 
+        # Merkle-batched registrations carry an inclusion proof instead of their own transaction
+        anchor = self._anchor_leaf(record['id'])
+
+        transfers = []
+        if record['contract_address'] and record['token_id']:
+            try:
+                transfers, _ = self.transfers.transfers(record['contract_address'], int(record['token_id']))
+            except Exception as e:
+                print(f"Provenance Trace Error: {e}")
+
+        version = (tuple(record), tuple(anchor) if anchor is not None else None,
+                   len(transfers), transfers[-1]['txn_hash'] if transfers else None)
+        with self._reports_lock:
+            cached = self._reports.get(record['document_hash'])
+            if cached is not None and cached[0] == version:
+                self._reports.move_to_end(record['document_hash'])
+                return cached[1]
+
+        report = self._build_report(record, anchor, transfers)
+        with self._reports_lock:
+            self._reports[record['document_hash']] = (version, report)
+            while len(self._reports) > PROVENANCE_CACHE_SIZE:
+                self._reports.popitem(last=False)
+        return report
+
+    def transfer_history(self, contract_address, token_id):
+        """All Transfer events of a token (mint included), from the incremental cache"""
+        events, _ = self.transfers.transfers(contract_address, int(token_id))
+        return events
+
+    def _build_report(self, record, anchor, transfers):
+        """Provenance report for a registry row, its anchor entry and the token's transfers"""
         # 2. Extract verified data
         brand_verified = "Confirmed" if record['issuer_address'] else "Unverified"
         integrity_score = 100
@@ -60,40 +197,35 @@ class ProvenanceAgent:
                 "event": "Genesis Protocol Registration",
                 "actor": record['issuer_address'] or "System Registry",
                 "timestamp": record['timestamp'],
-                "status": "Verified On-Chain",
+                "status": "Pending Confirmation" if record['txn_status'] == 'pending' else "Verified On-Chain",
                 "proof": record['txn_hash']
             }
         ]
 
-        if record['contract_address'] and record['token_id']:
-            try:
-                contract = self.web3.eth.contract(address=record['contract_address'], abi=self.nft_abi)
-                # Query Transfer events for this TokenID
-                events = contract.events.Transfer().get_logs(
-                    fromBlock=0,
-                    argument_filters={'tokenId': int(record['token_id'])}
-                )
-                
-                for event in events:
-                    if event.args['from'] == "0x0000000000000000000000000000000000000000":
-                        continue # Skip mint event as it's already Genesis
-                    
-                    block = self.web3.eth.get_block(event.blockNumber)
-                    timeline.append({
-                        "event": "Ownership Transfer",
-                        "actor": event.args['to'],
-                        "timestamp": datetime.fromtimestamp(block.timestamp).strftime('%Y-%m-%d %H:%M:%S'),
-                        "status": "Verified",
-                        "proof": event.transactionHash.hex()
-                    })
-            except Exception as e:
-                print(f"Provenance Trace Error: {e}")
+        for event in transfers:
+            if event['from'] == "0x0000000000000000000000000000000000000000":
+                continue # Skip mint event as it's already Genesis
+
+            timeline.append({
+                "event": "Ownership Transfer",
+                "actor": event['to'],
+                "timestamp": datetime.fromtimestamp(event['timestamp']).strftime('%Y-%m-%d %H:%M:%S'),
+                "status": "Verified",
+                "proof": event['txn_hash']
+            })
 
         # 4. Anomaly Detection
-        if not record['txn_hash']:
+        if anchor is not None and anchor['batch_id'] is None:
+            risk_flags.append("Registration anchor pending (next Merkle batch).")
+        elif not record['txn_hash']:
             risk_flags.append("Genesis transaction proof missing.")
             integrity_score -= 30
             confidence -= 20
+        elif record['txn_status'] == 'failed':
+            # Receipt recorded by the confirmation tracker
+            risk_flags.append(f"Genesis transaction reverted on-chain (block {record['txn_block']}).")
+            integrity_score -= 30
+            confidence -= 20
         
         if len(record['document_hash']) < 64:
             risk_flags.append("Fingerprint density below security threshold.")
@@ -118,6 +250,11 @@ class ProvenanceAgent:
                 "contract": record['contract_address'],
                 "token_id": record['token_id'],
                 "txn": record['txn_hash'],
+                "merkle_proof": {
+                    "batch_id": anchor['batch_id'],
+                    "leaf_index": anchor['leaf_index'],
+                    "proof": json.loads(anchor['proof'])
+                } if anchor is not None and anchor['batch_id'] is not None else None,
                 "abi": [
                     {
                         "inputs": [
@@ -0,0 +1,349 @@
+"""
+Registry Reconciliation Module
+Checks that rows in `documents` correspond to successful on-chain mints.
+
+ProductMinted logs are synced incrementally into `chain_mints` in
+block-range batches; the registry is then streamed in id order and
+matched against the minted set. Rows without a mint are classified with
+one batched receipt request per chunk. Findings go to
+`reconciliation_report`; progress is checkpointed per chunk so an
+interrupted run resumes where it stopped. A sharded registry is
+streamed one shard at a time; the report lives in the main database.
+
+Usage:
+    python reconcile.py                     # resume the last run or start one
+    python reconcile.py --fresh --chunk-size 20000 --block-step 10000
+"""
+
+import os
+import sys
+import time
+import argparse
+from datetime import datetime
+from typing import Dict, List, Optional, Set
+
+from dotenv import load_dotenv
+
+from chain_reader import ChainReader, PRODUCT_MINTED_TOPIC, ZERO_ADDRESS
+from registry_db import get_db_connection, hash_to_blob
+from registry_store import get_registry
+
+# Issue types written to reconciliation_report
+MISSING_MINT = "missing_mint"            # no mint and no receipt for the recorded transaction
+FAILED_TX = "failed_tx"                  # recorded transaction reverted
+LEGACY_ANCHOR = "legacy_anchor"          # recorded transaction is a fallback data anchor
+NOT_MINTED = "not_minted"                # transaction succeeded but emitted no ProductMinted
+TOKEN_MISMATCH = "token_mismatch"        # stored token_id differs from the fingerprint's token
+DUPLICATE_ROW = "duplicate_row"          # fingerprint already registered on an earlier row
+UNREGISTERED_MINT = "unregistered_mint"  # minted on-chain but absent from the registry
+
+
+# 32-byte key for a fingerprint (BLOB, or hex in any case, with or without 0x)
+_key = hash_to_blob
+
+
+class RegistryReconciler:
+    """
+    Reconciles the local registry with the VeriChain contract
+
+    Args:
+        db_path: registry database (defaults to the app's)
+        rpc_url: JSON-RPC endpoint
+        contract_address: VeriChainProduct address
+        chunk_size: registry rows per chunk (one receipt batch per chunk)
+        block_step: blocks per eth_getLogs range
+        start_block: first block to scan for mints (deployment block)
+        confirmations: blocks behind head to stop at, so reorgs are not synced
+        shards: registry shard count (defaults to REGISTRY_SHARDS)
+    """
+
+    def __init__(self, db_path=None, rpc_url=None, contract_address=None, chunk_size: int = 10000,
+                 block_step: int = 5000, start_block: int = 0, confirmations: int = 0, shards: Optional[int] = None):
+        self.db_path = db_path
+        self.shards = shards
+        self.contract_address = contract_address or os.getenv("NFT_CONTRACT_ADDRESS", ZERO_ADDRESS)
+        self.reader = ChainReader(rpc_url or os.getenv("WEB3_PROVIDER", "https://neoxt4seed1.ngd.network"),
+                                  self.contract_address)
+        self.chunk_size = chunk_size
+        self.block_step = block_step
+        self.start_block = start_block
+        self.confirmations = confirmations
+
+    def get_db_connection(self):
+        return get_db_connection(self.db_path)
+
+    def ensure_tables(self) -> None:
+        conn = self.get_db_connection()
+        conn.executescript('''
+            CREATE TABLE IF NOT EXISTS chain_mints (
+                contract_address TEXT,
+                fingerprint TEXT,      -- 64 lowercase hex chars, no 0x
+                owner TEXT,
+                block_number INTEGER,
+                txn_hash TEXT,
+                PRIMARY KEY (contract_address, fingerprint)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS reconcile_state (
+                contract_address TEXT PRIMARY KEY,
+                last_block INTEGER
+            );
+            CREATE TABLE IF NOT EXISTS reconciliation_runs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                contract_address TEXT,
+                status TEXT,           -- running / complete
+                started_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                finished_at DATETIME,
+                last_shard INTEGER DEFAULT 0,
+                last_document_id INTEGER DEFAULT 0,
+                rows_checked INTEGER DEFAULT 0,
+                chain_head INTEGER
+            );
+            CREATE TABLE IF NOT EXISTS reconciliation_report (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                run_id INTEGER,
+                document_id INTEGER,
+                document_hash TEXT,
+                txn_hash TEXT,
+                issue TEXT,
+                detail TEXT,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            );
+            CREATE INDEX IF NOT EXISTS idx_reconciliation_report_run ON reconciliation_report(run_id, issue);
+        ''')
+        columns = [row['name'] for row in conn.execute('PRAGMA table_info(reconciliation_runs)')]
+        if 'last_shard' not in columns:
+            conn.execute('ALTER TABLE reconciliation_runs ADD COLUMN last_shard INTEGER DEFAULT 0')
+        conn.commit()
+        conn.close()
+
+    # --- Chain side ---
+
+    def sync_mints(self) -> int:
+        """
+        Pull new ProductMinted logs into chain_mints, checkpointing after
+        every batch of ranges
+
+        Returns:
+            Number of mints added
+        """
+        conn = self.get_db_connection()
+        row = conn.execute('SELECT last_block FROM reconcile_state WHERE contract_address = ?',
+                           (self.contract_address,)).fetchone()
+        from_block = row['last_block'] + 1 if row else self.start_block
+        head = self.reader.block_number() - self.confirmations
+        added = 0
+        try:
+            for covered, logs in self.reader.iter_logs([PRODUCT_MINTED_TOPIC], from_block, head, self.block_step):
+                rows = [
+                    (self.contract_address, log["topics"][2][2:].lower(), "0x" + log["topics"][3][-40:],
+                     int(log["blockNumber"], 16), log["transactionHash"])
+                    for log in logs if len(log.get("topics", [])) == 4
+                ]
+                cursor = conn.executemany('INSERT OR IGNORE INTO chain_mints VALUES (?, ?, ?, ?, ?)', rows)
+                added += cursor.rowcount
+                conn.execute('INSERT OR REPLACE INTO reconcile_state (contract_address, last_block) VALUES (?, ?)',
+                             (self.contract_address, covered))
+                conn.commit()
+        finally:
+            conn.close()
+        return added
+
+    def load_minted(self) -> Set[bytes]:
+        conn = self.get_db_connection()
+        try:
+            cursor = conn.execute('SELECT fingerprint FROM chain_mints WHERE contract_address = ?', (self.contract_address,))
+            return {bytes.fromhex(fp) for (fp,) in cursor}
+        finally:
+            conn.close()
+
+    # --- Registry side ---
+
+    def _start_run(self, conn, fresh: bool) -> Dict:
+        if not fresh:
+            row = conn.execute(
+                "SELECT * FROM reconciliation_runs WHERE contract_address = ? AND status = 'running' ORDER BY id DESC LIMIT 1",
+                (self.contract_address,)
+            ).fetchone()
+            if row:
+                print(f"✓ Resuming reconciliation run {row['id']} after document {row['last_document_id']} "
+                      f"(shard {row['last_shard']})")
+                return dict(row)
+        cursor = conn.execute("INSERT INTO reconciliation_runs (contract_address, status) VALUES (?, 'running')",
+                              (self.contract_address,))
+        conn.commit()
+        return dict(conn.execute('SELECT * FROM reconciliation_runs WHERE id = ?', (cursor.lastrowid,)).fetchone())
+
+    def _duplicates(self, conn) -> Dict[bytes, int]:
+        """Lowest document id per fingerprint that occurs on more than one row (a fingerprint has one shard)"""
+        # hash_key groups BLOB and legacy hex spellings of the same fingerprint together
+        rows = conn.execute(
+            "SELECT hash_key(document_hash) AS h, MIN(id) AS first_id FROM documents "
+            "GROUP BY h HAVING COUNT(*) > 1 AND h IS NOT NULL"
+        ).fetchall()
+        return {row['h']: row['first_id'] for row in rows}
+
+    def _check_chunk(self, rows, minted: Set[bytes], duplicates: Dict[bytes, int]) -> List[tuple]:
+        """Issues for one chunk: (document_id, document_hash, txn_hash, issue, detail)"""
+        keys = {row['id']: _key(row['document_hash']) for row in rows}
+        unminted_ids = {doc_id for doc_id, key in keys.items() if key is None} | {
+            doc_id for doc_id, key in keys.items() if key is not None and key not in minted
+        }
+        issues = []
+
+        for row in rows:
+            key = keys[row['id']]
+            if key is None:
+                continue
+            if key in duplicates and duplicates[key] != row['id']:
+                issues.append((row['id'], row['document_hash'], row['txn_hash'], DUPLICATE_ROW,
+                               f"first registered as document {duplicates[key]}"))
+            if row['token_id'] and row['token_id'] != str(int.from_bytes(key, "big")):
+                issues.append((row['id'], row['document_hash'], row['txn_hash'], TOKEN_MISMATCH,
+                               f"stored token_id {row['token_id'][:20]}... does not derive from the fingerprint"))
+
+        # Only rows without a mint cost an RPC call, all in one batch
+        unminted = [row for row in rows if row['id'] in unminted_ids]
+        receipts = self.reader.receipts(row['txn_hash'] for row in unminted if row['txn_hash'])
+        contract = self.contract_address.lower()
+        for row in unminted:
+            receipt = receipts.get(row['txn_hash']) if row['txn_hash'] else None
+            if not row['txn_hash']:
+                issue, detail = MISSING_MINT, "no transaction recorded"
+            elif receipt is None:
+                issue, detail = MISSING_MINT, "transaction not found on-chain"
+            elif int(receipt.get("status") or "0x0", 16) == 0:
+                issue, detail = FAILED_TX, f"reverted in block {int(receipt['blockNumber'], 16)}"
+            elif str(receipt.get("to") or "").lower() != contract:
+                issue, detail = LEGACY_ANCHOR, f"data anchor to {receipt.get('to')}"
+            else:
+                issue, detail = NOT_MINTED, "transaction succeeded without a ProductMinted event"
+            issues.append((row['id'], row['document_hash'], row['txn_hash'], issue, detail))
+        return issues
+
+    def run(self, fresh: bool = False) -> Dict:
+        """
+        Sync mints, stream the registry and write the report
+
+        Returns:
+            Summary with the run id, rows checked, issue counts and timings
+        """
+        self.ensure_tables()
+        started = time.perf_counter()
+        added = self.sync_mints()
+        sync_time = time.perf_counter() - started
+        minted = self.load_minted()
+        print(f"✓ Chain mints: {len(minted)} ({added} new) in {sync_time:.1f}s")
+
+        registry = get_registry(self.db_path, self.shards)
+        conn = self.get_db_connection()
+        try:
+            run = self._start_run(conn, fresh)
+            checked = run['rows_checked']
+
+            for shard in range(run['last_shard'], registry.count):
+                # The main file is the only shard when REGISTRY_SHARDS=1
+                shard_conn = conn if registry.count == 1 else registry.connect(shard)
+                try:
+                    duplicates = self._duplicates(shard_conn)
+                    last_id = run['last_document_id'] if shard == run['last_shard'] else 0
+                    while True:
+                        rows = shard_conn.execute(
+                            'SELECT id, document_hash, txn_hash, token_id, contract_address FROM documents '
+                            'WHERE id > ? ORDER BY id LIMIT ?', (last_id, self.chunk_size)
+                        ).fetchall()
+                        if not rows:
+                            break
+                        last_id = rows[-1]['id']
+                        # Rows registered under another contract are not this run's concern
+                        rows = [r for r in rows if not r['contract_address'] or r['contract_address'].lower()
+                                in (self.contract_address.lower(), ZERO_ADDRESS)]
+                        issues = self._check_chunk(rows, minted, duplicates)
+                        checked += len(rows)
+                        # Issues and the cursor commit together, so a resumed run neither skips nor repeats a chunk
+                        conn.executemany(
+                            'INSERT INTO reconciliation_report (run_id, document_id, document_hash, txn_hash, issue, detail) '
+                            'VALUES (?, ?, ?, ?, ?, ?)', [(run['id'],) + issue for issue in issues]
+                        )
+                        conn.execute('UPDATE reconciliation_runs SET last_shard = ?, last_document_id = ?, rows_checked = ? '
+                                     'WHERE id = ?', (shard, last_id, checked, run['id']))
+                        conn.commit()
+                finally:
+                    if shard_conn is not conn:
+                        shard_conn.close()
+                if shard + 1 < registry.count:
+                    conn.execute('UPDATE reconciliation_runs SET last_shard = ?, last_document_id = 0 WHERE id = ?',
+                                 (shard + 1, run['id']))
+                    conn.commit()
+
+            # Mints with no registry row: anti-join against the indexed document_hash
+            conn.execute('DELETE FROM reconciliation_report WHERE run_id = ? AND issue = ?', (run['id'], UNREGISTERED_MINT))
+            anti_join = (
+                "SELECT '0x' || m.fingerprint, m.txn_hash, 'minted in block ' || m.block_number "
+                'FROM {mints} m WHERE m.contract_address = ? {shard_filter} AND NOT EXISTS ('
+                "  SELECT 1 FROM documents d WHERE d.document_hash IN (hash_key(m.fingerprint), '0x' || m.fingerprint, m.fingerprint))"
+            )
+            if registry.count == 1:
+                conn.execute(
+                    'INSERT INTO reconciliation_report (run_id, issue, document_hash, txn_hash, detail) '
+                    'SELECT ?, ?, * FROM (' + anti_join.format(mints='chain_mints', shard_filter='') + ')',
+                    (run['id'], UNREGISTERED_MINT, self.contract_address)
+                )
+            else:
+                # Each shard checks the mints routed to it, reading chain_mints from the main file
+                def unregistered(shard_conn, shard):
+                    shard_conn.execute('ATTACH DATABASE ? AS reg', (registry.db_path,))
+                    return shard_conn.execute(
+                        anti_join.format(mints='reg.chain_mints', shard_filter='AND shard_of(m.fingerprint) = ?'),
+                        (self.contract_address, shard)
+                    ).fetchall()
+                conn.executemany(
+                    'INSERT INTO reconciliation_report (run_id, issue, document_hash, txn_hash, detail) '
+                    'VALUES (?, ?, ?, ?, ?)',
+                    [(run['id'], UNREGISTERED_MINT) + tuple(row) for rows in registry.fan_out(unregistered) for row in rows]
+                )
+            conn.execute("UPDATE reconciliation_runs SET status = 'complete', finished_at = ?, chain_head = "
+                         "(SELECT last_block FROM reconcile_state WHERE contract_address = ?) WHERE id = ?",
+                         (datetime.now().isoformat(), self.contract_address, run['id']))
+            conn.commit()
+
+            counts = {row['issue']: row['n'] for row in conn.execute(
+                'SELECT issue, COUNT(*) AS n FROM reconciliation_report WHERE run_id = ? GROUP BY issue', (run['id'],)
+            )}
+        finally:
+            conn.close()
+
+        return {
+            "run_id": run['id'],
+            "rows_checked": checked,
+            "chain_mints": len(minted),
+            "issues": counts,
+            "sync_seconds": round(sync_time, 2),
+            "total_seconds": round(time.perf_counter() - started, 2),
+        }
+
+
+def main(argv=None) -> int:
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Reconcile the registry with on-chain mints")
+    parser.add_argument("--db", help="Registry database (default: the app's)")
+    parser.add_argument("--rpc", help="JSON-RPC URL (default: WEB3_PROVIDER)")
+    parser.add_argument("--contract", help="Contract address (default: NFT_CONTRACT_ADDRESS)")
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    parser.add_argument("--block-step", type=int, default=5000)
+    parser.add_argument("--start-block", type=int, default=int(os.getenv("RECONCILE_START_BLOCK", 0)))
+    parser.add_argument("--confirmations", type=int, default=0)
+    parser.add_argument("--shards", type=int, default=None, help="Registry shard count (default: REGISTRY_SHARDS)")
+    parser.add_argument("--fresh", action="store_true", help="Start a new run instead of resuming")
+    args = parser.parse_args(argv)
+
+    reconciler = RegistryReconciler(args.db, args.rpc, args.contract, args.chunk_size,
+                                    args.block_step, args.start_block, args.confirmations, args.shards)
+    summary = reconciler.run(fresh=args.fresh)
+    print(f"✓ Run {summary['run_id']}: {summary['rows_checked']} rows in {summary['total_seconds']}s")
+    for issue, count in sorted(summary["issues"].items()):
+        print(f"  {issue:<20} {count}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
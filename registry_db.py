@@ -0,0 +1,383 @@
+"""
+Registry Database Module
+Location, connections, schema and migrations of the documents registry
+
+Schema version 2 stores document_hash and txn_hash as 32-byte BLOBs and
+derives token_id from the fingerprint instead of storing it. Values are
+converted at this boundary: callers pass and receive '0x' hex strings.
+"""
+
+import os
+import sys
+import time
+import sqlite3
+import threading
+from collections import namedtuple
+from typing import Optional, Tuple
+
+SCHEMA_VERSION = 2
+
+# Columns holding 32-byte values (BLOB in v2, hex TEXT in older rows)
+BINARY_COLUMNS = ('document_hash', 'txn_hash')
+
+# Columns of the documents table (projections select a subset by name)
+DOCUMENT_COLUMNS = ('id', 'participant_name', 'hackathon_name', 'document_hash', 'txn_hash', 'token_id',
+                    'contract_address', 'timestamp', 'issuer_address', 'document_content', 'phash', 'dhash',
+                    'txn_status', 'txn_block', 'txn_gas_used')
+
+# Rows that hold their fingerprint: every registration except failed mints,
+# which may be registered again (the unique fingerprint index's condition)
+LIVE_REGISTRATION = "txn_status IS NOT 'failed'"
+
+
+def hash_to_blob(value) -> Optional[bytes]:
+    """32-byte BLOB for a hex hash (any case, with or without 0x), else None"""
+    if isinstance(value, bytes):
+        return value if len(value) == 32 else None
+    text = str(value or '').strip()
+    if text[:2] in ('0x', '0X'):
+        text = text[2:]
+    if len(text) != 64:
+        return None
+    try:
+        return bytes.fromhex(text)
+    except ValueError:
+        return None
+
+
+def blob_to_hex(value):
+    """'0x' hex for a stored BLOB; legacy TEXT values pass through unchanged"""
+    if isinstance(value, bytes):
+        return '0x' + value.hex()
+    return value
+
+
+def hash_params(value) -> Tuple:
+    """
+    Lookup keys for a hash: the BLOB plus both legacy TEXT spellings, so
+    exact-match queries work before, during and after the v2 migration
+    """
+    text = str(value or '').strip().lower()
+    bare = text[2:] if text.startswith('0x') else text
+    blob = hash_to_blob(bare)
+    return (blob if blob is not None else bare, '0x' + bare, bare)
+
+
+def token_id_for(document_hash) -> Optional[str]:
+    """Token id of a fingerprint (tokenId = uint256(fpHash)), as a decimal string"""
+    blob = hash_to_blob(document_hash)
+    return str(int.from_bytes(blob, 'big')) if blob is not None else None
+
+
+_last_layout = (None, None)
+_row_layouts = {}
+
+def _row_layout(description) -> Tuple:
+    """Positions of (hash columns, token_id, document_hash) in a result set"""
+    global _last_layout
+    # Every row of a result set shares one description object; queries repeat
+    cached_description, layout = _last_layout
+    if description is not cached_description:
+        layout = _row_layouts.get(description)
+        if layout is None:
+            names = [column[0] for column in description]
+            layout = _row_layouts[description] = (
+                tuple(i for i, name in enumerate(names) if name in BINARY_COLUMNS),
+                names.index('token_id') if 'token_id' in names else None,
+                names.index('document_hash') if 'document_hash' in names else None,
+            )
+        _last_layout = (description, layout)
+    return layout
+
+
+def _converted(description, values) -> Tuple:
+    """Row values with BLOB hashes as '0x' hex and a missing token_id filled from the fingerprint"""
+    hash_columns, token_column, hash_column = _row_layout(description)
+    converted = None
+    for i in hash_columns:
+        if values[i].__class__ is bytes:
+            converted = converted or list(values)
+            converted[i] = '0x' + values[i].hex()
+    if token_column is not None and hash_column is not None and values[token_column] is None:
+        converted = converted or list(values)
+        fingerprint = values[hash_column]
+        converted[token_column] = (str(int.from_bytes(fingerprint, 'big')) if fingerprint.__class__ is bytes
+                                   else token_id_for(fingerprint))
+    return tuple(converted) if converted else values
+
+
+def registry_row(cursor, values):
+    """
+    Row factory: sqlite3.Row with BLOB hashes as '0x' hex and a missing
+    token_id filled from the fingerprint, so callers see the pre-v2 row shape.
+    Each row is converted once; column access stays at sqlite3.Row speed.
+    """
+    return sqlite3.Row(cursor, _converted(cursor.description, values))
+
+
+_record_types = {}
+
+def record_type(columns: Tuple[str, ...]):
+    """Tuple-backed record class (namedtuple) for one projection, created once per column list"""
+    cls = _record_types.get(columns)
+    if cls is None:
+        cls = _record_types[columns] = namedtuple('DocumentRecord', columns, rename=True)
+    return cls
+
+
+def document_record(cursor, values):
+    """
+    Row factory for listings: a DocumentRecord of the selected columns only
+    (attribute access, no per-row mapping), converted like registry_row
+    """
+    description = cursor.description
+    cls = _record_types.get(description)
+    if cls is None:
+        cls = _record_types[description] = record_type(tuple(column[0] for column in description))
+    return cls._make(_converted(description, values))
+
+
+def is_migrated(conn) -> bool:
+    """True once every row stores its hashes as BLOBs (schema v2)"""
+    return conn.execute('PRAGMA user_version').fetchone()[0] >= SCHEMA_VERSION
+
+
+def get_db_path():
+    # DB_PATH points the app at another registry (e.g. a load-test copy)
+    if os.getenv("DB_PATH"):
+        return os.getenv("DB_PATH")
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(base_dir, 'document_verification.db')
+
+def get_db_connection(db_path=None):
+    conn = sqlite3.connect(db_path or get_db_path())
+    conn.row_factory = registry_row
+    # hash_key(x): 32-byte BLOB of a BLOB or hex TEXT hash, for joins across both forms
+    conn.create_function('hash_key', 1, hash_to_blob, deterministic=True)
+    return conn
+
+
+def fingerprint_for(identifier) -> str:
+    """The fingerprint an identifier names: hex as given, or a decimal token id as 64 hex chars"""
+    identifier = str(identifier or '').strip()
+    if identifier.isdigit() and len(identifier) > 64:
+        # Decimal token id: the fingerprint is its 32-byte big-endian form
+        token = int(identifier)
+        if token < 2 ** 256:
+            return format(token, '064x')
+    return identifier
+
+
+def find_document(conn, identifier):
+    """
+    Earliest document matching a fingerprint, transaction hash or token id
+    (hex with or without 0x, or decimal token id) via the indexed columns
+    """
+    identifier = str(identifier or '').strip()
+    row = conn.execute(
+        'SELECT * FROM documents WHERE document_hash IN (?, ?, ?) ORDER BY id LIMIT 1',
+        hash_params(fingerprint_for(identifier))
+    ).fetchone()
+    if row is None:
+        row = conn.execute(
+            'SELECT * FROM documents WHERE txn_hash IN (?, ?, ?) ORDER BY id LIMIT 1', hash_params(identifier)
+        ).fetchone()
+    if row is None and identifier.isdigit():
+        # Legacy rows whose stored token_id does not derive from the fingerprint
+        row = conn.execute(
+            'SELECT * FROM documents WHERE token_id = ? ORDER BY id LIMIT 1', (identifier,)
+        ).fetchone()
+    return row
+
+def ensure_fingerprint_index(conn) -> bool:
+    """
+    Unique index on the fingerprint of live registrations, so two writers
+    cannot both register one fingerprint. Created once hashes are canonical
+    BLOBs (schema v2); False while duplicates registered before it exist
+    (python registry_store.py dedupe removes them).
+    """
+    try:
+        conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_documents_fingerprint '
+                     f'ON documents(document_hash) WHERE {LIVE_REGISTRATION}')
+        return True
+    except sqlite3.IntegrityError:
+        return False
+
+
+def _warn_duplicates(db_path) -> None:
+    print(f"⚠ {os.path.basename(db_path or get_db_path())} has duplicate fingerprints: no unique fingerprint "
+          f"index until `python registry_store.py dedupe --apply`")
+
+
+def init_db(db_path=None):
+    conn = get_db_connection(db_path)
+    # Create table if not exists with product-focused columns
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS documents (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            participant_name TEXT, -- This will be Product Name
+            hackathon_name TEXT,   -- This will be Brand/Batch
+            document_hash BLOB,    -- Unique Product Fingerprint (32 bytes)
+            txn_hash BLOB,         -- 32 bytes
+            token_id TEXT,         -- NULL unless it differs from the fingerprint (legacy rows)
+            contract_address TEXT,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            issuer_address TEXT,
+            document_content TEXT, -- Full technical specs or label scan
+            phash TEXT,
+            dhash TEXT,
+            txn_status TEXT,       -- pending / confirmed / failed (confirmation tracker)
+            txn_block INTEGER,
+            txn_gas_used INTEGER
+        )
+    ''')
+    
+    # Check for missing columns in existing table (Migration)
+    cursor = conn.execute('PRAGMA table_info(documents)')
+    columns = [row['name'] for row in cursor.fetchall()]
+    
+    if 'token_id' not in columns:
+        print("Migrating: Adding token_id column...")
+        conn.execute('ALTER TABLE documents ADD COLUMN token_id TEXT')
+    
+    if 'contract_address' not in columns:
+        print("Migrating: Adding contract_address column...")
+        conn.execute('ALTER TABLE documents ADD COLUMN contract_address TEXT')
+
+    if 'issuer_address' not in columns:
+        print("Migrating: Adding issuer_address column...")
+        conn.execute('ALTER TABLE documents ADD COLUMN issuer_address TEXT')
+
+    if 'document_content' not in columns:
+        print("Migrating: Adding document_content column...")
+        conn.execute('ALTER TABLE documents ADD COLUMN document_content TEXT')
+
+    if 'phash' not in columns:
+        print("Migrating: Adding perceptual hash columns...")
+        conn.execute('ALTER TABLE documents ADD COLUMN phash TEXT')
+        conn.execute('ALTER TABLE documents ADD COLUMN dhash TEXT')
+
+    if 'txn_status' not in columns:
+        print("Migrating: Adding transaction receipt columns...")
+        conn.execute('ALTER TABLE documents ADD COLUMN txn_status TEXT')
+        conn.execute('ALTER TABLE documents ADD COLUMN txn_block INTEGER')
+        conn.execute('ALTER TABLE documents ADD COLUMN txn_gas_used INTEGER')
+
+    # Exact-match lookups (single and bulk validation) go through these indexes
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_documents_hash ON documents(document_hash)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_documents_txn ON documents(txn_hash)')
+
+    version = conn.execute('PRAGMA user_version').fetchone()[0]
+    if version < SCHEMA_VERSION and conn.execute('SELECT 1 FROM documents LIMIT 1').fetchone() is None:
+        # Empty registry: nothing to convert
+        conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+        version = SCHEMA_VERSION
+    if version >= SCHEMA_VERSION and not ensure_fingerprint_index(conn):
+        _warn_duplicates(db_path)
+
+    conn.commit()
+    conn.close()
+
+    # Existing registries convert to BLOB storage in the background while the app serves
+    if version < SCHEMA_VERSION and os.getenv("BINARY_MIGRATION", "background") == "background":
+        start_binary_migration(db_path)
+
+
+def insert_document(conn, **fields) -> int:
+    """
+    Insert a documents row, storing hashes as BLOBs (token_id is derived, not stored)
+
+    Returns:
+        The new row id
+    """
+    fields.pop('token_id', None)
+    for column in BINARY_COLUMNS:
+        if column in fields:
+            blob = hash_to_blob(fields[column])
+            if blob is not None:
+                fields[column] = blob
+    columns = ', '.join(fields)
+    placeholders = ', '.join('?' for _ in fields)
+    cursor = conn.execute(f'INSERT INTO documents ({columns}) VALUES ({placeholders})', tuple(fields.values()))
+    return cursor.lastrowid
+
+
+def migrate_to_binary(db_path=None, batch_size: int = 2000, pause: float = 0.005) -> int:
+    """
+    Online migration to schema v2: rewrites hex TEXT hashes as BLOBs and
+    clears stored token ids that merely repeat the fingerprint, in short
+    batched transactions so the app keeps serving. Values that are not
+    32-byte hex, and token ids that disagree with the fingerprint, are kept.
+
+    Args:
+        db_path: registry database (defaults to the app's)
+        batch_size: rows per transaction
+        pause: seconds to yield the write lock between batches
+
+    Returns:
+        Number of rows rewritten
+    """
+    # Plain tuples: the conversion has to see what is actually stored
+    conn = sqlite3.connect(db_path or get_db_path(), timeout=30)
+    converted, last_id = 0, 0
+    try:
+        while True:
+            rows = conn.execute('SELECT id, document_hash, txn_hash, token_id FROM documents WHERE id > ? '
+                                'ORDER BY id LIMIT ?', (last_id, batch_size)).fetchall()
+            if not rows:
+                break
+            updates = []
+            for doc_id, document_hash, txn_hash, token_id in rows:
+                new_hash = hash_to_blob(document_hash) or document_hash
+                new_txn = hash_to_blob(txn_hash) or txn_hash
+                new_token = token_id
+                if isinstance(new_hash, bytes) and token_id == str(int.from_bytes(new_hash, 'big')):
+                    new_token = None
+                if (new_hash, new_txn, new_token) != (document_hash, txn_hash, token_id):
+                    updates.append((new_hash, new_txn, new_token, doc_id))
+            with conn:
+                conn.executemany('UPDATE documents SET document_hash = ?, txn_hash = ?, token_id = ? WHERE id = ?',
+                                 updates)
+            converted += len(updates)
+            last_id = rows[-1][0]
+            if pause:
+                time.sleep(pause)
+        conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+        if not ensure_fingerprint_index(conn):
+            _warn_duplicates(db_path)
+        conn.commit()
+    finally:
+        conn.close()
+    return converted
+
+
+_migrations = {}
+_migrations_lock = threading.Lock()
+
+def start_binary_migration(db_path=None) -> None:
+    """Run migrate_to_binary in a background thread (once per database)"""
+    path = db_path or get_db_path()
+    with _migrations_lock:
+        if path in _migrations and _migrations[path].is_alive():
+            return
+
+        def run():
+            start = time.perf_counter()
+            try:
+                converted = migrate_to_binary(path)
+                print(f"✓ Registry converted to binary storage ({converted} rows in {time.perf_counter() - start:.1f}s)")
+            except Exception as e:
+                print(f"⚠ Binary storage migration stopped (resumes on next start): {e}")
+
+        _migrations[path] = threading.Thread(target=run, name="registry-migration", daemon=True)
+        _migrations[path].start()
+
+
+if __name__ == '__main__':
+    # python registry_db.py migrate [db_path]   (foreground, no pauses)
+    if len(sys.argv) >= 2 and sys.argv[1] == 'migrate':
+        start = time.perf_counter()
+        converted = migrate_to_binary(sys.argv[2] if len(sys.argv) > 2 else None, pause=0)
+        print(f"✓ Converted {converted} rows in {time.perf_counter() - start:.1f}s")
+    else:
+        print("Usage: python registry_db.py migrate [db_path]")
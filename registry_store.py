@@ -0,0 +1,545 @@
+"""
+Registry Store Module
+Partitions the documents registry across N SQLite shard files by
+fingerprint prefix, so registrations that land on different shards do not
+queue behind one write lock.
+
+REGISTRY_SHARDS=1 (the default) keeps everything in DB_PATH, as before.
+With N shards, documents live in <db>.shard-<i>-of-<N>.db next to DB_PATH
+and the main file keeps the shared tables (anchor batches, reconciliation).
+A fingerprint's first two bytes pick its shard, so point lookups touch one
+file; lookups by transaction hash, history, statistics and search fan out
+to every shard in parallel.
+
+Document ids stay unique across shards: shard i issues ids congruent to
+i mod N, above every id present when the shard set was created, and
+rebalancing keeps existing ids.
+
+Changing the shard count (here 1 -> 8):
+    python registry_store.py rebalance --from 1 --to 8           # live copy
+    python registry_store.py rebalance --from 1 --to 8           # again with registrations paused
+    # restart the app with REGISTRY_SHARDS=8
+    python registry_store.py rebalance --from 1 --to 8 --prune   # drop the old copy
+    python registry_store.py status --shards 8
+
+Each shard keeps one live registration per fingerprint (unique index).
+Registries that already hold repeats get the index after:
+    python registry_store.py dedupe            # report
+    python registry_store.py dedupe --apply
+"""
+
+import os
+import sys
+import heapq
+import sqlite3
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from registry_db import (
+    get_db_path, get_db_connection, init_db, insert_document as insert_row, find_document as find_row,
+    fingerprint_for, hash_params, hash_to_blob, ensure_fingerprint_index, document_record, BINARY_COLUMNS,
+    LIVE_REGISTRATION, SCHEMA_VERSION,
+)
+
+REGISTRY_SHARDS = int(os.getenv("REGISTRY_SHARDS", 1))
+
+
+def shard_paths(db_path: str, count: int) -> List[str]:
+    """Files of a shard set; a single shard is the main file itself"""
+    if count == 1:
+        return [db_path]
+    stem, ext = os.path.splitext(db_path)
+    return [f"{stem}.shard-{i}-of-{count}{ext or '.db'}" for i in range(count)]
+
+
+def shard_of(fingerprint, count: int) -> int:
+    """Shard of a fingerprint: its first two bytes mod count (malformed values go to shard 0)"""
+    if count == 1:
+        return 0
+    blob = hash_to_blob(fingerprint)
+    return int.from_bytes(blob[:2], 'big') % count if blob is not None else 0
+
+
+class RegistryStore:
+    """
+    Sharded documents registry
+
+    Args:
+        db_path: main registry database (defaults to the app's)
+        shards: shard count (defaults to REGISTRY_SHARDS)
+    """
+
+    def __init__(self, db_path=None, shards: Optional[int] = None):
+        self.db_path = db_path or get_db_path()
+        self.count = shards or REGISTRY_SHARDS
+        self.paths = shard_paths(self.db_path, self.count)
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+
+    # --- Setup ---
+
+    def init(self, warn: bool = True) -> None:
+        """Create the main file and every shard (schema, migrations, shard metadata)"""
+        init_db(self.db_path)
+        if self.count == 1:
+            return
+        conn = get_db_connection(self.db_path)
+        legacy_rows = conn.execute('SELECT COUNT(*) FROM documents').fetchone()[0]
+        conn.close()
+        if legacy_rows and warn:
+            print(f"⚠ {legacy_rows} documents are in {os.path.basename(self.db_path)}, outside the {self.count} shards: "
+                  f"run `python registry_store.py rebalance --to {self.count}`")
+        for i, path in enumerate(self.paths):
+            init_db(path)
+            conn = get_db_connection(path)
+            conn.execute('CREATE TABLE IF NOT EXISTS shard_meta (key TEXT PRIMARY KEY, value INTEGER)')
+            conn.executemany('INSERT OR IGNORE INTO shard_meta (key, value) VALUES (?, ?)',
+                             [('shard', i), ('shard_count', self.count), ('id_floor', 0)])
+            count = conn.execute("SELECT value FROM shard_meta WHERE key = 'shard_count'").fetchone()[0]
+            conn.commit()
+            conn.close()
+            if count != self.count:
+                raise RuntimeError(f"{path} belongs to a {count}-shard set, not {self.count}")
+
+    def connect(self, shard: int):
+        """Connection to one shard, with shard_of(x) available in SQL"""
+        conn = get_db_connection(self.paths[shard])
+        conn.create_function('shard_of', 1, lambda value: shard_of(value, self.count), deterministic=True)
+        return conn
+
+    # --- Fan-out ---
+
+    def fan_out(self, fn: Callable, shards: Optional[Iterable[int]] = None) -> List:
+        """
+        Run fn(conn, shard) on each shard in parallel
+
+        Returns:
+            The results, in shard order
+        """
+        shards = list(range(self.count) if shards is None else shards)
+
+        def run(shard):
+            conn = self.connect(shard)
+            try:
+                return fn(conn, shard)
+            finally:
+                conn.close()
+
+        if len(shards) == 1:
+            return [run(shards[0])]
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.count, thread_name_prefix="registry-shard")
+        return list(self._pool.map(run, shards))
+
+    def query(self, sql: str, params=(), raw: bool = False) -> List:
+        """Rows of a query run on every shard, concatenated in shard order"""
+        def run(conn, shard):
+            if raw:
+                conn.row_factory = None
+            return conn.execute(sql, params).fetchall()
+        return [row for rows in self.fan_out(run) for row in rows]
+
+    def query_ordered(self, sql: str, params=(), key: Callable = None, reverse: bool = False,
+                      limit: Optional[int] = None, raw: bool = False) -> List:
+        """Merge per-shard results that are each already sorted by key (e.g. ORDER BY timestamp DESC)"""
+        def run(conn, shard):
+            if raw:
+                conn.row_factory = None
+            return conn.execute(sql, params).fetchall()
+        merged = heapq.merge(*self.fan_out(run), key=key, reverse=reverse)
+        return list(merged) if limit is None else [row for _, row in zip(range(limit), merged)]
+
+    def iter_ordered(self, sql: str, params=(), key: Callable = None, reverse: bool = False,
+                     row_factory: Callable = document_record) -> Iterator:
+        """
+        Like query_ordered, but streamed: rows are merged from an open cursor
+        per shard as they are consumed, so a listing never holds every row.
+        Rows are DocumentRecords (namedtuples of the selected columns) by default.
+        """
+        conns = [self.connect(shard) for shard in range(self.count)]
+        try:
+            cursors = []
+            for conn in conns:
+                conn.row_factory = row_factory
+                cursors.append(conn.execute(sql, params))
+            yield from cursors[0] if len(cursors) == 1 else heapq.merge(*cursors, key=key, reverse=reverse)
+        finally:
+            for conn in conns:
+                conn.close()
+
+    # --- Point operations ---
+
+    def insert_document(self, **fields) -> int:
+        """
+        Register a document on its fingerprint's shard (committed)
+
+        Returns:
+            The document id, unique across shards
+        """
+        shard = shard_of(fields.get('document_hash'), self.count)
+        conn = self.connect(shard)
+        try:
+            if self.count == 1:
+                doc_id = insert_row(conn, **fields)
+            else:
+                # Reserve the next id congruent to this shard under the shard's write lock
+                conn.execute('BEGIN IMMEDIATE')
+                floor = conn.execute("SELECT value FROM shard_meta WHERE key = 'id_floor'").fetchone()[0]
+                base = max(conn.execute('SELECT MAX(id) FROM documents').fetchone()[0] or 0, floor)
+                doc_id = base + 1 + (shard - base - 1) % self.count
+                insert_row(conn, id=doc_id, **fields)
+            conn.commit()
+            return doc_id
+        finally:
+            conn.close()
+
+    def find_registration(self, fingerprint):
+        """Live registration of a fingerprint (failed mints aside), or None (one shard)"""
+        fingerprint = fingerprint_for(fingerprint)
+        conn = self.connect(shard_of(fingerprint, self.count))
+        try:
+            return conn.execute(f'SELECT * FROM documents WHERE document_hash IN (?, ?, ?) AND {LIVE_REGISTRATION} '
+                                'ORDER BY id LIMIT 1', hash_params(fingerprint)).fetchone()
+        finally:
+            conn.close()
+
+    def register_document(self, **fields) -> Tuple[int, bool]:
+        """
+        Insert a document unless its fingerprint already has a live registration
+
+        Returns:
+            (new document id, True), or (the existing registration's id, False)
+        """
+        existing = self.find_registration(fields.get('document_hash'))
+        if existing is not None:
+            return existing['id'], False
+        try:
+            return self.insert_document(**fields), True
+        except sqlite3.IntegrityError:
+            # Another process registered the fingerprint since the lookup (unique fingerprint index)
+            existing = self.find_registration(fields.get('document_hash'))
+            if existing is None:
+                raise
+            return existing['id'], False
+
+    def find_by_fingerprint(self, fingerprint):
+        """Earliest document registered under a fingerprint (one shard)"""
+        fingerprint = fingerprint_for(fingerprint)
+        conn = self.connect(shard_of(fingerprint, self.count))
+        try:
+            return conn.execute('SELECT * FROM documents WHERE document_hash IN (?, ?, ?) ORDER BY id LIMIT 1',
+                                hash_params(fingerprint)).fetchone()
+        finally:
+            conn.close()
+
+    def find_document(self, identifier):
+        """
+        Document matching a fingerprint, transaction hash or token id: the
+        fingerprint's shard first, then every other shard in parallel
+        """
+        home = shard_of(fingerprint_for(identifier), self.count)
+        conn = self.connect(home)
+        try:
+            row = find_row(conn, identifier)
+        finally:
+            conn.close()
+        if row is None and self.count > 1:
+            found = [r for r in self.fan_out(lambda c, shard: find_row(c, identifier),
+                                             [i for i in range(self.count) if i != home]) if r is not None]
+            row = min(found, key=lambda r: (r['timestamp'] or '', r['id'])) if found else None
+        return row
+
+    def find_by_txn(self, txn_hash):
+        """Earliest document recorded with a transaction hash (all shards)"""
+        found = [r for r in self.fan_out(lambda conn, shard: conn.execute(
+            'SELECT * FROM documents WHERE txn_hash IN (?, ?, ?) ORDER BY id LIMIT 1', hash_params(txn_hash)
+        ).fetchone()) if r is not None]
+        return min(found, key=lambda r: (r['timestamp'] or '', r['id'])) if found else None
+
+    def find_by_id(self, doc_id: int):
+        """
+        Document by id (primary key): the shard new ids are assigned to
+        first, then every other shard (rows keep their id when rebalanced)
+        """
+        home = doc_id % self.count
+        conn = self.connect(home)
+        try:
+            row = conn.execute('SELECT * FROM documents WHERE id = ?', (doc_id,)).fetchone()
+        finally:
+            conn.close()
+        if row is None and self.count > 1:
+            found = [r for r in self.fan_out(lambda c, shard: c.execute(
+                'SELECT * FROM documents WHERE id = ?', (doc_id,)
+            ).fetchone(), [i for i in range(self.count) if i != home]) if r is not None]
+            row = found[0] if found else None
+        return row
+
+    def update_documents(self, ids: List[int], **fields) -> int:
+        """
+        Set columns on documents by id, wherever they live
+
+        Returns:
+            Rows updated
+        """
+        if not ids:
+            return 0
+        assignments, values = self._assignments(fields)
+
+        def run(conn, shard):
+            updated = 0
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                updated += conn.execute(
+                    f"UPDATE documents SET {assignments} WHERE id IN ({', '.join('?' for _ in chunk)})",
+                    values + tuple(chunk)
+                ).rowcount
+            conn.commit()
+            return updated
+        return sum(self.fan_out(run))
+
+    def update_by_txn(self, recorded_txn, **fields) -> int:
+        """
+        Set columns on every document recorded with a transaction hash (all shards)
+
+        Returns:
+            Rows updated
+        """
+        assignments, values = self._assignments(fields)
+
+        def run(conn, shard):
+            updated = conn.execute(f'UPDATE documents SET {assignments} WHERE txn_hash IN (?, ?, ?)',
+                                   values + hash_params(recorded_txn)).rowcount
+            conn.commit()
+            return updated
+        return sum(self.fan_out(run))
+
+    @staticmethod
+    def _assignments(fields: Dict):
+        """SET clause and values for fields, with hash columns stored as BLOBs"""
+        assignments = ', '.join(f'{column} = ?' for column in fields)
+        values = tuple((hash_to_blob(v) or v) if column in BINARY_COLUMNS else v for column, v in fields.items())
+        return assignments, values
+
+    # --- Duplicates ---
+
+    def dedupe(self, apply: bool = False) -> Dict:
+        """
+        Find fingerprints registered more than once (before the unique
+        fingerprint index existed) and, with apply, delete the extra rows and
+        create the index. Per fingerprint the row kept is the earliest
+        confirmed one, else the earliest pending one, else the earliest.
+
+        Returns:
+            Duplicated fingerprints, extra rows, rows deleted and shards indexed
+        """
+        rank = {'confirmed': 0, 'pending': 1}
+
+        def run(conn, shard):
+            conn.row_factory = None
+            groups: Dict[bytes, List] = {}
+            for doc_id, key, status in conn.execute(
+                    f'SELECT id, hash_key(document_hash), txn_status FROM documents WHERE {LIVE_REGISTRATION} '
+                    'AND document_hash IS NOT NULL ORDER BY id'):
+                if key is not None:
+                    groups.setdefault(key, []).append((rank.get(status, 2), doc_id))
+            extra = [doc_id for rows in groups.values() if len(rows) > 1 for _, doc_id in sorted(rows)[1:]]
+            deleted, indexed = 0, False
+            if apply:
+                for start in range(0, len(extra), 500):
+                    chunk = extra[start:start + 500]
+                    deleted += conn.execute(f"DELETE FROM documents WHERE id IN ({', '.join('?' for _ in chunk)})",
+                                            chunk).rowcount
+                # Unmigrated (hex TEXT) registries get the index with the binary migration
+                indexed = (conn.execute('PRAGMA user_version').fetchone()[0] >= SCHEMA_VERSION
+                           and ensure_fingerprint_index(conn))
+                conn.commit()
+            return sum(len(rows) > 1 for rows in groups.values()), len(extra), deleted, indexed
+
+        results = self.fan_out(run)
+        return {"fingerprints": sum(r[0] for r in results), "extra_rows": sum(r[1] for r in results),
+                "deleted": sum(r[2] for r in results), "indexed": sum(r[3] for r in results)}
+
+    # --- Rebalancing ---
+
+    def rebalance(self, new_count: int, batch_size: int = 5000, prune: bool = False) -> Dict:
+        """
+        Copy every document into a new set of new_count shards, keeping ids.
+        Re-runs skip rows already copied, so the first pass can run live and
+        a last pass with registrations paused copies the tail before
+        REGISTRY_SHARDS is switched to new_count.
+
+        Args:
+            new_count: target shard count
+            batch_size: rows per read/insert batch
+            prune: once every row is present in the target, delete the source rows
+
+        Returns:
+            Rows copied per target shard and the total
+        """
+        if new_count == self.count:
+            raise ValueError(f"Registry already has {new_count} shard(s)")
+        target = RegistryStore(self.db_path, new_count)
+        sources = list(self.paths)
+        if new_count > 1:
+            # New shards only issue ids above everything that exists now
+            floor = max(self._max_id(p) for p in sources)
+            target.init(warn=False)
+            for path in target.paths:
+                conn = sqlite3.connect(path)
+                conn.execute("UPDATE shard_meta SET value = MAX(value, ?) WHERE key = 'id_floor'", (floor,))
+                conn.commit()
+                conn.close()
+        else:
+            init_db(self.db_path)
+
+        targets = [sqlite3.connect(path, timeout=30) for path in target.paths]
+        copied = [0] * new_count
+        try:
+            for source in sources:
+                if source in target.paths:
+                    continue
+                reader = sqlite3.connect(source, timeout=30)
+                columns = [row[1] for row in reader.execute('PRAGMA table_info(documents)')]
+                select = f"SELECT {', '.join(columns)} FROM documents WHERE id > ? ORDER BY id LIMIT ?"
+                insert = (f"INSERT OR IGNORE INTO documents ({', '.join(columns)}) "
+                          f"VALUES ({', '.join('?' for _ in columns)})")
+                hash_column, id_column = columns.index('document_hash'), columns.index('id')
+                last_id = 0
+                while True:
+                    rows = reader.execute(select, (last_id, batch_size)).fetchall()
+                    if not rows:
+                        break
+                    last_id = rows[-1][id_column]
+                    routed = [[] for _ in range(new_count)]
+                    for row in rows:
+                        routed[shard_of(row[hash_column], new_count)].append(row)
+                    for i, batch in enumerate(routed):
+                        if batch:
+                            copied[i] += targets[i].executemany(insert, batch).rowcount
+                            targets[i].commit()
+                reader.close()
+        finally:
+            for conn in targets:
+                conn.close()
+
+        total_source = sum(self._count(p) for p in sources if p not in target.paths)
+        total_target = sum(self._count(p) for p in target.paths)
+        summary = {"copied": copied, "total_copied": sum(copied), "source_rows": total_source,
+                   "target_rows": total_target}
+        if prune:
+            if total_target < total_source:
+                raise RuntimeError(f"Target has {total_target} rows, source {total_source}: not pruning")
+            for path in sources:
+                if path in target.paths:
+                    continue
+                if path == self.db_path:
+                    conn = sqlite3.connect(path, timeout=30)
+                    conn.execute('DELETE FROM documents')
+                    conn.commit()
+                    conn.close()
+                else:
+                    os.remove(path)
+            summary["pruned"] = True
+        return summary
+
+    @staticmethod
+    def _max_id(path: str) -> int:
+        if not os.path.exists(path):
+            return 0
+        conn = sqlite3.connect(path)
+        try:
+            return conn.execute('SELECT MAX(id) FROM documents').fetchone()[0] or 0
+        except sqlite3.OperationalError:
+            return 0
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _count(path: str) -> int:
+        conn = sqlite3.connect(path)
+        try:
+            return conn.execute('SELECT COUNT(*) FROM documents').fetchone()[0]
+        finally:
+            conn.close()
+
+    def status(self) -> List[Dict]:
+        """Rows and file size per shard"""
+        return [{"shard": i, "path": path, "documents": self._count(path),
+                 "bytes": os.path.getsize(path)} for i, path in enumerate(self.paths)]
+
+
+_stores: Dict[tuple, RegistryStore] = {}
+_stores_lock = threading.Lock()
+
+def get_registry(db_path=None, shards: Optional[int] = None) -> RegistryStore:
+    """Shared, initialized store for a registry (one per path and shard count)"""
+    key = (os.path.abspath(db_path or get_db_path()), shards or REGISTRY_SHARDS)
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = RegistryStore(*key)
+            store.init()
+            _stores[key] = store
+        return store
+
+
+def _after_fork() -> None:
+    # Fan-out pool threads do not survive fork; a server worker builds its own on first use
+    global _stores_lock
+    _stores_lock = threading.Lock()
+    for store in _stores.values():
+        store._pool = None
+        store._pool_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Sharded registry maintenance")
+    sub = parser.add_subparsers(dest="command", required=True)
+    rebalance = sub.add_parser("rebalance", help="Copy documents into a new shard count")
+    rebalance.add_argument("--to", type=int, required=True, dest="count")
+    rebalance.add_argument("--from", type=int, default=None, dest="source",
+                           help="Current shard count (default REGISTRY_SHARDS)")
+    rebalance.add_argument("--batch-size", type=int, default=5000)
+    rebalance.add_argument("--prune", action="store_true", help="Remove the source rows after a complete copy")
+    status = sub.add_parser("status", help="Rows per shard")
+    status.add_argument("--shards", type=int, default=None)
+    dedupe = sub.add_parser("dedupe", help="Remove repeated registrations of a fingerprint")
+    dedupe.add_argument("--shards", type=int, default=None)
+    dedupe.add_argument("--apply", action="store_true", help="Delete the extra rows (default: report only)")
+    parser.add_argument("--db", default=None, help="Main registry database (default DB_PATH)")
+    args = parser.parse_args(argv)
+
+    if args.command == "status":
+        for entry in RegistryStore(args.db, args.shards).status():
+            print(f"  shard {entry['shard']:<3} {entry['documents']:>10} documents  "
+                  f"{entry['bytes'] / 2 ** 20:8.1f} MiB  {os.path.basename(entry['path'])}")
+        return
+    if args.command == "dedupe":
+        store = RegistryStore(args.db, args.shards)
+        store.init(warn=False)
+        summary = store.dedupe(args.apply)
+        print(f"{summary['fingerprints']} fingerprints registered more than once, {summary['extra_rows']} extra rows")
+        if args.apply:
+            print(f"✓ Deleted {summary['deleted']} rows; unique fingerprint index on "
+                  f"{summary['indexed']} of {store.count} shard(s)")
+        elif summary['extra_rows']:
+            print("  Re-run with --apply to delete them")
+        return
+
+    store = RegistryStore(args.db, args.source)
+    summary = store.rebalance(args.count, args.batch_size, args.prune)
+    print(f"✓ Copied {summary['total_copied']} documents into {args.count} shard(s) {summary['copied']} "
+          f"({summary['target_rows']} in target, {summary['source_rows']} in source)")
+    if not args.prune:
+        print(f"  Set REGISTRY_SHARDS={args.count}, re-run to copy rows added meanwhile, then --prune")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,351 @@
+"""
+Request Profiler
+Opt-in profiling of single requests in production. A request is profiled
+when it carries X-Profile-Token matching PROFILE_TOKEN, or is picked at
+PROFILE_SAMPLE_RATE. Two modes:
+
+    sample    a background thread samples the stacks of the request thread
+              (and of busy worker threads, e.g. OCR engines and shard
+              fan-out) every PROFILE_INTERVAL_MS; saved as folded stacks
+              ("frame;frame;frame count"), readable by flamegraph.pl,
+              speedscope and inferno
+    cprofile  cProfile on the request thread; saved as a pstats file
+              (snakeviz, flameprof)
+
+Code marks its stages with `profiler.stage("ocr")`; samples taken inside a
+stage are rooted under "[stage:ocr]" and the wall time per stage is kept in
+the profile's metadata. Marks cost one dict lookup when nothing is profiled.
+
+Overhead and storage are capped: at most PROFILE_MAX_CONCURRENT requests
+are profiled at once and PROFILE_MAX_PER_MINUTE per minute (whatever the
+sample rate or header traffic), sampling stops after PROFILE_MAX_SECONDS, profiles
+are written by a background writer rather than the request, and the
+oldest profiles are deleted beyond PROFILE_MAX_FILES / PROFILE_MAX_MB.
+"""
+
+import os
+import re
+import sys
+import hmac
+import json
+import time
+import uuid
+import random
+import cProfile
+import threading
+from collections import Counter, deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", 0))
+PROFILE_MODE = os.getenv("PROFILE_MODE", "sample")
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", 10))
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", 30))
+PROFILE_MAX_CONCURRENT = int(os.getenv("PROFILE_MAX_CONCURRENT", 1))
+PROFILE_MAX_PER_MINUTE = int(os.getenv("PROFILE_MAX_PER_MINUTE", 30))
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", 50))
+PROFILE_MAX_MB = float(os.getenv("PROFILE_MAX_MB", 50))
+
+MODES = ("sample", "cprofile")
+EXTENSIONS = {"sample": ".folded", "cprofile": ".prof"}
+
+# Besides the request thread, only busy thread-pool workers are sampled (OCR engines,
+# page workers, shard fan-out); background loops (tracker, anchorer, servers) are not
+_POOL_WORKER = ("_worker", os.path.join("concurrent", "futures", "thread.py"))
+_IDLE_FILES = ("threading.py", "queue.py", os.path.join("concurrent", "futures", "thread.py"))
+
+
+def _frame_label(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _folded(frame, limit: int = 200) -> List[str]:
+    """Stack from the outermost frame to the innermost"""
+    stack = []
+    while frame is not None and len(stack) < limit:
+        stack.append(_frame_label(frame.f_code))
+        frame = frame.f_back
+    stack.reverse()
+    return stack
+
+
+def _busy_pool_worker(frame) -> bool:
+    """A thread-pool worker running a task (not parked on its work queue)"""
+    if frame.f_code.co_filename.endswith(_IDLE_FILES):
+        return False
+    while frame is not None:
+        if frame.f_code.co_name == _POOL_WORKER[0] and frame.f_code.co_filename.endswith(_POOL_WORKER[1]):
+            return True
+        frame = frame.f_back
+    return False
+
+
+class Profile:
+    """One profiled request"""
+
+    def __init__(self, profiler: "RequestProfiler", request_id: str, label: str, mode: str, reason: str):
+        self.profiler = profiler
+        self.request_id = request_id
+        self.label = label
+        self.mode = mode
+        self.reason = reason
+        self.thread_id = threading.get_ident()
+        self.started = time.time()
+        self.duration = 0.0
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.gmtime(self.started))
+        slug = re.sub(r"[^A-Za-z0-9_.-]+", "_", label).strip("_")[:40] or "request"
+        self.name = f"{stamp}_{request_id}_{slug}{EXTENSIONS[mode]}"
+        self.stack_counts: Counter = Counter()
+        self.stages: List[str] = []
+        self.stage_seconds: Dict[str, float] = {}
+        self.samples = 0
+        self.truncated = False
+        self._stop = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+        self._cprofile: Optional[cProfile.Profile] = None
+
+    def start(self) -> None:
+        if self.mode == "cprofile":
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+        else:
+            self._sampler = threading.Thread(target=self._sample, name="request-profiler", daemon=True)
+            self._sampler.start()
+
+    def stop(self) -> None:
+        self.duration = time.time() - self.started
+        if self._cprofile is not None:
+            self._cprofile.disable()
+        if self._sampler is not None:
+            self._stop.set()
+            self._sampler.join()
+
+    def _sample(self) -> None:
+        interval = self.profiler.interval
+        deadline = time.monotonic() + self.profiler.max_seconds
+        own = threading.get_ident()
+        names = {}
+        while not self._stop.wait(interval):
+            if time.monotonic() > deadline:
+                self.truncated = True
+                return
+            stage = ";".join(f"[stage:{s}]" for s in self.stages)
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own or (thread_id != self.thread_id and not _busy_pool_worker(frame)):
+                    continue
+                if thread_id not in names:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                name = names.get(thread_id, str(thread_id))
+                if name.startswith("profile-writer"):
+                    continue
+                root = "request" if thread_id == self.thread_id else f"[thread:{name}]"
+                key = ";".join(filter(None, [stage, root] + _folded(frame)))
+                self.stack_counts[key] += 1
+            self.samples += 1
+
+    @contextmanager
+    def stage(self, name: str):
+        self.stages.append(name)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stage_seconds[name] = self.stage_seconds.get(name, 0.0) + time.perf_counter() - start
+            self.stages.pop()
+
+    def save(self, directory: str, status: Optional[int] = None) -> Dict:
+        """Write the profile and its metadata sidecar; returns the metadata"""
+        path = os.path.join(directory, self.name)
+        if self._cprofile is not None:
+            self._cprofile.dump_stats(path)
+        else:
+            with open(path, "w") as f:
+                for stack, count in self.stack_counts.most_common():
+                    f.write(f"{stack} {count}\n")
+        meta = {
+            "name": self.name,
+            "request_id": self.request_id,
+            "request": self.label,
+            "mode": self.mode,
+            "reason": self.reason,
+            "status": status,
+            "started": self.started,
+            "duration_ms": round(self.duration * 1000, 1),
+            "samples": self.samples,
+            "interval_ms": round(self.profiler.interval * 1000, 2),
+            "truncated": self.truncated,
+            "stages_ms": {k: round(v * 1000, 1) for k, v in self.stage_seconds.items()},
+            "bytes": os.path.getsize(path),
+        }
+        with open(path + ".json", "w") as f:
+            json.dump(meta, f)
+        return meta
+
+
+class RequestProfiler:
+    """
+    Decides which requests to profile, runs them, keeps the stored set bounded.
+
+    Args:
+        directory: where profiles are written
+        token: secret for X-Profile-Token (empty: header-triggered profiling
+            and the admin endpoints are off)
+        sample_rate: fraction of requests profiled without a header
+        mode: "sample" or "cprofile"
+    """
+
+    def __init__(self, directory: str = PROFILE_DIR, token: str = PROFILE_TOKEN,
+                 sample_rate: float = PROFILE_SAMPLE_RATE, mode: str = PROFILE_MODE,
+                 interval_ms: float = PROFILE_INTERVAL_MS, max_seconds: float = PROFILE_MAX_SECONDS,
+                 max_concurrent: int = PROFILE_MAX_CONCURRENT, max_per_minute: int = PROFILE_MAX_PER_MINUTE,
+                 max_files: int = PROFILE_MAX_FILES, max_mb: float = PROFILE_MAX_MB):
+        if mode not in MODES:
+            raise ValueError(f"Unknown profile mode: {mode}")
+        self.directory = directory
+        self.token = token
+        self.sample_rate = sample_rate
+        self.mode = mode
+        self.interval = interval_ms / 1000.0
+        self.max_seconds = max_seconds
+        self.max_concurrent = max_concurrent
+        self.max_per_minute = max_per_minute
+        self._recent = deque()  # start times of profiles in the last minute
+        self.max_files = max_files
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.active: Dict[int, Profile] = {}  # request thread id -> profile
+        self.skipped = 0
+        self._lock = threading.Lock()
+        self._rng = random.Random()
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="profile-writer")
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.token) or self.sample_rate > 0
+
+    def authorized(self, token: Optional[str]) -> bool:
+        return bool(self.token) and token is not None and hmac.compare_digest(token, self.token)
+
+    def begin(self, label: str, token: Optional[str] = None, request_id: Optional[str] = None,
+              mode: Optional[str] = None) -> Optional[Profile]:
+        """
+        Start profiling the calling thread's request if it is selected
+
+        Args:
+            label: e.g. "POST /verify_document"
+            token: the request's X-Profile-Token header
+            request_id: caller-supplied id (a random one otherwise)
+            mode: override the default mode (header-triggered requests only)
+
+        Returns:
+            The running Profile, or None
+        """
+        if self.authorized(token):
+            reason = "header"
+        elif self.sample_rate > 0 and self._rng.random() < self.sample_rate:
+            reason, mode = "sampled", None
+        else:
+            return None
+        mode = mode if mode in MODES else self.mode
+        request_id = re.sub(r"[^A-Za-z0-9-]", "", request_id or "")[:32] or uuid.uuid4().hex[:12]
+        with self._lock:
+            # A profile whose request never finished (e.g. a stream that was never closed) is dropped
+            for thread_id, stale in list(self.active.items()):
+                if time.time() - stale.started > 2 * self.max_seconds:
+                    stale._stop.set()
+                    del self.active[thread_id]
+            now = time.monotonic()
+            while self._recent and now - self._recent[0] > 60:
+                self._recent.popleft()
+            if len(self.active) >= self.max_concurrent or len(self._recent) >= self.max_per_minute:
+                self.skipped += 1
+                return None
+            self._recent.append(now)
+            profile = Profile(self, request_id, label, mode, reason)
+            self.active[profile.thread_id] = profile
+        profile.start()
+        return profile
+
+    def end(self, profile: Profile, status: Optional[int] = None) -> str:
+        """
+        Stop profiling; the profile is written and old ones pruned off the
+        request path. Returns the profile's file name.
+        """
+        profile.stop()
+        with self._lock:
+            self.active.pop(profile.thread_id, None)
+        self._writer.submit(self._write, profile, status)
+        return profile.name
+
+    def _write(self, profile: Profile, status: Optional[int]) -> None:
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            meta = profile.save(self.directory, status)
+            self.prune()
+            print(f"✓ Profile {meta['name']} ({meta['samples']} samples, {meta['duration_ms']} ms)")
+        except Exception as e:
+            print(f"⚠ Profile not saved: {e}")
+
+    def flush(self) -> None:
+        """Wait for profiles handed to the writer to be on disk"""
+        self._writer.submit(lambda: None).result()
+
+    @contextmanager
+    def stage(self, name: str):
+        """Mark a stage (ocr, db, rpc, ...) of the current request"""
+        profile = self.active.get(threading.get_ident())
+        if profile is None:
+            yield
+            return
+        with profile.stage(name):
+            yield
+
+    # --- Stored profiles ---
+
+    def list(self) -> List[Dict]:
+        """Metadata of stored profiles, newest first"""
+        if not os.path.isdir(self.directory):
+            return []
+        profiles = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".json"):
+                try:
+                    with open(os.path.join(self.directory, name)) as f:
+                        profiles.append(json.load(f))
+                except (OSError, ValueError):
+                    continue
+        return sorted(profiles, key=lambda p: p.get("started", 0), reverse=True)
+
+    def path(self, name: str) -> Optional[str]:
+        """Absolute path of a stored profile (None for unknown or unsafe names)"""
+        if os.path.basename(name) != name or not name.endswith(tuple(EXTENSIONS.values())):
+            return None
+        path = os.path.join(self.directory, name)
+        return os.path.abspath(path) if os.path.isfile(path) else None
+
+    def prune(self) -> int:
+        """Delete the oldest profiles beyond the file-count and size caps"""
+        profiles = self.list()
+        total, removed = 0, 0
+        for index, meta in enumerate(profiles):
+            total += meta.get("bytes", 0)
+            if index >= self.max_files or total > self.max_bytes:
+                for suffix in ("", ".json"):
+                    try:
+                        os.remove(os.path.join(self.directory, meta["name"] + suffix))
+                    except OSError:
+                        pass
+                removed += 1
+        return removed
+
+    def stats(self) -> Dict:
+        profiles = self.list()
+        return {"enabled": self.enabled, "mode": self.mode, "sample_rate": self.sample_rate,
+                "active": len(self.active), "last_minute": len(self._recent), "skipped_at_cap": self.skipped, "stored": len(profiles),
+                "stored_bytes": sum(p.get("bytes", 0) for p in profiles),
+                "max_per_minute": self.max_per_minute, "max_files": self.max_files, "max_mb": round(self.max_bytes / 1024 / 1024, 1)}
+
+
+profiler = RequestProfiler()
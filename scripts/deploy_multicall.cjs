@@ -0,0 +1,19 @@
+const hre = require("hardhat");
+
+// Deploys Multicall3 where the chain has none at the canonical address (local networks)
+async function main() {
+    const canonical = "0xcA11bde05977b3631167028862bE2a173976CA11";
+    if ((await hre.ethers.provider.getCode(canonical)) !== "0x") {
+        console.log("Multicall3 already deployed at:", canonical);
+        return;
+    }
+    const multicall = await hre.ethers.deployContract("Multicall3");
+    await multicall.waitForDeployment();
+    console.log("Multicall3 deployed to:", await multicall.getAddress());
+    console.log("Set MULTICALL_ADDRESS to that address");
+}
+
+main().catch((error) => {
+    console.error(error);
+    process.exitCode = 1;
+});
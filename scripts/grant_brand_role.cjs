@@ -0,0 +1,24 @@
+const hre = require("hardhat");
+
+// Grants BRAND_ROLE to every signer-pool account (SIGNER_ADDRESSES, comma-separated)
+async function main() {
+    const [admin] = await hre.ethers.getSigners();
+    const product = await hre.ethers.getContractAt("VeriChainProduct", process.env.NFT_CONTRACT_ADDRESS);
+    const role = await product.BRAND_ROLE();
+
+    const addresses = (process.env.SIGNER_ADDRESSES || "").split(",").map((a) => a.trim()).filter(Boolean);
+    for (const address of addresses) {
+        if (await product.hasRole(role, address)) {
+            console.log("Already a brand signer:", address);
+            continue;
+        }
+        const tx = await product.connect(admin).grantRole(role, address);
+        await tx.wait();
+        console.log("Granted BRAND_ROLE to:", address);
+    }
+}
+
+main().catch((error) => {
+    console.error(error);
+    process.exitCode = 1;
+});
@@ -0,0 +1,230 @@
+"""
+Signer Pool Module
+Spreads transaction submission over several accounts so issuance is not
+serialized on one nonce sequence. Each signer keeps its own nonce counter
+and in-flight limit (nonces handed out but not yet mined); a submission
+goes to the least-loaded signer, and mints only to signers holding the
+contract's BRAND_ROLE.
+
+Keys come from SIGNER_KEYS (comma-separated private keys) or
+SIGNER_KEYS_FILE (one key per line); without either the pool holds the
+app's single account.
+"""
+
+import os
+import time
+import threading
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+from eth_account import Account
+from eth_hash.auto import keccak
+
+from chain_reader import ChainReader
+
+# hasRole(bytes32,address) and the contract's minter role
+HAS_ROLE_SELECTOR = "0x91d14854"
+BRAND_ROLE = "0x" + keccak(b"BRAND_ROLE").hex()
+
+SIGNER_MAX_IN_FLIGHT = int(os.getenv("SIGNER_MAX_IN_FLIGHT", 16))
+SIGNER_WAIT_SECONDS = float(os.getenv("SIGNER_WAIT_SECONDS", 30))
+
+
+def load_signer_keys(default_key: Optional[str] = None) -> List[str]:
+    """Private keys from SIGNER_KEYS / SIGNER_KEYS_FILE, else [default_key]"""
+    keys = [k.strip() for k in os.getenv("SIGNER_KEYS", "").split(",") if k.strip()]
+    path = os.getenv("SIGNER_KEYS_FILE")
+    if path:
+        with open(path) as f:
+            keys += [line.strip() for line in f if line.strip() and not line.startswith("#")]
+    if not keys and default_key:
+        keys = [default_key]
+    return list(dict.fromkeys(keys))
+
+
+class Signer:
+    """One account: local nonce counter, in-flight count and submission metrics"""
+
+    def __init__(self, private_key: str):
+        self.account = Account.from_key(private_key)
+        self.address = self.account.address
+        self.lock = threading.Lock()
+        self.next_nonce: Optional[int] = None   # None: read from the node before the next send
+        self.mined_nonce = 0                    # transactions of this account already in blocks
+        self.queued = 0                         # assigned to this signer, nonce not yet taken
+        self.has_role: Optional[bool] = None    # BRAND_ROLE on the contract (None: not checked)
+        self.submitted = 0
+        self.errors = 0
+        self.resyncs = 0
+        self.recent = deque(maxlen=1000)        # submission times, for the recent rate
+
+    @property
+    def in_flight(self) -> int:
+        sent = self.next_nonce - self.mined_nonce if self.next_nonce is not None else 0
+        return self.queued + max(0, sent)
+
+
+class SignerPool:
+    """
+    Least-loaded assignment of submissions to a set of accounts.
+
+    Args:
+        web3: Web3 instance used to broadcast
+        private_keys: signer keys
+        rpc_url: JSON-RPC endpoint for batched nonce and role reads
+        contract_address: NFT contract whose BRAND_ROLE gates minting
+        max_in_flight: unmined transactions allowed per signer
+        wait: seconds to wait for a signer below the limit before failing
+    """
+
+    def __init__(self, web3, private_keys: List[str], rpc_url: str, contract_address: Optional[str] = None,
+                 max_in_flight: int = SIGNER_MAX_IN_FLIGHT, wait: float = SIGNER_WAIT_SECONDS):
+        if not private_keys:
+            raise ValueError("Signer pool needs at least one private key")
+        self.web3 = web3
+        self.signers = [Signer(key) for key in private_keys]
+        self.by_address = {s.address.lower(): s for s in self.signers}
+        self.reader = ChainReader(rpc_url, contract_address)
+        self.contract_address = contract_address
+        self.max_in_flight = max_in_flight
+        self.wait = wait
+        self.started = time.time()
+        self._select_lock = threading.Lock()
+        self._roles_lock = threading.Lock()
+        self._roles_checked = False
+
+    def partition(self, index: int, count: int) -> None:
+        """
+        Keep every count-th signer starting at index for new submissions, so
+        server processes sharing the keys never hand out the same nonce.
+        All keys stay available to sign() (replacements of any account).
+        """
+        if count <= 1:
+            return
+        if len(self.signers) < count:
+            print(f"⚠ Signer pool: {len(self.signers)} accounts for {count} processes; "
+                  f"processes share accounts and may race on nonces")
+            subset = [self.signers[index % len(self.signers)]]
+        else:
+            subset = self.signers[index::count]
+        for signer in subset:
+            signer.next_nonce = None  # resync from the node
+        self.signers = subset
+
+    # --- Chain state ---
+
+    def refresh_nonces(self) -> None:
+        """Mined nonce of every signer, in one batched request"""
+        try:
+            results = self.reader.rpc_batch([("eth_getTransactionCount", [s.address, "latest"]) for s in self.signers])
+        except Exception as e:
+            print(f"⚠ Signer pool nonce refresh failed: {e}")
+            return
+        for signer, (result, error) in zip(self.signers, results):
+            if not error and result is not None:
+                signer.mined_nonce = int(result, 16)
+
+    def check_roles(self) -> List[str]:
+        """
+        Mark which signers hold BRAND_ROLE (one batched eth_call)
+
+        Returns:
+            Addresses that may mint
+        """
+        calls = [("eth_call", [{"to": self.contract_address,
+                                "data": HAS_ROLE_SELECTOR + BRAND_ROLE[2:] + s.address[2:].lower().rjust(64, "0")},
+                               "latest"]) for s in self.signers]
+        for signer, (result, error) in zip(self.signers, self.reader.rpc_batch(calls)):
+            if error:
+                raise RuntimeError(f"hasRole failed for {signer.address}: {error}")
+            signer.has_role = int(result or "0x0", 16) == 1
+        self._roles_checked = True
+        minters = [s.address for s in self.signers if s.has_role]
+        print(f"✓ Signer pool: {len(minters)}/{len(self.signers)} accounts hold BRAND_ROLE")
+        return minters
+
+    # --- Assignment ---
+
+    def _acquire(self, needs_role: bool) -> Signer:
+        if needs_role and not self._roles_checked:
+            with self._roles_lock:
+                if not self._roles_checked:
+                    try:
+                        self.check_roles()
+                    except Exception as e:
+                        # Unknown roles: let every signer try rather than refuse to mint
+                        print(f"⚠ Signer pool role check failed, using all signers: {e}")
+                        self._roles_checked = True
+        eligible = [s for s in self.signers if not needs_role or s.has_role is not False]
+        if not eligible:
+            raise RuntimeError("No signer holds BRAND_ROLE on the contract")
+
+        deadline = time.monotonic() + self.wait
+        while True:
+            with self._select_lock:
+                signer = min(eligible, key=lambda s: (s.in_flight, s.submitted))
+                if signer.in_flight < self.max_in_flight:
+                    # Counted as in flight before the selection lock is released
+                    signer.queued += 1
+                    return signer
+            if time.monotonic() >= deadline:
+                raise RuntimeError(f"All {len(eligible)} signers have {self.max_in_flight} transactions in flight")
+            # Every signer is at its limit: see what has been mined since
+            self.refresh_nonces()
+            time.sleep(0.2)
+
+    def send(self, fields: Dict, needs_role: bool = False) -> Tuple[str, str, Dict, str]:
+        """
+        Sign fields with the least-loaded eligible signer and broadcast
+
+        Args:
+            fields: transaction fields; nonce and from are set here
+            needs_role: only use signers holding BRAND_ROLE (mints)
+
+        Returns:
+            (txn hash, signer address, final fields, signed raw hex)
+        """
+        signer = self._acquire(needs_role)
+        with signer.lock:
+            try:
+                if signer.next_nonce is None:
+                    signer.mined_nonce = self.web3.eth.get_transaction_count(signer.address, "latest")
+                    signer.next_nonce = self.web3.eth.get_transaction_count(signer.address, "pending")
+                    signer.resyncs += 1
+                txn = dict(fields, nonce=signer.next_nonce, **{"from": signer.address})
+                raw = self.web3.to_hex(signer.account.sign_transaction(txn).raw_transaction)
+                txn_hash = self.web3.to_hex(self.web3.eth.send_raw_transaction(raw))
+            except Exception:
+                # The nonce may now be a gap or already taken: re-read it before this signer's next send
+                signer.errors += 1
+                signer.next_nonce = None
+                raise
+            finally:
+                signer.queued -= 1
+            signer.next_nonce += 1
+            signer.submitted += 1
+            signer.recent.append(time.time())
+        return txn_hash, signer.address, txn, raw
+
+    def sign(self, fields: Dict) -> str:
+        """Signed raw hex for fields, with the key of fields['from'] (replacements)"""
+        signer = self.by_address.get(str(fields.get("from", "")).lower(), self.signers[0])
+        return self.web3.to_hex(signer.account.sign_transaction(fields).raw_transaction)
+
+    # --- Metrics ---
+
+    def stats(self, window: float = 60.0) -> List[Dict]:
+        """Per-signer submissions, errors, in-flight count and throughput"""
+        self.refresh_nonces()
+        now = time.time()
+        elapsed = max(now - self.started, 1e-9)
+        return [{
+            "address": s.address,
+            "brand_role": s.has_role,
+            "submitted": s.submitted,
+            "errors": s.errors,
+            "nonce_resyncs": s.resyncs,
+            "in_flight": s.in_flight,
+            "tx_per_min": round(s.submitted * 60 / elapsed, 2),
+            "tx_per_min_recent": round(sum(1 for t in s.recent if now - t <= window) * 60 / window, 2),
+        } for s in self.signers]
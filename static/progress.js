@@ -0,0 +1,45 @@
+// Progress of a long POST (registration, verification) over server-sent events.
+// The request carries X-Progress-Id; /api/progress/<id> reports each stage as it
+// completes, and EventSource resumes after its Last-Event-ID when the connection drops.
+// The last event ("done") carries the response, so when the POST's own connection
+// fails the result is taken from the stream instead of sending the request again.
+// A stream that ends without it ("idle", or a refused or finished connection) ends the wait.
+
+const PROGRESS_STAGES = ['received', 'ocr', 'fingerprint', 'match', 'transaction'];
+
+function newProgressId() {
+    if (window.crypto && crypto.randomUUID) return crypto.randomUUID();
+    return Date.now().toString(36) + '-' + Math.random().toString(36).slice(2, 14);
+}
+
+// Resolves to { status, body, etag } (body is null for 304)
+async function postWithProgress(url, body, onStage, headers = {}, id = newProgressId()) {
+    const events = new EventSource(`/api/progress/${id}`);
+    const finished = new Promise((resolve, reject) => {
+        events.addEventListener('done', e => resolve(JSON.parse(e.data)));
+        events.addEventListener('idle', () => reject(new Error('No progress from the server')));
+        events.addEventListener('error', () => {
+            if (events.readyState === EventSource.CLOSED) reject(new Error('Progress stream closed'));
+        });
+    });
+    finished.catch(() => {});  // only awaited when the POST fails
+    const started = new Promise(resolve => events.addEventListener('received', () => resolve(true)));
+    PROGRESS_STAGES.forEach(stage => events.addEventListener(stage, e => onStage(stage, JSON.parse(e.data))));
+    try {
+        return await fetch(url, { method: 'POST', body, headers: { ...headers, 'X-Progress-Id': id } })
+            .then(async res => ({
+                status: res.status,
+                body: res.status === 304 ? null : await res.json(),
+                etag: res.headers.get('ETag')
+            }))
+            .catch(async err => {
+                const reached = await Promise.race([started, new Promise(r => setTimeout(() => r(false), 3000))]);
+                if (!reached) throw err;  // the request never got to the server
+                // The server carries on without the connection: wait for its result on the stream
+                const done = await finished;
+                return { status: done.status, body: done.body, etag: null };
+            });
+    } finally {
+        events.close();
+    }
+}
@@ -0,0 +1,102 @@
+"""
+Merkle proofs against OpenZeppelin's sorted-pair MerkleProof: an odd last
+node is carried up, so its proof skips that level (no chain or database needed)
+
+Run: python -m pytest -q tests
+"""
+
+import os
+import sys
+import random
+
+import pytest
+from eth_hash.auto import keccak
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from merkle_anchor import build_levels, leaf_hash, proof_for, verify_proof
+
+
+def fingerprints(count, seed=7):
+    rng = random.Random(seed)
+    return ["0x" + format(rng.getrandbits(256), "064x") for _ in range(count)]
+
+
+def tree(fps):
+    levels = build_levels([leaf_hash(fp) for fp in fps])
+    return levels, levels[-1][0]
+
+
+def oz_process_proof(leaf, proof):
+    """MerkleProof.processProof: fold the proof with Hashes.commutativeKeccak256"""
+    node = leaf
+    for sibling in proof:
+        node = keccak(min(node, sibling) + max(node, sibling))
+    return node
+
+
+@pytest.mark.parametrize("count", [1, 2, 3, 5, 1024])
+def test_every_leaf_verifies(count):
+    fps = fingerprints(count)
+    levels, root = tree(fps)
+    for i, fp in enumerate(fps):
+        proof = proof_for(levels, i)
+        assert verify_proof(fp, proof, root)
+        # As stored and served: 0x hex strings
+        assert verify_proof(fp, ["0x" + p.hex() for p in proof], "0x" + root.hex())
+        assert oz_process_proof(leaf_hash(fp), proof) == root
+
+
+def test_single_leaf_is_the_root():
+    fps = fingerprints(1)
+    levels, root = tree(fps)
+    assert root == leaf_hash(fps[0])
+    assert proof_for(levels, 0) == []
+
+
+def test_odd_node_is_carried_up():
+    fps = fingerprints(3)
+    levels, root = tree(fps)
+    leaves = [leaf_hash(fp) for fp in fps]
+    left = keccak(min(leaves[0], leaves[1]) + max(leaves[0], leaves[1]))
+    assert root == keccak(min(left, leaves[2]) + max(left, leaves[2]))
+    # The last leaf has no sibling on the first level
+    assert proof_for(levels, 2) == [left]
+
+
+def test_proof_length_for_1024_leaves():
+    levels, _ = tree(fingerprints(1024))
+    assert len(levels) == 11
+    assert all(len(proof_for(levels, i)) == 10 for i in (0, 511, 1023))
+
+
+@pytest.mark.parametrize("count", [2, 3, 5, 1024])
+def test_tampered_sibling_fails(count):
+    fps = fingerprints(count)
+    levels, root = tree(fps)
+    for i in (0, count - 1):
+        proof = proof_for(levels, i)
+        for level in range(len(proof)):
+            tampered = list(proof)
+            tampered[level] = bytes([proof[level][0] ^ 1]) + proof[level][1:]
+            assert not verify_proof(fps[i], tampered, root)
+
+
+@pytest.mark.parametrize("count", [1, 2, 3, 5, 1024])
+def test_tampered_root_fails(count):
+    fps = fingerprints(count)
+    levels, root = tree(fps)
+    wrong_root = bytes([root[0] ^ 1]) + root[1:]
+    assert not verify_proof(fps[-1], proof_for(levels, count - 1), wrong_root)
+
+
+def test_other_fingerprint_fails():
+    fps = fingerprints(5)
+    levels, root = tree(fps)
+    assert not verify_proof(fps[1], proof_for(levels, 0), root)
+    assert not verify_proof(fingerprints(1, seed=8)[0], proof_for(levels, 0), root)
+
+
+def test_no_leaves():
+    with pytest.raises(ValueError):
+        build_levels([])
@@ -0,0 +1,212 @@
+"""
+EngineEnsemble with stub engines of controllable latency (no OCR models needed)
+
+Run: python -m pytest -q tests
+"""
+
+import os
+import sys
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ocr_engines import EngineEnsemble
+
+
+class StubEngine:
+    """Sleeps for `delay` (or the next of `delays`), then returns fixed text and confidence"""
+
+    def __init__(self, name, delay=0.0, text="LABEL", confidence=0.9, error=None, delays=None):
+        self.name = name
+        self.delays = list(delays) if delays else None
+        self.delay = delay
+        self.text = text
+        self.confidence = confidence
+        self.error = error
+        self.calls = 0
+        self.finished = threading.Event()
+
+    def recognize(self, image_path):
+        self.calls += 1
+        try:
+            time.sleep(self.delays.pop(0) if self.delays else self.delay)
+            if self.error:
+                raise RuntimeError(self.error)
+            return self.text, self.confidence
+        finally:
+            self.finished.set()
+
+
+@pytest.fixture
+def executor():
+    pool = ThreadPoolExecutor(max_workers=4)
+    yield pool
+    pool.shutdown(wait=True)
+
+
+def run(ensemble):
+    start = time.perf_counter()
+    result, trace = ensemble.run("label.png")
+    return result, {t["engine"]: t for t in trace}, time.perf_counter() - start
+
+
+# --- sequential ---
+
+def test_sequential_stops_at_first_text(executor):
+    paddle, tesseract = StubEngine("paddle"), StubEngine("tesseract")
+    result, trace, _ = run(EngineEnsemble([paddle, tesseract], mode="sequential", executor=executor))
+    assert result.engine == "paddle"
+    assert tesseract.calls == 0
+    assert trace["tesseract"]["status"] == "skipped"
+
+
+def test_sequential_falls_back_when_primary_is_empty(executor):
+    paddle, tesseract = StubEngine("paddle", text=""), StubEngine("tesseract", text="SN 42")
+    result, trace, _ = run(EngineEnsemble([paddle, tesseract], mode="sequential", executor=executor))
+    assert result.engine == "tesseract" and result.text == "SN 42"
+    assert trace["paddle"]["status"] == "empty" and trace["tesseract"]["chosen"]
+
+
+def test_sequential_is_the_default():
+    assert EngineEnsemble([StubEngine("paddle")]).mode == "sequential"
+
+
+# --- hedged ---
+
+def test_hedged_secondary_not_started_before_hedge_delay(executor):
+    paddle, tesseract = StubEngine("paddle", delay=0.02), StubEngine("tesseract")
+    ensemble = EngineEnsemble([paddle, tesseract], mode="hedged", hedge_after=0.3, executor=executor)
+    result, trace, _ = run(ensemble)
+    assert result.engine == "paddle"
+    assert tesseract.calls == 0 and trace["tesseract"]["status"] == "skipped"
+
+
+def test_hedged_prefers_primary_after_hedging(executor):
+    paddle = StubEngine("paddle", delay=0.3)
+    tesseract = StubEngine("tesseract", delay=0.02, confidence=0.99)
+    ensemble = EngineEnsemble([paddle, tesseract], mode="hedged", hedge_after=0.05, executor=executor)
+    result, trace, elapsed = run(ensemble)
+    # Tesseract was started at the hedge point and finished first, but Paddle has priority
+    assert tesseract.calls == 1 and trace["tesseract"]["status"] == "ok"
+    assert result.engine == "paddle"
+    assert elapsed >= 0.3
+
+
+def test_hedged_falls_back_when_primary_fails(executor):
+    paddle = StubEngine("paddle", delay=0.01, error="predictor crashed")
+    tesseract = StubEngine("tesseract", delay=0.01)
+    ensemble = EngineEnsemble([paddle, tesseract], mode="hedged", hedge_after=5.0, executor=executor)
+    result, trace, elapsed = run(ensemble)
+    # No hedge yet: the secondary starts as soon as the primary has failed
+    assert result.engine == "tesseract"
+    assert trace["paddle"]["status"] == "error"
+    assert elapsed < 1.0
+
+
+def test_hedged_budget_abandons_slow_primary(executor):
+    paddle = StubEngine("paddle", delay=1.0)
+    tesseract = StubEngine("tesseract", delay=0.02)
+    ensemble = EngineEnsemble([paddle, tesseract], mode="hedged", hedge_after=0.05, budget=0.2, executor=executor)
+    result, trace, elapsed = run(ensemble)
+    assert result.engine == "tesseract"
+    assert trace["paddle"]["status"] == "abandoned"
+    assert 0.2 <= elapsed < 0.6
+
+
+def test_hedge_delay_defaults_to_primary_median(executor):
+    paddle = StubEngine("paddle", delays=[0.05, 0.05, 0.05, 0.4])
+    tesseract = StubEngine("tesseract", delay=0.01)
+    ensemble = EngineEnsemble([paddle, tesseract], mode="hedged", hedge_after=None, executor=executor)
+    # No latency history yet: nothing is hedged
+    assert ensemble.hedge_delay() is None
+    for _ in range(3):
+        run(ensemble)
+    assert tesseract.calls == 0
+    assert ensemble.hedge_delay() == pytest.approx(0.05, abs=0.03)
+    # A run slower than the median is hedged
+    result, trace, _ = run(ensemble)
+    assert result.engine == "paddle"
+    assert tesseract.calls == 1
+
+
+def test_speculative_starts_are_bounded(executor):
+    ensembles = []
+    secondaries = []
+    for _ in range(2):
+        secondary = StubEngine("tesseract", delay=0.3)
+        secondaries.append(secondary)
+        ensembles.append(EngineEnsemble([StubEngine("paddle", delay=0.3), secondary], mode="hedged",
+                                        hedge_after=0.0, executor=executor, max_speculative=1))
+    # Both ensembles share one slot, as the app's single ensemble shares it across requests
+    ensembles[1]._speculative = ensembles[0]._speculative
+    threads = [threading.Thread(target=e.run, args=("label.png",)) for e in ensembles]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sum(s.calls for s in secondaries) == 1
+
+
+# --- race ---
+
+def test_race_takes_first_acceptable(executor):
+    paddle = StubEngine("paddle", delay=0.5)
+    tesseract = StubEngine("tesseract", delay=0.02)
+    result, trace, elapsed = run(EngineEnsemble([paddle, tesseract], mode="race", executor=executor))
+    assert result.engine == "tesseract"
+    assert trace["paddle"]["status"] == "abandoned"
+    assert elapsed < 0.3
+
+
+def test_race_ignores_low_confidence(executor):
+    paddle = StubEngine("paddle", delay=0.1, confidence=0.8)
+    tesseract = StubEngine("tesseract", delay=0.01, confidence=0.2)
+    result, _, _ = run(EngineEnsemble([paddle, tesseract], mode="race", min_confidence=0.5, executor=executor))
+    assert result.engine == "paddle"
+
+
+# --- best ---
+
+def test_best_selects_highest_confidence(executor):
+    paddle = StubEngine("paddle", delay=0.02, confidence=0.6)
+    tesseract = StubEngine("tesseract", delay=0.05, confidence=0.95)
+    result, trace, _ = run(EngineEnsemble([paddle, tesseract], mode="best", executor=executor))
+    assert result.engine == "tesseract"
+    assert trace["tesseract"]["chosen"] and not trace["paddle"]["chosen"]
+
+
+def test_best_keeps_budget(executor):
+    paddle = StubEngine("paddle", delay=0.02, confidence=0.6)
+    tesseract = StubEngine("tesseract", delay=1.0, confidence=0.99)
+    result, trace, elapsed = run(EngineEnsemble([paddle, tesseract], mode="best", budget=0.2, executor=executor))
+    assert result.engine == "paddle"
+    assert trace["tesseract"]["status"] == "abandoned"
+    assert elapsed < 0.6
+
+
+def test_queued_engines_are_cancelled_at_budget():
+    pool = ThreadPoolExecutor(max_workers=1)
+    try:
+        blocker = StubEngine("blocker", delay=0.4)
+        pool.submit(blocker.recognize, "label.png")
+        paddle, tesseract = StubEngine("paddle"), StubEngine("tesseract")
+        ensemble = EngineEnsemble([paddle, tesseract], mode="best", budget=0.1, executor=pool, max_speculative=2)
+        result, trace, _ = run(ensemble)
+        assert result.engine == "none"
+        assert trace["paddle"]["status"] == "skipped" and trace["tesseract"]["status"] == "skipped"
+        blocker.finished.wait(1.0)
+        time.sleep(0.05)
+        # Neither engine ran once the worker was free, and the slots were returned
+        assert paddle.calls == 0 and tesseract.calls == 0
+        assert ensemble._start_speculative() and ensemble._start_speculative()
+    finally:
+        pool.shutdown(wait=True)
+
+
+def test_unknown_mode():
+    with pytest.raises(ValueError):
+        EngineEnsemble([StubEngine("paddle")], mode="fastest")
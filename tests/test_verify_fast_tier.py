@@ -0,0 +1,122 @@
+"""
+Re-scans of a registered label are accepted at the fast OCR tier: the
+registry lookup behind the tier's acceptance uses the fingerprint the label
+was registered under (stub OCR engines, simulated node)
+
+Run: python -m pytest -q tests
+"""
+
+import os
+import sys
+import random
+import tempfile
+
+import pytest
+from PIL import Image
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import local_ocr
+import ocr_engines
+from ocr_engines import EngineEnsemble
+
+LABEL = "Brand: ACME\nSerial No: AB-123456\nMFG: 2024-01-15"
+CONTRACT_ADDRESS = "0xaC8eCD06c9FB699E5C39f2b8EA316BA817f1fD09"
+
+
+class StubFastOCR:
+    """Fast-tier LocalOCR returning the label's lines with high confidence"""
+
+    def __init__(self, text):
+        self.lines = [(line, 0.98) for line in text.splitlines()]
+        self.calls = 0
+
+    def load_fast_image(self, image_path):
+        return image_path
+
+    def recognize(self, img):
+        self.calls += 1
+        return self.lines
+
+
+class StubEngine:
+    """Full-pipeline engine returning the label text"""
+
+    def __init__(self, name, text):
+        self.name = name
+        self.text = text
+        self.calls = 0
+
+    def recognize(self, image_path):
+        self.calls += 1
+        return self.text, 0.95
+
+
+def photo(path, seed):
+    """A noise image: photos with different seeds are far apart perceptually"""
+    rng = random.Random(seed)
+    image = Image.new("L", (64, 64))
+    image.putdata([rng.randrange(256) for _ in range(64 * 64)])
+    image.save(path)
+    return path
+
+
+@pytest.fixture(scope="module")
+def verichain():
+    from benchmarks.sim_node import SimulatedNode
+    from benchmarks.fake_node import FakeNodeServer
+
+    workdir = tempfile.mkdtemp(prefix="verichain-test-")
+    node = SimulatedNode(CONTRACT_ADDRESS, block_interval=0)
+    with FakeNodeServer(node) as server:
+        # The app reads its configuration at import time
+        os.environ.update({
+            "DB_PATH": os.path.join(workdir, "registry.db"),
+            "UPLOAD_FOLDER": os.path.join(workdir, "uploads"),
+            "WEB3_PROVIDER": server.url,
+            "NFT_CONTRACT_ADDRESS": CONTRACT_ADDRESS,
+            "LIVE_VERIFY_PORT": "0",
+            "BINARY_MIGRATION": "off",
+            "ADMISSION": "0",
+            "OCR_TIERED": "1",
+        })
+        import app
+        yield app, workdir
+
+
+@pytest.fixture
+def engines(monkeypatch):
+    fast_engine = StubFastOCR(LABEL)
+    full = StubEngine("paddle", LABEL)
+    ensemble = EngineEnsemble([full], mode="sequential")
+    monkeypatch.setattr(local_ocr, "get_local_ocr", lambda fast=False: fast_engine)
+    monkeypatch.setattr(ocr_engines, "get_default_ensemble", lambda: ensemble)
+    return fast_engine, full
+
+
+def test_registration_and_scan_share_the_fingerprint(verichain):
+    app, _ = verichain
+    details = local_ocr.LocalOCR.parse_details(LABEL)
+    assert app.scan_fingerprint(details) == app.label_fingerprint(details["document_title"],
+                                                                  app.label_fields(details))
+
+
+def test_rescan_of_registered_label_is_accepted_at_fast_tier(verichain, engines):
+    app, workdir = verichain
+    fast, full = engines
+    client = app.app.test_client()
+
+    with open(photo(os.path.join(workdir, "registered.png"), 1), "rb") as f:
+        registered = client.post("/upload_and_issue", data={"image": (f, "registered.png")})
+    assert registered.status_code == 200, registered.get_json()
+    assert full.calls == 1
+
+    # Another photo of the same label: no perceptual candidate, only the fingerprint matches
+    with open(photo(os.path.join(workdir, "rescan.png"), 2), "rb") as f:
+        verified = client.post("/verify_document", data={"image": (f, "rescan.png")})
+    body = verified.get_json()
+    assert fast.calls == 1
+    assert full.calls == 1  # not escalated
+    assert body["status"] == "verified"
+    assert body["match"]["method"] == "fingerprint"
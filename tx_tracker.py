@@ -0,0 +1,289 @@
+"""
+Transaction Tracker Module
+Follows every transaction the app submits until it is mined. On each new
+block the receipts of all pending transactions are fetched in one batched
+JSON-RPC round; status, block number and gas used are written to the
+registry rows that reference the transaction, so verification can read
+confirmed status locally.
+
+Transactions without a receipt for TX_STUCK_SECONDS are rebroadcast once,
+then replaced (same nonce, gas price bumped by TX_GAS_BUMP) up to
+TX_MAX_REPLACEMENTS times. Registry rows and anchor batches follow the
+replacement hash; if the original is mined after all, they point back to it.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import threading
+from typing import Callable, Dict, List, Optional
+
+from chain_reader import ChainReader
+from registry_db import get_db_connection
+from registry_store import get_registry
+
+TX_POLL_SECONDS = float(os.getenv("TX_POLL_SECONDS", 2))
+TX_STUCK_SECONDS = float(os.getenv("TX_STUCK_SECONDS", 120))
+TX_MAX_REPLACEMENTS = int(os.getenv("TX_MAX_REPLACEMENTS", 3))
+TX_GAS_BUMP = float(os.getenv("TX_GAS_BUMP", 1.125))  # nodes require at least +10% to replace
+
+# tracked_transactions.status
+PENDING = "pending"
+CONFIRMED = "confirmed"
+FAILED = "failed"
+REPLACED = "replaced"    # superseded by a higher-priced transaction with the same nonce
+DROPPED = "dropped"      # a replacement whose original was mined instead
+
+
+class ConfirmationTracker:
+    """
+    Tracks submitted transactions to their receipts.
+
+    Args:
+        rpc_url: JSON-RPC endpoint
+        sign_transaction: optional callable(fields) -> signed raw hex, used
+            to replace stuck transactions (rebroadcast only without it)
+        db_path: main registry database (defaults to the app's)
+        poll: seconds between checks for a new block
+        stuck_after: seconds without a receipt before a transaction is
+            rebroadcast, and again before each replacement
+        max_replacements: replacements per nonce
+        gas_bump: gas price multiplier for a replacement
+    """
+
+    def __init__(self, rpc_url: str, sign_transaction: Optional[Callable[[Dict], str]] = None, db_path=None,
+                 poll: float = TX_POLL_SECONDS, stuck_after: float = TX_STUCK_SECONDS,
+                 max_replacements: int = TX_MAX_REPLACEMENTS, gas_bump: float = TX_GAS_BUMP):
+        self.reader = ChainReader(rpc_url, None)
+        self.sign_transaction = sign_transaction
+        self.registry = get_registry(db_path)
+        self.db_path = self.registry.db_path
+        self.poll = poll
+        self.stuck_after = stuck_after
+        self.max_replacements = max_replacements
+        self.gas_bump = gas_bump
+        self._last_head = None
+        self._poll_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        # With several server processes only one runs the loop; the others just record
+        self.autostart = True
+        self.ensure_tables()
+
+    def get_db_connection(self):
+        return get_db_connection(self.db_path)
+
+    def ensure_tables(self) -> None:
+        conn = self.get_db_connection()
+        conn.executescript('''
+            CREATE TABLE IF NOT EXISTS tracked_transactions (
+                txn_hash TEXT PRIMARY KEY,  -- 0x lowercase
+                raw TEXT,                   -- signed transaction, for rebroadcasts
+                fields TEXT,                -- JSON of the unsigned fields, for replacements
+                nonce INTEGER,
+                gas_price INTEGER,
+                status TEXT,                -- pending / confirmed / failed / replaced / dropped
+                replaces TEXT,              -- hash of the transaction this one replaced
+                rebroadcasts INTEGER DEFAULT 0,
+                replacements INTEGER DEFAULT 0,
+                submitted_at REAL,
+                broadcast_at REAL,
+                block_number INTEGER,
+                gas_used INTEGER,
+                confirmed_at REAL
+            );
+            CREATE INDEX IF NOT EXISTS idx_tracked_transactions_status ON tracked_transactions(status);
+            CREATE INDEX IF NOT EXISTS idx_tracked_transactions_replaces ON tracked_transactions(replaces);
+        ''')
+        conn.commit()
+        conn.close()
+
+    # --- Submission side ---
+
+    def track(self, txn_hash: str, fields: Dict, raw: str) -> None:
+        """Start following a transaction that was just broadcast"""
+        now = time.time()
+        conn = self.get_db_connection()
+        conn.execute(
+            'INSERT OR IGNORE INTO tracked_transactions (txn_hash, raw, fields, nonce, gas_price, status, '
+            'submitted_at, broadcast_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            (txn_hash.lower(), raw, json.dumps(fields, default=str), fields.get('nonce'), fields.get('gasPrice'),
+             PENDING, now, now)
+        )
+        conn.commit()
+        conn.close()
+        if self.autostart:
+            self.start()
+
+    def lookup(self, txn_hash: str):
+        """Tracked state of a transaction, or None if this app did not submit it"""
+        conn = self.get_db_connection()
+        try:
+            return conn.execute('SELECT * FROM tracked_transactions WHERE txn_hash = ?',
+                                (str(txn_hash).lower(),)).fetchone()
+        finally:
+            conn.close()
+
+    def apply(self, txn_hash: str) -> None:
+        """Copy an already settled result onto rows written after it was recorded"""
+        row = self.lookup(txn_hash)
+        if row is not None and row['status'] in (CONFIRMED, FAILED):
+            self.registry.update_by_txn(txn_hash, txn_status=row['status'], txn_block=row['block_number'],
+                                        txn_gas_used=row['gas_used'])
+
+    # --- Background loop ---
+
+    def start(self) -> None:
+        """Start the polling loop (idempotent)"""
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._loop, name="tx-tracker", daemon=True)
+            self._thread.start()
+
+    def _loop(self) -> None:
+        while True:
+            time.sleep(self.poll)
+            try:
+                self.poll_once()
+            except Exception as e:
+                print(f"⚠ Confirmation tracker: {e}")
+
+    def poll_once(self, force: bool = False):
+        """
+        Check pending transactions if a new block arrived (or force)
+
+        Returns:
+            Counts of settled, rebroadcast and replaced transactions, None
+            when there was no new block, or False when nothing is pending
+        """
+        with self._poll_lock:
+            conn = self.get_db_connection()
+            try:
+                # Replaced originals stay watched while their replacement is unmined
+                rows = conn.execute(
+                    "SELECT * FROM tracked_transactions t WHERE status = 'pending' OR (status = 'replaced' AND "
+                    "EXISTS (SELECT 1 FROM tracked_transactions r WHERE r.replaces = t.txn_hash "
+                    "AND r.status IN ('pending', 'replaced')))"
+                ).fetchall()
+            finally:
+                conn.close()
+            if not rows:
+                return False
+
+            head = self.reader.block_number()
+            if head == self._last_head and not force:
+                return None
+            self._last_head = head
+
+            receipts = self.reader.receipts(row['txn_hash'] for row in rows)
+            summary = {"checked": len(rows), "confirmed": 0, "failed": 0, "rebroadcast": 0, "replaced": 0}
+            now = time.time()
+            for row in rows:
+                receipt = receipts.get(row['txn_hash'])
+                if receipt and receipt.get("blockNumber"):
+                    status = self._settle(row, receipt)
+                    summary[status] += 1
+                elif row['status'] == PENDING and now - row['broadcast_at'] >= self.stuck_after:
+                    summary[self._unstick(row)] += 1
+            return summary
+
+    # --- Outcomes ---
+
+    def _settle(self, row, receipt: Dict) -> str:
+        status = CONFIRMED if int(receipt.get("status") or "0x0", 16) == 1 else FAILED
+        block, gas_used = int(receipt["blockNumber"], 16), int(receipt.get("gasUsed") or "0x0", 16)
+        txn_hash = row['txn_hash']
+        dropped = []
+        conn = self.get_db_connection()
+        try:
+            conn.execute('UPDATE tracked_transactions SET status = ?, block_number = ?, gas_used = ?, confirmed_at = ? '
+                         'WHERE txn_hash = ?', (status, block, gas_used, time.time(), txn_hash))
+            if row['status'] == REPLACED:
+                # The original won the nonce: its replacements can never be mined
+                dropped = self._replacements(conn, txn_hash)
+                conn.executemany('UPDATE tracked_transactions SET status = ? WHERE txn_hash = ?',
+                                 [(DROPPED, replacement) for replacement in dropped])
+            conn.commit()
+        finally:
+            conn.close()
+        for replacement in dropped:
+            self._repoint(replacement, txn_hash)
+        self.registry.update_by_txn(txn_hash, txn_status=status, txn_block=block, txn_gas_used=gas_used)
+        if status == FAILED:
+            print(f"⚠ Transaction {txn_hash[:12]}... reverted in block {block}")
+        return status
+
+    def _unstick(self, row) -> str:
+        """Rebroadcast a stuck transaction once, then replace it with a higher gas price"""
+        now = time.time()
+        fields = json.loads(row['fields'])
+        if (row['rebroadcasts'] == 0 or self.sign_transaction is None or 'gasPrice' not in fields
+                or row['replacements'] >= self.max_replacements):
+            self._broadcast(row['raw'])
+            conn = self.get_db_connection()
+            conn.execute('UPDATE tracked_transactions SET rebroadcasts = rebroadcasts + 1, broadcast_at = ? '
+                         'WHERE txn_hash = ?', (now, row['txn_hash']))
+            conn.commit()
+            conn.close()
+            return "rebroadcast"
+
+        fields['gasPrice'] = int(int(fields['gasPrice']) * self.gas_bump) + 1
+        raw = self.sign_transaction(fields)
+        new_hash = self._broadcast(raw)
+        if new_hash is None:
+            return "rebroadcast"
+        new_hash = new_hash.lower()
+        conn = self.get_db_connection()
+        try:
+            conn.execute(
+                'INSERT OR IGNORE INTO tracked_transactions (txn_hash, raw, fields, nonce, gas_price, status, replaces, '
+                'replacements, submitted_at, broadcast_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (new_hash, raw, json.dumps(fields, default=str), fields.get('nonce'), fields['gasPrice'], PENDING,
+                 row['txn_hash'], row['replacements'] + 1, row['submitted_at'], now)
+            )
+            conn.execute('UPDATE tracked_transactions SET status = ? WHERE txn_hash = ?', (REPLACED, row['txn_hash']))
+            conn.commit()
+        finally:
+            conn.close()
+        self._repoint(row['txn_hash'], new_hash)
+        print(f"⚠ Replaced stuck transaction {row['txn_hash'][:12]}... with {new_hash[:12]}... "
+              f"(gas price {fields['gasPrice']})")
+        return "replaced"
+
+    def _broadcast(self, raw: str) -> Optional[str]:
+        (result, error), = self.reader.rpc_batch([("eth_sendRawTransaction", [raw])])
+        if error:
+            # "already known" / "nonce too low": the node has it or something took the nonce;
+            # the next receipt round settles it either way
+            print(f"  Broadcast: {error}")
+            return None
+        return result
+
+    def _replacements(self, conn, txn_hash: str) -> List[str]:
+        found, frontier = [], [txn_hash]
+        while frontier:
+            rows = conn.execute(f"SELECT txn_hash FROM tracked_transactions WHERE replaces IN "
+                                f"({', '.join('?' for _ in frontier)})", frontier).fetchall()
+            frontier = [row['txn_hash'] for row in rows]
+            found.extend(frontier)
+        return found
+
+    def _repoint(self, old_hash: str, new_hash: str) -> None:
+        """Move registry rows and anchor batches from one transaction hash to another"""
+        self.registry.update_by_txn(old_hash, txn_hash=new_hash)
+        conn = self.get_db_connection()
+        try:
+            conn.execute('UPDATE anchor_batches SET txn_hash = ? WHERE txn_hash = ?', (new_hash, old_hash))
+            conn.commit()
+        except sqlite3.OperationalError:
+            pass  # Merkle anchoring never enabled on this registry
+        finally:
+            conn.close()
+
+    def stats(self) -> Dict:
+        """Tracked transactions per status"""
+        conn = self.get_db_connection()
+        try:
+            return {row['status']: row['n'] for row in conn.execute(
+                'SELECT status, COUNT(*) AS n FROM tracked_transactions GROUP BY status')}
+        finally:
+            conn.close()
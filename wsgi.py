@@ -0,0 +1,117 @@
+"""
+Production Entry Point
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+gunicorn.conf.py preloads this module in the gunicorn master: the app is
+imported and the expensive read-mostly state (PaddleOCR models for both
+OCR tiers, the Tesseract binding, the perceptual index, compiled field
+extractors) is built once, then frozen out of the garbage collector so
+forked workers keep sharing those pages copy-on-write instead of each
+loading its own copy.
+
+Per worker, after fork:
+    after_fork()  fresh HTTP connection pools, a disjoint slice of the
+                  signer accounts, background loops (confirmation tracker,
+                  Merkle anchoring, live verification) in worker 0 only
+    warm_up()     one inference per OCR tier on a synthetic label, so the
+                  first real request does not pay for lazy initialization
+
+Inference itself is not run in the master: OCR runtimes start thread pools
+on first use, and those do not survive fork. With OCR_BACKEND=onnx the
+master only checks the model files; each worker builds its ONNX Runtime
+sessions during warm_up().
+
+`python app.py` remains the single-process debug server for development.
+"""
+
+import gc
+import os
+import time
+import tempfile
+
+import cv2
+import numpy as np
+from web3 import Web3
+
+import app as verichain
+from app import app  # noqa: F401  (the WSGI callable)
+from live_verify import LIVE_VERIFY_PORT
+from local_ocr import get_local_ocr
+from ocr_engines import get_default_ensemble
+from field_extraction import LABEL_PROFILES, get_extractor
+from perceptual_hash import compute_hashes
+
+WARM_UP_LINES = ["Brand: WARMUP", "Calibration Label", "S/N: WU-000000-0000", "Batch Date: 2025-01-01"]
+
+
+def uses_fast_tier() -> bool:
+    return verichain.OCR_TIERED or bool(LIVE_VERIFY_PORT)
+
+
+def preload() -> None:
+    """Build shared read-mostly state in the master before workers fork"""
+    start = time.perf_counter()
+    get_local_ocr()
+    if uses_fast_tier():
+        get_local_ocr(fast=True)
+    for engine in get_default_ensemble().engines:
+        # Engine backends are created lazily on first recognize()
+        for backend in ("ocr", "tesseract"):
+            getattr(engine, backend, None)
+    for profile in LABEL_PROFILES:
+        get_extractor(profile)
+    verichain.get_perceptual_index()
+    # Objects that survive to here live as long as the workers: keep the
+    # collector from touching (and so un-sharing) their pages
+    gc.collect()
+    gc.freeze()
+    print(f"✓ Preloaded OCR models and registry index in {time.perf_counter() - start:.1f}s "
+          f"({gc.get_freeze_count()} objects frozen)")
+
+
+def after_fork(index: int, workers: int) -> None:
+    """
+    Per-worker setup right after fork
+
+    Args:
+        index: stable worker number, 0..workers-1
+        workers: configured worker count
+    """
+    # Connection pools opened in the master (role checks at import) must not be shared
+    verichain.web3.provider = Web3.HTTPProvider(verichain.neoxt_url)
+    verichain.provenance.web3.provider = Web3.HTTPProvider(verichain.neoxt_url)
+    verichain.signers.partition(index, workers)
+    leader = index == 0
+    for loop in (verichain.tracker, verichain.anchorer):
+        if loop is not None:
+            loop.autostart = leader
+            if leader:
+                # Resume transactions and batches left pending by the previous run
+                loop.start()
+    if leader and LIVE_VERIFY_PORT:
+        verichain.live_verifier.serve_in_background(port=LIVE_VERIFY_PORT)
+
+
+def warm_up() -> float:
+    """One inference per OCR tier on a synthetic label; returns seconds taken"""
+    start = time.perf_counter()
+    label = np.full((480, 720), 235, dtype=np.uint8)
+    for i, line in enumerate(WARM_UP_LINES):
+        cv2.putText(label, line, (40, 110 + i * 90), cv2.FONT_HERSHEY_SIMPLEX, 1.3, 20, 3)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "warm_up.png")
+        cv2.imwrite(path, label)
+        try:
+            get_default_ensemble().run(path)
+            if uses_fast_tier():
+                engine = get_local_ocr(fast=True)
+                engine.recognize(engine.load_fast_image(path))
+            compute_hashes(path)
+        except Exception as e:
+            print(f"⚠ Warm-up inference failed: {e}")
+    elapsed = time.perf_counter() - start
+    print(f"✓ Worker {os.getpid()} warmed up in {elapsed * 1000:.0f} ms")
+    return elapsed
+
+
+preload()